@@ -1,8 +1,7 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, g
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
-import pandas as pd
-import numpy as np
 import os
+import time
 from dotenv import load_dotenv
 from flasgger import Swagger
 from config.swagger_config import swagger_config, swagger_template
@@ -18,34 +17,26 @@ from models.blueprints.gym import gym_bp
 from models.blueprints.cycling_readiness import cycling_readiness_bp
 from routes.timer_routes import timer_bp
 from models.calorie_weight import CalorieWeight
+from models.database.connection_manager import get_db_manager
+from models.database.ai_text_cache import get_text_cache
+from models.services.home_dashboard import load_home
 from datetime import datetime
 
 # Load environment variables from .env file
 load_dotenv()
 
-app = Flask(__name__)
-
-# Use environment variable for secret key, fallback to default for development
-app.secret_key = os.getenv('SECRET_KEY', 'secret')
-
-# Initialize Swagger UI
-swagger = Swagger(app, config=swagger_config, template=swagger_template)
-
-# Configure debug mode based on environment
-app.config['DEBUG'] = os.getenv('DEBUG', 'False').lower() == 'true'
-
-# Configure file upload limits
-app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024  # 10MB max file size
-
-# Configure session
-app.config['SESSION_PERMANENT'] = False
-app.config['PERMANENT_SESSION_LIFETIME'] = 3600  # 1 hour session lifetime
-
 # Initialize Flask-Login
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'login'
 
+# Per-worker boot and first-request timings, reported by /health
+worker_stats = {
+    'pid': os.getpid(),
+    'app_created_at': None,
+    'boot_ms': None,
+    'first_request_ms': None
+}
+
 # Simple User class
 class User(UserMixin):
     def __init__(self, id):
@@ -63,7 +54,6 @@ def load_user(user_id):
         return User(user_id)
     return None
 
-@app.route('/login', methods=['GET', 'POST'])
 def login():
     """
     User login endpoint
@@ -106,28 +96,15 @@ def login():
 
     return render_template('login.html')
 
-@app.route('/logout')
 @login_required
 def logout():
     logout_user()
     return redirect(url_for('login'))
 
-# Register old blueprint (to be removed later)
-app.register_blueprint(food_blueprint)
-# app.register_blueprint(nutrition_app)  # Commented out - replaced by new blueprints
-
-# Register new modular blueprints
-app.register_blueprint(food_bp)
-app.register_blueprint(meal_bp)
-app.register_blueprint(recipe_bp)
-app.register_blueprint(ai_bp)
-app.register_blueprint(analytics_bp)
-app.register_blueprint(gym_bp)
-app.register_blueprint(cycling_readiness_bp)
-app.register_blueprint(timer_bp)
-
+# Constructing these only resolves the (lazy) connection manager; the pool is
+# opened per worker after fork, see gunicorn.conf.py
 food_db = FoodDatabase()
-calorie_weight =CalorieWeight()
+calorie_weight = CalorieWeight()
 
 def transform_date_format(date_str):
     # Parse the input date string to a datetime object
@@ -135,7 +112,6 @@ def transform_date_format(date_str):
     # Format the datetime object to the desired string format
     return date_obj.strftime("%d.%m.%Y")
 
-@app.route('/', methods=["GET", "POST"])
 @login_required
 def home():
     """
@@ -155,102 +131,55 @@ def home():
               type: string
               example: "success"
     """
-    consumption = food_db.fetch_all_consumption()
-    calories = calorie_weight.fetch_calories()
-    weights = calorie_weight.fetch_weights()
-    avg_consumed = food_db.get_avg_nutrition_consumed()
-
-    # Handle None values in avg_consumed
-    if avg_consumed is None:
-        avg_consumed = {
-            "kcal": 0, "fat": 0, "carb": 0, "fiber": 0,
-            "net_carb": 0, "protein": 0, "cnt": 0
-        }
-    else:
-        # Ensure all values are not None
-        for key in ["kcal", "fat", "carb", "fiber", "net_carb", "protein", "cnt"]:
-            if avg_consumed.get(key) is None:
-                avg_consumed[key] = 0
-
-    # Initialize variables with defaults
-    dates = []
-    proteins = []
-    fats = []
-    carbs = []
-    date_calories = []
-    data_calories = []
-    date_weight = []
-    data_weight = []
-    average_weight = 0
-
-    if len(consumption) > 0:
-        df = pd.DataFrame(consumption)
-        df[['protein','carb']] = df[['protein','carb']] * 4
-        df['fat'] = df['fat'] * 9
-
-        # Convert 'date' column to datetime format - handle multiple formats
-        # Try to parse dates without specifying format, let pandas infer
-        try:
-            # First try with pd.to_datetime without any format specification
-            df['date'] = pd.to_datetime(df['date'])
-        except:
-            # If that fails, try with dayfirst=True for DD.MM.YYYY formats
-            try:
-                df['date'] = pd.to_datetime(df['date'], dayfirst=True)
-            except:
-                # As a last resort, try to parse each date individually
-                df['date'] = df['date'].apply(lambda x: pd.to_datetime(x, errors='coerce'))
-
-        df = df.sort_values(by='date', ascending=True)
-        # Group by date and sum up the necessary columns
-        grouped_data = df.groupby('date').agg({
-            'protein': 'sum',
-            'fat': 'sum',
-            'carb': 'sum',
-            'kcal':'sum'
-        }).reset_index()
-
-        dates = grouped_data['date'].tolist()
-        proteins = grouped_data['protein'].tolist()
-        fats = grouped_data['fat'].tolist()
-        carbs = grouped_data['carb'].tolist()
-
-    if len(calories) > 0:
-        df_calories = pd.DataFrame(calories).reset_index()
-        # Handle multiple date formats for calories
-        try:
-            df_calories['date'] = pd.to_datetime(df_calories['date'])
-        except:
-            try:
-                df_calories['date'] = pd.to_datetime(df_calories['date'], dayfirst=True)
-            except:
-                df_calories['date'] = df_calories['date'].apply(lambda x: pd.to_datetime(x, errors='coerce'))
-
-        df_calories = df_calories.sort_values(by='date', ascending=True)
-        date_calories = df_calories['date'].to_list()
-        data_calories = df_calories['calories'].to_list()
-
-    if len(weights) > 0:
-        df_weight = pd.DataFrame(weights).reset_index()
-        # Handle multiple date formats for weights
-        try:
-            df_weight['date'] = pd.to_datetime(df_weight['date'])
-        except:
-            try:
-                df_weight['date'] = pd.to_datetime(df_weight['date'], dayfirst=True)
-            except:
-                df_weight['date'] = df_weight['date'].apply(lambda x: pd.to_datetime(x, errors='coerce'))
-
-        df_weight = df_weight.sort_values(by='date', ascending=True)
-        date_weight = df_weight['date'].to_list()[1:] if len(df_weight) > 1 else []
-        data_weight = df_weight['weight'].to_list()[1:] if len(df_weight) > 1 else []
-        average_weight = np.round(np.mean(data_weight),1) if len(data_weight) > 0 else 0
+    # The charts load their series from /home/series
+    summary = load_home(food_db, calorie_weight, user_id=current_user.id)['summary']
+    return render_template('index.html', avg_consumed=summary['avg_consumed'],
+                           trend_weight=summary['trend_weight'], energy=summary['energy'],
+                           series_url=url_for('home_series'))
 
 
-    return render_template('index.html',average_weight=average_weight,avg_consumed=avg_consumed,date_calories=date_calories,data_calories=data_calories, date_weight=date_weight,data_weight=data_weight, dates=dates, kcals=data_calories, proteins=proteins, fats=fats, carbs=carbs)
+@login_required
+def home_series():
+    """
+    Chart series of the home dashboard
+    ---
+    tags:
+      - Dashboard
+    security:
+      - LoginRequired: []
+    description: >
+      Daily macros (in kcal) of the last 30 days plus the active calorie and
+      body weight histories, averaged down to at most 120 points each.
+      Cached until the underlying data changes; send If-None-Match or
+      If-Modified-Since to get 304 Not Modified for an unchanged dashboard.
+    responses:
+      200:
+        description: Chart series
+        schema:
+          type: object
+          properties:
+            macros:
+              type: object
+              description: dates plus kcal, protein, carb and fat (in kcal) per day
+            calories:
+              type: object
+              description: dates and values of the active calories
+            weight:
+              type: object
+              description: dates and values of the body weight
+      304:
+        description: The client's copy is current
+    """
+    data = load_home(food_db, calorie_weight, user_id=current_user.id)
+    response = jsonify(data['series'])
+    response.set_etag(data['etag'])
+    response.last_modified = data['last_modified']
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    # 304 Not Modified when the client already holds this version
+    return response.make_conditional(request)
 
 
-@app.route('/add_data', methods=["GET", "POST"])
 @login_required
 def add_data():
     date = datetime.now().strftime('%d.%m.%Y')
@@ -275,6 +204,105 @@ def add_data():
     return render_template('add_data.html', calories=calories, weights=weights)
 
 
+def health():
+    """
+    Health check with database pool readiness, query cache and AI text cache metrics
+    ---
+    tags:
+      - Monitoring
+    responses:
+      200:
+        description: Worker is up and its database pool is ready
+      503:
+        description: Worker is up but its database pool could not be filled
+    """
+    manager = get_db_manager()
+    pool = manager.pool_status()
+    if not pool['ready']:
+        # Nothing may have touched the database yet (DB_POOL_WARMUP=false or a failed warm-up)
+        try:
+            manager.warm_up()
+            pool = manager.pool_status()
+        except Exception as e:
+            pool = dict(manager.pool_status(), error=str(e))
+    status_code = 200 if pool['ready'] else 503
+    return jsonify({
+        'status': 'ok' if pool['ready'] else 'starting',
+        'database': pool,
+        'query_cache': manager.cache_stats(),
+        'ai_text_cache': get_text_cache(manager).stats(),
+        'worker': dict(worker_stats, pid=os.getpid())
+    }), status_code
+
+
+def _record_first_request(app):
+    """Log how long the first request served by this worker took"""
+    @app.before_request
+    def _start_timer():
+        if worker_stats['first_request_ms'] is None:
+            g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _stop_timer(response):
+        started = g.pop('request_started', None)
+        if started is not None and worker_stats['first_request_ms'] is None:
+            worker_stats['first_request_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            app.logger.info(f"Worker {os.getpid()} first request {request.path} took {worker_stats['first_request_ms']} ms")
+        return response
+
+
+def create_app():
+    """Application factory; builds the app without opening database connections"""
+    app = Flask(__name__)
+
+    # Use environment variable for secret key, fallback to default for development
+    app.secret_key = os.getenv('SECRET_KEY', 'secret')
+
+    # Initialize Swagger UI
+    Swagger(app, config=swagger_config, template=swagger_template)
+
+    # Configure debug mode based on environment
+    app.config['DEBUG'] = os.getenv('DEBUG', 'False').lower() == 'true'
+
+    # Configure file upload limits
+    app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024  # 10MB max file size
+
+    # Configure session
+    app.config['SESSION_PERMANENT'] = False
+    app.config['PERMANENT_SESSION_LIFETIME'] = 3600  # 1 hour session lifetime
+
+    login_manager.init_app(app)
+
+    app.add_url_rule('/login', 'login', login, methods=['GET', 'POST'])
+    app.add_url_rule('/logout', 'logout', logout)
+    app.add_url_rule('/', 'home', home, methods=['GET', 'POST'])
+    app.add_url_rule('/home/series', 'home_series', home_series)
+    app.add_url_rule('/add_data', 'add_data', add_data, methods=['GET', 'POST'])
+    app.add_url_rule('/health', 'health', health)
+
+    # Register old blueprint (to be removed later)
+    app.register_blueprint(food_blueprint)
+    # app.register_blueprint(nutrition_app)  # Commented out - replaced by new blueprints
+
+    # Register new modular blueprints
+    app.register_blueprint(food_bp)
+    app.register_blueprint(meal_bp)
+    app.register_blueprint(recipe_bp)
+    app.register_blueprint(ai_bp)
+    app.register_blueprint(analytics_bp)
+    app.register_blueprint(gym_bp)
+    app.register_blueprint(cycling_readiness_bp)
+    app.register_blueprint(timer_bp)
+
+    _record_first_request(app)
+    worker_stats['app_created_at'] = time.time()
+
+    return app
+
+
+app = create_app()
+
+
 if __name__ == "__main__":
     # Get debug mode from environment, default to True for development
     debug_mode = os.getenv('DEBUG', 'True').lower() == 'true'
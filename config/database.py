@@ -28,6 +28,66 @@ class DatabaseConfig:
     autocommit: bool = False
     auth_plugin: str = 'mysql_native_password'
 
+@dataclass
+class SQLiteConfig:
+    """Configuration for the embedded SQLite engine"""
+    path: str
+    database: str
+    busy_timeout_ms: int = 5000
+    cache_size_kb: int = 20000
+    journal_mode: str = 'WAL'
+    synchronous: str = 'NORMAL'
+
+@dataclass
+class QueryCacheConfig:
+    """Configuration for the table-tagged query result cache"""
+    enabled: bool = False
+    max_entries: int = 512
+    max_bytes: int = 32 * 1024 * 1024
+    ttl_seconds: Optional[float] = 300
+    shared_path: Optional[str] = None
+
+def get_query_cache_config() -> QueryCacheConfig:
+    """Get query result cache settings from the environment.
+
+    Per-process table versions cannot see another worker's writes, so the
+    cache is only on by default with a shared versions file (gunicorn.conf.py
+    sets one); QUERY_CACHE_ENABLED=true turns it on for a single process.
+    """
+    ttl = os.getenv('QUERY_CACHE_TTL_SECONDS', '300')
+    shared_path = os.getenv('QUERY_CACHE_SHARED_PATH') or None
+    return QueryCacheConfig(
+        enabled=os.getenv('QUERY_CACHE_ENABLED', 'true' if shared_path else 'false').lower() == 'true',
+        max_entries=int(os.getenv('QUERY_CACHE_MAX_ENTRIES', '512')),
+        max_bytes=int(os.getenv('QUERY_CACHE_MAX_MB', '32')) * 1024 * 1024,
+        ttl_seconds=float(ttl) if ttl and float(ttl) > 0 else None,
+        shared_path=shared_path
+    )
+
+def get_database_engine() -> str:
+    """Get the configured database engine ('mysql' or 'sqlite')"""
+    engine = os.getenv('DB_ENGINE')
+    if engine:
+        return engine.strip().lower()
+
+    # Legacy flag: USE_MYSQL=false selects the embedded engine
+    if os.getenv('USE_MYSQL', 'true').lower() == 'false':
+        return 'sqlite'
+    return 'mysql'
+
+def get_sqlite_config() -> SQLiteConfig:
+    """Get configuration for the embedded SQLite engine"""
+    db_path = os.getenv('DATABASE_PATH', 'database.db')
+    if db_path != ':memory:' and not os.path.isabs(db_path):
+        db_path = os.path.abspath(db_path)
+
+    return SQLiteConfig(
+        path=db_path,
+        database=os.path.splitext(os.path.basename(db_path))[0] or 'memory',
+        busy_timeout_ms=int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+        cache_size_kb=int(os.getenv('SQLITE_CACHE_SIZE_KB', '20000'))
+    )
+
 def get_database_config(environment: str = None) -> DatabaseConfig:
     """Get database configuration based on environment"""
     env = environment or os.getenv('FLASK_ENV', 'development')
@@ -0,0 +1,55 @@
+"""
+Gunicorn configuration.
+
+The app is imported without opening database connections (see create_app in
+app.py). Each worker builds its own pool after fork and fills it before
+accepting requests, so no socket is ever shared between
+processes and the first request does not pay for connection setup. The pool
+connects serially, so a worker's boot grows by about pool_size handshakes.
+"""
+import os
+import time
+import logging
+import tempfile
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv('GUNICORN_WORKERS', '1'))
+threads = int(os.getenv('GUNICORN_THREADS', '2'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '180'))
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '50'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '10'))
+
+logger = logging.getLogger('gunicorn.error')
+
+# Workers (and the import processes they start) share query cache table versions,
+# so a write in one worker invalidates the others' cached reads
+os.environ.setdefault('QUERY_CACHE_SHARED_PATH', os.path.join(tempfile.gettempdir(), 'nutrition_query_cache.versions'))
+
+_fork_started = {}
+
+
+def post_fork(server, worker):
+    """Remember when this worker was forked so boot time can be reported"""
+    _fork_started[os.getpid()] = time.perf_counter()
+
+
+def post_worker_init(worker):
+    """Warm up this worker's database pool before it accepts requests"""
+    from app import worker_stats
+    from models.database.connection_manager import get_db_manager
+
+    pid = os.getpid()
+    worker_stats['pid'] = pid
+
+    if os.getenv('DB_POOL_WARMUP', 'true').lower() == 'true':
+        try:
+            stats = get_db_manager().warm_up()
+            logger.info(f"Worker {pid} database pool warm: {stats}")
+        except Exception as e:
+            # The pool is retried by the first request or health check that needs it
+            logger.error(f"Worker {pid} database warm-up failed: {e}")
+
+    started = _fork_started.pop(pid, None)
+    if started is not None:
+        worker_stats['boot_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"Worker {pid} booted in {worker_stats['boot_ms']} ms")
@@ -0,0 +1,57 @@
+"""
+Migration: Add the ai_analysis_results table (server-side AI results).
+
+AI analysis results are kept server-side keyed by the session's
+ai_session_id (see models/database/ai_results.py). Until this runs they
+live only in the memory of the worker that produced them.
+
+Run: python migrations/add_ai_results.py [rollback]
+"""
+import os
+import sys
+import logging
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from models.database.connection_manager import get_db_manager
+from models.database.ai_results import RESULTS_TABLE, create_table, reset_results_state
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def run_migration() -> bool:
+    """Create ai_analysis_results"""
+    try:
+        db_manager = get_db_manager()
+        logger.info(f"Starting migration: Adding {RESULTS_TABLE}")
+        create_table(db_manager)
+        reset_results_state(db_manager)
+        logger.info(f"✓ Created {RESULTS_TABLE}")
+        return True
+
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        return False
+
+
+def rollback_migration() -> bool:
+    """Drop the ai_analysis_results table"""
+    try:
+        db_manager = get_db_manager()
+        logger.info(f"Rolling back: Dropping {RESULTS_TABLE}")
+        db_manager.execute_query(f'DROP TABLE IF EXISTS {RESULTS_TABLE}')
+        reset_results_state(db_manager)
+        logger.info(f"✓ Dropped {RESULTS_TABLE}")
+        return True
+
+    except Exception as e:
+        logger.error(f"Rollback failed: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "rollback":
+        success = rollback_migration()
+    else:
+        success = run_migration()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,57 @@
+"""
+Migration: Add the ai_text_items table (AI text analysis item cache).
+
+AI text analysis caches the model's answer per normalized food item (see
+models/database/ai_text_cache.py). Until this runs the cache lives only in
+the memory of each worker and is lost on restart.
+
+Run: python migrations/add_ai_text_cache.py [rollback]
+"""
+import os
+import sys
+import logging
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from models.database.connection_manager import get_db_manager
+from models.database.ai_text_cache import ITEMS_TABLE, create_table, reset_items_state
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def run_migration() -> bool:
+    """Create ai_text_items"""
+    try:
+        db_manager = get_db_manager()
+        logger.info(f"Starting migration: Adding {ITEMS_TABLE}")
+        create_table(db_manager)
+        reset_items_state(db_manager)
+        logger.info(f"✓ Created {ITEMS_TABLE}")
+        return True
+
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        return False
+
+
+def rollback_migration() -> bool:
+    """Drop the ai_text_items table"""
+    try:
+        db_manager = get_db_manager()
+        logger.info(f"Rolling back: Dropping {ITEMS_TABLE}")
+        db_manager.execute_query(f'DROP TABLE IF EXISTS {ITEMS_TABLE}')
+        reset_items_state(db_manager)
+        logger.info(f"✓ Dropped {ITEMS_TABLE}")
+        return True
+
+    except Exception as e:
+        logger.error(f"Rollback failed: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "rollback":
+        success = rollback_migration()
+    else:
+        success = run_migration()
+    sys.exit(0 if success else 1)
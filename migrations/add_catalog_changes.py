@@ -0,0 +1,59 @@
+"""
+Migration: Add the catalog_changes log behind the shared food catalog cache.
+
+Writers of Ingredient_Quantity, Nutrition and Favorites append the ingredient
+or ingredient quantity they changed, and every worker patches its in-memory
+catalog from the entries it has not applied yet (see
+models/database/food_catalog.py). Until this runs the catalog is invalidated
+as a whole through the query cache.
+
+Run: python migrations/add_catalog_changes.py [rollback]
+"""
+import os
+import sys
+import logging
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from models.database.connection_manager import get_db_manager
+from models.database.food_catalog import CHANGES_TABLE, create_table, reset_changes_state
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def run_migration() -> bool:
+    """Create the catalog_changes table"""
+    try:
+        db_manager = get_db_manager()
+        logger.info(f"Starting migration: Adding {CHANGES_TABLE}")
+        create_table(db_manager)
+        reset_changes_state(db_manager)
+        logger.info(f"✓ Created {CHANGES_TABLE}")
+        return True
+
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        return False
+
+
+def rollback_migration() -> bool:
+    """Drop the catalog_changes table"""
+    try:
+        db_manager = get_db_manager()
+        logger.info(f"Rolling back: Dropping {CHANGES_TABLE}")
+        db_manager.execute_query(f'DROP TABLE IF EXISTS {CHANGES_TABLE}')
+        reset_changes_state(db_manager)
+        logger.info(f"✓ Dropped {CHANGES_TABLE}")
+        return True
+
+    except Exception as e:
+        logger.error(f"Rollback failed: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "rollback":
+        success = rollback_migration()
+    else:
+        success = run_migration()
+    sys.exit(0 if success else 1)
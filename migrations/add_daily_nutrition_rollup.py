@@ -0,0 +1,69 @@
+"""
+Migration: Add the daily_nutrition rollup table and build it.
+
+The rollup holds pre-summed kcal, macros and fiber per day and meal type
+(food and recipe consumption), keyed on the native entry_date columns, so it
+needs migrations/add_native_date_columns.py to have completed its backfill.
+From then on every consumption/recipe writer keeps it up to date in its own
+transaction (see models/database/daily_nutrition.py); this migration only
+creates and fills it. scripts/rebuild_daily_nutrition.py rebuilds it later.
+
+Run: python migrations/add_daily_nutrition_rollup.py [rollback]
+"""
+import os
+import sys
+import logging
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from models.database.connection_manager import get_db_manager
+from models.database.daily_nutrition import ROLLUP_TABLE, create_table, rebuild, reset_rollup_state
+from models.database.native_dates import native_date_reads, reset_native_date_state
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def run_migration() -> bool:
+    """Create daily_nutrition and fill it from the consumption tables"""
+    try:
+        db_manager = get_db_manager()
+        logger.info("Starting migration: Adding daily_nutrition rollup")
+
+        reset_native_date_state(db_manager)
+        if not (native_date_reads(db_manager, 'Consumption') and
+                native_date_reads(db_manager, 'recipe_consumption')):
+            logger.error("Native date backfill is not complete; run add_native_date_columns first")
+            return False
+
+        create_table(db_manager)
+        rows = rebuild(db_manager)
+        reset_rollup_state(db_manager)
+        logger.info(f"✓ Built {ROLLUP_TABLE} with {rows} row(s)")
+        return True
+
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        return False
+
+
+def rollback_migration() -> bool:
+    """Drop the daily_nutrition table"""
+    try:
+        db_manager = get_db_manager()
+        logger.info(f"Rolling back: Dropping {ROLLUP_TABLE}")
+        db_manager.execute_query(f'DROP TABLE IF EXISTS {ROLLUP_TABLE}')
+        reset_rollup_state(db_manager)
+        logger.info(f"✓ Dropped {ROLLUP_TABLE}")
+        return True
+
+    except Exception as e:
+        logger.error(f"Rollback failed: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "rollback":
+        success = rollback_migration()
+    else:
+        success = run_migration()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,67 @@
+"""
+Migration: Create the energy_balance table for the adaptive TDEE estimate.
+
+Creates energy_balance (see models/database/energy_balance.py) and computes
+every day logged so far, so the first dashboard read only appends today's
+missing days. Once the daily_nutrition rollup is ready the table fills
+itself; before that it stays empty and the backfill is skipped.
+
+Run: python migrations/add_energy_balance.py [rollback]
+"""
+import os
+import sys
+import logging
+from datetime import date
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from models.database.connection_manager import get_db_manager
+from models.database.energy_balance import ENERGY_TABLE, create_table, reset_energy_state
+from models.services import tdee
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def run_migration() -> bool:
+    """Create energy_balance and backfill it up to yesterday"""
+    try:
+        db_manager = get_db_manager()
+        logger.info("Starting migration: Creating energy_balance")
+
+        create_table(db_manager)
+        reset_energy_state(db_manager)
+        logger.info(f"✓ Created {ENERGY_TABLE}")
+
+        added = tdee.refresh(db_manager, date.today())
+        logger.info(f"✓ Computed {added} day(s) of maintenance estimates")
+        db_manager.touch(ENERGY_TABLE)
+        return True
+
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        return False
+
+
+def rollback_migration() -> bool:
+    """Drop energy_balance"""
+    try:
+        db_manager = get_db_manager()
+        logger.info("Rolling back: Dropping energy_balance")
+
+        db_manager.execute_query(f'DROP TABLE IF EXISTS {ENERGY_TABLE}')
+        reset_energy_state(db_manager)
+        db_manager.touch(ENERGY_TABLE)
+        logger.info(f"✓ Dropped {ENERGY_TABLE}")
+        return True
+
+    except Exception as e:
+        logger.error(f"Rollback failed: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "rollback":
+        success = rollback_migration()
+    else:
+        success = run_migration()
+    sys.exit(0 if success else 1)
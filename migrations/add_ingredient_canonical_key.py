@@ -0,0 +1,77 @@
+"""
+Migration: Add Ingredient.canonical_key.
+
+Adds a nullable, indexed canonical_key column to Ingredient and fills it
+with models.database.ingredient_canon.canonical_key() of every name. From
+then on every ingest path resolves ingredient names by that key, so
+"Banana", " banana" and "bananas" no longer become three ingredients.
+
+Existing duplicates are merged separately, after reviewing the dry run:
+    python scripts/dedupe_ingredients.py [--apply]
+
+Run: python migrations/add_ingredient_canonical_key.py [rollback]
+"""
+import os
+import sys
+import logging
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from models.database.connection_manager import get_db_manager
+from models.database.index_advisor import apply_indexes, drop_indexes, table_columns
+from models.database.ingredient_canon import KEY_LENGTH, backfill_keys, reset_canonical_state
+from models.database.ingredient_ingest import CANON_COLUMN
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INDEX = ('Ingredient', f'idx_ingredient_{CANON_COLUMN}', (CANON_COLUMN,))
+
+
+def run_migration() -> bool:
+    """Add, backfill and index Ingredient.canonical_key"""
+    try:
+        db_manager = get_db_manager()
+        logger.info(f"Starting migration: Adding Ingredient.{CANON_COLUMN}")
+
+        if CANON_COLUMN not in table_columns(db_manager, 'Ingredient'):
+            column_type = f'VARCHAR({KEY_LENGTH})' if db_manager.use_mysql else 'TEXT'
+            db_manager.execute_query(f'ALTER TABLE Ingredient ADD COLUMN {CANON_COLUMN} {column_type} NULL')
+            logger.info(f"✓ Added Ingredient.{CANON_COLUMN}")
+
+        count = backfill_keys(db_manager)
+        logger.info(f"✓ Backfilled {count} canonical key(s)")
+        apply_indexes(db_manager, [INDEX])
+
+        reset_canonical_state(db_manager)
+        return True
+
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        return False
+
+
+def rollback_migration() -> bool:
+    """Drop Ingredient.canonical_key and its index"""
+    try:
+        db_manager = get_db_manager()
+        logger.info(f"Rolling back: Dropping Ingredient.{CANON_COLUMN}")
+
+        if CANON_COLUMN in table_columns(db_manager, 'Ingredient'):
+            drop_indexes(db_manager, [INDEX])
+            db_manager.execute_query(f'ALTER TABLE Ingredient DROP COLUMN {CANON_COLUMN}')
+            logger.info(f"✓ Dropped Ingredient.{CANON_COLUMN}")
+
+        reset_canonical_state(db_manager)
+        return True
+
+    except Exception as e:
+        logger.error(f"Rollback failed: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "rollback":
+        success = rollback_migration()
+    else:
+        success = run_migration()
+    sys.exit(0 if success else 1)
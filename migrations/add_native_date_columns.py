@@ -0,0 +1,137 @@
+"""
+Migration: Add native DATE columns to the day-keyed nutrition tables.
+
+Consumption, recipe_consumption, calorie_tracking and body_weight_tracking keep
+their day as DD.MM.YYYY / YYYY-MM-DD strings, so every reader sorts with
+STR_TO_DATE() or re-parses dates in Python. This migration runs online:
+
+1. expand   - add a nullable `entry_date DATE` column and index it
+              (instant ADD COLUMN, ALGORITHM=INPLACE LOCK=NONE index build);
+2. backfill - convert legacy values in small batches keyed on
+              `entry_date IS NULL`, pausing between batches;
+3. dual-write period - the app writes both columns as soon as (1) lands and
+              switches its readers to entry_date once (2) is complete
+              (see models/database/native_dates.py).
+
+Dropping the legacy string columns is a later contract step once no deployed
+code reads them. Re-running the migration resumes an interrupted backfill.
+
+Run: python migrations/add_native_date_columns.py [rollback]
+"""
+import os
+import sys
+import time
+import logging
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from models.database.connection_manager import get_db_manager
+from models.database.index_advisor import apply_indexes, drop_indexes, table_columns
+from models.database.native_dates import (
+    DATE_COLUMN, LEGACY_DATE_COLUMNS, legacy_parse_sql, reset_native_date_state
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.getenv('BACKFILL_BATCH_SIZE', '2000'))
+BATCH_PAUSE_SECONDS = float(os.getenv('BACKFILL_PAUSE_SECONDS', '0.05'))
+
+
+def _index(table):
+    return (table, f'idx_{table.lower()}_{DATE_COLUMN}', (DATE_COLUMN,))
+
+
+def _legacy_is_date(db_manager, table, legacy):
+    """True when the legacy column is already a DATE/DATETIME on MySQL"""
+    if not db_manager.use_mysql:
+        return False
+    row = db_manager.execute_query('''
+        SELECT DATA_TYPE AS data_type FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    ''', (table, legacy), fetch_one=True)
+    return bool(row) and row['data_type'] in ('date', 'datetime', 'timestamp')
+
+
+def backfill(db_manager, table) -> int:
+    """Fill entry_date from the legacy column in batches; returns rows converted"""
+    legacy = LEGACY_DATE_COLUMNS[table]
+    if _legacy_is_date(db_manager, table, legacy):
+        source = f'DATE({legacy})'
+    else:
+        source = legacy_parse_sql(legacy, escape_percent=True)
+
+    pending = f'{DATE_COLUMN} IS NULL AND {source} IS NOT NULL'
+    if db_manager.use_mysql:
+        statement = f'UPDATE {table} SET {DATE_COLUMN} = {source} WHERE {pending} LIMIT %s'
+    else:
+        statement = (f'UPDATE {table} SET {DATE_COLUMN} = {source} '
+                     f'WHERE rowid IN (SELECT rowid FROM {table} WHERE {pending} LIMIT %s)')
+
+    total = 0
+    while True:
+        updated = db_manager.execute_query(statement, (BATCH_SIZE,))
+        total += updated or 0
+        if not updated or updated < BATCH_SIZE:
+            break
+        logger.info(f"  {table}: {total} rows backfilled so far")
+        # Yield to application writes between batches
+        time.sleep(BATCH_PAUSE_SECONDS)
+    return total
+
+
+def run_migration() -> bool:
+    """Add, index and backfill entry_date on every day-keyed table"""
+    try:
+        db_manager = get_db_manager()
+        logger.info("Starting migration: Adding native DATE columns")
+
+        for table in LEGACY_DATE_COLUMNS:
+            columns = table_columns(db_manager, table)
+            if not columns:
+                logger.info(f"Table {table} does not exist, skipping")
+                continue
+
+            if DATE_COLUMN not in columns:
+                db_manager.execute_query(f'ALTER TABLE {table} ADD COLUMN {DATE_COLUMN} DATE NULL')
+                logger.info(f"✓ Added {table}.{DATE_COLUMN}")
+
+            apply_indexes(db_manager, [_index(table)])
+
+            converted = backfill(db_manager, table)
+            logger.info(f"✓ Backfilled {converted} row(s) in {table}")
+
+        reset_native_date_state(db_manager)
+        return True
+
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        return False
+
+
+def rollback_migration() -> bool:
+    """Drop the entry_date columns and their indexes"""
+    try:
+        db_manager = get_db_manager()
+        logger.info("Rolling back: Dropping native DATE columns")
+
+        for table in LEGACY_DATE_COLUMNS:
+            if DATE_COLUMN not in table_columns(db_manager, table):
+                continue
+            drop_indexes(db_manager, [_index(table)])
+            db_manager.execute_query(f'ALTER TABLE {table} DROP COLUMN {DATE_COLUMN}')
+            logger.info(f"✓ Dropped {table}.{DATE_COLUMN}")
+
+        reset_native_date_state(db_manager)
+        return True
+
+    except Exception as e:
+        logger.error(f"Rollback failed: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "rollback":
+        success = rollback_migration()
+    else:
+        success = run_migration()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,59 @@
+"""
+Migration: Add the recipe_nutrition table (per-serving recipe vectors).
+
+Creates the table and computes the vector of every existing recipe. Recipe,
+ingredient and nutrition writers keep it current from then on (see
+models/database/recipe_nutrition.py); until this runs recipe nutrition is
+summed at query time as before.
+
+Run: python migrations/add_recipe_nutrition.py [rollback]
+"""
+import os
+import sys
+import logging
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from models.database.connection_manager import get_db_manager
+from models.database.recipe_nutrition import VECTOR_TABLE, create_table, rebuild, reset_vectors_state
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def run_migration() -> bool:
+    """Create recipe_nutrition and compute every recipe's vector"""
+    try:
+        db_manager = get_db_manager()
+        logger.info(f"Starting migration: Adding {VECTOR_TABLE}")
+        create_table(db_manager)
+        count = rebuild(db_manager)
+        reset_vectors_state(db_manager)
+        logger.info(f"✓ Created {VECTOR_TABLE} with {count} recipe vector(s)")
+        return True
+
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        return False
+
+
+def rollback_migration() -> bool:
+    """Drop the recipe_nutrition table"""
+    try:
+        db_manager = get_db_manager()
+        logger.info(f"Rolling back: Dropping {VECTOR_TABLE}")
+        db_manager.execute_query(f'DROP TABLE IF EXISTS {VECTOR_TABLE}')
+        reset_vectors_state(db_manager)
+        logger.info(f"✓ Dropped {VECTOR_TABLE}")
+        return True
+
+    except Exception as e:
+        logger.error(f"Rollback failed: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "rollback":
+        success = rollback_migration()
+    else:
+        success = run_migration()
+    sys.exit(0 if success else 1)
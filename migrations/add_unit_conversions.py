@@ -0,0 +1,206 @@
+"""
+Migration: Collapse per-unit Nutrition rows into one base-unit row per ingredient.
+
+Nutrition is keyed by (ingredient_id, unit_id), so every unit a food was
+ever logged in carried its own row. This migration:
+
+1. adds Ingredient_Quantity.base_unit_id / unit_factor, the cached
+   conversion of each quantity row to its ingredient's base unit;
+2. writes one base row per ingredient (per g, per ml, or per its most used
+   portion unit) and fills the cached conversions, while the old per-unit
+   rows are still in place for code that has not switched yet;
+3. creates unit_conversions, which switches the application to base units,
+   and in one transaction stores the units the fixed mass/volume factors
+   cannot reach as edges (ratio of their row to the base row) and deletes
+   the per-unit rows.
+
+The daily_nutrition rollup and recipe vectors are rebuilt afterwards, since
+rows a fixed factor reaches are now computed from the base row instead of
+their typed-in values. See models/database/unit_conversion.py.
+
+Run: python migrations/add_unit_conversions.py [rollback]
+"""
+import os
+import sys
+import logging
+from collections import Counter, defaultdict
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from models.database import daily_nutrition, recipe_nutrition
+from models.database.connection_manager import get_db_manager
+from models.database.index_advisor import table_columns
+from models.database.ingredient_ingest import resolve_names
+from models.database.unit_conversion import (
+    BASE_COLUMN, CONVERSIONS_TABLE, FACTOR_COLUMN, NUTRITION_COLUMNS, collapse_rows, conversion_factor,
+    create_table, reset_base_units_state
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COLUMNS = ', '.join(NUTRITION_COLUMNS)
+
+
+def _add_columns(db_manager):
+    columns = table_columns(db_manager, 'Ingredient_Quantity')
+    types = {BASE_COLUMN: 'INT' if db_manager.use_mysql else 'INTEGER',
+             FACTOR_COLUMN: 'DOUBLE' if db_manager.use_mysql else 'REAL'}
+    for column, column_type in types.items():
+        if column not in columns:
+            db_manager.execute_query(f'ALTER TABLE Ingredient_Quantity ADD COLUMN {column} {column_type} NULL')
+            logger.info(f"✓ Added Ingredient_Quantity.{column}")
+
+
+def _plan(db_manager):
+    """Collapse plan of the current Nutrition rows (see unit_conversion.collapse_rows)"""
+    rows = [(row['ingredient_id'], row['unit_id'], [float(row[column] or 0) for column in NUTRITION_COLUMNS])
+            for row in db_manager.execute_query(f'SELECT ingredient_id, unit_id, {COLUMNS} FROM Nutrition',
+                                                fetch_all=True) or []]
+    usage = Counter()
+    for row in db_manager.execute_query('SELECT ingredient_id, unit_id FROM Ingredient_Quantity', fetch_all=True) or []:
+        usage[(row['ingredient_id'], row['unit_id'])] += 1
+    edges = defaultdict(list)
+    if table_columns(db_manager, CONVERSIONS_TABLE):
+        for row in db_manager.execute_query(f'SELECT * FROM {CONVERSIONS_TABLE}', fetch_all=True) or []:
+            edges[row['ingredient_id']].append((row['unit_id'], row['to_unit_id'], float(row['factor'])))
+
+    with db_manager.get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            base_symbols = resolve_names(cursor, 'Unit', 'unit_id', 'unit_name', ['g', 'ml'])[0]
+            conn.commit()
+        finally:
+            cursor.close()
+    names = {row['unit_id']: row['unit_name']
+             for row in db_manager.execute_query('SELECT unit_id, unit_name FROM Unit', fetch_all=True) or []}
+    return collapse_rows(rows, usage, names, base_symbols, edges), names, edges
+
+
+def _write_bases(db_manager, plan, names, edges):
+    """Base rows plus cached conversions, next to the per-unit rows (step 2)"""
+    every_edge = defaultdict(list, {key: list(value) for key, value in edges.items()})
+    for ingredient_id, unit_id, to_unit_id, factor in plan['edges']:
+        every_edge[ingredient_id].append((unit_id, to_unit_id, factor))
+
+    factors = []
+    for row in db_manager.execute_query('SELECT DISTINCT ingredient_id, unit_id FROM Ingredient_Quantity',
+                                        fetch_all=True) or []:
+        base = plan['bases'].get(row['ingredient_id'])
+        factor = conversion_factor(names, every_edge[row['ingredient_id']], row['unit_id'], base[0]) if base else None
+        factors.append((base[0] if factor is not None else None, factor, row['ingredient_id'], row['unit_id']))
+
+    with db_manager.get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            bases = [(ingredient_id, unit_id) for ingredient_id, (unit_id, _) in plan['bases'].items()]
+            cursor.executemany('DELETE FROM Nutrition WHERE ingredient_id = %s AND unit_id = %s', bases)
+            cursor.executemany(f'INSERT INTO Nutrition (ingredient_id, unit_id, {COLUMNS}) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)',
+                               [(ingredient_id, unit_id, *values)
+                                for ingredient_id, (unit_id, values) in plan['bases'].items()])
+            cursor.executemany(f'UPDATE Ingredient_Quantity SET {BASE_COLUMN} = %s, {FACTOR_COLUMN} = %s '
+                               f'WHERE ingredient_id = %s AND unit_id = %s', factors)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+def _drop_unit_rows(db_manager, plan):
+    """Conversion edges in, per-unit rows out, in one transaction (step 3)"""
+    with db_manager.get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(f'DELETE FROM {CONVERSIONS_TABLE} WHERE ingredient_id = %s AND unit_id = %s',
+                               [edge[:2] for edge in plan['edges']])
+            cursor.executemany(f'INSERT INTO {CONVERSIONS_TABLE} (ingredient_id, unit_id, to_unit_id, factor) '
+                               f'VALUES (%s,%s,%s,%s)', plan['edges'])
+            cursor.executemany('DELETE FROM Nutrition WHERE ingredient_id = %s AND unit_id = %s', plan['dropped'])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+def _rebuild_derived(db_manager):
+    if daily_nutrition.rollup_ready(db_manager):
+        logger.info(f"✓ Rebuilt {daily_nutrition.ROLLUP_TABLE}: {daily_nutrition.rebuild(db_manager)} row(s)")
+    if recipe_nutrition.vectors_ready(db_manager):
+        logger.info(f"✓ Rebuilt {recipe_nutrition.VECTOR_TABLE}: {recipe_nutrition.rebuild(db_manager)} vector(s)")
+
+
+def run_migration() -> bool:
+    """Collapse Nutrition to base units and cache every quantity's conversion"""
+    try:
+        db_manager = get_db_manager()
+        logger.info("Starting migration: Collapsing Nutrition to base units")
+
+        _add_columns(db_manager)
+        plan, names, edges = _plan(db_manager)
+        _write_bases(db_manager, plan, names, edges)
+        logger.info(f"✓ Wrote {len(plan['bases'])} base nutrition row(s)")
+
+        create_table(db_manager)
+        _drop_unit_rows(db_manager, plan)
+        logger.info(f"✓ Collapsed {len(plan['dropped'])} per-unit row(s), {len(plan['edges'])} kept as conversions")
+        if plan['lost']:
+            logger.warning(f"{plan['lost']} row(s) had no usable ratio to their base row; those units need a "
+                           f"conversion or new nutrition")
+
+        reset_base_units_state(db_manager)
+        _rebuild_derived(db_manager)
+        db_manager.touch('Nutrition', 'Ingredient_Quantity', CONVERSIONS_TABLE)
+        return True
+
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        return False
+
+
+def rollback_migration() -> bool:
+    """Write a per-unit Nutrition row for every unit in use, then drop the conversions"""
+    try:
+        db_manager = get_db_manager()
+        logger.info("Rolling back: Expanding Nutrition to per-unit rows")
+
+        if BASE_COLUMN in table_columns(db_manager, 'Ingredient_Quantity'):
+            rows = db_manager.execute_query(f'''
+                SELECT DISTINCT IQ.ingredient_id, IQ.unit_id, IQ.{FACTOR_COLUMN} factor,
+                       {', '.join(f'N.{column}' for column in NUTRITION_COLUMNS)}
+                FROM Ingredient_Quantity IQ
+                JOIN Nutrition N ON N.ingredient_id = IQ.ingredient_id AND N.unit_id = IQ.{BASE_COLUMN}
+                WHERE IQ.unit_id <> IQ.{BASE_COLUMN}
+            ''', fetch_all=True) or []
+            expanded = {(row['ingredient_id'], row['unit_id']):
+                        (row['ingredient_id'], row['unit_id'],
+                         *(float(row[column] or 0) * float(row['factor']) for column in NUTRITION_COLUMNS))
+                        for row in rows}
+            if expanded:
+                db_manager.execute_many(f'INSERT INTO Nutrition (ingredient_id, unit_id, {COLUMNS}) '
+                                        f'VALUES (%s,%s,%s,%s,%s,%s,%s,%s)', list(expanded.values()))
+            logger.info(f"✓ Wrote {len(expanded)} per-unit nutrition row(s)")
+
+        db_manager.execute_query(f'DROP TABLE IF EXISTS {CONVERSIONS_TABLE}')
+        reset_base_units_state(db_manager)
+        for column in (BASE_COLUMN, FACTOR_COLUMN):
+            if column in table_columns(db_manager, 'Ingredient_Quantity'):
+                db_manager.execute_query(f'ALTER TABLE Ingredient_Quantity DROP COLUMN {column}')
+        logger.info(f"✓ Dropped {CONVERSIONS_TABLE} and the cached conversions")
+
+        _rebuild_derived(db_manager)
+        return True
+
+    except Exception as e:
+        logger.error(f"Rollback failed: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "rollback":
+        success = rollback_migration()
+    else:
+        success = run_migration()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,62 @@
+"""
+Migration: Add composite (user_id, date) and covering indexes
+
+Generated by scripts/index_advisor.py from the cycling, sleep, analysis and gym session queries.
+Each index is only created when its table and columns exist and no existing
+index already starts with the same columns.
+
+Run: python migrations/add_user_date_indexes.py
+"""
+import os
+import sys
+import logging
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from models.database.connection_manager import get_db_manager
+from models.database.index_advisor import apply_indexes, drop_indexes
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# (table, index name, columns)
+INDEXES = [
+    ('ai_workout_analyses', 'idx_ai_workout_analyses_user_id_date_created_at', ('user_id', 'date', 'created_at')),
+    ('cycling_workouts', 'idx_cycling_workouts_user_id_date_start_time', ('user_id', 'date', 'start_time')),
+    ('sleep_summaries', 'idx_sleep_summaries_user_id_date_created_at', ('user_id', 'date', 'created_at')),
+    ('workout_sessions', 'idx_workout_sessions_user_id_date', ('user_id', 'date')),
+    ('workout_sessions', 'idx_workout_sessions_user_id_status_date', ('user_id', 'status', 'date')),
+    ('workout_sets', 'idx_workout_sets_exercise_id_session_id_set_number', ('exercise_id', 'session_id', 'set_number')),
+    ('workout_sets', 'idx_workout_sets_session_id_exercise_id', ('session_id', 'exercise_id')),
+    ('workout_timing_sessions', 'idx_workout_timing_sessions_session_id_event_type_timestamp', ('session_id', 'event_type', 'timestamp')),
+]
+
+
+def run_migration() -> bool:
+    """Create the missing composite indexes"""
+    try:
+        logger.info("Starting migration: Add composite (user_id, date) and covering indexes")
+        created = apply_indexes(get_db_manager(), INDEXES)
+        logger.info(f"✓ Created {created} index(es)")
+        return True
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        return False
+
+
+def rollback_migration() -> bool:
+    """Drop the indexes created by this migration"""
+    try:
+        drop_indexes(get_db_manager(), INDEXES)
+        logger.info("✓ Rollback completed")
+        return True
+    except Exception as e:
+        logger.error(f"Rollback failed: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "rollback":
+        success = rollback_migration()
+    else:
+        success = run_migration()
+    sys.exit(0 if success else 1)
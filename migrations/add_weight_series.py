@@ -0,0 +1,106 @@
+"""
+Migration: Merge body_weight_tracking into body_weights.
+
+The nutrition log and the cycling side kept their weigh-ins in two tables.
+This migration:
+
+1. creates body_weights where it does not exist yet (SQLite);
+2. adds body_weights.source, which switches both sides to body_weights
+   (see models/database/weight_series.py);
+3. copies every body_weight_tracking row in as an unowned ('log') weigh-in,
+   keeping a weigh-in already stored for that day.
+
+body_weight_tracking is left in place for rollback. Running the migration
+again copies weigh-ins workers logged to it before they saw the switch.
+
+Run: python migrations/add_weight_series.py [rollback]
+"""
+import os
+import sys
+import logging
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from models.database.connection_manager import get_db_manager
+from models.database.daily_nutrition import DEFAULT_USER
+from models.database.index_advisor import table_columns
+from models.database.native_dates import to_date
+from models.database.weight_series import (
+    LEGACY_TABLE, SERIES_TABLE, SOURCE_COLUMN, SOURCE_CYCLING, SOURCE_LOG, create_table, reset_series_state
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _copy_legacy(db_manager) -> int:
+    rows = [(DEFAULT_USER, to_date(row['date']), float(row['weight']), SOURCE_LOG)
+            for row in db_manager.execute_query(f'SELECT date, weight FROM {LEGACY_TABLE}', fetch_all=True) or []
+            if row['weight'] not in (None, '')]
+    rows = [row for row in rows if row[1] is not None]
+    if rows:
+        db_manager.execute_many(f'INSERT IGNORE INTO {SERIES_TABLE} (user_id, date, weight_kg, {SOURCE_COLUMN}) '
+                                f'VALUES (%s, %s, %s, %s)', rows)
+    return len(rows)
+
+
+def run_migration() -> bool:
+    """Merge the nutrition log's weigh-ins into body_weights"""
+    try:
+        db_manager = get_db_manager()
+        logger.info("Starting migration: Merging body_weight_tracking into body_weights")
+
+        create_table(db_manager)
+        if SOURCE_COLUMN not in table_columns(db_manager, SERIES_TABLE):
+            column_type = 'VARCHAR(16)' if db_manager.use_mysql else 'TEXT'
+            db_manager.execute_query(f"ALTER TABLE {SERIES_TABLE} ADD COLUMN {SOURCE_COLUMN} {column_type} "
+                                     f"NOT NULL DEFAULT '{SOURCE_CYCLING}'")
+            logger.info(f"✓ Added {SERIES_TABLE}.{SOURCE_COLUMN}")
+        reset_series_state(db_manager)
+
+        logger.info(f"✓ Copied {_copy_legacy(db_manager)} weigh-in(s) from {LEGACY_TABLE}")
+        db_manager.touch(SERIES_TABLE, LEGACY_TABLE)
+        return True
+
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        return False
+
+
+def rollback_migration() -> bool:
+    """Move the nutrition log's weigh-ins back to body_weight_tracking and drop body_weights.source"""
+    try:
+        db_manager = get_db_manager()
+        logger.info("Rolling back: Moving log weigh-ins back to body_weight_tracking")
+
+        if SOURCE_COLUMN not in table_columns(db_manager, SERIES_TABLE):
+            logger.info("body_weights has no source column. Nothing to roll back.")
+            return True
+
+        rows = db_manager.execute_query(f'SELECT date, weight_kg FROM {SERIES_TABLE} WHERE user_id = %s',
+                                        (DEFAULT_USER,), fetch_all=True) or []
+        with_entry_date = 'entry_date' in table_columns(db_manager, LEGACY_TABLE)
+        columns = 'date, weight, entry_date' if with_entry_date else 'date, weight'
+        legacy = []
+        for row in rows:
+            day = to_date(row['date'])
+            legacy.append((day.strftime('%d.%m.%Y'), row['weight_kg'], day)[:3 if with_entry_date else 2])
+        if legacy:
+            marks = ', '.join(['%s'] * len(legacy[0]))
+            db_manager.execute_many(f'INSERT IGNORE INTO {LEGACY_TABLE} ({columns}) VALUES ({marks})', legacy)
+        db_manager.execute_query(f'DELETE FROM {SERIES_TABLE} WHERE user_id = %s', (DEFAULT_USER,))
+        db_manager.execute_query(f'ALTER TABLE {SERIES_TABLE} DROP COLUMN {SOURCE_COLUMN}')
+        reset_series_state(db_manager)
+        logger.info(f"✓ Moved {len(rows)} weigh-in(s) back and dropped {SERIES_TABLE}.{SOURCE_COLUMN}")
+        return True
+
+    except Exception as e:
+        logger.error(f"Rollback failed: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "rollback":
+        success = rollback_migration()
+    else:
+        success = run_migration()
+    sys.exit(0 if success else 1)
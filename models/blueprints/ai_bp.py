@@ -1,7 +1,9 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, Response
 from flask_login import login_required
 from models.services.ai_service import AIService
+from models.services.product_scan import MAX_SCAN_PRODUCTS
 import base64
+import json
 from werkzeug.exceptions import RequestEntityTooLarge
 
 ai_bp = Blueprint('ai_bp', __name__, url_prefix='/ai')
@@ -139,3 +141,85 @@ def clear_results():
     ai_service._clear_stored_results()
     flash('Analysis results cleared. You can now start a new analysis.', 'info')
     return redirect(url_for('ai_bp.ai_assistant'))
+
+@ai_bp.route('/api/scan-products', methods=['POST'])
+@login_required
+def scan_products():
+    """
+    Analyze many products (nutrition label + front photo pairs) concurrently
+    ---
+    tags:
+      - AI Assistant
+    security:
+      - LoginRequired: []
+    consumes:
+      - multipart/form-data
+    produces:
+      - application/x-ndjson
+    parameters:
+      - name: nutrition_photos
+        in: formData
+        type: file
+        required: true
+        description: Nutrition label photos, one per product
+      - name: front_photos
+        in: formData
+        type: file
+        required: true
+        description: Product front photos, in the same order
+    responses:
+      200:
+        description: >
+          One JSON line per product as its analysis completes (index, success,
+          columns, results or error), then a summary line with done=true
+      400:
+        description: Missing photos, unpaired photos or too many products
+    """
+    nutrition_photos = [photo for photo in request.files.getlist('nutrition_photos') if photo and photo.filename]
+    front_photos = [photo for photo in request.files.getlist('front_photos') if photo and photo.filename]
+
+    if not nutrition_photos or len(nutrition_photos) != len(front_photos):
+        return jsonify({'success': False,
+                        'error': 'Upload one nutrition label photo and one front photo per product.'}), 400
+    if len(nutrition_photos) > MAX_SCAN_PRODUCTS:
+        return jsonify({'success': False, 'error': f'At most {MAX_SCAN_PRODUCTS} products per scan.'}), 400
+
+    pairs = [(base64.b64encode(nutrition.read()).decode('utf-8'), base64.b64encode(front.read()).decode('utf-8'))
+             for nutrition, front in zip(nutrition_photos, front_photos)]
+    # Resolve the session before streaming: it cannot be updated once the response started
+    session_id = ai_service._get_session_id()
+
+    def generate():
+        for product in ai_service.scan_products(pairs, session_id):
+            yield json.dumps(product, default=str) + '\n'
+
+    return Response(generate(), mimetype='application/x-ndjson', headers={'X-Accel-Buffering': 'no'})
+
+@ai_bp.route('/api/scan-products/save', methods=['POST'])
+@login_required
+def save_scanned_products():
+    """
+    Save the accepted products of the last scan in one transaction
+    ---
+    tags:
+      - AI Assistant
+    security:
+      - LoginRequired: []
+    parameters:
+      - name: products
+        in: formData
+        type: array
+        items:
+          type: integer
+        required: true
+        description: Indexes of the accepted products (JSON body {"products": [...]} also accepted)
+    responses:
+      200:
+        description: Products saved
+      400:
+        description: Nothing scanned, nothing selected or the save failed
+    """
+    payload = request.get_json(silent=True) or {}
+    accepted = payload.get('products', request.form.getlist('products'))
+    result = ai_service.save_scanned_products(accepted)
+    return jsonify(result), 200 if result['success'] else 400
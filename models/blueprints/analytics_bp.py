@@ -1,31 +1,105 @@
 from flask import Blueprint, render_template, jsonify, request
-from flask_login import login_required
-from datetime import datetime, timedelta
-import pandas as pd
-import numpy as np
+from flask_login import current_user, login_required
+from datetime import date, datetime, timedelta
+import hashlib
+import json
 from models.food import FoodDatabase
 from models.calorie_weight import CalorieWeight
+from models.database.native_dates import to_date
+from models.services import tdee
+from models.services.aggregation import DayColumns, group_by, mean, total, value_counts
+from models.services.weight_trend import load_trend
 
 analytics_bp = Blueprint('analytics_bp', __name__, url_prefix='/analytics')
 
 food_db = FoodDatabase()
 calorie_weight = CalorieWeight()
 
+# Every table the analytics outputs are derived from; a write to any of them
+# changes the data version and drops the cached frames and responses
+ANALYTICS_TABLES = (
+    'Consumption', 'recipe_consumption', 'daily_nutrition', 'Ingredient_Quantity', 'Nutrition',
+    'Unit', 'Ingredient', 'Recipe', 'Recipe_Ingredients', 'calorie_tracking', 'body_weight_tracking', 'body_weights',
+    'cycling_workouts', 'energy_balance'
+)
+
+MACROS = ['kcal', 'protein', 'carb', 'fat']
+
+
+class AnalyticsFrame:
+    """Typed, date-keyed columns for one inclusive date range.
+
+    Built once per (range, user, data version) and shared read-only by every
+    analytics output, so dates are parsed and the range is sliced once:
+    - days:     daily totals (kcal, protein, carb, fat, items), food and recipes
+    - items:    one row per logged food (ingredient plus macros)
+    - weights:  body weight measurements, with the trend weight as of each
+                (weight_trend: the user's series, smoothed over the whole history)
+    - calories: active calorie measurements
+    - energy:   the user's stored daily maintenance (TDEE) estimates of the range
+    """
+
+    def __init__(self, start: date, end: date, user_id):
+        self.start = start
+        self.end = end
+        self.days = self._columns(food_db.fetch_daily_nutrition(start, end), MACROS + ['items'])
+        self.items = self._columns(food_db.fetch_consumption_range(start, end), MACROS, text=['ingredient'])
+        self.weights = self._columns(calorie_weight.fetch_weights(), ['weight'])
+        trend = load_trend(food_db.connection_manager, user_id)
+        levels = [trend.level_on(day) for day in self.weights.days]
+        self.weight_trend = [round(level, 2) if level is not None else None for level in levels]
+        self.calories = self._columns(calorie_weight.fetch_calories(), ['calories'])
+        self.energy = tdee.load_days(food_db.connection_manager, start, end, user_id=user_id)
+
+    def _columns(self, rows, numeric, text=()):
+        return DayColumns.from_records(rows, numeric, text, start=self.start, end=self.end)
+
+    def __sizeof__(self):
+        columns = (self.days, self.items, self.weights, self.calories)
+        return (object.__sizeof__(self) + sum(c.__sizeof__() for c in columns) + len(self.weight_trend) * 8
+                + len(self.energy) * 400)
+
+
+def parse_range(start_date, end_date):
+    """Inclusive (start, end) dates from YYYY-MM-DD strings; defaults to the last 30 days"""
+    end = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else date.today()
+    start = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else end - timedelta(days=30)
+    return start, end
+
+
+def load_frame(start: date, end: date, user_id) -> AnalyticsFrame:
+    """`user_id`'s analytics frame of [start, end], reused until one of ANALYTICS_TABLES is written"""
+    # Append the days that ended first, so building the frame does not write
+    tdee.refresh(food_db.connection_manager, date.today(), user_id)
+    return food_db.connection_manager.cached_value(
+        ('analytics_frame', start, end, user_id), ANALYTICS_TABLES, lambda: AnalyticsFrame(start, end, user_id)
+    )
+
+
+def build_analytics_data(start: date, end: date, user_id):
+    """All chart series of /analytics/data plus a content ETag"""
+    frame = load_frame(start, end, user_id)
+    body = {
+        'daily_nutrition': process_daily_nutrition(frame),
+        'weight_trend': process_weight_trend(frame),
+        'energy_balance': process_energy_balance(frame),
+        'calorie_trend': process_calorie_trend(frame),
+        'macro_distribution': calculate_macro_distribution(frame),
+        'food_frequency': calculate_food_frequency(frame),
+        'weekly_averages': calculate_weekly_averages(frame)
+    }
+    encoded = json.dumps(body, sort_keys=True, default=str).encode()
+    return {'etag': hashlib.sha1(encoded).hexdigest(), 'body': body}
+
 @analytics_bp.route('')
 @login_required
 def analytics():
     """Analytics - View nutrition trends and insights"""
     # Get date range (default: last 30 days)
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=30)
-
-    # Fetch consumption data
-    consumption = food_db.fetch_all_consumption()
-    calories_data = calorie_weight.fetch_calories()
-    weights_data = calorie_weight.fetch_weights()
+    start_date, end_date = parse_range(None, None)
 
-    # Process data for initial display
-    summary_stats = calculate_summary_stats(consumption, start_date, end_date)
+    # Process data for initial display; the charts request the same range, so they reuse this frame
+    summary_stats = calculate_summary_stats(load_frame(start_date, end_date, current_user.id))
 
     return render_template('nutrition_app/analytics.html',
                          summary_stats=summary_stats,
@@ -36,62 +110,28 @@ def analytics():
 @login_required
 def get_analytics_data():
     """API endpoint to fetch analytics data for charts"""
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-
-    if start_date:
-        start_date = datetime.strptime(start_date, '%Y-%m-%d')
-    else:
-        start_date = datetime.now() - timedelta(days=30)
-
-    if end_date:
-        end_date = datetime.strptime(end_date, '%Y-%m-%d')
-    else:
-        end_date = datetime.now()
-
-    # Fetch all data
-    consumption = food_db.fetch_all_consumption()
-    calories_data = calorie_weight.fetch_calories()
-    weights_data = calorie_weight.fetch_weights()
-
-    # Process data
-    daily_nutrition = process_daily_nutrition(consumption, start_date, end_date)
-    weight_trend = process_weight_trend(weights_data, start_date, end_date)
-    calorie_trend = process_calorie_trend(calories_data, start_date, end_date)
-    macro_distribution = calculate_macro_distribution(consumption, start_date, end_date)
-    food_frequency = calculate_food_frequency(consumption, start_date, end_date)
-    weekly_averages = calculate_weekly_averages(consumption, start_date, end_date)
-
-    return jsonify({
-        'daily_nutrition': daily_nutrition,
-        'weight_trend': weight_trend,
-        'calorie_trend': calorie_trend,
-        'macro_distribution': macro_distribution,
-        'food_frequency': food_frequency,
-        'weekly_averages': weekly_averages
-    })
-
-def calculate_summary_stats(consumption, start_date, end_date):
-    """Calculate summary statistics for the given date range"""
-    if not consumption:
-        return {
-            'avg_calories': 0,
-            'avg_protein': 0,
-            'avg_carbs': 0,
-            'avg_fat': 0,
-            'total_days': 0,
-            'total_meals': 0
-        }
-
-    df = pd.DataFrame(consumption)
-    # Convert date strings to datetime (DD.MM.YYYY format)
-    df['date'] = pd.to_datetime(df['date'], format='%d.%m.%Y', errors='coerce')
-
-    # Filter by date range
-    mask = (df['date'] >= start_date) & (df['date'] <= end_date)
-    df_filtered = df.loc[mask]
-
-    if df_filtered.empty:
+    start_date, end_date = parse_range(request.args.get('start_date'), request.args.get('end_date'))
+    user_id = current_user.id
+
+    # Whole responses are cached per (range, user, data version), taken after the ended days are added
+    tdee.refresh(food_db.connection_manager, date.today(), user_id)
+    data = food_db.connection_manager.cached_value(
+        ('analytics_data', start_date, end_date, user_id), ANALYTICS_TABLES,
+        lambda: build_analytics_data(start_date, end_date, user_id)
+    )
+
+    response = jsonify(data['body'])
+    response.set_etag(data['etag'])
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    # 304 Not Modified when the client already holds this version
+    return response.make_conditional(request)
+
+def calculate_summary_stats(frame):
+    """Calculate summary statistics from the daily totals"""
+    daily_totals = frame.days
+
+    if daily_totals.empty:
         return {
             'avg_calories': 0,
             'avg_protein': 0,
@@ -101,127 +141,80 @@ def calculate_summary_stats(consumption, start_date, end_date):
             'total_meals': 0
         }
 
-    # Group by date and calculate daily totals
-    daily_totals = df_filtered.groupby('date').agg({
-        'kcal': 'sum',
-        'protein': 'sum',
-        'carb': 'sum',
-        'fat': 'sum'
-    })
-
     return {
-        'avg_calories': round(daily_totals['kcal'].mean(), 0),
-        'avg_protein': round(daily_totals['protein'].mean(), 1),
-        'avg_carbs': round(daily_totals['carb'].mean(), 1),
-        'avg_fat': round(daily_totals['fat'].mean(), 1),
+        'avg_calories': round(mean(daily_totals['kcal']), 0),
+        'avg_protein': round(mean(daily_totals['protein']), 1),
+        'avg_carbs': round(mean(daily_totals['carb']), 1),
+        'avg_fat': round(mean(daily_totals['fat']), 1),
         'total_days': len(daily_totals),
-        'total_meals': len(df_filtered)
+        'total_meals': int(total(daily_totals['items']))
     }
 
-def process_daily_nutrition(consumption, start_date, end_date):
-    """Process consumption data for daily nutrition charts"""
-    if not consumption:
-        return {'dates': [], 'calories': [], 'protein': [], 'carbs': [], 'fat': []}
-
-    df = pd.DataFrame(consumption)
-    df['date'] = pd.to_datetime(df['date'], format='%d.%m.%Y', errors='coerce')
-
-    # Filter by date range
-    mask = (df['date'] >= start_date) & (df['date'] <= end_date)
-    df_filtered = df.loc[mask]
+def process_daily_nutrition(frame):
+    """Daily nutrition chart series"""
+    daily_totals = frame.days
 
-    if df_filtered.empty:
+    if daily_totals.empty:
         return {'dates': [], 'calories': [], 'protein': [], 'carbs': [], 'fat': []}
 
-    # Group by date
-    daily_totals = df_filtered.groupby('date').agg({
-        'kcal': 'sum',
-        'protein': 'sum',
-        'carb': 'sum',
-        'fat': 'sum'
-    }).reset_index()
-
-    # Sort by date
-    daily_totals = daily_totals.sort_values('date')
-
     return {
-        'dates': daily_totals['date'].dt.strftime('%Y-%m-%d').tolist(),
+        'dates': daily_totals.iso_days(),
         'calories': daily_totals['kcal'].tolist(),
         'protein': daily_totals['protein'].tolist(),
         'carbs': daily_totals['carb'].tolist(),
         'fat': daily_totals['fat'].tolist()
     }
 
-def process_weight_trend(weights_data, start_date, end_date):
-    """Process weight data for trend chart"""
-    if not weights_data:
-        return {'dates': [], 'weights': []}
+def process_weight_trend(frame):
+    """Weight trend chart series"""
+    weights = frame.weights
 
-    df = pd.DataFrame(weights_data)
-    df['date'] = pd.to_datetime(df['date'], format='%d.%m.%Y', errors='coerce')
-
-    # Filter by date range
-    mask = (df['date'] >= start_date) & (df['date'] <= end_date)
-    df_filtered = df.loc[mask]
-
-    if df_filtered.empty:
-        return {'dates': [], 'weights': []}
-
-    # Sort by date
-    df_filtered = df_filtered.sort_values('date')
+    if weights.empty:
+        return {'dates': [], 'weights': [], 'trend': []}
 
     return {
-        'dates': df_filtered['date'].dt.strftime('%Y-%m-%d').tolist(),
-        'weights': df_filtered['weight'].tolist()
+        'dates': weights.iso_days(),
+        'weights': weights['weight'].tolist(),
+        'trend': frame.weight_trend
     }
 
-def process_calorie_trend(calories_data, start_date, end_date):
-    """Process calorie data for trend chart"""
-    if not calories_data:
-        return {'dates': [], 'calories': []}
+def process_energy_balance(frame):
+    """Intake against the adaptive maintenance estimate, per day"""
+    def rounded(value, digits=0):
+        return round(value, digits) if value is not None else None
 
-    df = pd.DataFrame(calories_data)
-    df['date'] = pd.to_datetime(df['date'], format='%d.%m.%Y', errors='coerce')
+    return {
+        'dates': [to_date(row['day']).isoformat() for row in frame.energy],
+        'intake': [rounded(row['intake_kcal']) for row in frame.energy],
+        'tdee': [rounded(row['tdee_kcal']) for row in frame.energy],
+        'maintenance': [rounded(row['maintenance_kcal']) for row in frame.energy],
+        'trend_kg': [rounded(row['trend_kg'], 2) for row in frame.energy]
+    }
 
-    # Filter by date range
-    mask = (df['date'] >= start_date) & (df['date'] <= end_date)
-    df_filtered = df.loc[mask]
+def process_calorie_trend(frame):
+    """Active calorie trend chart series"""
+    calories = frame.calories
 
-    if df_filtered.empty:
+    if calories.empty:
         return {'dates': [], 'calories': []}
 
-    # Sort by date
-    df_filtered = df_filtered.sort_values('date')
-
     return {
-        'dates': df_filtered['date'].dt.strftime('%Y-%m-%d').tolist(),
-        'calories': df_filtered['calories'].tolist()
+        'dates': calories.iso_days(),
+        'calories': calories['calories'].tolist()
     }
 
-def calculate_macro_distribution(consumption, start_date, end_date):
+def calculate_macro_distribution(frame):
     """Calculate macro distribution for pie chart"""
-    if not consumption:
-        return {'protein': 0, 'carbs': 0, 'fat': 0}
-
-    df = pd.DataFrame(consumption)
-    df['date'] = pd.to_datetime(df['date'], format='%d.%m.%Y', errors='coerce')
-
-    # Filter by date range
-    mask = (df['date'] >= start_date) & (df['date'] <= end_date)
-    df_filtered = df.loc[mask]
-
-    if df_filtered.empty:
+    if frame.days.empty:
         return {'protein': 0, 'carbs': 0, 'fat': 0}
 
     # Calculate totals
-    total_protein = df_filtered['protein'].sum()
-    total_carbs = df_filtered['carb'].sum()
-    total_fat = df_filtered['fat'].sum()
+    totals = {macro: total(frame.days[macro]) for macro in ('protein', 'carb', 'fat')}
 
     # Convert to calories
-    protein_calories = total_protein * 4
-    carb_calories = total_carbs * 4
-    fat_calories = total_fat * 9
+    protein_calories = totals['protein'] * 4
+    carb_calories = totals['carb'] * 4
+    fat_calories = totals['fat'] * 9
 
     total_calories = protein_calories + carb_calories + fat_calories
 
@@ -234,61 +227,34 @@ def calculate_macro_distribution(consumption, start_date, end_date):
         'fat': round((fat_calories / total_calories) * 100, 1)
     }
 
-def calculate_food_frequency(consumption, start_date, end_date):
+def calculate_food_frequency(frame):
     """Calculate most frequently consumed foods"""
-    if not consumption:
-        return []
-
-    df = pd.DataFrame(consumption)
-    df['date'] = pd.to_datetime(df['date'], format='%d.%m.%Y', errors='coerce')
-
-    # Filter by date range
-    mask = (df['date'] >= start_date) & (df['date'] <= end_date)
-    df_filtered = df.loc[mask]
-
-    if df_filtered.empty:
+    if frame.items.empty:
         return []
 
     # Count food frequency
-    food_counts = df_filtered['ingredient'].value_counts().head(10)
+    food_counts = value_counts(frame.items['ingredient'], 10)
 
-    return [{'food': food, 'count': int(count)} for food, count in food_counts.items()]
+    return [{'food': food, 'count': count} for food, count in food_counts]
 
-def calculate_weekly_averages(consumption, start_date, end_date):
-    """Calculate weekly average nutrition"""
-    if not consumption:
-        return []
-
-    df = pd.DataFrame(consumption)
-    df['date'] = pd.to_datetime(df['date'], format='%d.%m.%Y', errors='coerce')
-
-    # Filter by date range
-    mask = (df['date'] >= start_date) & (df['date'] <= end_date)
-    df_filtered = df.loc[mask]
+def calculate_weekly_averages(frame):
+    """Calculate weekly average nutrition (per logged item, by ISO week)"""
+    items = frame.items
 
-    if df_filtered.empty:
+    if items.empty:
         return []
 
-    # Add week column
-    df_filtered['week'] = df_filtered['date'].dt.isocalendar().week
-    df_filtered['year'] = df_filtered['date'].dt.year
-
-    # Group by week
-    weekly_averages = df_filtered.groupby(['year', 'week']).agg({
-        'kcal': 'mean',
-        'protein': 'mean',
-        'carb': 'mean',
-        'fat': 'mean',
-        'date': 'min'
-    }).reset_index()
-
-    # Sort by date
-    weekly_averages = weekly_averages.sort_values('date')
+    # Items are sorted by day, so weeks come out in order and each starts at its first logged day
+    weeks = [day.isocalendar()[:2] for day in items.days]
+    keys, averages = group_by(weeks, {macro: items[macro] for macro in MACROS}, how='mean')
+    first = {}
+    for week, day in zip(weeks, items.days):
+        first.setdefault(week, day)
 
     return [{
-        'week_start': row['date'].strftime('%Y-%m-%d'),
-        'avg_calories': round(row['kcal'], 0),
-        'avg_protein': round(row['protein'], 1),
-        'avg_carbs': round(row['carb'], 1),
-        'avg_fat': round(row['fat'], 1)
-    } for _, row in weekly_averages.iterrows()]
+        'week_start': first[week].strftime('%Y-%m-%d'),
+        'avg_calories': round(averages['kcal'][i], 0),
+        'avg_protein': round(averages['protein'][i], 1),
+        'avg_carbs': round(averages['carb'][i], 1),
+        'avg_fat': round(averages['fat'][i], 1)
+    } for i, week in enumerate(keys)]
@@ -13,6 +13,7 @@ from .helpers import (
     get_base_context,
 )
 from models.services.cycling_readiness_service import CyclingReadinessService
+from models.database.keyset import InvalidCursor
 
 
 # ============== Page Routes ==============
@@ -181,6 +182,9 @@ def get_analysis_history():
     Query params:
         limit: Max results (default 20)
         offset: Pagination offset (default 0)
+        cursor: Keyset pagination instead of offset; empty for the first
+                page, then pagination.next_cursor
+        include_total: With cursor, add the cached total (default false)
     
     Returns:
         List of analysis summaries
@@ -198,8 +202,18 @@ def get_analysis_history():
     
     service = get_service()
     
-    analyses = service.get_analysis_history(limit=limit, offset=offset)
-    total = service.get_analysis_count()
+    page = None
+    if 'cursor' in request.args:
+        try:
+            page = service.get_analysis_history_page(
+                limit=limit, cursor=request.args.get('cursor'),
+                include_total=request.args.get('include_total') == 'true')
+        except InvalidCursor as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        analyses = page['items']
+    else:
+        analyses = service.get_analysis_history(limit=limit, offset=offset)
+        total = service.get_analysis_count()
     
     # Format each analysis for response
     formatted_analyses = []
@@ -236,15 +250,26 @@ def get_analysis_history():
             'updated_at': a.get('updated_at')
         })
     
-    return jsonify({
-        'success': True,
-        'analyses': formatted_analyses,
-        'pagination': {
+    if page is not None:
+        pagination = {
+            'limit': limit,
+            'next_cursor': page['next_cursor'],
+            'has_more': page['has_more']
+        }
+        if 'total' in page:
+            pagination['total'] = page['total']
+    else:
+        pagination = {
             'limit': limit,
             'offset': offset,
             'total': total,
             'has_more': offset + limit < total
         }
+
+    return jsonify({
+        'success': True,
+        'analyses': formatted_analyses,
+        'pagination': pagination
     })
 
 
@@ -18,6 +18,7 @@ from .helpers import (
     CYCLING_NUMERIC_FIELDS,
     SLEEP_NUMERIC_FIELDS
 )
+from models.database.keyset import InvalidCursor
 from models.services.openai_extraction import (
     extract_batch,
     extract_cycling_workout_from_image,
@@ -257,15 +258,33 @@ def get_cycling_workouts():
         in: query
         type: integer
         default: 0
+      - name: cursor
+        in: query
+        type: string
+        description: Keyset pagination; pass empty for the first page, then next_cursor (replaces offset)
+      - name: include_total
+        in: query
+        type: boolean
+        description: With cursor, add an approximate total served from cached counts
     responses:
       200:
-        description: List of cycling workouts
+        description: List of cycling workouts (plus next_cursor/has_more with cursor)
     """
     limit = request.args.get('limit', 30, type=int)
     offset = request.args.get('offset', 0, type=int)
 
     service = get_service()
-    workouts = service.get_cycling_workouts(limit=limit, offset=offset)
+    page = None
+    if 'cursor' in request.args:
+        try:
+            page = service.get_cycling_workouts_page(
+                limit=min(max(1, limit), 100), cursor=request.args.get('cursor'),
+                include_total=request.args.get('include_total') == 'true')
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+        workouts = page['items']
+    else:
+        workouts = service.get_cycling_workouts(limit=limit, offset=offset)
 
     # Convert dates to strings for JSON serialization
     for w in workouts:
@@ -274,6 +293,13 @@ def get_cycling_workouts():
         if w.get('start_time'):
             w['start_time'] = str(w['start_time'])
 
+    if page is not None:
+        return jsonify({
+            'workouts': workouts,
+            'next_cursor': page['next_cursor'],
+            'has_more': page['has_more'],
+            **({'total': page['total']} if 'total' in page else {})
+        })
     return jsonify({'workouts': workouts})
 
 
@@ -1,11 +1,18 @@
 from flask import Blueprint, render_template, request, jsonify
-from flask_login import login_required
+from flask_login import login_required, current_user
 from datetime import datetime
+import os
+import tempfile
+from models.database.catalog_import import IMPORT_DIR, ImportInProgress, TooManyImports
+from models.database.keyset import InvalidCursor
 from models.services.food_service import FoodService
 
 food_bp = Blueprint('food_bp', __name__, url_prefix='/foods')
 food_service = FoodService()
 
+# Users allowed to bulk import into the shared food catalog
+ADMIN_USERS = {name.strip() for name in os.getenv('ADMIN_USERS', 'plamenyankov').split(',') if name.strip()}
+
 @food_bp.route('')
 @login_required
 def food_database():
@@ -29,6 +36,14 @@ def get_foods_paginated():
         type: integer
         default: 1
         description: Page number
+      - name: cursor
+        in: query
+        type: string
+        description: Opaque cursor from next_cursor; switches to keyset pages (empty for the first one)
+      - name: include_total
+        in: query
+        type: boolean
+        description: With cursor, also return an approximate total
       - name: per_page
         in: query
         type: integer
@@ -88,6 +103,13 @@ def get_foods_paginated():
                   type: integer
                 pages:
                   type: integer
+            next_cursor:
+              type: string
+              description: Cursor of the next page (cursor mode; null on the last page)
+            has_more:
+              type: boolean
+      400:
+        description: Invalid cursor
     """
     try:
         page = int(request.args.get('page', 1))
@@ -107,9 +129,79 @@ def get_foods_paginated():
         if request.args.get('max_protein'):
             filters['max_protein'] = float(request.args.get('max_protein'))
 
+        if 'cursor' in request.args:
+            result = food_service.get_foods_after(
+                request.args.get('cursor'), min(max(1, per_page), 100), search, filters,
+                include_total=request.args.get('include_total') == 'true')
+            return jsonify(result)
+
         result = food_service.get_foods_paginated(page, per_page, search, filters)
         return jsonify(result)
 
+    except InvalidCursor as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@food_bp.route('/api/autocomplete')
+@login_required
+def autocomplete_foods():
+    """
+    Ranked food name suggestions while typing
+    ---
+    tags:
+      - Food Database
+    security:
+      - LoginRequired: []
+    parameters:
+      - name: q
+        in: query
+        type: string
+        required: true
+        description: Partially typed food name (prefix, words in any order, or with typos)
+      - name: limit
+        in: query
+        type: integer
+        default: 10
+        description: Maximum number of suggestions (1-50)
+    responses:
+      200:
+        description: Suggestions, best match first (exact, name prefix, word prefix, fuzzy; then favorites and most eaten)
+        schema:
+          type: object
+          properties:
+            success:
+              type: boolean
+            query:
+              type: string
+            results:
+              type: array
+              items:
+                type: object
+                properties:
+                  id:
+                    type: integer
+                  ingredient_id:
+                    type: integer
+                  ingredient:
+                    type: string
+                  qty:
+                    type: number
+                  unit:
+                    type: string
+                  kcal:
+                    type: number
+                  is_favorite:
+                    type: boolean
+                  match:
+                    type: integer
+    """
+    try:
+        query = request.args.get('q', '').strip()
+        limit = min(max(int(request.args.get('limit', 10)), 1), 50)
+        result = food_service.autocomplete(query, limit)
+        return jsonify(result)
+
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -216,6 +308,78 @@ def add_food():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@food_bp.route('/api/import', methods=['POST'])
+@login_required
+def import_foods():
+    """
+    Bulk import a nutrition dataset (CSV) into the food catalog
+    ---
+    tags:
+      - Food Database
+    security:
+      - LoginRequired: []
+    consumes:
+      - multipart/form-data
+    parameters:
+      - name: file
+        in: formData
+        type: file
+        required: true
+        description: CSV with qty, unit, ingr, kcal, fats, carbs, protein (fiber, net_carbs optional)
+      - name: update_nutrition
+        in: formData
+        type: boolean
+        description: Overwrite the nutrition of foods that already exist
+    responses:
+      202:
+        description: Import started (or resumed); poll /foods/api/import/{import_id}
+      200:
+        description: This file was already imported
+      400:
+        description: No file uploaded
+      403:
+        description: Not an admin user
+      409:
+        description: The same file is being imported right now
+      429:
+        description: Too many imports are running; retry later
+    """
+    if current_user.get_id() not in ADMIN_USERS:
+        return jsonify({'success': False, 'error': 'Admin access required'}), 403
+
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({'success': False, 'error': 'No file uploaded'}), 400
+
+    try:
+        os.makedirs(IMPORT_DIR, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix='upload_', suffix='.csv', dir=IMPORT_DIR)
+        with os.fdopen(fd, 'wb') as f:
+            upload.save(f)
+        state = food_service.start_catalog_import(path, source=upload.filename,
+                                                  update_nutrition=request.form.get('update_nutrition') == 'true')
+        return jsonify({'success': True, 'import': state}), 200 if state['status'] == 'done' else 202
+    except ImportInProgress as e:
+        return jsonify({'success': False, 'error': str(e)}), 409
+    except TooManyImports as e:
+        return jsonify({'success': False, 'error': str(e)}), 429
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@food_bp.route('/api/import/<int:import_id>', methods=['GET'])
+@login_required
+def import_status(import_id):
+    """Progress of a bulk import (rows done, rows/s, counts added, status)"""
+    try:
+        state = food_service.get_catalog_import(import_id)
+        if not state:
+            return jsonify({'success': False, 'error': 'Import not found'}), 404
+        return jsonify({'success': True, 'import': state})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @food_bp.route('/get/<int:food_id>', methods=['GET'])
 @login_required
 def get_food(food_id):
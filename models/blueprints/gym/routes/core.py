@@ -3,6 +3,7 @@
 from flask import render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required
 from models.services.gym_service import GymService
+from models.database.keyset import InvalidCursor
 from .. import gym_bp
 
 # Initialize gym service with hardcoded user ID (matching old behavior)
@@ -20,9 +21,15 @@ def dashboard():
 @gym_bp.route('/history')
 @login_required
 def history():
-    """View workout history"""
-    workouts = gym_service.get_user_workouts(20)
-    return render_template('gym/history/list.html', workouts=workouts)
+    """View workout history (newest first, 20 per page, ?cursor= for older pages)"""
+    cursor = request.args.get('cursor')
+    try:
+        page = gym_service.get_user_workouts_page(20, cursor=cursor, include_total=True)
+    except InvalidCursor:
+        return redirect(url_for('gym.history'))
+    return render_template('gym/history/list.html', workouts=page['items'],
+                           total_workouts=page['total'], next_cursor=page['next_cursor'],
+                           is_first_page=not cursor)
 
 
 @gym_bp.route('/history/<int:workout_id>')
@@ -22,6 +22,74 @@ def meal_tracking_week(start_date=None):
     result = meal_service.get_weekly_meals(start_date)
     return render_template('nutrition_app/meal_tracking_week.html', **result)
 
+@meal_bp.route('/month')
+@meal_bp.route('/month/<month_str>')
+@login_required
+def meal_tracking_month(month_str=None):
+    """Monthly meal tracking view (month_str is YYYY-MM)"""
+    result = meal_service.get_monthly_meals(month_str)
+    return render_template('nutrition_app/meal_tracking_month.html', **result)
+
+@meal_bp.route('/api/macro-gap')
+@login_required
+def macro_gap():
+    """
+    Suggest foods that close the remaining macros of a day
+    ---
+    tags:
+      - Meal Tracking
+    security:
+      - LoginRequired: []
+    parameters:
+      - name: date
+        in: query
+        type: string
+        description: Day in YYYY-MM-DD format (today by default)
+      - name: calories
+        in: query
+        type: number
+        description: Calorie goal of the day
+      - name: protein
+        in: query
+        type: number
+        description: Protein goal in grams
+      - name: carbs
+        in: query
+        type: number
+        description: Carbohydrate goal in grams
+      - name: fat
+        in: query
+        type: number
+        description: Fat goal in grams
+      - name: combos
+        in: query
+        type: integer
+        default: 3
+        description: Number of combinations to return (1-5)
+      - name: max_items
+        in: query
+        type: integer
+        default: 3
+        description: Foods per combination (1-3)
+    responses:
+      200:
+        description: Eaten and remaining macros with the best food combinations
+      400:
+        description: No goal given or an invalid number
+    """
+    try:
+        targets = {key: request.args.get(key, type=float) for key in ('calories', 'protein', 'carbs', 'fat')}
+        result = meal_service.suggest_for_macro_gap(
+            request.args.get('date'), targets,
+            combos=request.args.get('combos', 3, type=int),
+            max_items=request.args.get('max_items', 3, type=int)
+        )
+        return jsonify({'success': True, **result})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @meal_bp.route('/add', methods=['POST'])
 @login_required
 def add_to_meal():
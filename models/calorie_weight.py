@@ -1,5 +1,9 @@
 import os
 from models.database.connection_manager import get_db_manager
+from models.database.native_dates import native_date_reads, native_date_writes, to_date
+from models.database import weight_series
+from models.database.energy_balance import invalidate as invalidate_energy
+from models.services.weight_trend import record_weight
 
 # Use environment variable for database path (for backward compatibility)
 db_path = os.getenv('DATABASE_PATH', 'database.db')
@@ -20,55 +24,90 @@ class CalorieWeight:
     def add_calorie(self, date, active_calories, total_calories=None):
         with self.connection_manager.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('INSERT IGNORE INTO calorie_tracking (date, calories, total_calories) VALUES (%s,%s,%s)',
-                          (date, active_calories, total_calories))
+            if native_date_writes(self.connection_manager, 'calorie_tracking'):
+                # Dual-write: legacy string column plus the native DATE column
+                cursor.execute('INSERT IGNORE INTO calorie_tracking (date, calories, total_calories, entry_date) VALUES (%s,%s,%s,%s)',
+                              (date, active_calories, total_calories, to_date(date)))
+            else:
+                cursor.execute('INSERT IGNORE INTO calorie_tracking (date, calories, total_calories) VALUES (%s,%s,%s)',
+                              (date, active_calories, total_calories))
             conn.commit()
+        self.connection_manager.touch('calorie_tracking')
+        invalidate_energy(self.connection_manager, [to_date(date)])
 
     def add_weight(self, date, weight):
+        if weight_series.series_ready(self.connection_manager):
+            # One store for every weigh-in; a day already weighed keeps its weight, as before
+            record_weight(self.connection_manager, to_date(date), float(weight), replace=False)
+            return
         with self.connection_manager.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('INSERT IGNORE INTO body_weight_tracking (date, weight) VALUES (%s,%s)', (date, weight))
+            if native_date_writes(self.connection_manager, 'body_weight_tracking'):
+                # Dual-write: legacy string column plus the native DATE column
+                cursor.execute('INSERT IGNORE INTO body_weight_tracking (date, weight, entry_date) VALUES (%s,%s,%s)',
+                              (date, weight, to_date(date)))
+            else:
+                cursor.execute('INSERT IGNORE INTO body_weight_tracking (date, weight) VALUES (%s,%s)', (date, weight))
             conn.commit()
+        self.connection_manager.touch('body_weight_tracking')
 
     def fetch_weights(self):
-        with self.connection_manager.get_connection() as conn:
-            cursor = conn.cursor()
+        if weight_series.series_ready(self.connection_manager):
+            return [{"date": day.strftime('%d.%m.%Y'), "weight": weight, "day": day}
+                    for day, weight in reversed(weight_series.fetch(self.connection_manager))]
+        if native_date_reads(self.connection_manager, 'body_weight_tracking'):
+            # Index scan on the native DATE column
+            query = '''
+                SELECT date, weight, entry_date AS day
+                FROM body_weight_tracking
+                ORDER BY entry_date DESC
+            '''
+        else:
             # MySQL version - handle date sorting differently
             query = '''
-                SELECT date, weight
+                SELECT date, weight, NULL AS day
                 FROM body_weight_tracking
                 ORDER BY STR_TO_DATE(date, '%d.%m.%Y') DESC
             '''
-            cursor.execute(query)
-            weight = cursor.fetchall()
+        weight = self.connection_manager.execute_query(
+            query, fetch_all=True, cache_tables=('body_weight_tracking',)
+        )
 
-            weight_data = []
-            for w in weight:
-                weight_data.append({
-                    "date": w[0],
-                    "weight": w[1]
-                })
+        weight_data = []
+        for w in weight:
+            weight_data.append({
+                "date": w['date'],
+                "weight": w['weight'],
+                "day": w['day'] or to_date(w['date'])
+            })
 
-            return weight_data
+        return weight_data
 
     def fetch_calories(self):
-        with self.connection_manager.get_connection() as conn:
-            cursor = conn.cursor()
+        if native_date_reads(self.connection_manager, 'calorie_tracking'):
+            # Index scan on the native DATE column
+            query = '''
+                SELECT date, calories, total_calories, entry_date AS day
+                FROM calorie_tracking
+                ORDER BY entry_date DESC
+            '''
+        else:
             # MySQL version - handle date sorting differently
             query = '''
-                SELECT date, calories, total_calories
+                SELECT date, calories, total_calories, NULL AS day
                 FROM calorie_tracking
                 ORDER BY STR_TO_DATE(date, '%d.%m.%Y') DESC
             '''
-            cursor.execute(query)
-            calories = cursor.fetchall()
-            calories_data = []
-            for c in calories:
-                calories_data.append({
-                    "date": c[0],
-                    "calories": c[1],  # active calories
-                    "total_calories": c[2] if len(c) > 2 else None
-                })
-            print("fetch ", calories_data)
+        calories = self.connection_manager.execute_query(
+            query, fetch_all=True, cache_tables=('calorie_tracking',)
+        )
+        calories_data = []
+        for c in calories:
+            calories_data.append({
+                "date": c['date'],
+                "calories": c['calories'],  # active calories
+                "total_calories": c.get('total_calories'),
+                "day": c['day'] or to_date(c['date'])
+            })
 
-            return calories_data
+        return calories_data
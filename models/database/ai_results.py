@@ -0,0 +1,203 @@
+"""
+Server-side store of AI food analysis results, keyed by ai_session_id.
+
+The analyzers used to keep their whole result table as a CSV string in the
+Flask cookie session: every request of the user carried it (~0.8 KB
+compressed for 20 foods, growing with every food towards the 4 KB cookie
+limit) and every save or recipe creation parsed it again with pd.read_csv.
+Now the session carries only the id (see scripts/benchmark_ai_results.py).
+
+Results are typed records (column list plus one dict per row, numbers kept
+as numbers) with a TTL:
+- an in-process LRU (AnalysisResultStore) serves the worker that produced
+  them without any I/O;
+- the ai_analysis_results table is the spill tier: results are written
+  through as JSON, so another gunicorn worker (or this one after an LRU
+  eviction or restart) still finds them. Expired rows are pruned on write.
+
+Until migrations/add_ai_results.py has run the store is memory-only, which
+is enough for a single worker.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from models.database.index_advisor import table_columns
+from models.database.readiness import forget, ready
+
+logger = logging.getLogger(__name__)
+
+RESULTS_TABLE = 'ai_analysis_results'
+
+# Matches the session lifetime configured in app.py
+RESULT_TTL_SECONDS = int(os.getenv('AI_RESULTS_TTL_SECONDS', '3600'))
+LRU_ENTRIES = int(os.getenv('AI_RESULTS_LRU_ENTRIES', '256'))
+PRUNE_SECONDS = 300
+
+
+CREATE_MYSQL = f'''
+    CREATE TABLE IF NOT EXISTS {RESULTS_TABLE} (
+        session_id VARCHAR(64) NOT NULL PRIMARY KEY,
+        payload MEDIUMTEXT NOT NULL,
+        expires_at DOUBLE NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_ai_results_expires (expires_at)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+'''
+
+CREATE_SQLITE = [
+    f'''
+    CREATE TABLE IF NOT EXISTS {RESULTS_TABLE} (
+        session_id TEXT NOT NULL PRIMARY KEY,
+        payload TEXT NOT NULL,
+        expires_at REAL NOT NULL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    f'CREATE INDEX IF NOT EXISTS idx_ai_results_expires ON {RESULTS_TABLE} (expires_at)'
+]
+
+
+@dataclass
+class AnalysisResult:
+    """One analysis: its columns in order and one record per analyzed food"""
+    columns: List[str]
+    records: List[Dict[str, Any]]
+    expires_at: float
+
+    def to_json(self) -> str:
+        return json.dumps({'columns': self.columns, 'records': self.records})
+
+    @classmethod
+    def from_json(cls, payload: str, expires_at: float) -> 'AnalysisResult':
+        data = json.loads(payload)
+        return cls(data['columns'], data['records'], expires_at)
+
+
+def create_table(manager):
+    if manager.use_mysql:
+        manager.execute_query(CREATE_MYSQL)
+    else:
+        for statement in CREATE_SQLITE:
+            manager.execute_query(statement)
+
+
+def results_table_ready(manager) -> bool:
+    """True once the ai_analysis_results table exists"""
+    return ready(manager, RESULTS_TABLE, lambda: table_columns(manager, RESULTS_TABLE))
+
+
+def reset_results_state(manager):
+    """Forget the cached readiness check (used by the migration)"""
+    forget(manager, RESULTS_TABLE)
+
+
+class AnalysisResultStore:
+    """LRU of analysis results in front of the ai_analysis_results table"""
+
+    def __init__(self, manager, ttl: int = RESULT_TTL_SECONDS, max_entries: int = LRU_ENTRIES):
+        self.manager = manager
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, AnalysisResult]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pruned_at = 0.0
+        self.hits = 0
+        self.spill_hits = 0
+        self.misses = 0
+
+    def put(self, session_id: str, columns: List[str], records: List[Dict[str, Any]]) -> AnalysisResult:
+        result = AnalysisResult(list(columns), records, time.time() + self.ttl)
+        self._remember(session_id, result)
+        if results_table_ready(self.manager):
+            try:
+                self._spill(session_id, result)
+            except Exception as e:
+                # The worker that analyzed still has the result in memory
+                logger.warning(f"Could not store AI results of {session_id}: {e}")
+        return result
+
+    def get(self, session_id: str) -> Optional[AnalysisResult]:
+        with self._lock:
+            result = self._entries.get(session_id)
+            if result is not None:
+                if result.expires_at > time.time():
+                    self._entries.move_to_end(session_id)
+                    self.hits += 1
+                    return result
+                del self._entries[session_id]
+
+        result = self._load(session_id) if results_table_ready(self.manager) else None
+        if result is None:
+            self.misses += 1
+            return None
+        self.spill_hits += 1
+        self._remember(session_id, result)
+        return result
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._entries.pop(session_id, None)
+        if results_table_ready(self.manager):
+            try:
+                self.manager.execute_query(f'DELETE FROM {RESULTS_TABLE} WHERE session_id = %s', (session_id,))
+            except Exception as e:
+                logger.warning(f"Could not delete AI results of {session_id}: {e}")
+
+    def stats(self) -> Dict:
+        return {'entries': len(self._entries), 'hits': self.hits, 'spill_hits': self.spill_hits,
+                'misses': self.misses}
+
+    def _remember(self, session_id: str, result: AnalysisResult):
+        with self._lock:
+            self._entries[session_id] = result
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _spill(self, session_id: str, result: AnalysisResult):
+        now = time.time()
+        with self.manager.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f'DELETE FROM {RESULTS_TABLE} WHERE session_id = %s', (session_id,))
+                cursor.execute(f'INSERT INTO {RESULTS_TABLE} (session_id, payload, expires_at) VALUES (%s, %s, %s)',
+                               (session_id, result.to_json(), result.expires_at))
+                if now - self._pruned_at > PRUNE_SECONDS:
+                    self._pruned_at = now
+                    cursor.execute(f'DELETE FROM {RESULTS_TABLE} WHERE expires_at < %s', (now,))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def _load(self, session_id: str) -> Optional[AnalysisResult]:
+        try:
+            row = self.manager.execute_query(
+                f'SELECT payload, expires_at FROM {RESULTS_TABLE} WHERE session_id = %s AND expires_at > %s',
+                (session_id, time.time()), fetch_one=True)
+        except Exception as e:
+            logger.warning(f"Could not read AI results of {session_id}: {e}")
+            return None
+        return AnalysisResult.from_json(row['payload'], float(row['expires_at'])) if row else None
+
+
+_store_lock = threading.Lock()
+
+
+def get_result_store(manager) -> AnalysisResultStore:
+    """The worker-wide analysis result store of `manager`"""
+    store = getattr(manager, '_ai_result_store', None)
+    if store is None:
+        with _store_lock:
+            store = getattr(manager, '_ai_result_store', None)
+            if store is None:
+                store = manager._ai_result_store = AnalysisResultStore(manager)
+    return store
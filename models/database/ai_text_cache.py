@@ -0,0 +1,296 @@
+"""
+Per-item memoization of AI food text analysis.
+
+analyze_foods() sent the whole free text ("2 eggs, 100g oats, banana") to
+the model on every request, although the same breakfasts are logged almost
+daily. The text is now split into items, each normalized (case, whitespace,
+number formatting and unit synonyms: "100 Grams Oats" == "100g oats"), and
+each normalized item is one cache entry holding the CSV row the model
+returned for it. Because entries are per item the order of the items does
+not matter, and a query with one new item sends only that item to the model.
+
+Entries live in an in-process LRU in front of the ai_text_items table
+(persistent, shared by workers, entries older than ITEM_TTL_DAYS ignored).
+A model answer is cached only when it has exactly one row per item sent,
+in the same order, since otherwise rows cannot be attributed to items.
+stats() reports the item hit rate and the model time saved, estimated from
+the measured model time per item.
+
+Until migrations/add_ai_text_cache.py has run the cache is memory-only.
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from models.database.index_advisor import table_columns
+from models.database.ingredient_ingest import select_in
+from models.database.readiness import forget, ready
+
+logger = logging.getLogger(__name__)
+
+ITEMS_TABLE = 'ai_text_items'
+
+# Column order of the rows returned by analyze(), as in the text analysis prompt
+CSV_COLUMNS = ('qty', 'unit', 'ingr', 'carbs', 'fats', 'protein', 'net_carbs', 'fiber', 'kcal')
+
+ITEM_TTL_DAYS = int(os.getenv('AI_TEXT_CACHE_TTL_DAYS', '90'))
+LRU_ENTRIES = int(os.getenv('AI_TEXT_CACHE_LRU_ENTRIES', '2048'))
+
+
+CREATE_MYSQL = f'''
+    CREATE TABLE IF NOT EXISTS {ITEMS_TABLE} (
+        item_hash CHAR(40) NOT NULL PRIMARY KEY,
+        item_text VARCHAR(500) NOT NULL,
+        csv_row TEXT NOT NULL,
+        cached_at DOUBLE NOT NULL
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+'''
+
+CREATE_SQLITE = f'''
+    CREATE TABLE IF NOT EXISTS {ITEMS_TABLE} (
+        item_hash TEXT NOT NULL PRIMARY KEY,
+        item_text TEXT NOT NULL,
+        csv_row TEXT NOT NULL,
+        cached_at REAL NOT NULL
+    )
+'''
+
+# ============== Normalization ==============
+
+UNIT_SYNONYMS = {
+    'g': ('g', 'gr', 'grs', 'gram', 'grams', 'gramme', 'grammes'),
+    'kg': ('kg', 'kgs', 'kilo', 'kilos', 'kilogram', 'kilograms'),
+    'mg': ('mg', 'milligram', 'milligrams'),
+    'ml': ('ml', 'milliliter', 'milliliters', 'millilitre', 'millilitres'),
+    'l': ('l', 'liter', 'liters', 'litre', 'litres'),
+    'oz': ('oz', 'ounce', 'ounces'),
+    'lb': ('lb', 'lbs', 'pound', 'pounds'),
+    'tbsp': ('tbsp', 'tbsps', 'tbs', 'tablespoon', 'tablespoons'),
+    'tsp': ('tsp', 'tsps', 'teaspoon', 'teaspoons'),
+    'cup': ('cup', 'cups'),
+    'pc': ('pc', 'pcs', 'piece', 'pieces'),
+    'slice': ('slice', 'slices'),
+}
+_UNITS = {synonym: unit for unit, synonyms in UNIT_SYNONYMS.items() for synonym in synonyms}
+
+_ITEM_SEPARATORS = re.compile(r'[,;\n]+')
+_NUMBER_UNIT = re.compile(r'(\d)([^\d\s.,/])')
+_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+
+def split_items(text: str) -> List[str]:
+    """The items of a free-text food list, as typed"""
+    return [item.strip() for item in _ITEM_SEPARATORS.split(text or '') if item.strip(' .')]
+
+
+def _number(match) -> str:
+    return f"{float(match.group(0)):g}"
+
+
+def normalize_item(item: str) -> str:
+    """Cache key text of one item: '100 Grams  Oats.' -> '100 g oats'"""
+    text = _NUMBER_UNIT.sub(r'\1 \2', item.casefold().strip(' .'))
+    text = _NUMBER.sub(_number, text)
+    return ' '.join(_UNITS.get(token, token) for token in text.split())
+
+
+def _hash(key: str) -> str:
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def parse_rows(response: str) -> Optional[List[List[str]]]:
+    """Rows of a model CSV answer in CSV_COLUMNS order, or None when its header lacks a column"""
+    lines = [line for line in (response or '').strip().split('\n') if line.strip()]
+    if not lines:
+        return []
+    header = [column.strip().casefold() for column in lines[0].split(',')]
+    if not set(CSV_COLUMNS) <= set(header):
+        return None
+    positions = [header.index(column) for column in CSV_COLUMNS]
+    rows = []
+    for line in lines[1:]:
+        values = [value.strip() for value in line.split(',')]
+        if len(values) == len(header):
+            rows.append([values[i] for i in positions])
+    return rows
+
+
+def _describes(key: str, row: List[str]) -> bool:
+    """True when the row's ingredient shares a word stem with the item (the model kept the order)"""
+    words = [word for word in re.findall(r'[^\W\d_]+', row[CSV_COLUMNS.index('ingr')].casefold()) if len(word) >= 3]
+    return not words or any(word[:4] in key for word in words)
+
+
+def to_csv(rows: List[List[str]]) -> str:
+    return '\n'.join([','.join(CSV_COLUMNS)] + [','.join(row) for row in rows])
+
+
+# ============== Table ==============
+
+def create_table(manager):
+    manager.execute_query(CREATE_MYSQL if manager.use_mysql else CREATE_SQLITE)
+
+
+def items_table_ready(manager) -> bool:
+    """True once the ai_text_items table exists"""
+    return ready(manager, ITEMS_TABLE, lambda: table_columns(manager, ITEMS_TABLE))
+
+
+def reset_items_state(manager):
+    """Forget the cached readiness check (used by the migration)"""
+    forget(manager, ITEMS_TABLE)
+
+
+# ============== Cache ==============
+
+class FoodTextCache:
+    """Normalized item -> model CSV row, in an LRU in front of ai_text_items"""
+
+    def __init__(self, manager, max_entries: int = LRU_ENTRIES):
+        self.manager = manager
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(('queries', 'items', 'memory_hits', 'table_hits', 'model_calls',
+                                     'model_items', 'unattributed_calls'), 0)
+        self._model_seconds = 0.0
+
+    def analyze(self, user_input: str, analyze: Callable[[str], str]) -> str:
+        """CSV analysis of `user_input`, asking `analyze` only about the items not cached yet"""
+        items = split_items(user_input)
+        if not items:
+            return analyze(user_input)
+        keys = [normalize_item(item) for item in items]
+        found = self._lookup(set(keys))
+
+        unknown = {}
+        for item, key in zip(items, keys):
+            if key not in found:
+                unknown.setdefault(key, item)
+        self._count(queries=1, items=len(set(keys)))
+
+        extra_rows = []
+        if unknown:
+            started = time.perf_counter()
+            response = analyze(', '.join(unknown.values()))
+            self._model_seconds += time.perf_counter() - started
+            self._count(model_calls=1, model_items=len(unknown))
+
+            rows = parse_rows(response)
+            if rows is None:
+                if found:
+                    logger.warning("AI text analysis answer has an unexpected header; cached items dropped")
+                return response
+            if len(rows) == len(unknown) and all(map(_describes, unknown, rows)):
+                learned = dict(zip(unknown, rows))
+                self._store(learned)
+                found.update(learned)
+            else:
+                # Rows cannot be matched to items: use them as they are, cache nothing
+                self._count(unattributed_calls=1)
+                extra_rows = rows
+
+        rows = [found[key] for key in keys if key in found]
+        return to_csv(rows + extra_rows)
+
+    def stats(self) -> Dict:
+        stats = dict(self._stats, entries=len(self._entries))
+        hits = stats['memory_hits'] + stats['table_hits']
+        per_item = self._model_seconds / stats['model_items'] if stats['model_items'] else 0.0
+        stats.update(
+            hit_rate=round(hits / stats['items'], 3) if stats['items'] else 0.0,
+            model_seconds=round(self._model_seconds, 2),
+            # Every cached item would have cost about the measured model time per item
+            saved_seconds=round(hits * per_item, 2)
+        )
+        return stats
+
+    def _count(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                self._stats[name] += value
+
+    def _lookup(self, keys) -> Dict[str, List[str]]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                row = self._entries.get(key)
+                if row is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = row
+        self._count(memory_hits=len(found))
+
+        missing = [key for key in keys if key not in found]
+        if missing and items_table_ready(self.manager):
+            by_hash = {_hash(key): key for key in missing}
+            try:
+                with self.manager.get_connection() as conn:
+                    cursor = conn.cursor()
+                    try:
+                        rows = select_in(cursor, f'''
+                            SELECT item_hash, csv_row, cached_at FROM {ITEMS_TABLE} WHERE item_hash IN ({{values}})
+                        ''', sorted(by_hash))
+                    finally:
+                        cursor.close()
+            except Exception as e:
+                logger.warning(f"Could not read cached AI text items: {e}")
+                rows = []
+            oldest = time.time() - ITEM_TTL_DAYS * 86400
+            loaded = {by_hash[item_hash]: json.loads(csv_row)
+                      for item_hash, csv_row, cached_at in rows if float(cached_at) >= oldest}
+            self._remember(loaded)
+            self._count(table_hits=len(loaded))
+            found.update(loaded)
+        return found
+
+    def _remember(self, entries: Dict[str, List[str]]):
+        with self._lock:
+            for key, row in entries.items():
+                self._entries[key] = row
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _store(self, entries: Dict[str, List[str]]):
+        self._remember(entries)
+        if not items_table_ready(self.manager):
+            return
+        now = time.time()
+        hashes = [(_hash(key),) for key in entries]
+        try:
+            with self.manager.get_connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.executemany(f'DELETE FROM {ITEMS_TABLE} WHERE item_hash = %s', hashes)
+                    cursor.executemany(
+                        f'INSERT INTO {ITEMS_TABLE} (item_hash, item_text, csv_row, cached_at) VALUES (%s, %s, %s, %s)',
+                        [(_hash(key), key[:500], json.dumps(row), now) for key, row in entries.items()])
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
+        except Exception as e:
+            # The worker still has the items in memory
+            logger.warning(f"Could not store AI text items: {e}")
+
+
+_cache_lock = threading.Lock()
+
+
+def get_text_cache(manager) -> FoodTextCache:
+    """The worker-wide AI text item cache of `manager`"""
+    cache = getattr(manager, '_ai_text_cache', None)
+    if cache is None:
+        with _cache_lock:
+            cache = getattr(manager, '_ai_text_cache', None)
+            if cache is None:
+                cache = manager._ai_text_cache = FoodTextCache(manager)
+    return cache
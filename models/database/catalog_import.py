@@ -0,0 +1,400 @@
+"""
+Streaming bulk import of nutrition datasets into the food catalog.
+
+Imports CSV files shaped like data/data.csv (qty, unit, ingr and the
+nutrients of that quantity; fiber and net_carbs optional, extra columns
+ignored) into Unit, Ingredient, Ingredient_Quantity and Nutrition, at the
+scale of hundreds of thousands of rows:
+
+- the file is streamed through the csv module and imported CHUNK_ROWS rows
+  at a time, so memory stays flat whatever its size;
+- rows are normalized to one unit like every other writer does (see
+  ingredient_ingest.per_unit, converter_base_unit's conversion), invalid
+  ones are skipped and counted, and duplicates within a chunk dropped;
+- names are resolved with batched IN lookups (case-insensitively) and
+  everything missing is inserted with one executemany per table; existing
+  nutrition is kept unless update_nutrition is set.
+
+Each chunk commits together with its progress row in catalog_imports, so an
+interrupted import resumes exactly after the last committed chunk when the
+same file (by checksum) is imported again. Workers reload their catalog once
+at the end instead of patching every imported row.
+
+Uploads are imported outside the web workers by scripts/import_food_catalog.py
+from IMPORT_DIR/<import_id>.csv, which is kept until the import is done so an
+interrupted one can be resumed from it.
+"""
+import os
+import csv
+import time
+import hashlib
+import logging
+from typing import Callable, Dict, Iterator, List, Optional
+
+from models.database.daily_nutrition import ROLLUP_TABLE, days_of_nutrition, refresh_days, rollup_ready
+from models.database.energy_balance import invalidate as invalidate_energy
+from models.database.food_catalog import CATALOG_TABLES, changes_ready, record_reload
+from models.database.ingredient_canon import canonical_key, canonical_keys_ready
+from models.database.ingredient_ingest import per_unit, resolve_ingredients, resolve_names, select_in
+from models.database.recipe_nutrition import VECTOR_TABLE, recipes_using, refresh_recipes, vectors_ready
+from models.database.unit_conversion import base_units_ready, store_nutrition
+
+logger = logging.getLogger(__name__)
+
+IMPORTS_TABLE = 'catalog_imports'
+
+CHUNK_ROWS = 2000
+# A running import whose heartbeat is older than this is considered dead and can be resumed
+STALE_SECONDS = 120
+# Where uploaded files wait for (and during) their import
+IMPORT_DIR = os.path.abspath(os.getenv('CATALOG_IMPORT_DIR', os.path.join('data', 'imports')))
+
+REQUIRED_COLUMNS = ('qty', 'unit', 'ingr', 'kcal', 'fats', 'carbs', 'protein')
+COLUMN_ALIASES = {
+    'quantity': 'qty', 'unit_name': 'unit', 'ingredient': 'ingr', 'ingredient_name': 'ingr', 'name': 'ingr',
+    'calories': 'kcal', 'fat': 'fats', 'carb': 'carbs', 'net_carb': 'net_carbs'
+}
+COUNTERS = ('rows_done', 'rows_skipped', 'ingredients_added', 'quantities_added',
+            'nutrition_added', 'nutrition_updated')
+
+CREATE_MYSQL = f'''
+    CREATE TABLE IF NOT EXISTS {IMPORTS_TABLE} (
+        import_id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        source VARCHAR(255) NOT NULL,
+        checksum CHAR(64) NOT NULL,
+        status VARCHAR(16) NOT NULL DEFAULT 'running',
+        rows_total BIGINT NOT NULL DEFAULT 0,
+        rows_done BIGINT NOT NULL DEFAULT 0,
+        rows_skipped BIGINT NOT NULL DEFAULT 0,
+        ingredients_added BIGINT NOT NULL DEFAULT 0,
+        quantities_added BIGINT NOT NULL DEFAULT 0,
+        nutrition_added BIGINT NOT NULL DEFAULT 0,
+        nutrition_updated BIGINT NOT NULL DEFAULT 0,
+        rows_per_second DOUBLE NOT NULL DEFAULT 0,
+        heartbeat DOUBLE NOT NULL DEFAULT 0,
+        error TEXT NULL,
+        started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        finished_at TIMESTAMP NULL,
+        INDEX idx_catalog_imports_checksum (checksum)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+'''
+
+CREATE_SQLITE = [f'''
+    CREATE TABLE IF NOT EXISTS {IMPORTS_TABLE} (
+        import_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        source TEXT NOT NULL,
+        checksum TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'running',
+        rows_total INTEGER NOT NULL DEFAULT 0,
+        rows_done INTEGER NOT NULL DEFAULT 0,
+        rows_skipped INTEGER NOT NULL DEFAULT 0,
+        ingredients_added INTEGER NOT NULL DEFAULT 0,
+        quantities_added INTEGER NOT NULL DEFAULT 0,
+        nutrition_added INTEGER NOT NULL DEFAULT 0,
+        nutrition_updated INTEGER NOT NULL DEFAULT 0,
+        rows_per_second REAL NOT NULL DEFAULT 0,
+        heartbeat REAL NOT NULL DEFAULT 0,
+        error TEXT NULL,
+        started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        finished_at DATETIME NULL
+    )
+''', f'CREATE INDEX IF NOT EXISTS idx_catalog_imports_checksum ON {IMPORTS_TABLE} (checksum)']
+
+
+class ImportInProgress(RuntimeError):
+    """The same file is already being imported by a live process"""
+
+
+class TooManyImports(RuntimeError):
+    """As many imports as allowed are already running"""
+
+
+def create_table(manager):
+    for statement in ([CREATE_MYSQL] if manager.use_mysql else CREATE_SQLITE):
+        manager.execute_query(statement)
+
+
+def file_stats(path: str):
+    """(sha256, data row estimate) of a file, read in 1 MB blocks"""
+    digest = hashlib.sha256()
+    lines = 0
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+            lines += block.count(b'\n')
+    return digest.hexdigest(), max(lines - 1, 0)
+
+
+def read_rows(stream) -> Iterator[Dict[str, str]]:
+    """Rows of a CSV text stream with normalized column names"""
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [name.strip().lower() for name in header]
+    columns = [COLUMN_ALIASES.get(name, name) for name in columns]
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+    for values in reader:
+        yield dict(zip(columns, values))
+
+
+def normalize(row: Dict[str, str]) -> Optional[tuple]:
+    """(unit, ingredient, quantity, per-unit nutrition) of a row, or None when it is unusable"""
+    unit = (row.get('unit') or '').strip()
+    ingredient = (row.get('ingr') or '').strip()
+    try:
+        entry = {field: float((row.get(field) or '0').strip() or 0)
+                 for field in ('qty', 'kcal', 'fats', 'carbs', 'protein', 'fiber')}
+        net_carbs = (row.get('net_carbs') or '').strip()
+        entry['net_carbs'] = float(net_carbs) if net_carbs else entry['carbs'] - entry['fiber']
+    except ValueError:
+        return None
+    if not unit or not ingredient or not entry['qty'] > 0:
+        return None
+    return unit, ingredient, entry['qty'], per_unit(entry)
+
+
+def import_path(import_id: int) -> str:
+    """The kept upload of an import"""
+    return os.path.join(IMPORT_DIR, f'{import_id}.csv')
+
+
+def get_import(manager, import_id: int) -> Optional[Dict]:
+    return manager.execute_query(f'SELECT * FROM {IMPORTS_TABLE} WHERE import_id = %s', (import_id,), fetch_one=True)
+
+
+class CatalogImporter:
+    """Imports one file into the catalog, resuming a previous interrupted run of it"""
+
+    def __init__(self, manager, chunk_rows: int = CHUNK_ROWS, update_nutrition: bool = False,
+                 progress: Optional[Callable[[Dict], None]] = None):
+        self.manager = manager
+        self.chunk_rows = chunk_rows
+        self.update_nutrition = update_nutrition
+        self.progress = progress
+
+    def import_file(self, path: str, source: Optional[str] = None) -> Dict:
+        state = self.begin(path, source)
+        if state['status'] == 'done':
+            return state
+        return self.run(path, state)
+
+    def begin(self, path: str, source: Optional[str] = None, max_running: Optional[int] = None) -> Dict:
+        """The import row of `path`: a finished or resumable one of the same file, or a new one.
+
+        With `max_running`, starting or resuming a run fails with TooManyImports
+        while that many imports are alive.
+        """
+        with open(path, newline='', encoding='utf-8-sig', errors='replace') as f:
+            next(read_rows(f), None)  # Raises on missing columns before anything is recorded
+        create_table(self.manager)
+        checksum, rows_total = file_stats(path)
+        previous = self.manager.execute_query(
+            f'SELECT * FROM {IMPORTS_TABLE} WHERE checksum = %s ORDER BY import_id DESC LIMIT 1',
+            (checksum,), fetch_one=True
+        )
+        now = time.time()
+        if previous and previous['status'] == 'done':
+            return previous
+        if previous and previous['status'] == 'running' and now - float(previous['heartbeat']) < STALE_SECONDS:
+            raise ImportInProgress(f"Import {previous['import_id']} of this file is still running")
+        if max_running is not None:
+            running = self.manager.execute_query(
+                f"SELECT COUNT(*) AS running FROM {IMPORTS_TABLE} WHERE status = 'running' AND heartbeat >= %s",
+                (now - STALE_SECONDS,), fetch_one=True
+            )['running']
+            if running >= max_running:
+                raise TooManyImports(f"{running} import(s) already running; try again when one has finished")
+
+        if previous:
+            self.manager.execute_query(
+                f"UPDATE {IMPORTS_TABLE} SET status = 'running', error = NULL, heartbeat = %s WHERE import_id = %s",
+                (now, previous['import_id'])
+            )
+            logger.info(f"Resuming import {previous['import_id']} after {previous['rows_done']} row(s)")
+            return get_import(self.manager, previous['import_id'])
+
+        with self.manager.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f'''
+                    INSERT INTO {IMPORTS_TABLE} (source, checksum, rows_total, heartbeat) VALUES (%s, %s, %s, %s)
+                ''', ((source or path)[:255], checksum, rows_total, now))
+                import_id = cursor.lastrowid
+                conn.commit()
+            finally:
+                cursor.close()
+        return get_import(self.manager, import_id)
+
+    def run(self, path: str, state: Dict) -> Dict:
+        """Import the rows of `path` after the ones `state` already committed"""
+        import_id = state['import_id']
+        counts = {name: int(state[name]) for name in COUNTERS}
+        skip = counts['rows_done']
+        started = time.perf_counter()
+        imported = 0
+        try:
+            with open(path, newline='', encoding='utf-8-sig', errors='replace') as f:
+                chunk = []
+                for position, row in enumerate(read_rows(f)):
+                    if position < skip:
+                        continue
+                    chunk.append(row)
+                    if len(chunk) >= self.chunk_rows:
+                        imported += self._commit_chunk(import_id, chunk, counts, started, imported)
+                        chunk = []
+                if chunk:
+                    imported += self._commit_chunk(import_id, chunk, counts, started, imported)
+            self.manager.execute_query(
+                f"UPDATE {IMPORTS_TABLE} SET status = 'done', finished_at = CURRENT_TIMESTAMP WHERE import_id = %s",
+                (import_id,)
+            )
+        except Exception as e:
+            logger.error(f"Catalog import {import_id} failed after {counts['rows_done']} row(s): {e}")
+            self.manager.execute_query(
+                f"UPDATE {IMPORTS_TABLE} SET status = 'failed', error = %s WHERE import_id = %s",
+                (str(e)[:2000], import_id)
+            )
+            raise
+        finally:
+            if imported:
+                self._publish()
+
+        elapsed = time.perf_counter() - started
+        logger.info(f"Catalog import {import_id} done: {imported} row(s) in {elapsed:.1f}s "
+                    f"({imported / elapsed if elapsed else 0:.0f} rows/s)")
+        return get_import(self.manager, import_id)
+
+    def _commit_chunk(self, import_id, rows: List[Dict], counts: Dict, started: float, imported: int) -> int:
+        """Import one chunk and its progress in one transaction"""
+        with self.manager.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                added = self._import_chunk(cursor, rows)
+                for name, value in added.items():
+                    counts[name] += value
+                counts['rows_done'] += len(rows)
+
+                elapsed = time.perf_counter() - started
+                rate = (imported + len(rows)) / elapsed if elapsed else 0
+                cursor.execute(f'''
+                    UPDATE {IMPORTS_TABLE}
+                    SET rows_done = %s, rows_skipped = %s, ingredients_added = %s, quantities_added = %s,
+                        nutrition_added = %s, nutrition_updated = %s, rows_per_second = %s, heartbeat = %s
+                    WHERE import_id = %s
+                ''', (*(counts[name] for name in COUNTERS), rate, time.time(), import_id))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        # Keep cached catalog reads consistent with what is already committed
+        self.manager.touch(*CATALOG_TABLES, ROLLUP_TABLE, VECTOR_TABLE)
+        if self.progress:
+            self.progress({**counts, 'import_id': import_id, 'rows_per_second': rate})
+        return len(rows)
+
+    def _import_chunk(self, cursor, rows: List[Dict]) -> Dict[str, int]:
+        added = {'rows_skipped': 0, 'ingredients_added': 0, 'quantities_added': 0,
+                 'nutrition_added': 0, 'nutrition_updated': 0}
+
+        entries = {}
+        for row in rows:
+            entry = normalize(row)
+            if entry is None:
+                added['rows_skipped'] += 1
+                continue
+            entries.setdefault((entry[1].casefold(), entry[0].casefold(), entry[2]), entry)
+        if not entries:
+            return added
+        entries = list(entries.values())
+
+        unit_ids, _ = resolve_names(cursor, 'Unit', 'unit_id', 'unit_name', [e[0] for e in entries])
+        ingredient_ids, added['ingredients_added'] = resolve_ingredients(
+            cursor, [e[1] for e in entries], canonical_key if canonical_keys_ready(self.manager) else None)
+
+        ids = sorted(set(ingredient_ids.values()))
+        quantities = {(row[0], row[1], float(row[2])) for row in select_in(
+            cursor, 'SELECT ingredient_id, unit_id, quantity FROM Ingredient_Quantity WHERE ingredient_id IN ({values})',
+            ids)}
+        has_nutrition = set(select_in(
+            cursor, 'SELECT ingredient_id, unit_id FROM Nutrition WHERE ingredient_id IN ({values})', ids))
+
+        new_quantities, new_nutrition, updated_nutrition = [], {}, {}
+        for unit, ingredient, quantity, nutrition in entries:
+            ingredient_id, unit_id = ingredient_ids[ingredient], unit_ids[unit]
+            if (ingredient_id, unit_id, quantity) not in quantities:
+                quantities.add((ingredient_id, unit_id, quantity))
+                new_quantities.append((quantity, ingredient_id, unit_id))
+            if (ingredient_id, unit_id) not in has_nutrition:
+                new_nutrition.setdefault((ingredient_id, unit_id), (ingredient_id, unit_id, *nutrition))
+            elif self.update_nutrition:
+                updated_nutrition.setdefault((ingredient_id, unit_id), (*nutrition, ingredient_id, unit_id))
+
+        if new_quantities:
+            cursor.executemany('INSERT INTO Ingredient_Quantity (quantity, ingredient_id, unit_id) VALUES (%s,%s,%s)',
+                               new_quantities)
+        if base_units_ready(self.manager):
+            changed = self._store_base_nutrition(cursor, entries, unit_ids, ingredient_ids, has_nutrition, added)
+            if changed and vectors_ready(self.manager):
+                refresh_recipes(cursor, recipes_using(cursor, ingredient_ids=changed), base_units=True)
+            added['quantities_added'] = len(new_quantities)
+            return added
+
+        if new_nutrition:
+            cursor.executemany('''
+                INSERT INTO Nutrition (ingredient_id, unit_id, kcal, fat, carb, fiber, net_carb, protein)
+                VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
+            ''', list(new_nutrition.values()))
+        if updated_nutrition:
+            cursor.executemany('''
+                UPDATE Nutrition SET kcal=%s, fat=%s, carb=%s, fiber=%s, net_carb=%s, protein=%s
+                WHERE ingredient_id=%s AND unit_id=%s
+            ''', list(updated_nutrition.values()))
+            # Days that ate the updated foods change with them
+            if rollup_ready(self.manager):
+                days = [day for ingredient_id, unit_id in updated_nutrition
+                        for day in days_of_nutrition(cursor, ingredient_id, unit_id)]
+                refresh_days(cursor, days)
+                invalidate_energy(self.manager, days, cursor=cursor)
+
+        # Recipes using foods whose nutrition appeared or changed get new vectors
+        changed = {key[0] for key in new_nutrition} | {key[0] for key in updated_nutrition}
+        if changed and vectors_ready(self.manager):
+            refresh_recipes(cursor, recipes_using(cursor, ingredient_ids=changed))
+
+        added['quantities_added'] = len(new_quantities)
+        added['nutrition_added'] = len(new_nutrition)
+        added['nutrition_updated'] = len(updated_nutrition)
+        return added
+
+    def _store_base_nutrition(self, cursor, entries, unit_ids, ingredient_ids, has_nutrition, added) -> set:
+        """Nutrition of the chunk as base rows and conversions (see unit_conversion.py); returns changed ingredients"""
+        rows = {(ingredient_ids[ingredient], unit_ids[unit]): nutrition for unit, ingredient, _, nutrition in entries}
+        had = {ingredient_id for ingredient_id, _ in has_nutrition}
+        changed = set(store_nutrition(cursor, [(*key, nutrition) for key, nutrition in rows.items()],
+                                      replace=self.update_nutrition))
+        # Every unit of an ingredient is priced from its one base row
+        if changed & had and rollup_ready(self.manager):
+            days = [day for ingredient_id in sorted(changed & had) for day in days_of_nutrition(cursor, ingredient_id)]
+            refresh_days(cursor, days, base_units=True)
+            invalidate_energy(self.manager, days, cursor=cursor)
+        added['nutrition_added'] = len(changed - had)
+        added['nutrition_updated'] = len(changed & had)
+        return changed
+
+    def _publish(self):
+        """Make every worker reload its catalog once instead of patching each imported row"""
+        if not changes_ready(self.manager):
+            return
+        with self.manager.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                record_reload(cursor)
+                conn.commit()
+            finally:
+                cursor.close()
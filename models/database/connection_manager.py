@@ -1,67 +1,135 @@
 import mysql.connector
 from mysql.connector import pooling
 import os
+import time
 import logging
+import threading
 from contextlib import contextmanager
 from typing import Optional, Union, Dict, Any
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-from config.database import get_database_config, DatabaseConfig, ensure_database_exists
+from config.database import (
+    get_database_config, DatabaseConfig, ensure_database_exists, get_database_engine, get_query_cache_config
+)
+from models.database.query_cache import QueryCacheMixin, create_query_cache
 
 logger = logging.getLogger(__name__)
 
-class DatabaseConnectionManager:
-    """MySQL-only database connection manager"""
+class DatabaseConnectionManager(QueryCacheMixin):
+    """MySQL database connection manager"""
+
+    use_mysql = True
 
     def __init__(self):
         self.config = get_database_config()
         self.connection_pool = None
+        self.warmup_stats = None
+        self.query_cache = create_query_cache(get_query_cache_config())
+
+        # The pool is created lazily by the first process that needs it, so
+        # importing the app in a gunicorn master opens no sockets before fork
+        self._pool_lock = threading.Lock()
+        self._pool_pid = None
 
-        # Ensure database exists before creating pool
-        if ensure_database_exists(self.config):
+    def _connection_config(self) -> Dict[str, Any]:
+        """Connection arguments of the pool"""
+        cnx_config = {
+            'host': self.config.host,
+            'port': self.config.port,
+            'database': self.config.database,
+            'user': self.config.username,
+            'password': self.config.password,
+            'charset': self.config.charset,
+            'autocommit': self.config.autocommit,
+            'time_zone': '+00:00',
+            'ssl_disabled': self.config.ssl_disabled
+        }
+
+        # Configure SSL for DigitalOcean databases
+        if not self.config.ssl_disabled:
+            # DigitalOcean requires SSL but doesn't require certificate verification
+            cnx_config['ssl_verify_cert'] = False
+            cnx_config['ssl_verify_identity'] = False
+
+        return cnx_config
+
+    def _ensure_pool(self):
+        """Create the pool on first use and again after a fork"""
+        pid = os.getpid()
+        if self.connection_pool is not None and self._pool_pid == pid:
+            return
+
+        with self._pool_lock:
+            if self.connection_pool is not None and self._pool_pid == pid:
+                return
+            if self.connection_pool is not None:
+                # Sockets inherited from the parent process must never be shared
+                logger.info(f"Process {pid} forked from pool owner {self._pool_pid}; creating a fresh pool")
+                self.connection_pool = None
             self._init_mysql_pool()
-        else:
-            logger.error("Failed to ensure database exists")
-            raise Exception("Cannot connect to MySQL database")
+            self._pool_pid = pid
 
     def _init_mysql_pool(self):
-        """Initialize MySQL connection pool"""
+        """Initialize MySQL connection pool; it opens all pool_size connections up front.
+
+        The connector opens them one after another: its constructor connects
+        them in turn and get_connection() reconnects under a module-wide lock,
+        so the public API offers no parallel warm-up. A warm-up costs about
+        pool_size handshakes, reported in warmup_stats['duration_ms'] (see
+        scripts/benchmark_pool_warmup.py).
+        """
+        started = time.perf_counter()
+        pool_size = self.config.pool_size
+
         try:
-            pool_config = {
-                'pool_name': f'{self.config.database}_pool',
-                'pool_size': self.config.pool_size,
-                'pool_reset_session': True,
-                'host': self.config.host,
-                'port': self.config.port,
-                'database': self.config.database,
-                'user': self.config.username,
-                'password': self.config.password,
-                'charset': self.config.charset,
-                'autocommit': self.config.autocommit,
-                'time_zone': '+00:00',
-                'ssl_disabled': self.config.ssl_disabled
+            self.connection_pool = pooling.MySQLConnectionPool(
+                pool_name=f'{self.config.database}_pool_{os.getpid()}',
+                pool_size=pool_size,
+                pool_reset_session=True,
+                **self._connection_config()
+            )
+            elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+            self.warmup_stats = {
+                'pid': os.getpid(),
+                'connections': pool_size,
+                'duration_ms': elapsed_ms,
+                'completed_at': time.time()
             }
-            
-            # Configure SSL for DigitalOcean databases
-            if not self.config.ssl_disabled:
-                # DigitalOcean requires SSL but doesn't require certificate verification
-                pool_config['ssl_verify_cert'] = False
-                pool_config['ssl_verify_identity'] = False
-
-            self.connection_pool = pooling.MySQLConnectionPool(**pool_config)
-            logger.info(f"MySQL connection pool initialized for {self.config.database} at {self.config.host}:{self.config.port}")
+            logger.info(f"MySQL connection pool initialized for {self.config.database} at {self.config.host}:{self.config.port} "
+                        f"({pool_size} connections, {elapsed_ms} ms)")
 
         except mysql.connector.Error as e:
             logger.error(f"Failed to initialize MySQL connection pool: {e}")
+            # Only pay for the diagnostic connection when something is wrong
+            ensure_database_exists(self.config)
             raise
 
+    def warm_up(self) -> Dict[str, Any]:
+        """Create this process's pool now instead of on the first request"""
+        with self._pool_lock:
+            if self.connection_pool is None or self._pool_pid != os.getpid():
+                self.connection_pool = None
+                self._init_mysql_pool()
+                self._pool_pid = os.getpid()
+        return self.warmup_stats
+
+    def pool_status(self) -> Dict[str, Any]:
+        """Readiness of this process's pool, for health checks"""
+        ready = self.connection_pool is not None and self._pool_pid == os.getpid()
+        return {
+            'engine': 'mysql',
+            'ready': ready,
+            'pid': os.getpid(),
+            'pool_size': self.config.pool_size,
+            'warmup': self.warmup_stats if ready else None
+        }
+
     @contextmanager
     def get_connection(self):
         """Get MySQL database connection (context manager)"""
         connection = None
         try:
-            if self.connection_pool is None:
-                raise Exception("Connection pool not initialized")
+            self._ensure_pool()
             connection = self.connection_pool.get_connection()
             # Ensure connection is in a clean state
             if connection.is_connected():
@@ -91,8 +159,24 @@ class DatabaseConnectionManager:
                 finally:
                     connection.close()
 
-    def execute_query(self, query: str, params: Optional[tuple] = None, fetch_one: bool = False, fetch_all: bool = False):
-        """Execute query with automatic connection management"""
+    def execute_query(self, query: str, params: Optional[tuple] = None, fetch_one: bool = False,
+                      fetch_all: bool = False, cache_tables: Optional[tuple] = None):
+        """Execute query with automatic connection management.
+
+        Reads that pass cache_tables are served from the query cache until one
+        of those tables is written; writes bump the version of their table.
+        """
+        if cache_tables and (fetch_one or fetch_all):
+            return self._cached_fetch(
+                query, params, fetch_one, cache_tables,
+                lambda: self._run_query(query, params, fetch_one, fetch_all)
+            )
+
+        result = self._run_query(query, params, fetch_one, fetch_all)
+        self._note_write(query)
+        return result
+
+    def _run_query(self, query: str, params: Optional[tuple], fetch_one: bool, fetch_all: bool):
         with self.get_connection() as conn:
             cursor = conn.cursor(dictionary=True)
 
@@ -128,6 +212,7 @@ class DatabaseConnectionManager:
             try:
                 cursor.executemany(query, params_list)
                 conn.commit()
+                self._note_write(query)
                 return cursor.rowcount
             except Exception as e:
                 conn.rollback()
@@ -204,8 +289,12 @@ class DatabaseConnectionManager:
 _db_manager = None
 
 def get_db_manager() -> DatabaseConnectionManager:
-    """Get singleton database manager instance"""
+    """Get singleton database manager instance for the configured engine"""
     global _db_manager
     if _db_manager is None:
-        _db_manager = DatabaseConnectionManager()
+        if get_database_engine() == 'sqlite':
+            from models.database.sqlite_manager import SQLiteConnectionManager
+            _db_manager = SQLiteConnectionManager()
+        else:
+            _db_manager = DatabaseConnectionManager()
     return _db_manager
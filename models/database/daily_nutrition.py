@@ -0,0 +1,245 @@
+"""
+daily_nutrition rollup: pre-summed nutrition per (user, day, meal type).
+
+Dashboards and averages used to re-aggregate every Consumption row on each
+request. The rollup holds one row per day and meal type with kcal, macros,
+fiber and the number of logged items, recipe consumption included, so a day
+total is a handful of rows and a 30-day window a few hundred.
+
+It is maintained transactionally: every writer of Consumption,
+recipe_consumption, Recipe_Ingredients or Nutrition recomputes the affected
+days with refresh_days() on its own cursor, before it commits, so the rollup
+and the source rows can never disagree. rebuild() recomputes everything (see
+migrations/add_daily_nutrition_rollup.py and scripts/rebuild_daily_nutrition.py).
+
+rollup_ready() only caches a positive answer (see readiness.py), so every
+worker maintains the rollup from its first write after the table exists and
+the migration's single rebuild covers what was written before.
+
+Rows are keyed on the native entry_date (see native_dates.py); the rollup is
+only read and maintained once that backfill is complete. Nutrition logs are
+single-user today and use DEFAULT_USER; user_id is part of the key so the
+rollup does not need another migration once they get an owner.
+"""
+import logging
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+
+from models.database.index_advisor import table_columns
+from models.database.native_dates import native_date_reads
+from models.database.readiness import forget, ready
+from models.database.unit_conversion import amount, base_units_ready, nutrition_join
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_TABLE = 'daily_nutrition'
+DEFAULT_USER = ''
+NUTRIENTS = ('kcal', 'fat', 'carb', 'fiber', 'net_carb', 'protein')
+MEAL_TYPES = ('breakfast', 'lunch', 'dinner', 'snacks', 'other')
+
+# Source tables whose writes change the rollup
+SOURCE_TABLES = ('Consumption', 'recipe_consumption', 'Recipe', 'Recipe_Ingredients',
+                 'Ingredient_Quantity', 'Nutrition')
+
+CREATE_MYSQL = f'''
+    CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+        user_id VARCHAR(36) NOT NULL DEFAULT '',
+        day DATE NOT NULL,
+        meal_type VARCHAR(20) NOT NULL DEFAULT 'other',
+        kcal DOUBLE NOT NULL DEFAULT 0,
+        fat DOUBLE NOT NULL DEFAULT 0,
+        carb DOUBLE NOT NULL DEFAULT 0,
+        fiber DOUBLE NOT NULL DEFAULT 0,
+        net_carb DOUBLE NOT NULL DEFAULT 0,
+        protein DOUBLE NOT NULL DEFAULT 0,
+        items INT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (user_id, day, meal_type)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+'''
+
+CREATE_SQLITE = f'''
+    CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+        user_id TEXT NOT NULL DEFAULT '',
+        day DATE NOT NULL,
+        meal_type TEXT NOT NULL DEFAULT 'other',
+        kcal REAL NOT NULL DEFAULT 0,
+        fat REAL NOT NULL DEFAULT 0,
+        carb REAL NOT NULL DEFAULT 0,
+        fiber REAL NOT NULL DEFAULT 0,
+        net_carb REAL NOT NULL DEFAULT 0,
+        protein REAL NOT NULL DEFAULT 0,
+        items INTEGER NOT NULL DEFAULT 0,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (user_id, day, meal_type)
+    )
+'''
+
+
+def _source_query(condition: str = '', base_units: bool = False) -> str:
+    """Per (day, meal_type) sums over food and recipe consumption.
+
+    `condition` is appended to both branches and may reference `{day}`,
+    which is replaced by the branch's entry_date column.
+    """
+    food_sums = ', '.join(
+        f"COALESCE({amount(base_units)}*N.{n}*c.ingredient_quantity_portions, 0) {n}" for n in NUTRIENTS
+    )
+    recipe_sums = ', '.join(
+        f"COALESCE(SUM(N.{n}*{amount(base_units)}*rc.servings/r.servings), 0) {n}" for n in NUTRIENTS
+    )
+    totals = ', '.join(f"SUM(src.{n}) {n}" for n in NUTRIENTS)
+    return f'''
+        SELECT src.day, src.meal_type, {totals}, SUM(src.items) items
+        FROM (
+            SELECT c.entry_date day, COALESCE(c.meal_type, 'other') meal_type, {food_sums}, 1 items
+            FROM Consumption c
+            LEFT JOIN Ingredient_Quantity IQ ON IQ.ingredient_quantity_id = c.ingredient_quantity_id
+            {nutrition_join(base_units)}
+            WHERE c.entry_date IS NOT NULL {condition.format(day='c.entry_date')}
+            UNION ALL
+            SELECT rc.entry_date day, COALESCE(rc.meal_type, 'other') meal_type, {recipe_sums}, 1 items
+            FROM recipe_consumption rc
+            JOIN Recipe r ON r.recipe_id = rc.recipe_id
+            LEFT JOIN Recipe_Ingredients RI ON RI.recipe_id = r.recipe_id
+            LEFT JOIN Ingredient_Quantity IQ ON IQ.ingredient_quantity_id = RI.ingredient_quantity_id
+            {nutrition_join(base_units)}
+            WHERE rc.entry_date IS NOT NULL {condition.format(day='rc.entry_date')}
+            GROUP BY rc.recipe_consumption_id, rc.entry_date, rc.meal_type
+        ) src
+        GROUP BY src.day, src.meal_type
+    '''
+
+
+def _insert_statement(condition: str = '', base_units: bool = False) -> str:
+    columns = ', '.join(NUTRIENTS)
+    return (f"INSERT INTO {ROLLUP_TABLE} (user_id, day, meal_type, {columns}, items) "
+            f"SELECT %s, rollup.* FROM ({_source_query(condition, base_units)}) rollup")
+
+
+def create_table(manager):
+    manager.execute_query(CREATE_MYSQL if manager.use_mysql else CREATE_SQLITE)
+
+
+def rollup_ready(manager) -> bool:
+    """True when the rollup table exists and the native date backfill it is keyed on is done"""
+    if not (native_date_reads(manager, 'Consumption') and native_date_reads(manager, 'recipe_consumption')):
+        return False
+    return ready(manager, ROLLUP_TABLE, lambda: table_columns(manager, ROLLUP_TABLE))
+
+
+def reset_rollup_state(manager):
+    """Forget the cached readiness check (used by the migration)"""
+    forget(manager, ROLLUP_TABLE)
+
+
+def refresh_days(cursor, days: Iterable[Optional[date]], user_id: str = DEFAULT_USER, base_units: bool = False):
+    """Recompute the rollup rows of `days` on the caller's cursor (inside its transaction).
+
+    `base_units` tells whether Nutrition is stored per base unit (see unit_conversion.py).
+    """
+    days = sorted({d for d in days if d is not None})
+    if not days:
+        return
+    marks = ', '.join(['%s'] * len(days))
+    cursor.execute(f'DELETE FROM {ROLLUP_TABLE} WHERE user_id = %s AND day IN ({marks})', (user_id, *days))
+    cursor.execute(_insert_statement(f'AND {{day}} IN ({marks})', base_units), (user_id, *days, *days))
+
+
+def days_of_consumption(cursor, consumption_ids: Iterable[int]) -> List[date]:
+    ids = list(consumption_ids)
+    if not ids:
+        return []
+    marks = ', '.join(['%s'] * len(ids))
+    cursor.execute(f'SELECT DISTINCT entry_date FROM Consumption WHERE consumption_id IN ({marks})', tuple(ids))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def days_of_recipe_consumption(cursor, recipe_consumption_ids: Iterable[int]) -> List[date]:
+    ids = list(recipe_consumption_ids)
+    if not ids:
+        return []
+    marks = ', '.join(['%s'] * len(ids))
+    cursor.execute(f'SELECT DISTINCT entry_date FROM recipe_consumption '
+                   f'WHERE recipe_consumption_id IN ({marks})', tuple(ids))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def days_of_recipe(cursor, recipe_id) -> List[date]:
+    """Days on which the recipe was eaten (all of them change when the recipe does)"""
+    cursor.execute('SELECT DISTINCT entry_date FROM recipe_consumption WHERE recipe_id = %s', (recipe_id,))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _days_using(cursor, condition: str, params: tuple) -> List[date]:
+    """Days whose food or recipe consumption goes through Ingredient_Quantity rows matching `condition`"""
+    cursor.execute(f'''
+        SELECT c.entry_date FROM Consumption c
+        JOIN Ingredient_Quantity IQ ON IQ.ingredient_quantity_id = c.ingredient_quantity_id
+        WHERE {condition}
+        UNION
+        SELECT rc.entry_date FROM recipe_consumption rc
+        JOIN Recipe_Ingredients RI ON RI.recipe_id = rc.recipe_id
+        JOIN Ingredient_Quantity IQ ON IQ.ingredient_quantity_id = RI.ingredient_quantity_id
+        WHERE {condition}
+    ''', params + params)
+    return [row[0] for row in cursor.fetchall()]
+
+
+def days_of_nutrition(cursor, ingredient_id, unit_id=None) -> List[date]:
+    """Days using the ingredient's nutrition (one unit, or every unit when unit_id is None)"""
+    if unit_id is None:
+        return _days_using(cursor, 'IQ.ingredient_id = %s', (ingredient_id,))
+    return _days_using(cursor, 'IQ.ingredient_id = %s AND IQ.unit_id = %s', (ingredient_id, unit_id))
+
+
+def days_of_ingredient_quantity(cursor, ingredient_quantity_id) -> List[date]:
+    return _days_using(cursor, 'IQ.ingredient_quantity_id = %s', (ingredient_quantity_id,))
+
+
+def aggregate_days(manager) -> List[Dict]:
+    """The rollup rows as computed from the source tables right now (nothing is written)"""
+    return manager.execute_query(_source_query(base_units=base_units_ready(manager)), fetch_all=True) or []
+
+
+def rebuild(manager, user_id: str = DEFAULT_USER) -> int:
+    """Recompute the whole rollup in one transaction; returns the number of rows written"""
+    with manager.get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f'DELETE FROM {ROLLUP_TABLE} WHERE user_id = %s', (user_id,))
+            cursor.execute(_insert_statement(base_units=base_units_ready(manager)), (user_id,))
+            conn.commit()
+            cursor.execute(f'SELECT COUNT(*) FROM {ROLLUP_TABLE} WHERE user_id = %s', (user_id,))
+            count = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+    manager.touch(ROLLUP_TABLE)
+    return count
+
+
+def fetch_days(manager, start: date, end: date, user_id: str = DEFAULT_USER) -> List[Dict]:
+    """Day totals in [start, end] with per-meal-type splits, oldest first"""
+    rows = manager.execute_query(f'''
+        SELECT day, meal_type, {', '.join(NUTRIENTS)}, items
+        FROM {ROLLUP_TABLE}
+        WHERE user_id = %s AND day BETWEEN %s AND %s
+        ORDER BY day, meal_type
+    ''', (user_id, start, end), fetch_all=True, cache_tables=(ROLLUP_TABLE,)) or []
+    return group_days(rows)
+
+
+def group_days(rows: Iterable[Dict]) -> List[Dict]:
+    """Fold (day, meal_type) rows into one dict per day: totals plus a `meals` split"""
+    days: Dict[date, Dict] = {}
+    for row in rows:
+        day = days.get(row['day'])
+        if day is None:
+            day = days[row['day']] = dict({n: 0.0 for n in NUTRIENTS}, day=row['day'], items=0, meals={})
+        meal = {n: float(row[n] or 0) for n in NUTRIENTS}
+        meal['items'] = int(row['items'] or 0)
+        day['meals'][row['meal_type']] = meal
+        for n in NUTRIENTS:
+            day[n] += meal[n]
+        day['items'] += meal['items']
+    return [days[d] for d in sorted(days)]
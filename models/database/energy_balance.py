@@ -0,0 +1,132 @@
+"""
+energy_balance: the adaptive maintenance (TDEE) estimate, one row per day.
+
+Rows are appended by models/services/tdee.py as days end. Each holds the
+day's inputs (intake from the daily_nutrition rollup, active calories, trend
+weight) and the estimate after it, so a new day continues from the last
+WINDOW_DAYS rows instead of replaying the whole history.
+
+Writers that change an input of a past day call invalidate() with the days
+they touched: food and nutrition writers next to refresh_days() on their own
+cursor, weigh-ins, calorie entries and cycling workouts on their own. That
+day and every later one are dropped and recomputed on the next read, since
+each day's estimate carries the ones before it. Rows are per user; a write
+without an owner (the nutrition log, calorie entries, unowned weigh-ins)
+changes every user's inputs and drops every user's rows. Like the rollup, the table
+is only read and maintained once the rollup is (see rollup_ready), and a writer
+invalidates it from its first write after the table exists (see readiness.py).
+"""
+import logging
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+
+from models.database.daily_nutrition import DEFAULT_USER, ROLLUP_TABLE, rollup_ready
+from models.database.index_advisor import table_columns
+from models.database.native_dates import to_date
+from models.database.readiness import forget, ready
+
+logger = logging.getLogger(__name__)
+
+ENERGY_TABLE = 'energy_balance'
+# Inputs of a day, then the estimate after it
+COLUMNS = ('intake_kcal', 'active_kcal', 'trend_kg', 'maintenance_kcal', 'tdee_kcal', 'active_avg_kcal')
+# Days of inputs every estimate is taken over
+WINDOW_DAYS = 28
+# Tables a read depends on: invalidations made on a writer's cursor are published with the rollup's version
+READ_TABLES = (ENERGY_TABLE, ROLLUP_TABLE)
+
+CREATE_MYSQL = f'''
+    CREATE TABLE IF NOT EXISTS {ENERGY_TABLE} (
+        user_id VARCHAR(36) NOT NULL DEFAULT '',
+        day DATE NOT NULL,
+        intake_kcal DOUBLE NULL,
+        active_kcal DOUBLE NULL,
+        trend_kg DOUBLE NULL,
+        maintenance_kcal DOUBLE NULL,
+        tdee_kcal DOUBLE NULL,
+        active_avg_kcal DOUBLE NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (user_id, day)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+'''
+
+CREATE_SQLITE = f'''
+    CREATE TABLE IF NOT EXISTS {ENERGY_TABLE} (
+        user_id TEXT NOT NULL DEFAULT '',
+        day DATE NOT NULL,
+        intake_kcal REAL NULL,
+        active_kcal REAL NULL,
+        trend_kg REAL NULL,
+        maintenance_kcal REAL NULL,
+        tdee_kcal REAL NULL,
+        active_avg_kcal REAL NULL,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (user_id, day)
+    )
+'''
+
+
+def create_table(manager):
+    manager.execute_query(CREATE_MYSQL if manager.use_mysql else CREATE_SQLITE)
+
+
+def energy_ready(manager) -> bool:
+    """True when the energy_balance table exists and the rollup it reads intake from is ready"""
+    if not rollup_ready(manager):
+        return False
+    return ready(manager, ENERGY_TABLE, lambda: table_columns(manager, ENERGY_TABLE))
+
+
+def reset_energy_state(manager):
+    """Forget the cached readiness check (used by the migration)"""
+    forget(manager, ENERGY_TABLE)
+
+
+def invalidate(manager, days: Iterable[Optional[date]], cursor=None, user_id: Optional[str] = None,
+               ready: Optional[bool] = None):
+    """Drop the estimates from the earliest of `days` on (on the caller's cursor, inside its transaction, if given).
+
+    Only `user_id`'s rows go when the changed input has an owner; None (or
+    DEFAULT_USER) drops every user's. `ready` is energy_ready() as resolved
+    by a caller before its transaction opened.
+    """
+    days = [d for d in days if d is not None]
+    if not days or not (energy_ready(manager) if ready is None else ready):
+        return
+    if user_id in (None, DEFAULT_USER):
+        query, params = f'DELETE FROM {ENERGY_TABLE} WHERE day >= %s', (min(days),)
+    else:
+        query, params = f'DELETE FROM {ENERGY_TABLE} WHERE user_id = %s AND day >= %s', (user_id, min(days))
+    if cursor is not None:
+        cursor.execute(query, params)
+    else:
+        manager.execute_query(query, params)
+
+
+def last_day(manager, user_id: str = DEFAULT_USER) -> Optional[date]:
+    row = manager.execute_query(f'SELECT MAX(day) AS day FROM {ENERGY_TABLE} WHERE user_id = %s', (user_id,),
+                                fetch_one=True, cache_tables=READ_TABLES)
+    # MAX() loses the column type on SQLite
+    return to_date(row['day']) if row else None
+
+
+def fetch_rows(manager, start: date, end: date, user_id: str = DEFAULT_USER) -> List[Dict]:
+    """Stored days in [start, end], oldest first"""
+    return manager.execute_query(f'''
+        SELECT day, {', '.join(COLUMNS)}
+        FROM {ENERGY_TABLE}
+        WHERE user_id = %s AND day BETWEEN %s AND %s
+        ORDER BY day
+    ''', (user_id, start, end), fetch_all=True, cache_tables=READ_TABLES) or []
+
+
+def store_rows(manager, rows: List[Dict], user_id: str = DEFAULT_USER):
+    """Write computed days (a concurrent refresh of the same days writes the same values)"""
+    if not rows:
+        return
+    updates = ', '.join(f'{column} = VALUES({column})' for column in COLUMNS)
+    manager.execute_many(f'''
+        INSERT INTO {ENERGY_TABLE} (user_id, day, {', '.join(COLUMNS)})
+        VALUES ({', '.join(['%s'] * (len(COLUMNS) + 2))})
+        ON DUPLICATE KEY UPDATE {updates}
+    ''', [(user_id, row['day'], *(row[column] for column in COLUMNS)) for row in rows])
@@ -0,0 +1,311 @@
+"""
+Food catalog cache shared by every worker through a change log.
+
+The catalog is every Ingredient_Quantity row joined with its ingredient,
+unit, nutrition and favorite flag. Each worker process keeps one copy in
+memory (FoodCatalog) instead of one per FoodService with a TTL.
+
+Workers stay in sync through the catalog_changes table: every writer of
+Ingredient_Quantity, Nutrition or Favorites appends the ingredient or
+ingredient quantity it changed with record_change(), inside its own
+transaction. On each read a worker fetches the log entries it has not
+applied yet (one primary-key range scan) and re-reads only the affected
+rows; it reloads everything only on first use, after a long absence
+(more than MAX_PATCH pending changes), when the log was pruned past it or
+after a bulk import logged a full reload with record_reload().
+
+Until migrations/add_catalog_changes.py has run, the catalog falls back to
+the query cache, which invalidates the whole catalog on writes (across
+workers through QUERY_CACHE_SHARED_PATH).
+"""
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from models.database.index_advisor import table_columns
+from models.database.readiness import forget, ready
+from models.database.unit_conversion import amount, base_units_ready, nutrition_join
+
+logger = logging.getLogger(__name__)
+
+CHANGES_TABLE = 'catalog_changes'
+
+# Tables the catalog rows are read from
+CATALOG_TABLES = ('Ingredient_Quantity', 'Ingredient', 'Unit', 'Nutrition', 'Favorites')
+
+# Log entries kept after pruning; workers further behind reload in full
+KEEP_CHANGES = 5000
+# Pending changes above which a full reload is cheaper than patching
+MAX_PATCH = 500
+# Ids below the last applied one that are re-read, for transactions that took
+# an id earlier but committed later
+OVERLAP = 100
+
+
+CREATE_MYSQL = f'''
+    CREATE TABLE IF NOT EXISTS {CHANGES_TABLE} (
+        change_id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        ingredient_id INT NULL,
+        ingredient_quantity_id INT NULL,
+        changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+'''
+
+CREATE_SQLITE = f'''
+    CREATE TABLE IF NOT EXISTS {CHANGES_TABLE} (
+        change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ingredient_id INTEGER NULL,
+        ingredient_quantity_id INTEGER NULL,
+        changed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+CATALOG_QUERY = """
+    SELECT
+        iq.ingredient_quantity_id as id,
+        iq.quantity as qty,
+        U.unit_name as unit,
+        I.ingredient_name as ingredient,
+        ROUND({amount} * N.kcal, 2) as kcal,
+        ROUND({amount} * N.fat, 2) as fat,
+        ROUND({amount} * N.carb, 2) as carb,
+        ROUND({amount} * N.fiber, 2) as fiber,
+        ROUND({amount} * N.net_carb, 2) as net_carb,
+        ROUND({amount} * N.protein, 2) as protein,
+        I.ingredient_id,
+        CASE WHEN F.ingredient_id IS NOT NULL THEN 1 ELSE 0 END as is_favorite
+    FROM Ingredient_Quantity iq
+    LEFT JOIN Ingredient I ON I.ingredient_id = iq.ingredient_id
+    LEFT JOIN Unit U ON U.unit_id = iq.unit_id
+    {nutrition_join}
+    LEFT JOIN Favorites F ON I.ingredient_id = F.ingredient_id
+    {where}
+    ORDER BY iq.ingredient_quantity_id DESC
+"""
+
+CATALOG_COUNT_QUERY = """
+    SELECT COUNT(*) as total
+    FROM Ingredient_Quantity iq
+    LEFT JOIN Ingredient I ON I.ingredient_id = iq.ingredient_id
+    LEFT JOIN Unit U ON U.unit_id = iq.unit_id
+    {nutrition_join}
+    LEFT JOIN Favorites F ON I.ingredient_id = F.ingredient_id
+    {where}
+"""
+
+
+def catalog_query(query: str, where: str = '', base_units: bool = False) -> str:
+    """CATALOG_QUERY or CATALOG_COUNT_QUERY for `where`, Nutrition joined per unit or per base unit"""
+    return query.format(where=where, amount=amount(base_units, 'iq'), nutrition_join=nutrition_join(base_units, 'iq'))
+
+
+def food_from_row(row) -> Dict:
+    """Catalog dict of one CATALOG_QUERY tuple"""
+    return {
+        "id": row[0],
+        "qty": row[1] or 0,
+        "unit": row[2] or "",
+        "ingredient": row[3] or "",
+        "kcal": row[4] or 0,
+        "fat": row[5] or 0,
+        "carb": row[6] or 0,
+        "fiber": row[7] or 0,
+        "net_carb": row[8] or 0,
+        "protein": row[9] or 0,
+        "ingredient_id": row[10],
+        "is_favorite": bool(row[11])
+    }
+
+
+def fetch_foods(cursor, where: str = '', params: tuple = (), limit: Optional[int] = None,
+                base_units: bool = False) -> List[Dict]:
+    """Catalog rows matching `where` (all of them by default), newest first"""
+    query = catalog_query(CATALOG_QUERY, where, base_units)
+    if limit is not None:
+        query += ' LIMIT %s'
+        params = (*params, limit)
+    cursor.execute(query, params)
+    return [food_from_row(row) for row in cursor.fetchall()]
+
+
+def create_table(manager):
+    manager.execute_query(CREATE_MYSQL if manager.use_mysql else CREATE_SQLITE)
+
+
+def changes_ready(manager) -> bool:
+    """True once the catalog_changes table exists"""
+    return ready(manager, CHANGES_TABLE, lambda: table_columns(manager, CHANGES_TABLE))
+
+
+def reset_changes_state(manager):
+    """Forget the cached readiness check and the worker's catalog (used by the migration)"""
+    forget(manager, CHANGES_TABLE)
+    manager._food_catalog = None
+
+
+def record_change(cursor, ingredient_id=None, ingredient_quantity_id=None):
+    """Log a catalog change on the caller's cursor (inside its transaction).
+
+    `ingredient_id` re-reads every quantity of the ingredient (nutrition,
+    favorites, deletion); `ingredient_quantity_id` only that row.
+    """
+    if ingredient_id is None and ingredient_quantity_id is None:
+        return
+    cursor.execute(f'INSERT INTO {CHANGES_TABLE} (ingredient_id, ingredient_quantity_id) VALUES (%s, %s)',
+                   (ingredient_id, ingredient_quantity_id))
+    change_id = cursor.lastrowid
+    if change_id and change_id % KEEP_CHANGES == 0:
+        cursor.execute(f'DELETE FROM {CHANGES_TABLE} WHERE change_id <= %s', (change_id - KEEP_CHANGES,))
+
+
+def record_reload(cursor):
+    """Log a change that makes every worker reload the whole catalog (bulk imports)"""
+    cursor.execute(f'INSERT INTO {CHANGES_TABLE} (ingredient_id, ingredient_quantity_id) VALUES (NULL, NULL)')
+
+
+class FoodCatalog:
+    """One worker's copy of the food catalog, patched from catalog_changes"""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self._rows: Dict[int, Dict] = {}
+        self._foods: Optional[List[Dict]] = None
+        self._last_change = 0
+        self._applied = set()
+        self._lock = threading.Lock()
+        self._listeners = []
+        self.full_loads = 0
+        self.patches = 0
+        self.patched_rows = 0
+
+    def foods(self) -> List[Dict]:
+        """Every catalog row, newest first (shared; callers must not modify the dicts)"""
+        if not changes_ready(self.manager):
+            return self.manager.cached_value(('food_catalog',), CATALOG_TABLES, self._load_without_log)
+
+        with self._lock:
+            with self.manager.get_connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    self._sync(cursor)
+                finally:
+                    cursor.close()
+            return self._foods
+
+    def subscribe(self, listener):
+        """Call `listener(removed_ids, foods)` after every reload or patch.
+
+        On a reload `removed_ids` is None and `foods` is the whole catalog;
+        on a patch they are the ids dropped and the rows re-read. Listeners
+        run under the catalog lock and must not read the catalog themselves.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, removed_ids, foods):
+        for listener in self._listeners:
+            try:
+                listener(removed_ids, foods)
+            except Exception as e:
+                logger.error(f"Food catalog listener failed: {e}")
+
+    def invalidate(self):
+        """Drop this worker's copy; the next read reloads it"""
+        with self._lock:
+            self._foods = None
+            self._rows = {}
+
+    def stats(self) -> Dict:
+        return {
+            'rows': len(self._rows),
+            'last_change': self._last_change,
+            'full_loads': self.full_loads,
+            'patches': self.patches,
+            'patched_rows': self.patched_rows
+        }
+
+    def _load_without_log(self) -> List[Dict]:
+        with self.manager.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                return fetch_foods(cursor, base_units=base_units_ready(self.manager))
+            finally:
+                cursor.close()
+
+    def _sync(self, cursor):
+        if self._foods is None:
+            self._load(cursor)
+            return
+
+        cursor.execute(f'''
+            SELECT change_id, ingredient_id, ingredient_quantity_id FROM {CHANGES_TABLE}
+            WHERE change_id > %s ORDER BY change_id LIMIT %s
+        ''', (max(self._last_change - OVERLAP, 0), OVERLAP + MAX_PATCH + 1))
+        changes = [change for change in cursor.fetchall() if change[0] not in self._applied]
+        if not changes:
+            return
+
+        reload = any(change[1] is None and change[2] is None for change in changes)
+        if reload or len(changes) > MAX_PATCH or self._pruned_past(cursor):
+            self._load(cursor)
+            return
+
+        self._patch(cursor, {c[1] for c in changes if c[1] is not None},
+                    {c[2] for c in changes if c[2] is not None})
+        self._mark_applied(change[0] for change in changes)
+
+    def _pruned_past(self, cursor) -> bool:
+        """True when entries this worker never saw were pruned from the log"""
+        cursor.execute(f'SELECT MIN(change_id) FROM {CHANGES_TABLE}')
+        oldest = cursor.fetchone()[0]
+        return oldest is not None and oldest > self._last_change + 1
+
+    def _load(self, cursor):
+        # Read the log position first: changes committed during the load are re-applied, never lost
+        cursor.execute(f'SELECT COALESCE(MAX(change_id), 0) FROM {CHANGES_TABLE}')
+        last_change = cursor.fetchone()[0]
+        foods = fetch_foods(cursor, base_units=base_units_ready(self.manager))
+        self._rows = {food['id']: food for food in foods}
+        self._foods = foods
+        self._last_change = last_change
+        self._applied = set()
+        self.full_loads += 1
+        self._notify(None, foods)
+
+    def _patch(self, cursor, ingredient_ids, quantity_ids):
+        """Re-read the rows of the changed ingredients and ingredient quantities"""
+        removed = {
+            iq_id for iq_id, food in self._rows.items()
+            if iq_id in quantity_ids or food['ingredient_id'] in ingredient_ids
+        }
+        self._rows = {iq_id: food for iq_id, food in self._rows.items() if iq_id not in removed}
+        conditions, params = [], []
+        if ingredient_ids:
+            conditions.append(f"iq.ingredient_id IN ({', '.join(['%s'] * len(ingredient_ids))})")
+            params.extend(sorted(ingredient_ids))
+        if quantity_ids:
+            conditions.append(f"iq.ingredient_quantity_id IN ({', '.join(['%s'] * len(quantity_ids))})")
+            params.extend(sorted(quantity_ids))
+        fresh = fetch_foods(cursor, 'WHERE ' + ' OR '.join(conditions), tuple(params),
+                            base_units=base_units_ready(self.manager))
+        for food in fresh:
+            self._rows[food['id']] = food
+
+        # Publish a new list; readers holding the previous one keep a consistent snapshot
+        self._foods = [self._rows[iq_id] for iq_id in sorted(self._rows, reverse=True)]
+        self.patches += 1
+        self.patched_rows += len(fresh)
+        self._notify(removed, fresh)
+
+    def _mark_applied(self, change_ids: Iterable[int]):
+        self._applied.update(change_ids)
+        self._last_change = max(self._applied)
+        floor = self._last_change - OVERLAP
+        self._applied = {change_id for change_id in self._applied if change_id > floor}
+
+
+def get_catalog(manager) -> FoodCatalog:
+    """The worker-wide catalog of `manager`"""
+    catalog = getattr(manager, '_food_catalog', None)
+    if catalog is None:
+        catalog = manager._food_catalog = FoodCatalog(manager)
+    return catalog
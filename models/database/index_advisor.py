@@ -0,0 +1,510 @@
+"""
+Composite index advisor.
+
+Collects the statements a running instance actually executes, EXPLAINs each
+one, and flags full table scans and filesorts. For every flagged statement it
+derives the composite index the access path needs (equality columns first,
+then the range or ORDER BY columns, optionally the selected columns to make it
+covering), drops suggestions an existing index already serves, and can render
+an idempotent migration for the rest.
+
+Works against both engines: MySQL statements come from
+performance_schema.events_statements_summary_by_digest, SQLite plans from
+EXPLAIN QUERY PLAN. Statements can also be loaded from a file.
+"""
+import re
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Columns that identify the owner of a row go first so per-user scans stay narrow
+_LEADING_COLUMNS = ('user_id',)
+_MAX_COVERING_COLUMNS = 5
+_KEYWORDS = {
+    'where', 'join', 'left', 'right', 'inner', 'outer', 'cross', 'on', 'group',
+    'order', 'limit', 'having', 'union', 'straight_join', 'natural', 'using', 'set'
+}
+
+
+@dataclass
+class Statement:
+    """A statement fingerprint with one executable sample"""
+    fingerprint: str
+    sample: str
+    count: int = 1
+    avg_ms: float = 0.0
+
+
+@dataclass
+class IndexSuggestion:
+    table: str
+    columns: Tuple[str, ...]
+
+    @property
+    def name(self) -> str:
+        return f"idx_{self.table}_{'_'.join(self.columns)}"[:64].lower()
+
+    def as_tuple(self) -> Tuple[str, str, Tuple[str, ...]]:
+        return self.table, self.name, self.columns
+
+
+@dataclass
+class Finding:
+    statement: Statement
+    problems: List[str] = field(default_factory=list)
+    plan: List[Dict] = field(default_factory=list)
+    suggestion: Optional[IndexSuggestion] = None
+    covered_by: Optional[str] = None
+    error: Optional[str] = None
+
+
+# ============== Fingerprints ==============
+
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+
+
+def fingerprint(sql: str) -> str:
+    """Normalize literals and whitespace so equivalent statements collapse"""
+    text = _STRING_RE.sub('?', sql)
+    text = _NUMBER_RE.sub('?', text)
+    text = text.replace('%s', '?')
+    text = _IN_LIST_RE.sub('(?+)', text)
+    return ' '.join(text.split()).lower()
+
+
+def collect_fingerprints(manager, limit: int = 200, min_count: int = 1) -> List[Statement]:
+    """Top statement digests of the current MySQL schema, with a runnable sample each"""
+    if not manager.use_mysql:
+        raise ValueError("Statement digests are only available on MySQL; load statements from a file instead")
+
+    rows = manager.execute_query('''
+        SELECT DIGEST_TEXT AS digest, QUERY_SAMPLE_TEXT AS sample,
+               COUNT_STAR AS calls, AVG_TIMER_WAIT / 1000000000 AS avg_ms
+        FROM performance_schema.events_statements_summary_by_digest
+        WHERE SCHEMA_NAME = DATABASE()
+          AND COUNT_STAR >= %s
+          AND QUERY_SAMPLE_TEXT IS NOT NULL
+          AND (DIGEST_TEXT LIKE 'SELECT%%' OR DIGEST_TEXT LIKE 'UPDATE%%' OR DIGEST_TEXT LIKE 'DELETE%%')
+        ORDER BY SUM_TIMER_WAIT DESC
+        LIMIT %s
+    ''', (min_count, limit), fetch_all=True) or []
+
+    statements = []
+    for row in rows:
+        sample = row['sample']
+        # Samples longer than performance_schema_max_sql_text_length are truncated
+        if not sample or sample.rstrip().endswith('...'):
+            continue
+        statements.append(Statement(
+            fingerprint=fingerprint(sample),
+            sample=sample,
+            count=int(row['calls'] or 0),
+            avg_ms=round(float(row['avg_ms'] or 0), 3)
+        ))
+    return statements
+
+
+def load_statements(path: str) -> List[Statement]:
+    """Read ';'-separated statements from a file, merging identical fingerprints"""
+    with open(path) as handle:
+        text = handle.read()
+
+    merged: Dict[str, Statement] = {}
+    for raw in text.split(';'):
+        sql = '\n'.join(line for line in raw.splitlines() if not line.strip().startswith('--')).strip()
+        if not sql:
+            continue
+        key = fingerprint(sql)
+        if key in merged:
+            merged[key].count += 1
+        else:
+            merged[key] = Statement(fingerprint=key, sample=sql)
+    return list(merged.values())
+
+
+# ============== Plans ==============
+
+def explain(manager, sql: str) -> Tuple[List[Dict], List[str]]:
+    """Run EXPLAIN for `sql` and return (plan rows, problems found)"""
+    problems = []
+    if manager.use_mysql:
+        plan = manager.execute_query(f'EXPLAIN {sql}', fetch_all=True) or []
+        for row in plan:
+            extra = row.get('Extra') or ''
+            if row.get('type') == 'ALL' and row.get('table') and not row['table'].startswith('<'):
+                problems.append(f"full_scan:{row['table']}")
+            if 'Using filesort' in extra:
+                problems.append(f"filesort:{row.get('table')}")
+            if 'Using temporary' in extra:
+                problems.append(f"temporary:{row.get('table')}")
+    else:
+        plan = manager.execute_query(f'EXPLAIN QUERY PLAN {sql}', fetch_all=True) or []
+        for row in plan:
+            detail = row.get('detail') or ''
+            scan = re.match(r'SCAN (?:TABLE )?(\w+)', detail)
+            if scan and 'INDEX' not in detail:
+                problems.append(f"full_scan:{scan.group(1)}")
+            if 'TEMP B-TREE FOR ORDER BY' in detail:
+                problems.append('filesort')
+            if 'TEMP B-TREE FOR GROUP BY' in detail or 'TEMP B-TREE FOR DISTINCT' in detail:
+                problems.append('temporary')
+    return plan, problems
+
+
+# ============== Schema ==============
+
+def table_columns(manager, table: str) -> List[str]:
+    if manager.use_mysql:
+        rows = manager.execute_query('''
+            SELECT COLUMN_NAME AS name FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+            ORDER BY ORDINAL_POSITION
+        ''', (table,), fetch_all=True) or []
+    else:
+        rows = manager.execute_query(f'PRAGMA table_info("{table}")', fetch_all=True) or []
+    return [row['name'] for row in rows]
+
+
+def existing_indexes(manager, table: str) -> Dict[str, Tuple[str, ...]]:
+    """Index name -> ordered column tuple (primary key included on MySQL)"""
+    indexes: Dict[str, List[str]] = {}
+    if manager.use_mysql:
+        rows = manager.execute_query('''
+            SELECT INDEX_NAME AS index_name, COLUMN_NAME AS column_name
+            FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+            ORDER BY INDEX_NAME, SEQ_IN_INDEX
+        ''', (table,), fetch_all=True) or []
+        for row in rows:
+            indexes.setdefault(row['index_name'], []).append(row['column_name'])
+    else:
+        for index in manager.execute_query(f'PRAGMA index_list("{table}")', fetch_all=True) or []:
+            info = manager.execute_query(f'PRAGMA index_info("{index["name"]}")', fetch_all=True) or []
+            indexes[index['name']] = [col['name'] for col in sorted(info, key=lambda c: c['seqno'])]
+    return {name: tuple(cols) for name, cols in indexes.items()}
+
+
+def index_covers(existing: Sequence[str], wanted: Sequence[str]) -> bool:
+    """True when `wanted` is a leftmost prefix of an existing index"""
+    wanted = [c.lower() for c in wanted]
+    return [c.lower() for c in existing[:len(wanted)]] == wanted
+
+
+def unique_indexes(manager, table: str) -> List[str]:
+    if manager.use_mysql:
+        rows = manager.execute_query('''
+            SELECT DISTINCT INDEX_NAME AS name FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND NON_UNIQUE = 0
+        ''', (table,), fetch_all=True) or []
+    else:
+        rows = [r for r in manager.execute_query(f'PRAGMA index_list("{table}")', fetch_all=True) or [] if r['unique']]
+    return [row['name'] for row in rows]
+
+
+def redundant_indexes(indexes: Dict[str, Tuple[str, ...]], unique: Sequence[str] = ()) -> List[Tuple[str, str]]:
+    """(redundant, kept) pairs where one index is a leftmost prefix of another.
+
+    Unique indexes enforce a constraint and are never reported.
+    """
+    pairs = []
+    for name, cols in indexes.items():
+        if name == 'PRIMARY' or name in unique:
+            continue
+        for other, other_cols in indexes.items():
+            if other != name and len(other_cols) >= len(cols) and index_covers(other_cols, cols):
+                if len(other_cols) == len(cols) and other not in unique and other > name:
+                    continue
+                pairs.append((name, other))
+                break
+    return pairs
+
+
+# ============== Suggestions ==============
+
+def _split_top_level(text: str, separator: str) -> List[str]:
+    parts, depth, current = [], 0, []
+    pattern = rf'\b{separator}\b' if separator.isalpha() else re.escape(separator)
+    tokens = re.split(rf'(\(|\)|{pattern})', text, flags=re.IGNORECASE)
+    for token in tokens:
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        if depth == 0 and token.upper() == separator.upper():
+            parts.append(''.join(current))
+            current = []
+        else:
+            current.append(token)
+    parts.append(''.join(current))
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _clause(sql: str, start: str, stops: Sequence[str]) -> str:
+    match = re.search(rf'\b{start}\b(.*)', sql, re.IGNORECASE | re.DOTALL)
+    if not match:
+        return ''
+    body = match.group(1)
+    stop = re.search(r'\b(' + '|'.join(stops) + r')\b', body, re.IGNORECASE)
+    return body[:stop.start()] if stop else body
+
+
+def _own_column(expression: str, alias: str, single_table: bool) -> Optional[str]:
+    match = re.fullmatch(r'`?(?:(\w+)`?\.`?)?(\w+)`?', expression.strip())
+    if not match:
+        return None
+    qualifier, column = match.groups()
+    if qualifier is None and not single_table:
+        return None
+    if qualifier is not None and qualifier.lower() != alias.lower():
+        return None
+    return column
+
+
+def suggest_index(sql: str, table: Optional[str] = None) -> Optional[IndexSuggestion]:
+    """Derive the composite index that serves the WHERE/ORDER BY of `sql`.
+
+    Only the driving table is considered (`table`, or the first FROM table).
+    """
+    flat = ' '.join(_STRING_RE.sub('?', sql).split())
+    sources = re.findall(r'\b(?:FROM|JOIN|UPDATE)\s+`?(\w+)`?(?:\s+(?:AS\s+)?(\w+))?', flat, re.IGNORECASE)
+    if not sources:
+        return None
+
+    alias = None
+    for name, candidate in sources:
+        if table is None or table.lower() in (name.lower(), (candidate or '').lower()):
+            table = name
+            alias = candidate if candidate and candidate.lower() not in _KEYWORDS else name
+            break
+    if alias is None:
+        return None
+    single_table = len(sources) == 1
+
+    equality, ranges = [], []
+    where = _clause(flat, 'WHERE', ('GROUP BY', 'ORDER BY', 'LIMIT', 'HAVING', 'FOR UPDATE'))
+    if re.search(r'\bOR\b', where, re.IGNORECASE):
+        # Disjunctions need index merges or rewrites, not a composite index
+        where = ''
+    for predicate in _split_top_level(where, 'AND'):
+        match = re.match(r'([\w.`]+)\s*(=|<=>|\bIN\b|>=|<=|<>|!=|>|<|\bBETWEEN\b|\bLIKE\b)', predicate, re.IGNORECASE)
+        if not match:
+            continue
+        column = _own_column(match.group(1), alias, single_table)
+        if not column:
+            continue
+        operator = match.group(2).upper()
+        if operator in ('=', '<=>', 'IN'):
+            if column not in equality:
+                equality.append(column)
+        elif operator in ('>=', '<=', '>', '<', 'BETWEEN') or (operator == 'LIKE' and "'%" not in predicate):
+            if column not in ranges:
+                ranges.append(column)
+
+    # Join keys of the driving table act as equalities on the inner side of a nested loop
+    for condition in re.findall(r'\bON\s+(.+?)(?=\b(?:LEFT|RIGHT|INNER|CROSS|JOIN|WHERE|GROUP|ORDER|LIMIT)\b|$)',
+                                flat, re.IGNORECASE):
+        for predicate in _split_top_level(condition, 'AND'):
+            sides = [side.strip() for side in predicate.split('=')]
+            for side in sides if len(sides) == 2 else []:
+                column = _own_column(side, alias, False)
+                if column and column.lower() != 'id' and column not in equality:
+                    equality.append(column)
+
+    order = []
+    for term in _split_top_level(_clause(flat, 'ORDER BY', ('LIMIT', 'FOR UPDATE')), ','):
+        column = _own_column(re.sub(r'\s+(ASC|DESC)$', '', term, flags=re.IGNORECASE), alias, single_table)
+        if column is None:
+            order = []
+            break
+        if column not in order:
+            order.append(column)
+
+    columns = sorted(equality, key=lambda c: c.lower() not in _LEADING_COLUMNS)
+    if ranges:
+        columns.append(ranges[0])
+        # ORDER BY still rides the index when it continues on the range column
+        if order and order[0] == ranges[0]:
+            columns.extend(c for c in order[1:] if c not in columns)
+    else:
+        columns.extend(c for c in order if c not in columns)
+
+    if not columns:
+        return None
+
+    select = _clause(flat, 'SELECT', ('FROM',))
+    if select and '*' not in select:
+        selected = []
+        for term in _split_top_level(select, ','):
+            term = re.sub(r'\s+(?:AS\s+)?\w+$', '', term, flags=re.IGNORECASE) if ' ' in term.strip() else term
+            column = _own_column(term, alias, single_table)
+            if column is None:
+                selected = None
+                break
+            if column not in columns and column not in selected:
+                selected.append(column)
+        if selected is not None and len(columns) + len(selected) <= _MAX_COVERING_COLUMNS:
+            columns.extend(selected)
+
+    return IndexSuggestion(table=table, columns=tuple(columns))
+
+
+# ============== Advisor ==============
+
+def analyze(manager, statements: Sequence[Statement]) -> List[Finding]:
+    """EXPLAIN every statement and attach an index suggestion to the slow ones"""
+    findings = []
+    schema_cache: Dict[str, Tuple[List[str], Dict[str, Tuple[str, ...]]]] = {}
+
+    for statement in statements:
+        finding = Finding(statement=statement)
+        try:
+            finding.plan, finding.problems = explain(manager, statement.sample)
+        except Exception as e:
+            finding.error = str(e)
+            findings.append(finding)
+            continue
+
+        if finding.problems:
+            scanned = next((p.split(':', 1)[1] for p in finding.problems if p.startswith('full_scan:')), None)
+            suggestion = suggest_index(statement.sample, scanned)
+            if suggestion:
+                if suggestion.table not in schema_cache:
+                    schema_cache[suggestion.table] = (
+                        table_columns(manager, suggestion.table),
+                        existing_indexes(manager, suggestion.table)
+                    )
+                columns, indexes = schema_cache[suggestion.table]
+                known = {c.lower() for c in columns}
+                suggestion.columns = tuple(c for c in suggestion.columns if c.lower() in known)
+                if suggestion.columns:
+                    finding.covered_by = next(
+                        (name for name, cols in indexes.items() if index_covers(cols, suggestion.columns)), None
+                    )
+                    finding.suggestion = suggestion
+        findings.append(finding)
+    return findings
+
+
+def missing_indexes(findings: Sequence[Finding]) -> List[Tuple[str, str, Tuple[str, ...]]]:
+    """Distinct suggestions not served by an existing index, longest first per table"""
+    wanted: List[IndexSuggestion] = []
+    for finding in findings:
+        suggestion = finding.suggestion
+        if suggestion is None or finding.covered_by:
+            continue
+        if any(s.table == suggestion.table and index_covers(s.columns, suggestion.columns) for s in wanted):
+            continue
+        wanted = [s for s in wanted if not (s.table == suggestion.table and index_covers(suggestion.columns, s.columns))]
+        wanted.append(suggestion)
+    return [s.as_tuple() for s in sorted(wanted, key=lambda s: (s.table, s.columns))]
+
+
+_MIGRATION_TEMPLATE = '''"""
+Migration: {title}
+
+Generated by scripts/index_advisor.py from {source}.
+Each index is only created when its table and columns exist and no existing
+index already starts with the same columns.
+
+Run: python migrations/{module}.py
+"""
+import os
+import sys
+import logging
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from models.database.connection_manager import get_db_manager
+from models.database.index_advisor import apply_indexes, drop_indexes
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# (table, index name, columns)
+INDEXES = [
+{entries}
+]
+
+
+def run_migration() -> bool:
+    """Create the missing composite indexes"""
+    try:
+        logger.info("Starting migration: {title}")
+        created = apply_indexes(get_db_manager(), INDEXES)
+        logger.info(f"✓ Created {{created}} index(es)")
+        return True
+    except Exception as e:
+        logger.error(f"Migration failed: {{e}}")
+        return False
+
+
+def rollback_migration() -> bool:
+    """Drop the indexes created by this migration"""
+    try:
+        drop_indexes(get_db_manager(), INDEXES)
+        logger.info("✓ Rollback completed")
+        return True
+    except Exception as e:
+        logger.error(f"Rollback failed: {{e}}")
+        return False
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "rollback":
+        success = rollback_migration()
+    else:
+        success = run_migration()
+    sys.exit(0 if success else 1)
+'''
+
+
+def render_migration(indexes: Sequence[Tuple[str, str, Tuple[str, ...]]], module: str,
+                     title: str = 'Add composite indexes for hot access paths',
+                     source: str = 'EXPLAIN analysis') -> str:
+    entries = '\n'.join(f"    ({table!r}, {name!r}, {tuple(columns)!r})," for table, name, columns in indexes)
+    return _MIGRATION_TEMPLATE.format(title=title, source=source, module=module, entries=entries)
+
+
+def apply_indexes(manager, indexes: Sequence[Tuple[str, str, Tuple[str, ...]]]) -> int:
+    """Create each index unless its table or columns are missing or it is already served"""
+    created = 0
+    for table, name, columns in indexes:
+        present = {c.lower() for c in table_columns(manager, table)}
+        if not present:
+            logger.info(f"Table {table} does not exist, skipping {name}")
+            continue
+        if any(c.lower() not in present for c in columns):
+            logger.info(f"Table {table} lacks one of {columns}, skipping {name}")
+            continue
+
+        current = existing_indexes(manager, table)
+        served_by = next((n for n, cols in current.items() if index_covers(cols, columns)), None)
+        if served_by:
+            logger.info(f"{table}{columns} already served by {served_by}")
+            continue
+
+        column_list = ', '.join(f'`{c}`' if manager.use_mysql else f'"{c}"' for c in columns)
+        if manager.use_mysql:
+            # ALGORITHM=INPLACE, LOCK=NONE keeps the table writable while the index builds
+            manager.execute_query(f'ALTER TABLE `{table}` ADD INDEX `{name}` ({column_list}), ALGORITHM=INPLACE, LOCK=NONE')
+        else:
+            manager.execute_query(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({column_list})')
+        logger.info(f"✓ Created {name} on {table}{columns}")
+        created += 1
+    return created
+
+
+def drop_indexes(manager, indexes: Sequence[Tuple[str, str, Tuple[str, ...]]]) -> int:
+    dropped = 0
+    for table, name, _columns in indexes:
+        if name not in existing_indexes(manager, table):
+            continue
+        if manager.use_mysql:
+            manager.execute_query(f'ALTER TABLE `{table}` DROP INDEX `{name}`')
+        else:
+            manager.execute_query(f'DROP INDEX IF EXISTS "{name}"')
+        dropped += 1
+    return dropped
@@ -0,0 +1,379 @@
+"""
+Canonical ingredient keys and merging of duplicate ingredients.
+
+Ingredients were matched on their exact name, so AI output created near
+duplicates (" banana", "Banana", "bananas", "banana (large)") with their
+own quantities and nutrition rows, inflating the catalog and its search.
+
+canonical_key() reduces a name to accent-free, lowercase, singular words
+in sorted order, without articles or a parenthesized size ("banana (large)"
+-> "banana", "Peanut Butter" == "butter, peanut"). Once
+migrations/add_ingredient_canonical_key.py has added and backfilled
+Ingredient.canonical_key, every ingest path resolves ingredient names by
+that key (ingredient_ingest.resolve_ingredients()), so no new duplicate of
+a key is created.
+
+find_duplicates() clusters the existing catalog: names with the same key,
+plus near-identical keys (typos) whose trigram similarity, computed for all
+candidate pairs at once on hashed trigram bitsets, reaches FUZZY_THRESHOLD.
+Merging is unit-aware: a member joins its cluster only when its nutrition
+agrees with the canonical ingredient's on every unit both have (a "large"
+piece is not a "small" one); nutrition rows for units the canonical lacks
+move over. merge_duplicates() then repoints Ingredient_Quantity (collapsing
+identical quantities), Consumption, Recipe_Ingredients and Favorites and
+deletes the members, all in one transaction (scripts/dedupe_ingredients.py).
+"""
+import re
+import zlib
+import logging
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from models.database import daily_nutrition
+from models.database.daily_nutrition import ROLLUP_TABLE, rollup_ready, refresh_days
+from models.database.energy_balance import invalidate as invalidate_energy
+from models.database.food_catalog import CATALOG_TABLES, changes_ready, record_change
+from models.database.index_advisor import table_columns
+from models.database.ingredient_ingest import CANON_COLUMN, LOOKUP_BATCH
+from models.database.readiness import forget, ready
+from models.database.recipe_nutrition import VECTOR_TABLE, recipes_using, refresh_recipes, vectors_ready
+from models.database.unit_conversion import (CONVERSIONS_TABLE, NUTRITION_COLUMNS, base_units_ready,
+                                             refresh_factors, store_nutrition)
+
+logger = logging.getLogger(__name__)
+
+KEY_LENGTH = 255
+
+# Parenthesized qualifiers made only of these words are dropped: "banana (large)"
+SIZE_WORDS = {'large', 'medium', 'small', 'big', 'jumbo', 'mini', 'extra', 'xl', 'regular', 'whole'}
+STOP_WORDS = {'a', 'an', 'the', 'of'}
+
+# Minimum trigram (Jaccard) similarity of two keys with the same number of words
+# ('banana' / 'bananna' is 0.75)
+FUZZY_THRESHOLD = 0.75
+# Largest relative kcal difference per unit for two ingredients to be the same food
+NUTRITION_TOLERANCE = 0.15
+# Names sharing a word prefix are compared; prefixes shared by more names are too generic to block on
+MAX_BLOCK = 400
+SIGNATURE_BITS = 512
+
+
+_SEPARATORS = re.compile(r'[\W_]+')
+_NUMBERS = re.compile(r'\d+')
+_PARENTHESES = re.compile(r'\(([^)]*)\)')
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+# ============== Keys ==============
+
+def _singular(word: str) -> str:
+    if len(word) <= 3 or not word.endswith('s') or word.endswith(('ss', 'us', 'is')):
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith(('oes', 'ches', 'shes', 'xes')):
+        return word[:-2]
+    return word[:-1]
+
+
+def _qualifier(match) -> str:
+    words = set(_SEPARATORS.split(match.group(1).lower())) - {''}
+    return ' ' if words <= SIZE_WORDS else f' {match.group(1)} '
+
+
+def canonical_key(name: str) -> str:
+    """'  Bananas (Large)' -> 'banana'; 'Peanut Butter' -> 'butter peanut'"""
+    text = unicodedata.normalize('NFKD', name or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = _PARENTHESES.sub(_qualifier, text)
+    words = {_singular(word) for word in _SEPARATORS.split(text) if word and word not in STOP_WORDS}
+    return ' '.join(sorted(words))[:KEY_LENGTH]
+
+
+def trigrams(key: str) -> set:
+    grams = set()
+    for word in key.split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _signatures(keys: List[str]) -> np.ndarray:
+    """One bitset of hashed trigrams per key, as (keys x SIGNATURE_BITS/8) uint8"""
+    bits = np.zeros((len(keys), SIGNATURE_BITS), dtype=bool)
+    for i, key in enumerate(keys):
+        bits[i, [zlib.crc32(gram.encode('utf-8')) % SIGNATURE_BITS for gram in trigrams(key)]] = True
+    return np.packbits(bits, axis=1)
+
+
+# ============== Schema ==============
+
+def canonical_keys_ready(manager) -> bool:
+    """True once Ingredient.canonical_key exists (and was backfilled by its migration)"""
+    return ready(manager, ('Ingredient', CANON_COLUMN), lambda: CANON_COLUMN in table_columns(manager, 'Ingredient'))
+
+
+def reset_canonical_state(manager):
+    """Forget the cached readiness check (used by the migration)"""
+    forget(manager, ('Ingredient', CANON_COLUMN))
+
+
+def backfill_keys(manager) -> int:
+    """Set canonical_key on every ingredient; returns how many changed"""
+    rows = manager.execute_query(f'SELECT ingredient_id, ingredient_name, {CANON_COLUMN} FROM Ingredient',
+                                 fetch_all=True) or []
+    updates = [(canonical_key(row['ingredient_name']), row['ingredient_id']) for row in rows
+               if row[CANON_COLUMN] != canonical_key(row['ingredient_name'])]
+    for i in range(0, len(updates), LOOKUP_BATCH):
+        manager.execute_many(f'UPDATE Ingredient SET {CANON_COLUMN} = %s WHERE ingredient_id = %s',
+                             updates[i:i + LOOKUP_BATCH])
+    return len(updates)
+
+
+# ============== Duplicate clusters ==============
+
+def _fuzzy_pairs(keys: List[str], threshold: float) -> List[Tuple[int, int]]:
+    """Index pairs of keys with the same word count and numbers and trigram similarity >= threshold"""
+    blocks = defaultdict(list)
+    for i, key in enumerate(keys):
+        for prefix in {word[:3] for word in key.split()}:
+            blocks[prefix].append(i)
+
+    n = len(keys)
+    codes = []
+    for members in blocks.values():
+        if 1 < len(members) <= MAX_BLOCK:
+            members = np.asarray(members, dtype=np.int64)
+            left, right = np.triu_indices(len(members), 1)
+            codes.append(members[left] * n + members[right])
+    if not codes:
+        return []
+    left, right = np.divmod(np.unique(np.concatenate(codes)), n)
+
+    words = np.array([len(key.split()) for key in keys])
+    same_length = words[left] == words[right]
+    left, right = left[same_length], right[same_length]
+
+    # Estimated Jaccard of all candidate pairs at once, then confirmed on the exact trigram sets
+    signatures = _signatures(keys)
+    shared = _POPCOUNT[signatures[left] & signatures[right]].sum(axis=1, dtype=np.int64)
+    either = _POPCOUNT[signatures[left] | signatures[right]].sum(axis=1, dtype=np.int64)
+    likely = shared >= (threshold - 0.05) * np.maximum(either, 1)
+
+    pairs = []
+    for i, j in zip(left[likely].tolist(), right[likely].tolist()):
+        # '1% milk' / '2% milk' are close in trigrams but never the same food
+        if keys[i] == keys[j] or _NUMBERS.findall(keys[i]) != _NUMBERS.findall(keys[j]):
+            continue
+        a, b = trigrams(keys[i]), trigrams(keys[j])
+        if len(a & b) >= threshold * len(a | b):
+            pairs.append((i, j))
+    return pairs
+
+
+def _compatible(a: Dict[int, float], b: Dict[int, float]) -> bool:
+    """Same kcal per unit (within NUTRITION_TOLERANCE) on every unit both have"""
+    for unit_id in a.keys() & b.keys():
+        x, y = a[unit_id] or 0, b[unit_id] or 0
+        if abs(x - y) > max(NUTRITION_TOLERANCE * max(abs(x), abs(y)), 5):
+            return False
+    return True
+
+
+def find_duplicates(names: Dict[int, str], usage: Dict[int, int], nutrition: Dict[int, Dict[int, float]],
+                    threshold: float = FUZZY_THRESHOLD) -> Dict:
+    """Duplicate clusters of `names` (ingredient_id -> name).
+
+    `usage` (ingredient_id -> times eaten) picks the ingredient each
+    cluster keeps, `nutrition` (ingredient_id -> unit_id -> kcal) decides
+    which members can join it. Returns {'clusters': [(canonical, members)],
+    'conflicts': [(canonical, member)]}.
+    """
+    ids = sorted(names)
+    keys = [canonical_key(names[i]) for i in ids]
+
+    parent = list(range(len(ids)))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    first_of_key = {}
+    for i, key in enumerate(keys):
+        if key in first_of_key:
+            parent[root(i)] = root(first_of_key[key])
+        else:
+            first_of_key[key] = i
+    if threshold < 1:
+        distinct = list(first_of_key)
+        for a, b in _fuzzy_pairs(distinct, threshold):
+            parent[root(first_of_key[distinct[a]])] = root(first_of_key[distinct[b]])
+
+    groups = defaultdict(list)
+    for i in range(len(ids)):
+        groups[root(i)].append(ids[i])
+
+    clusters, conflicts = [], []
+    for group in groups.values():
+        if len(group) < 2:
+            continue
+        # Keep the most eaten ingredient, the oldest on ties
+        group.sort(key=lambda ingredient_id: (-usage.get(ingredient_id, 0), ingredient_id))
+        canonical, merged, members = group[0], dict(nutrition.get(group[0], {})), []
+        for member in group[1:]:
+            units = nutrition.get(member, {})
+            if _compatible(merged, units):
+                members.append(member)
+                for unit_id, kcal in units.items():
+                    merged.setdefault(unit_id, kcal)
+            else:
+                conflicts.append((canonical, member))
+        if members:
+            clusters.append((canonical, members))
+    return {'clusters': clusters, 'conflicts': conflicts}
+
+
+# ============== Merging ==============
+
+def _in(values) -> str:
+    return ', '.join(['%s'] * len(values))
+
+
+def _merge_base_units(cursor, canonical: int, members: List[int]):
+    """Fold the members' base rows and conversions into the canonical's graph (see unit_conversion.py)"""
+    cursor.execute(f'SELECT unit_id FROM {CONVERSIONS_TABLE} WHERE ingredient_id = %s', (canonical,))
+    units = {row[0] for row in cursor.fetchall()}
+    for member in members:
+        # Conversions for units the canonical lacks move over first, so the member's base row can use them
+        cursor.execute(f'SELECT unit_id FROM {CONVERSIONS_TABLE} WHERE ingredient_id = %s', (member,))
+        moved = [row[0] for row in cursor.fetchall() if row[0] not in units]
+        if moved:
+            cursor.execute(f'UPDATE {CONVERSIONS_TABLE} SET ingredient_id = %s '
+                           f'WHERE ingredient_id = %s AND unit_id IN ({_in(moved)})', (canonical, member, *moved))
+            units.update(moved)
+        # A base row the canonical's graph cannot reach becomes a conversion; the canonical's values win
+        cursor.execute(f'SELECT unit_id, {", ".join(NUTRITION_COLUMNS)} FROM Nutrition WHERE ingredient_id = %s',
+                       (member,))
+        store_nutrition(cursor, [(canonical, unit_id, values) for unit_id, *values in cursor.fetchall()])
+    cursor.execute(f'DELETE FROM {CONVERSIONS_TABLE} WHERE ingredient_id IN ({_in(members)})', tuple(members))
+
+
+def _merge_cluster(cursor, canonical: int, members: List[int], base_units: bool = False):
+    """Fold `members` into `canonical` on the caller's cursor"""
+    if base_units:
+        _merge_base_units(cursor, canonical, members)
+    else:
+        # Nutrition: units the canonical lacks move over (first member wins), the rest is dropped
+        cursor.execute('SELECT unit_id FROM Nutrition WHERE ingredient_id = %s', (canonical,))
+        units = {row[0] for row in cursor.fetchall()}
+        for member in members:
+            cursor.execute('SELECT unit_id FROM Nutrition WHERE ingredient_id = %s', (member,))
+            moved = [row[0] for row in cursor.fetchall() if row[0] not in units]
+            if moved:
+                cursor.execute(f'UPDATE Nutrition SET ingredient_id = %s WHERE ingredient_id = %s AND unit_id IN ({_in(moved)})',
+                               (canonical, member, *moved))
+                units.update(moved)
+    cursor.execute(f'DELETE FROM Nutrition WHERE ingredient_id IN ({_in(members)})', tuple(members))
+
+    # Quantities: repoint, then collapse identical (unit, quantity) rows onto the oldest
+    cursor.execute(f'UPDATE Ingredient_Quantity SET ingredient_id = %s WHERE ingredient_id IN ({_in(members)})',
+                   (canonical, *members))
+    cursor.execute('''
+        SELECT ingredient_quantity_id, unit_id, quantity FROM Ingredient_Quantity
+        WHERE ingredient_id = %s ORDER BY ingredient_quantity_id
+    ''', (canonical,))
+    kept, duplicates = {}, []
+    for iq_id, unit_id, quantity in cursor.fetchall():
+        key = (unit_id, float(quantity))
+        if key in kept:
+            duplicates.append((kept[key], iq_id))
+        else:
+            kept[key] = iq_id
+    if duplicates:
+        for table in ('Consumption', 'Recipe_Ingredients'):
+            cursor.executemany(f'UPDATE {table} SET ingredient_quantity_id = %s WHERE ingredient_quantity_id = %s',
+                               duplicates)
+        for i in range(0, len(duplicates), LOOKUP_BATCH):
+            part = tuple(iq_id for _, iq_id in duplicates[i:i + LOOKUP_BATCH])
+            cursor.execute(f'DELETE FROM Ingredient_Quantity WHERE ingredient_quantity_id IN ({_in(part)})', part)
+    if base_units:
+        # The members' quantities still carry their old base unit and factor
+        refresh_factors(cursor, [canonical])
+
+    # Favorites: the canonical is a favorite when any member was
+    cursor.execute(f'SELECT ingredient_id FROM Favorites WHERE ingredient_id IN ({_in(members)})', tuple(members))
+    if cursor.fetchall():
+        cursor.execute(f'DELETE FROM Favorites WHERE ingredient_id IN ({_in(members)})', tuple(members))
+        cursor.execute('SELECT COUNT(*) FROM Favorites WHERE ingredient_id = %s', (canonical,))
+        if not cursor.fetchone()[0]:
+            cursor.execute('INSERT INTO Favorites (ingredient_id) VALUES (%s)', (canonical,))
+
+    cursor.execute(f'DELETE FROM Ingredient WHERE ingredient_id IN ({_in(members)})', tuple(members))
+
+
+def merge_duplicates(manager, clusters: List[Tuple[int, List[int]]]) -> Dict:
+    """Merge every cluster in one transaction, keeping rollup, recipe vectors and catalog in sync"""
+    with_rollup, with_vectors, with_changes = rollup_ready(manager), vectors_ready(manager), changes_ready(manager)
+    base_units = base_units_ready(manager)
+    merged = {'clusters_merged': 0, 'ingredients_removed': 0}
+    with manager.get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            for canonical, members in clusters:
+                everyone = [canonical, *members]
+                # Kept nutrition can differ slightly from a member's: its days and recipes are recomputed
+                days = [day for ingredient_id in members
+                        for day in daily_nutrition.days_of_nutrition(cursor, ingredient_id)] if with_rollup else []
+                recipes = recipes_using(cursor, ingredient_ids=everyone) if with_vectors else []
+
+                _merge_cluster(cursor, canonical, members, base_units)
+
+                if with_rollup:
+                    refresh_days(cursor, days, base_units=base_units)
+                    invalidate_energy(manager, days, cursor=cursor)
+                if recipes:
+                    refresh_recipes(cursor, recipes, base_units=base_units)
+                if with_changes:
+                    for ingredient_id in everyone:
+                        record_change(cursor, ingredient_id=ingredient_id)
+                merged['clusters_merged'] += 1
+                merged['ingredients_removed'] += len(members)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    manager.touch(*CATALOG_TABLES, 'Consumption', 'Recipe_Ingredients', CONVERSIONS_TABLE, ROLLUP_TABLE, VECTOR_TABLE)
+    return merged
+
+
+def load_catalog(manager) -> Tuple[Dict[int, str], Dict[int, int], Dict[int, Dict[int, float]]]:
+    """Names, usage counts and kcal per unit of every ingredient, for find_duplicates()"""
+    names = {row['ingredient_id']: row['ingredient_name'] for row in manager.execute_query(
+        'SELECT ingredient_id, ingredient_name FROM Ingredient', fetch_all=True) or []}
+    usage = {row['ingredient_id']: row['uses'] for row in manager.execute_query('''
+        SELECT IQ.ingredient_id AS ingredient_id, COUNT(*) AS uses FROM Consumption c
+        JOIN Ingredient_Quantity IQ ON IQ.ingredient_quantity_id = c.ingredient_quantity_id
+        GROUP BY IQ.ingredient_id
+    ''', fetch_all=True) or []}
+    nutrition = defaultdict(dict)
+    for row in manager.execute_query('SELECT ingredient_id, unit_id, kcal FROM Nutrition', fetch_all=True) or []:
+        nutrition[row['ingredient_id']][row['unit_id']] = float(row['kcal'] or 0)
+    return names, usage, dict(nutrition)
+
+
+def dedupe(manager, apply: bool = False, threshold: float = FUZZY_THRESHOLD) -> Dict:
+    """Find duplicate clusters across the catalog and merge them when `apply`"""
+    names, usage, nutrition = load_catalog(manager)
+    found = find_duplicates(names, usage, nutrition, threshold)
+    found['names'] = names
+    if apply and found['clusters']:
+        found.update(merge_duplicates(manager, found['clusters']))
+    return found
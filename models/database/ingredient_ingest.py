@@ -0,0 +1,176 @@
+"""
+Batch ingest of analyzed ingredients (units, ingredients, quantities, nutrition).
+
+save_to_database() used to resolve every row with save_unit(),
+save_ingredient(), save_ingredient_qty() and save_nutrition(), each on its
+own pooled connection with a SELECT and an INSERT: a 15-ingredient recipe
+took ~120 round trips and a failure half-way left half the rows behind.
+
+ingest() does the same work on the caller's cursor, so it commits (or rolls
+back) with the caller's transaction:
+- units and ingredients are looked up with one IN query each, the missing
+  ones inserted with one executemany and read back by name;
+- existing quantities and nutrition rows are looked up with one IN query
+  per table, the missing nutrition rows inserted with one executemany;
+- new quantities are inserted one statement each, because their ids are
+  needed and lastrowid is only reliable for single-row inserts.
+
+Names are matched case-insensitively, like the MySQL collation compares
+them, so 'Egg' and 'egg' in one batch never become two rows.
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+NUTRIENT_FIELDS = ('kcal', 'fats', 'carbs', 'fiber', 'net_carbs', 'protein')
+
+# Values per IN (...) lookup; stays below SQLite's host parameter limit
+LOOKUP_BATCH = 500
+
+# Ingredient column holding the canonical key of the name (see ingredient_canon.py)
+CANON_COLUMN = 'canonical_key'
+
+
+def parse_csv(data: str) -> List[Dict[str, str]]:
+    """Entries of the `qty,unit,ingr,kcal,...` CSV produced by the analyzers"""
+    lines = data.strip().split("\n")
+    headers = lines[0].split(',')
+    return [dict(zip(headers, line.split(','))) for line in lines[1:]]
+
+
+def per_unit(entry) -> Tuple[float, ...]:
+    """Nutrition of one unit of the entry (kcal, fat, carb, fiber, net_carb, protein)"""
+    qty = float(entry['qty'])
+    return tuple(round(float(entry[field]) / qty, 4) for field in NUTRIENT_FIELDS)
+
+
+def _placeholders(values: Sequence) -> str:
+    return ', '.join(['%s'] * len(values))
+
+
+def select_in(cursor, query: str, values: Sequence) -> List[tuple]:
+    """Rows of `query` for every value, its `{values}` IN list run LOOKUP_BATCH values at a time"""
+    rows = []
+    for i in range(0, len(values), LOOKUP_BATCH):
+        part = tuple(values[i:i + LOOKUP_BATCH])
+        cursor.execute(query.format(values=_placeholders(part)), part)
+        rows.extend(cursor.fetchall())
+    return rows
+
+
+def resolve_names(cursor, table: str, id_column: str, name_column: str, names: Iterable[str],
+                  key_column: Optional[str] = None, key: Callable[[str], str] = str.casefold
+                  ) -> Tuple[Dict[str, int], int]:
+    """Ids of `names` in `table` and how many had to be inserted.
+
+    Names are matched case-insensitively, or by `key(name)` against
+    `key_column` when it is given (inserted rows store their key there).
+    """
+    wanted = list(dict.fromkeys(names))
+    column = key_column or name_column
+    values = wanted if key_column is None else list(dict.fromkeys(key(name) for name in wanted))
+
+    def lookup():
+        found = {}
+        for row_id, value in sorted(select_in(
+                cursor, f'SELECT {id_column}, {column} FROM {table} WHERE {column} IN ({{values}})', values)):
+            found.setdefault(value if key_column else key(value), row_id)
+        return found
+
+    found = lookup()
+    # One new row per key, in the first spelling seen
+    missing = {}
+    for name in wanted:
+        if key(name) not in found:
+            missing.setdefault(key(name), name)
+    if missing:
+        if key_column is None:
+            cursor.executemany(f'INSERT INTO {table} ({name_column}) VALUES (%s)',
+                               [(name,) for name in missing.values()])
+        else:
+            cursor.executemany(f'INSERT INTO {table} ({name_column}, {key_column}) VALUES (%s, %s)',
+                               [(name, name_key) for name_key, name in missing.items()])
+        found = lookup()
+
+    return {name: found[key(name)] for name in wanted}, len(missing)
+
+
+def resolve_ingredients(cursor, names: Iterable[str],
+                        key: Optional[Callable[[str], str]] = None) -> Tuple[Dict[str, int], int]:
+    """Ingredient ids of `names`, matched by `key` on Ingredient.canonical_key when given"""
+    if key is None:
+        return resolve_names(cursor, 'Ingredient', 'ingredient_id', 'ingredient_name', names)
+    return resolve_names(cursor, 'Ingredient', 'ingredient_id', 'ingredient_name', names,
+                         key_column=CANON_COLUMN, key=key)
+
+
+def ingest(cursor, entries: List[Dict], serv=None, ingredient_key: Optional[Callable[[str], str]] = None,
+           store_nutrition: Optional[Callable] = None) -> Dict:
+    """Save analyzed entries on `cursor` without committing.
+
+    Quantities are divided by `serv` when given (per-serving recipe rows);
+    nutrition is stored per unit and only when the ingredient/unit pair has
+    none yet, or handed to `store_nutrition` when given (base unit storage,
+    see unit_conversion.py). Ingredients are matched by `ingredient_key`
+    when given (the canonical key, see ingredient_canon.py). Returns the ingredient quantity
+    id of every entry, in order, plus what was inserted (for catalog change
+    records and cache touches).
+    """
+    result = {'quantity_ids': [], 'new_quantity_ids': [], 'nutrition_ingredient_ids': [], 'tables': set()}
+    if not entries:
+        return result
+
+    # Convert everything first so bad input fails before anything is written
+    rows = []
+    for entry in entries:
+        quantity = float(entry['qty'])
+        if serv is not None:
+            quantity = quantity / float(serv)
+        rows.append((entry['unit'], entry['ingr'], quantity, per_unit(entry)))
+
+    unit_ids, new_units = resolve_names(cursor, 'Unit', 'unit_id', 'unit_name', (row[0] for row in rows))
+    ingredient_ids, new_ingredients = resolve_ingredients(cursor, (row[1] for row in rows), ingredient_key)
+    resolved = [(ingredient_ids[ingr], unit_ids[unit], quantity, nutrition)
+                for unit, ingr, quantity, nutrition in rows]
+
+    ids = sorted({row[0] for row in resolved})
+    quantities = {}
+    for iq_id, ingredient_id, unit_id, quantity in sorted(select_in(cursor, '''
+        SELECT ingredient_quantity_id, ingredient_id, unit_id, quantity FROM Ingredient_Quantity
+        WHERE ingredient_id IN ({values})
+    ''', ids)):
+        quantities.setdefault((ingredient_id, unit_id, float(quantity)), iq_id)
+
+    has_nutrition = set() if store_nutrition is not None else set(select_in(
+        cursor, 'SELECT ingredient_id, unit_id FROM Nutrition WHERE ingredient_id IN ({values})', ids))
+
+    new_nutrition = []
+    for ingredient_id, unit_id, quantity, nutrition in resolved:
+        key = (ingredient_id, unit_id, quantity)
+        if key not in quantities:
+            cursor.execute('INSERT INTO Ingredient_Quantity (quantity, ingredient_id, unit_id) VALUES (%s,%s,%s)',
+                           (quantity, ingredient_id, unit_id))
+            quantities[key] = cursor.lastrowid
+            result['new_quantity_ids'].append(cursor.lastrowid)
+        result['quantity_ids'].append(quantities[key])
+
+        if store_nutrition is not None:
+            new_nutrition.append((ingredient_id, unit_id, nutrition))
+        elif (ingredient_id, unit_id) not in has_nutrition:
+            has_nutrition.add((ingredient_id, unit_id))
+            new_nutrition.append((ingredient_id, unit_id, *nutrition))
+            result['nutrition_ingredient_ids'].append(ingredient_id)
+
+    if store_nutrition is not None:
+        # Units the graph already reaches change nothing but the cached factors
+        new_nutrition = result['nutrition_ingredient_ids'] = store_nutrition(cursor, new_nutrition)
+        if new_nutrition:
+            result['tables'].add('Ingredient_Quantity')
+    elif new_nutrition:
+        cursor.executemany('''
+            INSERT INTO Nutrition (ingredient_id, unit_id, kcal, fat, carb, fiber, net_carb, protein)
+            VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
+        ''', new_nutrition)
+
+    inserted = (('Unit', new_units), ('Ingredient', new_ingredients),
+                ('Ingredient_Quantity', result['new_quantity_ids']), ('Nutrition', new_nutrition))
+    result['tables'] |= {table for table, rows_inserted in inserted if rows_inserted}
+    return result
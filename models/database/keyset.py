@@ -0,0 +1,104 @@
+"""
+Keyset (cursor) pagination helpers.
+
+OFFSET pagination reads and discards every row before the page, so deep
+pages get linearly slower, and a COUNT(*) per request pays for a full scan.
+A keyset page instead continues strictly after the sort key of the last row
+it returned: `WHERE (sort key) < (last key) ORDER BY sort key DESC LIMIT n+1`
+starts at the cursor through the index, whatever the depth.
+
+Sort keys are descending, end in a unique column (the id) and may contain
+nullable columns, which sort last like MySQL and SQLite order NULLs in DESC.
+Cursors are opaque URL-safe tokens carrying the last key; totals, when
+wanted, come from cached_count(), a COUNT(*) memoized until its tables
+are written.
+"""
+import json
+import base64
+import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+CURSOR_VERSION = 1
+
+
+class InvalidCursor(ValueError):
+    """The cursor token is malformed or belongs to another listing"""
+
+
+def _key_value(value):
+    """JSON-safe form of a sort key value, comparable as a SQL parameter"""
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        # MySQL TIME columns come back as timedelta
+        seconds = int(value.total_seconds())
+        return f'{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}'
+    return value
+
+
+def encode_cursor(kind: str, values: Sequence[Any]) -> str:
+    payload = json.dumps({'v': CURSOR_VERSION, 'k': kind, 's': [_key_value(v) for v in values]},
+                         separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token: str, kind: str, size: int) -> List[Any]:
+    """Sort key values of a cursor made by encode_cursor(kind, ...) with `size` values"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        values = payload['s']
+        valid = payload['v'] == CURSOR_VERSION and payload['k'] == kind and len(values) == size
+    except (ValueError, TypeError, KeyError, AttributeError):
+        valid = False
+    if not valid:
+        raise InvalidCursor('Invalid pagination cursor')
+    return values
+
+
+def after_condition(columns: Sequence[Tuple[str, bool]], values: Sequence[Any]) -> Tuple[str, tuple]:
+    """SQL condition (and params) for rows after `values` in DESC order of `columns`.
+
+    `columns` are (expression, nullable) pairs; the last one must be unique
+    and not null. Written as nested OR/AND rather than a row comparison so
+    nullable columns work and MySQL can range-scan the leading column.
+    """
+    (expr, nullable), value = columns[0], values[0]
+    if len(columns) == 1:
+        return f'{expr} < %s', (value,)
+
+    rest, rest_params = after_condition(columns[1:], values[1:])
+    if nullable and value is None:
+        return f'({expr} IS NULL AND {rest})', rest_params
+    if nullable:
+        return f'({expr} < %s OR {expr} IS NULL OR ({expr} = %s AND {rest}))', (value, value, *rest_params)
+    return f'({expr} < %s OR ({expr} = %s AND {rest}))', (value, value, *rest_params)
+
+
+def keyset_page(rows: List, limit: int, kind: str, key) -> Dict[str, Any]:
+    """Split `limit + 1` fetched rows into a page and the cursor of the next one.
+
+    `key(row)` returns the row's sort key values in column order.
+    """
+    has_more = len(rows) > limit
+    items = rows[:limit]
+    return {
+        'items': items,
+        'has_more': has_more,
+        'next_cursor': encode_cursor(kind, key(items[-1])) if has_more else None
+    }
+
+
+def cached_count(manager, tables: Sequence[str], query: str, params: tuple = ()) -> int:
+    """COUNT(*) query result, recomputed only after one of `tables` is written"""
+    def count():
+        row = manager.execute_query(query, params, fetch_one=True)
+        return int(next(iter(row.values()))) if row else 0
+    return manager.cached_value(('count', query, tuple(params)), tables, count)
+
+
+def cursor_values(token: Optional[str], kind: str, size: int) -> Optional[List[Any]]:
+    """Decoded sort key of `token`, or None for the first page"""
+    return decode_cursor(token, kind, size) if token else None
@@ -0,0 +1,110 @@
+"""
+Native DATE columns for the day-keyed nutrition tables.
+
+Consumption, recipe_consumption, calorie_tracking and body_weight_tracking
+historically store their day as a string (DD.MM.YYYY or YYYY-MM-DD depending
+on the writer). migrations/add_native_date_columns.py adds an indexed
+`entry_date DATE` column next to each legacy column and backfills it online.
+
+The switch happens in two steps so a deploy never depends on migration timing:
+- writes: as soon as the column exists, every writer fills both columns
+  (dual-write), so rows written during the backfill are already correct;
+- reads: once no parsable row is left with a NULL entry_date, readers filter
+  and sort on entry_date instead of parsing the legacy strings.
+
+Both checks go through readiness.ready(), which only caches a positive
+answer: a worker writes the column from its first write after the column
+exists, so no row written after the backfill can miss it, and the reads
+switch in every worker once the backfill is done.
+"""
+from datetime import date, datetime
+from typing import Optional
+
+from models.database.readiness import forget, ready
+
+DATE_COLUMN = 'entry_date'
+
+# table -> legacy string date column
+LEGACY_DATE_COLUMNS = {
+    'Consumption': 'consumption_date',
+    'recipe_consumption': 'consumption_date',
+    'calorie_tracking': 'date',
+    'body_weight_tracking': 'date',
+}
+
+# (LIKE shape, MySQL format) for every format the writers have ever produced
+_LEGACY_FORMATS = (
+    ('__.__.____', '%d.%m.%Y'),
+    ('____-__-__', '%Y-%m-%d'),
+    ('____/__/__', '%Y/%m/%d'),
+    ('__/__/____', '%d/%m/%Y'),
+)
+_PY_FORMATS = ('%d.%m.%Y', '%Y-%m-%d', '%Y/%m/%d', '%d/%m/%Y')
+
+
+def to_date(value) -> Optional[date]:
+    """Parse a legacy date value into a date (None when it is not a date)"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value).strip()
+    for fmt in _PY_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def legacy_parse_sql(column: str, escape_percent: bool = False) -> str:
+    """SQL expression turning the legacy string column into a DATE (NULL if unparsable).
+
+    Set escape_percent when the statement is executed with bound parameters.
+    """
+    branches = []
+    for shape, fmt in _LEGACY_FORMATS:
+        if escape_percent:
+            fmt = fmt.replace('%', '%%')
+        branches.append(f"WHEN {column} LIKE '{shape}' THEN STR_TO_DATE({column}, '{fmt}')")
+    return f"(CASE {' '.join(branches)} ELSE NULL END)"
+
+
+def _column_exists(manager, table: str) -> bool:
+    if manager.use_mysql:
+        row = manager.execute_query('''
+            SELECT COUNT(*) AS cnt FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        ''', (table, DATE_COLUMN), fetch_one=True)
+        return bool(row and row['cnt'])
+    rows = manager.execute_query(f'PRAGMA table_info("{table}")', fetch_all=True) or []
+    return any(row['name'] == DATE_COLUMN for row in rows)
+
+
+def pending_backfill_query(table: str) -> str:
+    legacy = LEGACY_DATE_COLUMNS[table]
+    return (f"SELECT 1 AS pending FROM {table} "
+            f"WHERE {DATE_COLUMN} IS NULL AND {legacy_parse_sql(legacy)} IS NOT NULL LIMIT 1")
+
+
+def native_date_writes(manager, table: str) -> bool:
+    """True once `table` has the entry_date column (writers must fill it)"""
+    return ready(manager, ('native_date_writes', table), lambda: _column_exists(manager, table))
+
+
+def native_date_reads(manager, table: str) -> bool:
+    """True once every parsable row of `table` has its entry_date backfilled"""
+    if not native_date_writes(manager, table):
+        return False
+    return ready(
+        manager, ('native_date_reads', table),
+        lambda: manager.execute_query(pending_backfill_query(table), fetch_one=True) is None
+    )
+
+
+def reset_native_date_state(manager):
+    """Forget cached checks (used by the migration after it finishes)"""
+    forget(manager, *((check, table) for check in ('native_date_writes', 'native_date_reads')
+                      for table in LEGACY_DATE_COLUMNS))
@@ -0,0 +1,316 @@
+"""
+Table-tagged query result cache with write-driven invalidation.
+
+Reads opt in by naming the tables they depend on. Every table has a version
+counter; a write through execute_query/execute_many (or an explicit touch)
+bumps the counters of the tables it modifies, and any cached entry whose
+snapshot no longer matches is dropped on its next lookup.
+
+Counters live in a memory-mapped file named by QUERY_CACHE_SHARED_PATH, so
+every gunicorn worker on the host sees the same versions and invalidates
+together; gunicorn.conf.py points it at a temp file. Without one the cache is
+off unless QUERY_CACHE_ENABLED=true, and counters then live in process
+memory, which only suits a single process.
+"""
+import os
+import re
+import mmap
+import sys
+import time
+import struct
+import fcntl
+import logging
+import threading
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_WRITE_RE = re.compile(
+    r'^\s*(?:INSERT(?:\s+(?:IGNORE|OR\s+\w+))?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+IGNORE)?|'
+    r'DELETE\s+FROM|TRUNCATE(?:\s+TABLE)?|ALTER\s+TABLE|DROP\s+TABLE(?:\s+IF\s+EXISTS)?)\s+`?(\w+)`?',
+    re.IGNORECASE
+)
+
+
+@lru_cache(maxsize=1024)
+def written_table(query: str) -> Optional[str]:
+    """Name of the table a write statement modifies, or None for reads"""
+    match = _WRITE_RE.match(query)
+    return match.group(1).lower() if match else None
+
+
+def _normalize(tables: Iterable[str]) -> Tuple[str, ...]:
+    return tuple(sorted({t.lower() for t in tables}))
+
+
+# ============== Version Backends ==============
+
+class LocalTableVersions:
+    """Per-process table version counters"""
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, table: str) -> int:
+        return self._versions.get(table, 0)
+
+    def bump(self, table: str) -> int:
+        with self._lock:
+            version = self._versions.get(table, 0) + 1
+            self._versions[table] = version
+            return version
+
+
+class SharedTableVersions:
+    """Table version counters in a memory-mapped file shared by all workers.
+
+    Tables hash into a fixed number of 8-byte slots. A collision only means
+    two tables invalidate each other, which is safe.
+    """
+
+    SLOTS = 512
+    _SLOT = struct.Struct('<Q')
+
+    def __init__(self, path: str):
+        self.path = path
+        size = self.SLOTS * self._SLOT.size
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        finally:
+            os.close(fd)
+        self._lock_file = None
+        self._lock_pid = None
+
+    def _lock_handle(self):
+        # flock is tied to the open file description, which a fork shares, so
+        # each worker needs its own handle for the lock to exclude the others
+        pid = os.getpid()
+        if self._lock_pid != pid:
+            self._lock_file = open(self.path, 'rb')
+            self._lock_pid = pid
+        return self._lock_file
+
+    def _offset(self, table: str) -> int:
+        return (zlib.crc32(table.encode()) % self.SLOTS) * self._SLOT.size
+
+    def get(self, table: str) -> int:
+        return self._SLOT.unpack_from(self._map, self._offset(table))[0]
+
+    def bump(self, table: str) -> int:
+        offset = self._offset(table)
+        # Writers are rare; a file lock keeps the read-modify-write atomic across processes
+        handle = self._lock_handle()
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            version = self._SLOT.unpack_from(self._map, offset)[0] + 1
+            self._SLOT.pack_into(self._map, offset, version)
+            return version
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+# ============== Cache ==============
+
+def _estimate_size(value) -> int:
+    """Approximate memory footprint of a fetched result"""
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_estimate_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def _copy_result(value):
+    """Hand out row copies so callers can mutate results safely"""
+    if isinstance(value, list):
+        return [dict(row) if isinstance(row, dict) else row for row in value]
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+class QueryCache:
+    """Bounded LRU of query results tagged with the table versions they were read at"""
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 32 * 1024 * 1024,
+                 ttl_seconds: Optional[float] = 300, versions=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.versions = versions or LocalTableVersions()
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _snapshot(self, tables: Tuple[str, ...]) -> Tuple[int, ...]:
+        return tuple(self.versions.get(t) for t in tables)
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[4]
+
+    def get(self, key, tables: Iterable[str]):
+        """Return (True, value) on a fresh hit, (False, None) otherwise"""
+        tables = _normalize(tables)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+
+            value, entry_tables, snapshot, stored_at, _size = entry
+            expired = self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds
+            if expired or entry_tables != tables or snapshot != self._snapshot(tables):
+                self._drop(key)
+                self.invalidations += 1
+                self.misses += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, _copy_result(value)
+
+    def snapshot(self, tables: Iterable[str]) -> Tuple[int, ...]:
+        """Versions to store alongside a result; take it before running the query"""
+        return self._snapshot(_normalize(tables))
+
+    def put(self, key, tables: Iterable[str], value, snapshot: Tuple[int, ...] = None):
+        """Store a result read at `snapshot` (defaults to the current versions)"""
+        tables = _normalize(tables)
+        snapshot = snapshot if snapshot is not None else self._snapshot(tables)
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (_copy_result(value), tables, snapshot, time.monotonic(), size)
+            self._bytes += size
+
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def touch(self, *tables: str):
+        """Invalidate every entry that depends on any of `tables`"""
+        for table in {t.lower() for t in tables if t}:
+            self.versions.bump(table)
+
+    def version_of(self, *tables: str) -> Tuple[int, ...]:
+        """Current versions of `tables`, usable as a data-version key"""
+        return self._snapshot(_normalize(tables))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'shared': isinstance(self.versions, SharedTableVersions)
+        }
+
+
+def create_query_cache(config) -> Optional[QueryCache]:
+    """Build the cache described by a QueryCacheConfig, or None when disabled"""
+    if not config.enabled:
+        return None
+
+    versions = None
+    if config.shared_path:
+        try:
+            versions = SharedTableVersions(config.shared_path)
+        except OSError as e:
+            logger.error(f"Shared query cache versions unavailable at {config.shared_path}: {e}")
+
+    return QueryCache(
+        max_entries=config.max_entries,
+        max_bytes=config.max_bytes,
+        ttl_seconds=config.ttl_seconds,
+        versions=versions
+    )
+
+
+class QueryCacheMixin:
+    """Result caching shared by the MySQL and SQLite connection managers"""
+
+    query_cache: Optional[QueryCache] = None
+
+    def _cached_fetch(self, query: str, params, fetch_one: bool, cache_tables, run):
+        """Serve a read from the cache, or run it and remember the result"""
+        if self.query_cache is None:
+            return run()
+
+        try:
+            key = (query, tuple(params) if params is not None else None, fetch_one)
+            hash(key)
+        except TypeError:
+            return run()
+
+        return self.cached_value(key, cache_tables, run)
+
+    def cached_value(self, key, tables, compute):
+        """Memoize `compute()` under `key` until one of `tables` is written.
+
+        For values derived from several reads (frames, whole responses); the
+        key must be hashable and should not collide with SQL text.
+        """
+        cache = self.query_cache
+        if cache is None:
+            return compute()
+
+        hit, value = cache.get(key, tables)
+        if hit:
+            return value
+
+        # Snapshot before reading so a concurrent write can only make the entry stale, never wrong
+        snapshot = cache.snapshot(tables)
+        value = compute()
+        cache.put(key, tables, value, snapshot)
+        return value
+
+    def _note_write(self, query: str):
+        """Bump the version of the table a successful write touched"""
+        if self.query_cache is not None:
+            table = written_table(query)
+            if table:
+                self.query_cache.touch(table)
+
+    def touch(self, *tables: str):
+        """Invalidate cached reads of `tables` after a write made outside execute_query"""
+        if self.query_cache is not None:
+            self.query_cache.touch(*tables)
+
+    def data_version(self, *tables: str) -> Tuple[int, ...]:
+        """Version vector of `tables`; changes whenever one of them is written"""
+        if self.query_cache is None:
+            return ()
+        return self.query_cache.version_of(*tables)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        if self.query_cache is None:
+            return {'enabled': False}
+        return dict(self.query_cache.stats(), enabled=True)
@@ -0,0 +1,45 @@
+"""
+Readiness checks for schema that migrations add while workers are running.
+
+Code that depends on a migration (a new table or column, a finished
+backfill) asks ready() before using it. Only a positive answer is cached,
+per connection manager: a negative one is probed again on the next call, so
+every worker starts using and maintaining a derived table on its first call
+after the migration committed, and no worker keeps skipping the maintenance
+of a table that others already read.
+
+A positive answer is kept for the life of the process; migrations that drop
+or rebuild what a check saw call forget().
+"""
+import logging
+from typing import Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+def _checks(manager) -> set:
+    checks = getattr(manager, '_ready_checks', None)
+    if checks is None:
+        checks = set()
+        manager._ready_checks = checks
+    return checks
+
+
+def ready(manager, key: Hashable, probe: Callable[[], bool]) -> bool:
+    """True once `probe()` returned true for `key` on this manager; a failing probe counts as not ready"""
+    checks = _checks(manager)
+    if key in checks:
+        return True
+    try:
+        value = bool(probe())
+    except Exception as e:
+        logger.warning(f"Readiness check {key} failed: {e}")
+        return False
+    if value:
+        checks.add(key)
+    return value
+
+
+def forget(manager, *keys: Hashable):
+    """Drop the cached answers of `keys` (used by migrations)"""
+    _checks(manager).difference_update(keys)
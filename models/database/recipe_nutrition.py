@@ -0,0 +1,136 @@
+"""
+recipe_nutrition: materialized per-serving nutrient vector of every recipe.
+
+Recipe nutrition used to be summed at query time: every recipe consumption
+row, recipe list and recipe detail joined Recipe, Recipe_Ingredients,
+Ingredient_Quantity and Nutrition and summed N.x * IQ.quantity. The vector
+holds SUM(N.x * IQ.quantity) / Recipe.servings per recipe, so a consumption
+row is rc.servings * vector and a recipe total vector * servings.
+
+Like the daily rollup it is maintained transactionally: writers of Recipe,
+Recipe_Ingredients, Ingredient_Quantity and Nutrition find the recipes they
+affect with recipes_using() (before deleting anything) and recompute them
+with refresh_recipes() on their own cursor before they commit. rebuild()
+recomputes every vector (see migrations/add_recipe_nutrition.py).
+
+A recipe without ingredients (or without any nutrition) has NULL nutrients,
+the same as the summing queries returned.
+"""
+import logging
+from typing import Iterable, List, Optional
+
+from models.database.daily_nutrition import NUTRIENTS
+from models.database.index_advisor import table_columns
+from models.database.ingredient_ingest import LOOKUP_BATCH, select_in
+from models.database.readiness import forget, ready
+from models.database.unit_conversion import amount, base_units_ready, nutrition_join
+
+logger = logging.getLogger(__name__)
+
+VECTOR_TABLE = 'recipe_nutrition'
+
+
+CREATE_MYSQL = f'''
+    CREATE TABLE IF NOT EXISTS {VECTOR_TABLE} (
+        recipe_id INT NOT NULL PRIMARY KEY,
+        kcal DOUBLE NULL,
+        fat DOUBLE NULL,
+        carb DOUBLE NULL,
+        fiber DOUBLE NULL,
+        net_carb DOUBLE NULL,
+        protein DOUBLE NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+'''
+
+CREATE_SQLITE = f'''
+    CREATE TABLE IF NOT EXISTS {VECTOR_TABLE} (
+        recipe_id INTEGER NOT NULL PRIMARY KEY,
+        kcal REAL NULL,
+        fat REAL NULL,
+        carb REAL NULL,
+        fiber REAL NULL,
+        net_carb REAL NULL,
+        protein REAL NULL,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+
+def _insert_statement(condition: str = '', base_units: bool = False) -> str:
+    """INSERT ... SELECT of the vectors of the recipes matching `condition`"""
+    columns = ', '.join(NUTRIENTS)
+    sums = ', '.join(f"SUM(N.{n}*{amount(base_units)})/r.servings {n}" for n in NUTRIENTS)
+    return f'''
+        INSERT INTO {VECTOR_TABLE} (recipe_id, {columns})
+        SELECT r.recipe_id, {sums}
+        FROM Recipe r
+        LEFT JOIN Recipe_Ingredients RI ON RI.recipe_id = r.recipe_id
+        LEFT JOIN Ingredient_Quantity IQ ON IQ.ingredient_quantity_id = RI.ingredient_quantity_id
+        {nutrition_join(base_units)}
+        {condition}
+        GROUP BY r.recipe_id, r.servings
+    '''
+
+
+def create_table(manager):
+    manager.execute_query(CREATE_MYSQL if manager.use_mysql else CREATE_SQLITE)
+
+
+def vectors_ready(manager) -> bool:
+    """True once the recipe_nutrition table exists"""
+    return ready(manager, VECTOR_TABLE, lambda: table_columns(manager, VECTOR_TABLE))
+
+
+def reset_vectors_state(manager):
+    """Forget the cached readiness check (used by the migration)"""
+    forget(manager, VECTOR_TABLE)
+
+
+def refresh_recipes(cursor, recipe_ids: Iterable[Optional[int]], base_units: bool = False):
+    """Recompute the vectors of `recipe_ids` on the caller's cursor (inside its transaction).
+
+    `base_units` tells whether Nutrition is stored per base unit (see unit_conversion.py).
+    """
+    ids = sorted({recipe_id for recipe_id in recipe_ids if recipe_id is not None})
+    for i in range(0, len(ids), LOOKUP_BATCH):
+        part = tuple(ids[i:i + LOOKUP_BATCH])
+        placeholders = ', '.join(['%s'] * len(part))
+        cursor.execute(f'DELETE FROM {VECTOR_TABLE} WHERE recipe_id IN ({placeholders})', part)
+        # Deleted recipes match nothing here, so their vector is simply gone
+        cursor.execute(_insert_statement(f'WHERE r.recipe_id IN ({placeholders})', base_units), part)
+
+
+def recipes_using(cursor, ingredient_ids: Iterable[int] = (), ingredient_quantity_ids: Iterable[int] = ()) -> List[int]:
+    """Recipes containing any of the ingredients or ingredient quantities"""
+    recipes = set()
+    ingredient_ids = sorted(set(ingredient_ids))
+    if ingredient_ids:
+        recipes.update(row[0] for row in select_in(cursor, '''
+            SELECT DISTINCT RI.recipe_id FROM Recipe_Ingredients RI
+            JOIN Ingredient_Quantity IQ ON IQ.ingredient_quantity_id = RI.ingredient_quantity_id
+            WHERE IQ.ingredient_id IN ({values})
+        ''', ingredient_ids))
+    ingredient_quantity_ids = sorted(set(ingredient_quantity_ids))
+    if ingredient_quantity_ids:
+        recipes.update(row[0] for row in select_in(
+            cursor, 'SELECT DISTINCT recipe_id FROM Recipe_Ingredients WHERE ingredient_quantity_id IN ({values})',
+            ingredient_quantity_ids))
+    return sorted(recipes)
+
+
+def rebuild(manager) -> int:
+    """Recompute every vector in one transaction; returns the number of recipes"""
+    with manager.get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f'DELETE FROM {VECTOR_TABLE}')
+            cursor.execute(_insert_statement(base_units=base_units_ready(manager)))
+            conn.commit()
+            cursor.execute(f'SELECT COUNT(*) FROM {VECTOR_TABLE}')
+            count = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+    manager.touch(VECTOR_TABLE)
+    return count
+
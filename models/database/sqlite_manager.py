@@ -0,0 +1,543 @@
+"""
+Embedded SQLite engine behind the DatabaseConnectionManager API.
+
+Single-user and local installs can run without a MySQL server by setting
+DB_ENGINE=sqlite (or the legacy USE_MYSQL=false). Queries written for MySQL
+keep working: placeholders, INSERT IGNORE, ON DUPLICATE KEY UPDATE and the
+MySQL date functions used by the services are translated on the fly.
+"""
+import os
+import re
+import sqlite3
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from functools import lru_cache
+from typing import Optional, Dict, Any
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from config.database import get_sqlite_config, SQLiteConfig, get_query_cache_config
+from models.database.query_cache import QueryCacheMixin, create_query_cache
+from models.database.sqlite_schema import ensure_core_schema
+
+logger = logging.getLogger(__name__)
+
+
+# ============== Query Translation ==============
+
+_LITERAL_RE = re.compile(r"""('(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*")""")
+_INSERT_IGNORE_RE = re.compile(r'\bINSERT\s+IGNORE\b', re.IGNORECASE)
+_ON_DUPLICATE_RE = re.compile(r'\bON\s+DUPLICATE\s+KEY\s+UPDATE\b', re.IGNORECASE)
+_VALUES_FUNC_RE = re.compile(r'\bVALUES\s*\(\s*`?(\w+)`?\s*\)', re.IGNORECASE)
+_INTERVAL_RE = re.compile(
+    r'\bINTERVAL\s+(\([^()]*(?:\([^()]*\)[^()]*)*\)|[^\s(),]+)\s+(DAY|WEEK|MONTH|YEAR)S?\b',
+    re.IGNORECASE
+)
+
+
+@lru_cache(maxsize=2048)
+def translate_query(query: str, has_params: bool) -> str:
+    """Translate a MySQL-dialect statement into SQLite"""
+    literals = []
+
+    def _mask(match):
+        literal = match.group(0)
+        # mysql-connector unescapes %% inside literals only when params are bound
+        literals.append(literal.replace('%%', '%') if has_params else literal)
+        return f'\x00{len(literals) - 1}\x00'
+
+    sql = _LITERAL_RE.sub(_mask, query)
+
+    if has_params:
+        sql = sql.replace('%s', '?').replace('%%', '%')
+
+    sql = _INSERT_IGNORE_RE.sub('INSERT OR IGNORE', sql)
+    upsert = _ON_DUPLICATE_RE.search(sql)
+    if upsert:
+        head, tail = sql[:upsert.start()], sql[upsert.end():]
+        sql = head + 'ON CONFLICT DO UPDATE SET' + _VALUES_FUNC_RE.sub(r'excluded.\1', tail)
+
+    sql = _INTERVAL_RE.sub(lambda m: f"{m.group(1)}, '{m.group(2).upper()}'", sql)
+
+    return re.sub('\x00(\\d+)\x00', lambda m: literals[int(m.group(1))], sql)
+
+
+# ============== MySQL Function Emulation ==============
+
+_MYSQL_TO_STRFTIME = {
+    '%d': '%d', '%e': '%-d', '%m': '%m', '%c': '%-m', '%Y': '%Y', '%y': '%y',
+    '%H': '%H', '%k': '%-H', '%i': '%M', '%s': '%S', '%S': '%S', '%p': '%p',
+    '%W': '%A', '%a': '%a', '%M': '%B', '%b': '%b', '%j': '%j', '%%': '%%',
+}
+
+
+def _convert_format(mysql_format: str, for_parsing: bool) -> str:
+    converted = re.sub(r'%.', lambda m: _MYSQL_TO_STRFTIME.get(m.group(0), m.group(0)), mysql_format)
+    if for_parsing:
+        # strptime accepts unpadded values for the padded directives
+        converted = converted.replace('%-', '%')
+    return converted
+
+
+def _to_datetime(value) -> Optional[datetime]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    try:
+        return datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        return None
+
+
+def _format_like(source, result: datetime) -> str:
+    # Keep the DATE vs DATETIME shape of the input, like MySQL does
+    text = str(source)
+    if isinstance(source, datetime) or (isinstance(source, str) and len(text) > 10):
+        return result.strftime('%Y-%m-%d %H:%M:%S')
+    return result.strftime('%Y-%m-%d')
+
+
+def _shift(value, amount, unit, sign):
+    moment = _to_datetime(value)
+    if moment is None or amount is None:
+        return None
+    amount = int(amount) * sign
+    unit = (unit or 'DAY').upper()
+
+    if unit == 'DAY':
+        result = moment + timedelta(days=amount)
+    elif unit == 'WEEK':
+        result = moment + timedelta(weeks=amount)
+    else:
+        months = amount * 12 if unit == 'YEAR' else amount
+        month_index = moment.month - 1 + months
+        year = moment.year + month_index // 12
+        month = month_index % 12 + 1
+        # Clamp to the last day of the target month (Jan 31 + 1 month = Feb 28)
+        next_month = date(year + (month == 12), month % 12 + 1, 1)
+        last_day = (next_month - timedelta(days=1)).day
+        result = moment.replace(year=year, month=month, day=min(moment.day, last_day))
+
+    return _format_like(value, result)
+
+
+def _str_to_date(value, mysql_format):
+    if value is None or mysql_format is None:
+        return None
+    try:
+        parsed = datetime.strptime(str(value).strip(), _convert_format(mysql_format, True))
+    except ValueError:
+        return None
+    if re.search(r'%[HkisSp]', mysql_format):
+        return parsed.strftime('%Y-%m-%d %H:%M:%S')
+    return parsed.strftime('%Y-%m-%d')
+
+
+def _date_format(value, mysql_format):
+    moment = _to_datetime(value)
+    if moment is None or mysql_format is None:
+        return None
+    return moment.strftime(_convert_format(mysql_format, False))
+
+
+def _datediff(first, second):
+    a, b = _to_datetime(first), _to_datetime(second)
+    if a is None or b is None:
+        return None
+    return (a.date() - b.date()).days
+
+
+def _weekday(value):
+    moment = _to_datetime(value)
+    return moment.weekday() if moment else None
+
+
+def _yearweek(value, mode=0):
+    moment = _to_datetime(value)
+    if moment is None:
+        return None
+    if int(mode or 0) % 2 == 1:
+        iso_year, iso_week, _ = moment.isocalendar()
+        return iso_year * 100 + iso_week
+    return int(moment.strftime('%Y%U'))
+
+
+def _greatest(*values):
+    return None if any(v is None for v in values) else max(values)
+
+
+def _least(*values):
+    return None if any(v is None for v in values) else min(values)
+
+
+def _concat(*values):
+    return None if any(v is None for v in values) else ''.join(str(v) for v in values)
+
+
+def _utc_now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _register_functions(conn: sqlite3.Connection):
+    """Register the MySQL functions used across the services"""
+    conn.create_function('CURDATE', 0, lambda: _utc_now().strftime('%Y-%m-%d'))
+    conn.create_function('NOW', 0, lambda: _utc_now().strftime('%Y-%m-%d %H:%M:%S'))
+    conn.create_function('DATE_SUB', 3, lambda d, n, u: _shift(d, n, u, -1))
+    conn.create_function('DATE_ADD', 3, lambda d, n, u: _shift(d, n, u, 1))
+    conn.create_function('STR_TO_DATE', 2, _str_to_date, deterministic=True)
+    conn.create_function('DATE_FORMAT', 2, _date_format, deterministic=True)
+    conn.create_function('DATEDIFF', 2, _datediff, deterministic=True)
+    conn.create_function('WEEKDAY', 1, _weekday, deterministic=True)
+    conn.create_function('YEARWEEK', 1, _yearweek, deterministic=True)
+    conn.create_function('YEARWEEK', 2, _yearweek, deterministic=True)
+    conn.create_function('YEAR', 1, lambda d: _to_datetime(d).year if _to_datetime(d) else None, deterministic=True)
+    conn.create_function('MONTH', 1, lambda d: _to_datetime(d).month if _to_datetime(d) else None, deterministic=True)
+    conn.create_function('GREATEST', -1, _greatest, deterministic=True)
+    conn.create_function('LEAST', -1, _least, deterministic=True)
+    conn.create_function('CONCAT', -1, _concat, deterministic=True)
+
+
+# ============== Type Adapters ==============
+
+def _convert_date(raw: bytes):
+    try:
+        return date.fromisoformat(raw.decode()[:10])
+    except ValueError:
+        return raw.decode()
+
+
+def _convert_datetime(raw: bytes):
+    try:
+        return datetime.fromisoformat(raw.decode())
+    except ValueError:
+        return raw.decode()
+
+
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+sqlite3.register_adapter(datetime, lambda d: d.strftime('%Y-%m-%d %H:%M:%S'))
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_converter('DATE', _convert_date)
+sqlite3.register_converter('DATETIME', _convert_datetime)
+sqlite3.register_converter('TIMESTAMP', _convert_datetime)
+
+
+# ============== Connection Wrappers ==============
+
+class SQLiteCursor:
+    """mysql-connector style cursor over sqlite3"""
+
+    def __init__(self, cursor: sqlite3.Cursor, dictionary: bool = False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    def execute(self, query: str, params=None):
+        if params is not None:
+            self._cursor.execute(translate_query(query, True), tuple(params))
+        else:
+            self._cursor.execute(translate_query(query, False))
+        return self
+
+    def executemany(self, query: str, params_list):
+        self._cursor.executemany(translate_query(query, True), [tuple(p) for p in params_list])
+        return self
+
+    def _to_row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._to_row(self._cursor.fetchone())
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        if not self._dictionary:
+            return rows
+        columns = [column[0] for column in self._cursor.description or ()]
+        return [dict(zip(columns, row)) for row in rows]
+
+    def fetchmany(self, size: int = 1):
+        return [self._to_row(row) for row in self._cursor.fetchmany(size)]
+
+    def __iter__(self):
+        return (self._to_row(row) for row in self._cursor)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """mysql-connector style connection over a cached sqlite3 connection.
+
+    Every holder on a thread shares that thread's sqlite3 connection, so only
+    the outermost one ends the transaction; commit() and rollback() of a
+    nested holder (an execute_query() inside an open get_connection()) leave
+    it to the caller that opened it.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, outermost: bool = True):
+        self._conn = conn
+        self._outermost = outermost
+
+    def cursor(self, dictionary: bool = False, **kwargs):
+        # buffered/prepared and friends are no-ops for sqlite3
+        return SQLiteCursor(self._conn.cursor(), dictionary=dictionary)
+
+    def commit(self):
+        if self._outermost:
+            self._conn.commit()
+
+    def rollback(self):
+        if self._outermost:
+            self._conn.rollback()
+
+    def is_connected(self) -> bool:
+        return True
+
+    def close(self):
+        # The per-thread connection is owned by the manager and reused
+        pass
+
+
+# ============== Manager ==============
+
+class SQLiteConnectionManager(QueryCacheMixin):
+    """Embedded SQLite database manager with the DatabaseConnectionManager contract"""
+
+    use_mysql = False
+
+    def __init__(self, config: SQLiteConfig = None):
+        self.config = config or get_sqlite_config()
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._schema_ready = False
+        self.query_cache = create_query_cache(get_query_cache_config())
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.config.path,
+            timeout=self.config.busy_timeout_ms / 1000.0,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False
+        )
+        conn.execute(f'PRAGMA journal_mode={self.config.journal_mode}')
+        conn.execute(f'PRAGMA synchronous={self.config.synchronous}')
+        conn.execute(f'PRAGMA busy_timeout={int(self.config.busy_timeout_ms)}')
+        conn.execute(f'PRAGMA cache_size=-{int(self.config.cache_size_kb)}')
+        conn.execute('PRAGMA foreign_keys=OFF')
+        _register_functions(conn)
+
+        # Bootstrap the schema once so a fresh file is immediately usable
+        if not self._schema_ready:
+            ensure_core_schema(conn)
+            self._schema_ready = True
+            logger.info(f"SQLite engine initialized at {self.config.path} (journal_mode={self.config.journal_mode})")
+        return conn
+
+    def _thread_connection(self) -> sqlite3.Connection:
+        # A forked worker must not reuse handles opened by the parent
+        if os.getpid() != self._pid:
+            self._local = threading.local()
+            self._connections = []
+            self._pid = os.getpid()
+
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def get_connection(self):
+        """Get the calling thread's SQLite connection (context manager).
+
+        Calls nest on the thread's one connection: only the outermost holder
+        commits or rolls back, so a nested query never ends its caller's
+        transaction.
+        """
+        conn = self._thread_connection()
+        depth = getattr(self._local, 'depth', 0)
+        self._local.depth = depth + 1
+        outermost = depth == 0
+        try:
+            yield SQLiteConnection(conn, outermost)
+        except sqlite3.Error as e:
+            if outermost:
+                try:
+                    conn.rollback()
+                except sqlite3.Error:
+                    pass
+            logger.error(f"SQLite connection error: {e}")
+            raise
+        finally:
+            self._local.depth = depth
+            # Mirror the MySQL manager: commit anything left pending on release
+            try:
+                if outermost and conn.in_transaction:
+                    conn.commit()
+            except sqlite3.Error:
+                pass
+
+    def execute_query(self, query: str, params: Optional[tuple] = None, fetch_one: bool = False,
+                      fetch_all: bool = False, cache_tables: Optional[tuple] = None):
+        """Execute query with automatic connection management.
+
+        Reads that pass cache_tables are served from the query cache until one
+        of those tables is written; writes bump the version of their table.
+        """
+        if cache_tables and (fetch_one or fetch_all):
+            return self._cached_fetch(
+                query, params, fetch_one, cache_tables,
+                lambda: self._run_query(query, params, fetch_one, fetch_all)
+            )
+
+        result = self._run_query(query, params, fetch_one, fetch_all)
+        self._note_write(query)
+        return result
+
+    def _run_query(self, query: str, params: Optional[tuple], fetch_one: bool, fetch_all: bool):
+        with self.get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+
+            try:
+                cursor.execute(query, params)
+
+                if fetch_one:
+                    result = cursor.fetchone()
+                elif fetch_all:
+                    result = cursor.fetchall()
+                else:
+                    result = cursor.rowcount
+
+                conn.commit()
+                return result
+
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Query execution error: {e}")
+                logger.error(f"Query: {query}")
+                logger.error(f"Params: {params}")
+                raise
+            finally:
+                cursor.close()
+
+    def execute_many(self, query: str, params_list: list):
+        """Execute query multiple times with different parameters"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.executemany(query, params_list)
+                conn.commit()
+                self._note_write(query)
+                return cursor.rowcount
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Execute many error: {e}")
+                raise
+            finally:
+                cursor.close()
+
+    def warm_up(self) -> Dict[str, Any]:
+        """Open this thread's connection ahead of the first request"""
+        started = time.perf_counter()
+        self.test_connection()
+        return {
+            'pid': os.getpid(),
+            'connections': len(self._connections),
+            'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+            'completed_at': time.time()
+        }
+
+    def pool_status(self) -> Dict[str, Any]:
+        """Readiness of the embedded engine, for health checks"""
+        return {
+            'engine': 'sqlite',
+            'ready': self._pid == os.getpid() and bool(self._connections),
+            'pid': os.getpid(),
+            'pool_size': len(self._connections),
+            'warmup': None
+        }
+
+    def get_table_info(self) -> Dict[str, Any]:
+        """Get information about all tables in the database"""
+        tables = {}
+
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
+            names = [row[0] for row in cursor.fetchall()]
+
+            for name in names:
+                cursor.execute(f'SELECT COUNT(*) FROM "{name}"')
+                tables[name] = {
+                    'row_count': cursor.fetchone()[0],
+                    'data_size': None,
+                    'index_size': None
+                }
+
+            cursor.close()
+
+        return tables
+
+    def test_connection(self) -> bool:
+        """Test the database connection"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT 1")
+                result = cursor.fetchone()
+                cursor.close()
+                return result is not None
+        except Exception as e:
+            logger.error(f"Connection test failed: {e}")
+            return False
+
+    def get_connection_info(self) -> Dict[str, Any]:
+        """Get database connection information"""
+        return {
+            'type': 'SQLite',
+            'path': self.config.path,
+            'database': self.config.database,
+            'journal_mode': self.config.journal_mode,
+            'open_connections': len(self._connections)
+        }
+
+    def cleanup_connections(self):
+        """Close every cached per-thread connection"""
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error as e:
+                    logger.error(f"Error during connection cleanup: {e}")
+            self._connections = []
+        self._local = threading.local()
+
+    def __del__(self):
+        """Cleanup on destruction"""
+        try:
+            self.cleanup_connections()
+        except:
+            pass
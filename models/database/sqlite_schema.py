@@ -0,0 +1,134 @@
+"""
+Core nutrition schema for the embedded SQLite engine.
+
+The MySQL deployment owns its schema through the migrations package; a fresh
+SQLite file has nothing, so the embedded engine bootstraps the nutrition
+tables it needs on first use. Every statement is idempotent.
+"""
+
+CORE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS Unit (
+        unit_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        unit_name TEXT NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Ingredient (
+        ingredient_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ingredient_name TEXT NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Ingredient_Quantity (
+        ingredient_quantity_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ingredient_id INTEGER NOT NULL,
+        unit_id INTEGER NOT NULL,
+        quantity REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_iq_ingredient_unit ON Ingredient_Quantity (ingredient_id, unit_id)",
+    """
+    CREATE TABLE IF NOT EXISTS Nutrition (
+        ingredient_id INTEGER NOT NULL,
+        unit_id INTEGER NOT NULL,
+        kcal REAL,
+        fat REAL,
+        carb REAL,
+        fiber REAL,
+        net_carb REAL,
+        protein REAL,
+        PRIMARY KEY (ingredient_id, unit_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Consumption (
+        consumption_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        consumption_date TEXT NOT NULL,
+        ingredient_quantity_id INTEGER NOT NULL,
+        ingredient_quantity_portions REAL NOT NULL DEFAULT 1,
+        meal_type TEXT DEFAULT 'other',
+        entry_date DATE
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_consumption_date ON Consumption (consumption_date)",
+    """
+    CREATE TABLE IF NOT EXISTS Recipe (
+        recipe_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        recipe_name TEXT NOT NULL,
+        recipe_date TEXT,
+        servings REAL NOT NULL DEFAULT 1
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Recipe_Ingredients (
+        recipe_id INTEGER NOT NULL,
+        ingredient_quantity_id INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_recipe ON Recipe_Ingredients (recipe_id)",
+    """
+    CREATE TABLE IF NOT EXISTS Favorites (
+        favorite_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ingredient_id INTEGER NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS recipe_consumption (
+        recipe_consumption_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        recipe_id INTEGER NOT NULL,
+        consumption_date TEXT NOT NULL,
+        meal_type TEXT DEFAULT 'other',
+        servings REAL NOT NULL DEFAULT 1,
+        entry_date DATE,
+        UNIQUE (recipe_id, consumption_date, meal_type)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS calorie_tracking (
+        date TEXT PRIMARY KEY,
+        calories REAL,
+        total_calories REAL,
+        entry_date DATE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS body_weight_tracking (
+        date TEXT PRIMARY KEY,
+        weight REAL,
+        entry_date DATE
+    )
+    """,
+]
+
+# Columns added after the first release; files created earlier get them on startup
+CORE_COLUMNS = [
+    ('Consumption', 'entry_date', 'DATE'),
+    ('recipe_consumption', 'entry_date', 'DATE'),
+    ('calorie_tracking', 'entry_date', 'DATE'),
+    ('body_weight_tracking', 'entry_date', 'DATE'),
+]
+
+CORE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_consumption_entry_date ON Consumption (entry_date)",
+    "CREATE INDEX IF NOT EXISTS idx_recipe_consumption_entry_date ON recipe_consumption (entry_date)",
+    "CREATE INDEX IF NOT EXISTS idx_calorie_tracking_entry_date ON calorie_tracking (entry_date)",
+    "CREATE INDEX IF NOT EXISTS idx_body_weight_tracking_entry_date ON body_weight_tracking (entry_date)",
+]
+
+
+def ensure_core_schema(conn) -> None:
+    """Create the core nutrition tables on a raw sqlite3 connection"""
+    cursor = conn.cursor()
+    try:
+        for statement in CORE_SCHEMA:
+            cursor.execute(statement)
+        for table, column, declaration in CORE_COLUMNS:
+            cursor.execute(f'PRAGMA table_info("{table}")')
+            if column not in {row[1] for row in cursor.fetchall()}:
+                cursor.execute(f'ALTER TABLE "{table}" ADD COLUMN {column} {declaration}')
+        for statement in CORE_INDEXES:
+            cursor.execute(statement)
+        conn.commit()
+    finally:
+        cursor.close()
@@ -0,0 +1,394 @@
+"""
+Unit conversion graph: nutrition stored once per ingredient, in a base unit.
+
+Nutrition used to hold one row per (ingredient, unit): "1 g", "1 kg",
+"1 cup" and "1 large" of the same food were separate rows, each typed in
+(or analyzed) on its own, and a food logged in a new unit had no nutrition
+until someone entered it again. Once migrations/add_unit_conversions.py has
+run, every ingredient has a single Nutrition row: per gram, per millilitre,
+or - for foods only ever counted (eggs, slices) - per one of its own units.
+Every other unit is reached through a conversion graph:
+- mass and volume units convert by fixed factors (SCALES);
+- per-ingredient edges in unit_conversions add densities (1 ml of milk =
+  1.03 g) and named portions (1 large egg = 50 g). Edges are also learnt
+  when nutrition is given for a unit the graph cannot reach yet, as the
+  ratio of that nutrition to the base row.
+
+Each Ingredient_Quantity row caches its conversion (base_unit_id,
+unit_factor = base units per unit), so readers join Nutrition on the base
+unit and scale by the factor (nutrition_join(), amount()) instead of walking
+the graph. Writers keep the cache current with store_nutrition() and
+refresh_factors() on their own cursor.
+"""
+import re
+import logging
+from collections import defaultdict, deque
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from models.database.index_advisor import table_columns
+from models.database.ingredient_ingest import resolve_names, select_in
+from models.database.readiness import forget, ready
+
+logger = logging.getLogger(__name__)
+
+CONVERSIONS_TABLE = 'unit_conversions'
+BASE_COLUMN = 'base_unit_id'
+FACTOR_COLUMN = 'unit_factor'
+
+NUTRITION_COLUMNS = ('kcal', 'fat', 'carb', 'fiber', 'net_carb', 'protein')
+
+# Relative difference under which replacement nutrition counts as unchanged
+MATCH_TOLERANCE = 0.01
+
+
+# symbol: (base symbol, base units per unit)
+SCALES = {
+    'g': ('g', 1.0),
+    'kg': ('g', 1000.0),
+    'mg': ('g', 0.001),
+    'oz': ('g', 28.349523125),
+    'lb': ('g', 453.59237),
+    'ml': ('ml', 1.0),
+    'l': ('ml', 1000.0),
+    'dl': ('ml', 100.0),
+    'cl': ('ml', 10.0),
+    'tsp': ('ml', 4.92892159375),
+    'tbsp': ('ml', 14.78676478125),
+    'fl oz': ('ml', 29.5735295625),
+    'cup': ('ml', 240.0),
+    'pint': ('ml', 473.176473),
+}
+
+UNIT_SYNONYMS = {
+    'g': ('g', 'gr', 'grs', 'gram', 'grams', 'gramme', 'grammes'),
+    'kg': ('kg', 'kgs', 'kilo', 'kilos', 'kilogram', 'kilograms'),
+    'mg': ('mg', 'milligram', 'milligrams'),
+    'oz': ('oz', 'ounce', 'ounces'),
+    'lb': ('lb', 'lbs', 'pound', 'pounds'),
+    'ml': ('ml', 'milliliter', 'milliliters', 'millilitre', 'millilitres'),
+    'l': ('l', 'liter', 'liters', 'litre', 'litres'),
+    'dl': ('dl', 'deciliter', 'deciliters', 'decilitre', 'decilitres'),
+    'cl': ('cl', 'centiliter', 'centiliters', 'centilitre', 'centilitres'),
+    'tsp': ('tsp', 'tsps', 'teaspoon', 'teaspoons'),
+    'tbsp': ('tbsp', 'tbsps', 'tbs', 'tablespoon', 'tablespoons'),
+    'fl oz': ('fl oz', 'floz', 'fluid ounce', 'fluid ounces'),
+    'cup': ('cup', 'cups'),
+    'pint': ('pint', 'pints', 'pt'),
+}
+_SYMBOLS = {synonym: symbol for symbol, synonyms in UNIT_SYNONYMS.items() for synonym in synonyms}
+
+CREATE_MYSQL = f'''
+    CREATE TABLE IF NOT EXISTS {CONVERSIONS_TABLE} (
+        ingredient_id INT NOT NULL,
+        unit_id INT NOT NULL,
+        to_unit_id INT NOT NULL,
+        factor DOUBLE NOT NULL,
+        PRIMARY KEY (ingredient_id, unit_id)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+'''
+
+CREATE_SQLITE = f'''
+    CREATE TABLE IF NOT EXISTS {CONVERSIONS_TABLE} (
+        ingredient_id INTEGER NOT NULL,
+        unit_id INTEGER NOT NULL,
+        to_unit_id INTEGER NOT NULL,
+        factor REAL NOT NULL,
+        PRIMARY KEY (ingredient_id, unit_id)
+    )
+'''
+
+Edge = Tuple[int, int, float]
+
+
+# ============== Units ==============
+
+def unit_symbol(name: Optional[str]) -> Optional[str]:
+    """Symbol of a mass or volume unit name ('Grams' -> 'g'), None for portions"""
+    text = re.sub(r'\s+', ' ', (name or '').casefold().strip().rstrip('.'))
+    return _SYMBOLS.get(text)
+
+
+def scale(name: Optional[str]) -> Optional[Tuple[str, float]]:
+    """(base symbol, base units per unit) of a mass or volume unit name"""
+    symbol = unit_symbol(name)
+    return SCALES[symbol] if symbol else None
+
+
+def conversion_factor(names: Dict[int, str], edges: Iterable[Edge], unit_id: int, base_unit_id: int
+                      ) -> Optional[float]:
+    """How many `base_unit_id` one `unit_id` is, or None when the graph has no path.
+
+    Mass and volume units collapse into one node per base symbol; `edges`
+    are the ingredient's (unit_id, to_unit_id, factor) conversions.
+    """
+    def node(unit):
+        fixed = scale(names.get(unit))
+        return fixed if fixed else (unit, 1.0)
+
+    (start, start_scale), (goal, goal_scale) = node(unit_id), node(base_unit_id)
+    if start == goal:
+        return start_scale / goal_scale
+
+    neighbours = defaultdict(list)
+    for source, target, factor in edges:
+        if not factor or factor <= 0:
+            continue
+        (a, a_scale), (b, b_scale) = node(source), node(target)
+        # 1 a = factor * b_scale / a_scale of b
+        weight = float(factor) * b_scale / a_scale
+        neighbours[a].append((b, weight))
+        neighbours[b].append((a, 1 / weight))
+
+    seen, queue = {start: 1.0}, deque([start])
+    while queue:
+        current = queue.popleft()
+        for target, weight in neighbours[current]:
+            if target not in seen:
+                seen[target] = seen[current] * weight
+                if target == goal:
+                    return start_scale * seen[target] / goal_scale
+                queue.append(target)
+    return None
+
+
+def _ratio(values: Sequence[float], base: Sequence[float]) -> Optional[float]:
+    """Base units per unit implied by two nutrition rows of the same food"""
+    if values[0] > 0 and base[0] > 0:
+        return values[0] / base[0]
+    # kcal missing: fat + carb + protein
+    macros, base_macros = values[1] + values[2] + values[5], base[1] + base[2] + base[5]
+    if macros > 0 and base_macros > 0:
+        return macros / base_macros
+    if not any(values) and not any(base):
+        # Nothing to scale (water, black coffee)
+        return 1.0
+    return None
+
+
+def _agrees(values: Sequence[float], expected: Sequence[float]) -> bool:
+    return all(abs(a - b) <= MATCH_TOLERANCE * max(abs(a), abs(b)) + 1e-6 for a, b in zip(values, expected))
+
+
+# ============== Schema ==============
+
+def create_table(manager):
+    manager.execute_query(CREATE_MYSQL if manager.use_mysql else CREATE_SQLITE)
+
+
+def base_units_ready(manager) -> bool:
+    """True once Nutrition is collapsed to base units (see migrations/add_unit_conversions.py)"""
+    return ready(manager, CONVERSIONS_TABLE, lambda: table_columns(manager, CONVERSIONS_TABLE))
+
+
+def reset_base_units_state(manager):
+    """Forget the cached readiness check (used by the migration)"""
+    forget(manager, CONVERSIONS_TABLE)
+
+
+def nutrition_join(base_units: bool, iq: str = 'IQ', alias: str = 'N') -> str:
+    """LEFT JOIN of the Nutrition row that prices the `iq` Ingredient_Quantity row"""
+    unit_column = BASE_COLUMN if base_units else 'unit_id'
+    return (f'LEFT JOIN Nutrition {alias} ON {alias}.ingredient_id = {iq}.ingredient_id '
+            f'AND {alias}.unit_id = {iq}.{unit_column}')
+
+
+def amount(base_units: bool, iq: str = 'IQ') -> str:
+    """The `iq` quantity in the unit its Nutrition row is stored for"""
+    return f'{iq}.quantity*{iq}.{FACTOR_COLUMN}' if base_units else f'{iq}.quantity'
+
+
+# ============== Writers (caller's cursor, no commit) ==============
+
+def _unit_names(cursor, unit_ids: Iterable[int]) -> Dict[int, str]:
+    return dict(select_in(cursor, 'SELECT unit_id, unit_name FROM Unit WHERE unit_id IN ({values})',
+                          sorted(set(unit_ids))))
+
+
+def _load(cursor, ingredient_ids: Sequence[int]) -> Tuple[Dict[int, Tuple[int, List[float]]], Dict[int, List[Edge]]]:
+    """Base Nutrition row and conversion edges of every ingredient"""
+    bases = {}
+    for ingredient_id, unit_id, *values in sorted(select_in(cursor, f'''
+        SELECT ingredient_id, unit_id, {', '.join(NUTRITION_COLUMNS)} FROM Nutrition WHERE ingredient_id IN ({{values}})
+    ''', ingredient_ids)):
+        bases.setdefault(ingredient_id, (unit_id, [float(value or 0) for value in values]))
+    edges = defaultdict(list)
+    for ingredient_id, unit_id, to_unit_id, factor in select_in(cursor, f'''
+        SELECT ingredient_id, unit_id, to_unit_id, factor FROM {CONVERSIONS_TABLE} WHERE ingredient_id IN ({{values}})
+    ''', ingredient_ids):
+        edges[ingredient_id].append((unit_id, to_unit_id, float(factor)))
+    return bases, edges
+
+
+def store_nutrition(cursor, rows: Iterable[Tuple[int, int, Sequence[float]]], replace: bool = False) -> List[int]:
+    """Save per-unit nutrition (ingredient_id, unit_id, NUTRITION_COLUMNS values) as base rows.
+
+    An ingredient without nutrition gets its base row: per gram or
+    millilitre for mass and volume units, else per the unit itself. A unit
+    the graph cannot reach yet becomes an edge to the base unit. Units it
+    reaches change the base row only when `replace`. Refreshes the cached
+    factors of every ingredient in `rows`; returns the ingredients whose
+    nutrition changed.
+    """
+    rows = [(ingredient_id, unit_id, [float(value or 0) for value in values])
+            for ingredient_id, unit_id, values in rows]
+    ids = sorted({row[0] for row in rows})
+    if not ids:
+        return []
+    bases, edges = _load(cursor, ids)
+    names = _unit_names(cursor, [row[1] for row in rows] + [base[0] for base in bases.values()]
+                        + [unit for ingredient_edges in edges.values() for edge in ingredient_edges for unit in edge[:2]])
+    base_symbols = {}
+
+    inserted, updated, new_edges, unreachable = set(), set(), [], 0
+    for ingredient_id, unit_id, values in rows:
+        if ingredient_id not in bases:
+            fixed = scale(names.get(unit_id))
+            if fixed:
+                symbol, factor = fixed
+                if symbol not in base_symbols:
+                    base_symbols[symbol] = resolve_names(cursor, 'Unit', 'unit_id', 'unit_name', [symbol])[0][symbol]
+                    names[base_symbols[symbol]] = symbol
+                base_unit_id = base_symbols[symbol]
+            else:
+                base_unit_id, factor = unit_id, 1.0
+            bases[ingredient_id] = (base_unit_id, [value / factor for value in values])
+            inserted.add(ingredient_id)
+            continue
+
+        base_unit_id, base = bases[ingredient_id]
+        factor = conversion_factor(names, edges[ingredient_id], unit_id, base_unit_id)
+        if factor is None:
+            factor = _ratio(values, base)
+            if factor is None:
+                unreachable += 1
+                continue
+            edges[ingredient_id].append((unit_id, base_unit_id, factor))
+            new_edges.append((ingredient_id, unit_id, base_unit_id, factor))
+        elif replace and not _agrees(values, [value * factor for value in base]):
+            bases[ingredient_id] = (base_unit_id, [value / factor for value in values])
+            updated.add(ingredient_id)
+
+    columns = ', '.join(NUTRITION_COLUMNS)
+    if inserted:
+        cursor.executemany(f'''
+            INSERT INTO Nutrition (ingredient_id, unit_id, {columns}) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
+        ''', [(ingredient_id, bases[ingredient_id][0], *bases[ingredient_id][1]) for ingredient_id in sorted(inserted)])
+    if updated - inserted:
+        cursor.executemany(f'''
+            UPDATE Nutrition SET {', '.join(f'{column}=%s' for column in NUTRITION_COLUMNS)}
+            WHERE ingredient_id=%s AND unit_id=%s
+        ''', [(*bases[ingredient_id][1], ingredient_id, bases[ingredient_id][0])
+              for ingredient_id in sorted(updated - inserted)])
+    if new_edges:
+        cursor.executemany(f'INSERT INTO {CONVERSIONS_TABLE} (ingredient_id, unit_id, to_unit_id, factor) '
+                           f'VALUES (%s,%s,%s,%s)', new_edges)
+    if unreachable:
+        logger.info(f"{unreachable} unit(s) left without nutrition: no conversion to their base unit")
+
+    refresh_factors(cursor, ids)
+    return sorted(inserted | updated | {edge[0] for edge in new_edges})
+
+
+def set_conversion(cursor, ingredient_id: int, unit_id: int, to_unit_id: int, factor: float):
+    """Define 1 `unit_id` = `factor` `to_unit_id` for the ingredient (a density or named portion)"""
+    cursor.execute(f'DELETE FROM {CONVERSIONS_TABLE} WHERE ingredient_id = %s AND unit_id = %s',
+                   (ingredient_id, unit_id))
+    cursor.execute(f'INSERT INTO {CONVERSIONS_TABLE} (ingredient_id, unit_id, to_unit_id, factor) '
+                   f'VALUES (%s,%s,%s,%s)', (ingredient_id, unit_id, to_unit_id, float(factor)))
+    refresh_factors(cursor, [ingredient_id])
+
+
+def refresh_factors(cursor, ingredient_ids: Iterable[int]):
+    """Recompute the cached base_unit_id / unit_factor of the ingredients' quantity rows"""
+    ids = sorted({ingredient_id for ingredient_id in ingredient_ids if ingredient_id is not None})
+    if not ids:
+        return
+    pairs = select_in(cursor, f'''
+        SELECT DISTINCT ingredient_id, unit_id, {BASE_COLUMN}, {FACTOR_COLUMN} FROM Ingredient_Quantity
+        WHERE ingredient_id IN ({{values}})
+    ''', ids)
+    bases, edges = _load(cursor, ids)
+    names = _unit_names(cursor, [pair[1] for pair in pairs] + [base[0] for base in bases.values()]
+                        + [unit for ingredient_edges in edges.values() for edge in ingredient_edges for unit in edge[:2]])
+
+    updates = {}
+    for ingredient_id, unit_id, cached_base, cached_factor in pairs:
+        base_unit_id, factor = bases.get(ingredient_id, (None, None))[0], None
+        if base_unit_id is not None:
+            factor = conversion_factor(names, edges[ingredient_id], unit_id, base_unit_id)
+        if factor is None:
+            base_unit_id = None
+        if cached_base != base_unit_id or (cached_factor is None) != (factor is None) or (
+                factor is not None and abs(float(cached_factor) - factor) > 1e-9 * factor):
+            updates[(ingredient_id, unit_id)] = (base_unit_id, factor, ingredient_id, unit_id)
+    if updates:
+        cursor.executemany(f'''
+            UPDATE Ingredient_Quantity SET {BASE_COLUMN} = %s, {FACTOR_COLUMN} = %s
+            WHERE ingredient_id = %s AND unit_id = %s
+        ''', list(updates.values()))
+
+
+def nutrients_in(cursor, ingredient_id: int, unit_id: int) -> Optional[Dict[str, float]]:
+    """Nutrition of one `unit_id` of the ingredient, or None when it cannot be converted"""
+    bases, edges = _load(cursor, [ingredient_id])
+    if ingredient_id not in bases:
+        return None
+    base_unit_id, base = bases[ingredient_id]
+    names = _unit_names(cursor, [unit_id, base_unit_id] + [unit for edge in edges[ingredient_id] for unit in edge[:2]])
+    factor = conversion_factor(names, edges[ingredient_id], unit_id, base_unit_id)
+    if factor is None:
+        return None
+    return {column: value * factor for column, value in zip(NUTRITION_COLUMNS, base)}
+
+
+# ============== Collapsing per-unit rows ==============
+
+def collapse_rows(rows: List[Tuple[int, int, List[float]]], usage: Dict[Tuple[int, int], int],
+                  names: Dict[int, str], base_symbols: Dict[str, int], edges: Dict[int, List[Edge]]) -> Dict:
+    """Plan the collapse of per-unit Nutrition rows into one base row per ingredient.
+
+    `rows` are (ingredient_id, unit_id, values), `usage` counts quantity
+    rows per (ingredient_id, unit_id), `base_symbols` maps 'g' / 'ml' to
+    their unit ids and `edges` holds conversions already defined. Rows the
+    graph reaches from the base row are dropped (fixed conversions win over
+    typed-in values); the others become edges derived from their ratio to
+    the base row. Returns {'bases':
+    {ingredient_id: (unit_id, values)}, 'edges': [(ingredient_id, unit_id,
+    to_unit_id, factor)], 'dropped': [(ingredient_id, unit_id)], 'lost': n}.
+    """
+    by_ingredient = defaultdict(list)
+    for ingredient_id, unit_id, values in rows:
+        by_ingredient[ingredient_id].append((unit_id, values))
+
+    plan = {'bases': {}, 'edges': [], 'dropped': [], 'lost': 0}
+    for ingredient_id, units in by_ingredient.items():
+        ingredient_edges = list(edges.get(ingredient_id, []))
+
+        def preference(row):
+            fixed = scale(names.get(row[0]))
+            # Mass before volume before portions; then the exact base unit, then the most used
+            dimension = {'g': 0, 'ml': 1}[fixed[0]] if fixed else 2
+            return dimension, fixed is None or fixed[1] != 1.0, -usage.get((ingredient_id, row[0]), 0), row[0]
+
+        preferred_unit, preferred = min(units, key=preference)
+        fixed = scale(names.get(preferred_unit))
+        if fixed:
+            base_unit_id = base_symbols[fixed[0]]
+            base = [value / fixed[1] for value in preferred]
+        else:
+            base_unit_id, base = preferred_unit, list(preferred)
+        plan['bases'][ingredient_id] = (base_unit_id, base)
+
+        for unit_id, values in units:
+            if unit_id == base_unit_id:
+                continue
+            if conversion_factor(names, ingredient_edges, unit_id, base_unit_id) is None:
+                # Not reachable from the base row: keep what was typed in as an edge
+                ratio = _ratio(values, base)
+                if ratio is None:
+                    plan['lost'] += 1
+                else:
+                    ingredient_edges.append((unit_id, base_unit_id, ratio))
+                    plan['edges'].append((ingredient_id, unit_id, base_unit_id, ratio))
+            plan['dropped'].append((ingredient_id, unit_id))
+    return plan
@@ -0,0 +1,141 @@
+"""
+Body weight series: every weigh-in in one indexed store.
+
+Weights used to live in two tables: the nutrition log's body_weight_tracking
+(one string-dated row per day, read by the home dashboard and analytics) and
+the cycling side's body_weights (a native DATE per user, read for W/kg).
+migrations/add_weight_series.py copies the first into the second and adds
+body_weights.source; from then on both sides read and write body_weights
+through this module, keyed on (user_id, date), and body_weight_tracking is
+only kept for rollback. Until then fetch() reads both tables, so the trend
+(see models/services/weight_trend.py) is built from one series either way.
+
+Nutrition logs are single-user today and write DEFAULT_USER, as in the
+daily_nutrition rollup. Every read is for an owner: a user's series is their
+own weigh-ins plus the unowned ones, theirs winning on the same day, and
+DEFAULT_USER's series is the nutrition log alone. Reads select by
+(user_id, date) in SQL, so they use the table's index.
+"""
+import logging
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from models.database.daily_nutrition import DEFAULT_USER
+from models.database.energy_balance import invalidate as invalidate_energy
+from models.database.index_advisor import table_columns
+from models.database.native_dates import to_date
+from models.database.readiness import forget, ready
+
+logger = logging.getLogger(__name__)
+
+SERIES_TABLE = 'body_weights'
+LEGACY_TABLE = 'body_weight_tracking'
+SOURCE_COLUMN = 'source'
+
+# Where a weigh-in was entered
+SOURCE_LOG = 'log'
+SOURCE_CYCLING = 'cycling'
+
+# Tables a series read depends on
+SERIES_TABLES = (SERIES_TABLE, LEGACY_TABLE)
+
+CREATE_MYSQL = f'''
+    CREATE TABLE IF NOT EXISTS {SERIES_TABLE} (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id VARCHAR(36) NOT NULL,
+        date DATE NOT NULL,
+        weight_kg FLOAT NOT NULL,
+        {SOURCE_COLUMN} VARCHAR(16) NOT NULL DEFAULT '{SOURCE_CYCLING}',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        UNIQUE KEY unique_user_date (user_id, date),
+        INDEX idx_user_date (user_id, date)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+'''
+
+CREATE_SQLITE = f'''
+    CREATE TABLE IF NOT EXISTS {SERIES_TABLE} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        date DATE NOT NULL,
+        weight_kg REAL NOT NULL,
+        {SOURCE_COLUMN} TEXT NOT NULL DEFAULT '{SOURCE_CYCLING}',
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (user_id, date)
+    )
+'''
+
+Point = Tuple[date, float]
+
+
+def create_table(manager):
+    manager.execute_query(CREATE_MYSQL if manager.use_mysql else CREATE_SQLITE)
+
+
+def _has_series(manager) -> bool:
+    """True once body_weights exists (the cycling side creates it)"""
+    return ready(manager, SERIES_TABLE, lambda: table_columns(manager, SERIES_TABLE))
+
+
+def series_ready(manager) -> bool:
+    """True once the weight stores are merged into body_weights"""
+    return ready(manager, (SERIES_TABLE, SOURCE_COLUMN), lambda: SOURCE_COLUMN in table_columns(manager, SERIES_TABLE))
+
+
+def reset_series_state(manager):
+    """Forget the cached readiness checks (used by the migration)"""
+    forget(manager, SERIES_TABLE, (SERIES_TABLE, SOURCE_COLUMN))
+
+
+def record(manager, day: date, weight_kg: float, user_id: str = DEFAULT_USER, source: str = SOURCE_LOG,
+           replace: bool = True):
+    """Store one weigh-in; an existing one of the same user and day is replaced, or kept when not `replace`"""
+    if replace:
+        manager.execute_query(f'''
+            INSERT INTO {SERIES_TABLE} (user_id, date, weight_kg, {SOURCE_COLUMN})
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                weight_kg = VALUES(weight_kg),
+                {SOURCE_COLUMN} = VALUES({SOURCE_COLUMN}),
+                updated_at = CURRENT_TIMESTAMP
+        ''', (user_id, day, weight_kg, source))
+    else:
+        manager.execute_query(f'INSERT IGNORE INTO {SERIES_TABLE} (user_id, date, weight_kg, {SOURCE_COLUMN}) '
+                              f'VALUES (%s, %s, %s, %s)', (user_id, day, weight_kg, source))
+    # The trend weight changes from this day on, and the maintenance estimates with it
+    invalidate_energy(manager, [day], user_id=user_id)
+
+
+def _rows(manager, user_id: str, start: Optional[date]) -> List[Tuple[str, Optional[date], float]]:
+    """(user_id, day, weight) of the weigh-ins of `user_id` and the unowned ones, from `start` on"""
+    merged = series_ready(manager)
+    rows = []
+    if merged or _has_series(manager):
+        query = f'SELECT user_id, date, weight_kg FROM {SERIES_TABLE} WHERE user_id IN (%s, %s)'
+        params = (user_id, DEFAULT_USER)
+        if start is not None:
+            query += ' AND date >= %s'
+            params += (start,)
+        rows += [(row['user_id'], to_date(row['date']), float(row['weight_kg']))
+                 for row in manager.execute_query(query, params, fetch_all=True, cache_tables=(SERIES_TABLE,)) or []]
+    if not merged:
+        # Before the merge the nutrition log's weigh-ins are still only in the legacy table
+        rows += [(DEFAULT_USER, to_date(row['date']), float(row['weight']))
+                 for row in manager.execute_query(f'SELECT date, weight FROM {LEGACY_TABLE}',
+                                                  fetch_all=True, cache_tables=(LEGACY_TABLE,)) or []
+                 if row['weight'] not in (None, '')]
+    return rows
+
+
+def fetch(manager, user_id: str = DEFAULT_USER, start: Optional[date] = None) -> List[Point]:
+    """(day, weight) of `user_id`'s series oldest first: one weigh-in per day from `start` on, owned rows winning"""
+    chosen: Dict[date, Tuple[bool, float]] = {}
+    for owner, day, weight in _rows(manager, user_id, start):
+        # Legacy rows are only filtered here: their date is a string
+        if day is None or (start is not None and day < start):
+            continue
+        owned = owner != DEFAULT_USER
+        if day not in chosen or owned >= chosen[day][0]:
+            chosen[day] = (owned, weight)
+    return [(day, chosen[day][1]) for day in sorted(chosen)]
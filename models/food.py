@@ -1,5 +1,15 @@
 import os
+from dataclasses import dataclass
 from models.database.connection_manager import get_db_manager
+from models.database.native_dates import legacy_parse_sql, native_date_reads, native_date_writes, to_date
+from models.database import daily_nutrition, ingredient_ingest
+from models.database.daily_nutrition import ROLLUP_TABLE, rollup_ready, refresh_days
+from models.database.energy_balance import energy_ready, invalidate as invalidate_energy
+from models.database.food_catalog import changes_ready, record_change
+from models.database.ingredient_canon import canonical_key, canonical_keys_ready
+from models.database.recipe_nutrition import VECTOR_TABLE, recipes_using, refresh_recipes, vectors_ready
+from models.database.unit_conversion import (CONVERSIONS_TABLE, amount, base_units_ready, nutrition_join,
+                                             refresh_factors, set_conversion, store_nutrition)
 from datetime import datetime
 
 # Use environment variable for database path (for backward compatibility)
@@ -10,6 +20,27 @@ if not db_path.startswith('/'):
 DATABASE_PATH = db_path
 
 
+# Tables behind the consumption aggregates; writes to any of them invalidate cached reads
+AVG_NUTRITION_TABLES = ('Consumption', 'recipe_consumption', 'Recipe', 'Recipe_Ingredients',
+                        'Ingredient_Quantity', 'Nutrition')
+
+
+@dataclass(frozen=True)
+class WriteReadiness:
+    """Which derived stores a write maintains, resolved before its transaction opens.
+
+    The *_ready() probes query the database again while their answer is no,
+    so multi-step writers take them up front and keep every statement of the
+    transaction on its own cursor.
+    """
+    canonical_keys: bool
+    base_units: bool
+    rollup: bool
+    vectors: bool
+    changes: bool
+    energy: bool
+
+
 # noinspection SqlNoDataSourceInspection
 class FoodDatabase:
 
@@ -37,6 +68,7 @@ class FoodDatabase:
                 # Insert if it doesn't exist
                 cursor.execute('INSERT INTO Unit (unit_name) VALUES (%s)', (data,))
                 conn.commit()
+                self.connection_manager.touch('Unit')
                 return cursor.lastrowid
                 unit_id = cursor.fetchone()
                 if unit_id:
@@ -48,6 +80,14 @@ class FoodDatabase:
         with self.connection_manager.get_connection() as conn:
             cursor = conn.cursor()
             try:
+                if canonical_keys_ready(self.connection_manager):
+                    # Same canonical key as an existing ingredient -> that ingredient
+                    ids, added = ingredient_ingest.resolve_ingredients(cursor, [data], canonical_key)
+                    if added:
+                        conn.commit()
+                        self.connection_manager.touch('Ingredient')
+                    return ids[data]
+
                 # MySQL-only code:
                 # First check if it exists
                 cursor.execute('SELECT ingredient_id FROM Ingredient WHERE ingredient_name = %s', (data,))
@@ -61,6 +101,7 @@ class FoodDatabase:
                 # Insert if it doesn't exist
                 cursor.execute('INSERT INTO Ingredient (ingredient_name) VALUES (%s)', (data,))
                 conn.commit()
+                self.connection_manager.touch('Ingredient')
                 return cursor.lastrowid
                 ingredient_id = cursor.fetchone()
                 if ingredient_id:
@@ -72,33 +113,43 @@ class FoodDatabase:
         if serv is not None:
             quantity = float(quantity)/float(serv)
 
+        ready = self._readiness()
         with self.connection_manager.get_connection() as conn:
             cursor = conn.cursor()
             try:
-                # MySQL-only code:
-                # First check if it already exists
-                cursor.execute('SELECT ingredient_quantity_id FROM Ingredient_Quantity WHERE ingredient_id=%s AND unit_id=%s AND quantity=%s', (ingredient_id, unit_id, quantity))
-                existing = cursor.fetchone()
-                # Consume any remaining results
-                cursor.fetchall()
-
-                if existing:
-                    return existing[0]
-
-                # Insert new record
-                cursor.execute('INSERT INTO Ingredient_Quantity (quantity, ingredient_id, unit_id) VALUES (%s,%s,%s)', (quantity, ingredient_id, unit_id,))
+                ingredient_quantity_id, added = self._ingredient_quantity(cursor, quantity, ingredient_id, unit_id, ready)
                 conn.commit()
-
-                # Get the inserted ID using lastrowid
-                ingredient_quantity_id = cursor.lastrowid
-                return ingredient_quantity_id
-                ingredient_quantity_id = cursor.fetchone()
-                if ingredient_quantity_id:
-                    return ingredient_quantity_id[0]
             finally:
                 cursor.close()
+        if added:
+            self.connection_manager.touch('Ingredient_Quantity')
+        return ingredient_quantity_id
+
+    def _ingredient_quantity(self, cursor, quantity, ingredient_id, unit_id, ready):
+        """(id, added) of the Ingredient_Quantity row, inserted on the caller's cursor when missing"""
+        # MySQL-only code:
+        # First check if it already exists
+        cursor.execute('SELECT ingredient_quantity_id FROM Ingredient_Quantity WHERE ingredient_id=%s AND unit_id=%s AND quantity=%s', (ingredient_id, unit_id, quantity))
+        existing = cursor.fetchone()
+        # Consume any remaining results
+        cursor.fetchall()
+
+        if existing:
+            return existing[0], False
+
+        # Insert new record
+        cursor.execute('INSERT INTO Ingredient_Quantity (quantity, ingredient_id, unit_id) VALUES (%s,%s,%s)', (quantity, ingredient_id, unit_id,))
+
+        # Get the inserted ID using lastrowid
+        ingredient_quantity_id = cursor.lastrowid
+        if ready.base_units:
+            refresh_factors(cursor, [ingredient_id])
+        self._record_catalog_change(cursor, ingredient_quantity_id=ingredient_quantity_id, ready=ready)
+        return ingredient_quantity_id, True
 
     def save_nutrition(self, ingredient_id, unit_id, kcal, fat, carb, fiber, net_carb, protein):
+        if base_units_ready(self.connection_manager):
+            return self._save_base_nutrition(ingredient_id, unit_id, (kcal, fat, carb, fiber, net_carb, protein))
         with self.connection_manager.get_connection() as conn:
             cursor = conn.cursor()
             try:
@@ -114,7 +165,10 @@ class FoodDatabase:
 
                 # Insert if it doesn't exist
                 cursor.execute('INSERT INTO Nutrition (ingredient_id, unit_id, kcal, fat, carb, fiber, net_carb, protein) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)', (ingredient_id, unit_id, kcal, fat, carb, fiber, net_carb, protein))
+                self._refresh_vectors(cursor, self._vector_recipes(cursor, ingredient_ids=[ingredient_id]))
+                self._record_catalog_change(cursor, ingredient_id=ingredient_id)
                 conn.commit()
+                self.connection_manager.touch('Nutrition', VECTOR_TABLE)
                 return ingredient_id  # Return ingredient_id since there's no auto-increment ID
                 nutrition = cursor.fetchone()
                 if nutrition:
@@ -122,41 +176,190 @@ class FoodDatabase:
             finally:
                 cursor.close()
 
+    def _save_base_nutrition(self, ingredient_id, unit_id, values, replace=False):
+        """Store per-unit nutrition as the ingredient's base row or a conversion (see unit_conversion.py)"""
+        with self.connection_manager.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                if store_nutrition(cursor, [(ingredient_id, unit_id, values)], replace=replace):
+                    # Every unit of the ingredient is priced from the one base row
+                    self._refresh_rollup(cursor, self._rollup_days(daily_nutrition.days_of_nutrition, cursor, ingredient_id))
+                    self._refresh_vectors(cursor, self._vector_recipes(cursor, ingredient_ids=[ingredient_id]))
+                    self._record_catalog_change(cursor, ingredient_id=ingredient_id)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        self.connection_manager.touch('Nutrition', 'Ingredient_Quantity', CONVERSIONS_TABLE, ROLLUP_TABLE, VECTOR_TABLE)
+        return ingredient_id
+
+    def save_unit_conversion(self, ingredient_id, unit_name, to_unit_name, factor):
+        """Define 1 `unit_name` of the ingredient as `factor` `to_unit_name` (e.g. 1 large = 50 g)"""
+        if not base_units_ready(self.connection_manager):
+            raise RuntimeError('Unit conversions need migrations/add_unit_conversions.py')
+        with self.connection_manager.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                unit_ids, _ = ingredient_ingest.resolve_names(cursor, 'Unit', 'unit_id', 'unit_name',
+                                                              [unit_name, to_unit_name])
+                set_conversion(cursor, ingredient_id, unit_ids[unit_name], unit_ids[to_unit_name], factor)
+                self._refresh_rollup(cursor, self._rollup_days(daily_nutrition.days_of_nutrition, cursor, ingredient_id))
+                self._refresh_vectors(cursor, self._vector_recipes(cursor, ingredient_ids=[ingredient_id]))
+                self._record_catalog_change(cursor, ingredient_id=ingredient_id)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        self.connection_manager.touch('Unit', 'Ingredient_Quantity', CONVERSIONS_TABLE, ROLLUP_TABLE, VECTOR_TABLE)
+
     def save_consumption(self, date, ingredient_quantity_id, meal_type='other'):
+        day = to_date(date)
+        # Match on the native DATE once it is backfilled, so DD.MM.YYYY and
+        # YYYY-MM-DD writes of the same day land on the same row
+        if day and native_date_reads(self.connection_manager, 'Consumption'):
+            match_column, match_value = 'entry_date', day
+        else:
+            match_column, match_value = 'consumption_date', date
+
         with self.connection_manager.get_connection() as conn:
             cursor = conn.cursor()
             # MySQL-only code:
-            cursor.execute('SELECT COUNT(*) cnt FROM Consumption WHERE ingredient_quantity_id = %s AND consumption_date = %s AND meal_type = %s', (ingredient_quantity_id, date, meal_type))
+            cursor.execute(f'SELECT COUNT(*) cnt FROM Consumption WHERE ingredient_quantity_id = %s AND {match_column} = %s AND meal_type = %s', (ingredient_quantity_id, match_value, meal_type))
             cnt = cursor.fetchone()[0]
             if cnt:
-                cursor.execute('UPDATE Consumption SET ingredient_quantity_portions = ingredient_quantity_portions + 1 WHERE ingredient_quantity_id = %s AND consumption_date = %s AND meal_type = %s', (ingredient_quantity_id, date, meal_type))
-                conn.commit()  # Ensure the transaction is committed
+                cursor.execute(f'UPDATE Consumption SET ingredient_quantity_portions = ingredient_quantity_portions + 1 WHERE ingredient_quantity_id = %s AND {match_column} = %s AND meal_type = %s', (ingredient_quantity_id, match_value, meal_type))
+            elif native_date_writes(self.connection_manager, 'Consumption'):
+                # Dual-write: legacy string column plus the native DATE column
+                cursor.execute('INSERT INTO Consumption (consumption_date, ingredient_quantity_id, ingredient_quantity_portions, meal_type, entry_date) VALUES (%s,%s,%s,%s,%s)', (date, ingredient_quantity_id, 1, meal_type, day))
             else:
                 cursor.execute('INSERT INTO Consumption (consumption_date, ingredient_quantity_id, ingredient_quantity_portions, meal_type) VALUES (%s,%s,%s,%s)', (date, ingredient_quantity_id, 1, meal_type))
-                conn.commit()  # Ensure the transaction is committed
-            return cnt
+            self._refresh_rollup(cursor, [day])
+            conn.commit()  # Ensure the transaction is committed
+        self.connection_manager.touch('Consumption', ROLLUP_TABLE)
+        return cnt
+
+    def _readiness(self):
+        """Every readiness flag a write consults, to be taken before its connection is opened"""
+        manager = self.connection_manager
+        return WriteReadiness(canonical_keys=canonical_keys_ready(manager), base_units=base_units_ready(manager),
+                              rollup=rollup_ready(manager), vectors=vectors_ready(manager),
+                              changes=changes_ready(manager), energy=energy_ready(manager))
+
+    def _rollup_days(self, finder, cursor, *args, ready=None):
+        """Days a write is about to change (looked up before the rows are gone)"""
+        if not (ready.rollup if ready else rollup_ready(self.connection_manager)):
+            return []
+        return finder(cursor, *args)
+
+    def _refresh_rollup(self, cursor, days, ready=None):
+        """Recompute the daily_nutrition rows of `days` inside the caller's transaction"""
+        if ready.rollup if ready else rollup_ready(self.connection_manager):
+            refresh_days(cursor, days, base_units=ready.base_units if ready else base_units_ready(self.connection_manager))
+            # The maintenance estimates from the first changed day on are recomputed on their next read
+            invalidate_energy(self.connection_manager, days, cursor=cursor, ready=ready.energy if ready else None)
+
+    def _vector_recipes(self, cursor, ingredient_ids=(), ingredient_quantity_ids=(), ready=None):
+        """Recipes whose nutrition vector a write changes (looked up before the rows are gone)"""
+        if not (ready.vectors if ready else vectors_ready(self.connection_manager)):
+            return []
+        return recipes_using(cursor, ingredient_ids, ingredient_quantity_ids)
+
+    def _refresh_vectors(self, cursor, recipe_ids, ready=None):
+        """Recompute the recipe_nutrition vectors of `recipe_ids` inside the caller's transaction"""
+        if ready.vectors if ready else vectors_ready(self.connection_manager):
+            refresh_recipes(cursor, recipe_ids,
+                            base_units=ready.base_units if ready else base_units_ready(self.connection_manager))
+
+    def _record_catalog_change(self, cursor, ingredient_id=None, ingredient_quantity_id=None, ready=None):
+        """Log a food catalog change inside the caller's transaction (see food_catalog.py)"""
+        if ready.changes if ready else changes_ready(self.connection_manager):
+            record_change(cursor, ingredient_id, ingredient_quantity_id)
 
     def delete_consumption(self, ingredient_id):
         try:
             with self.connection_manager.get_connection() as conn:
                 cursor = conn.cursor()
 
+                days = self._rollup_days(daily_nutrition.days_of_consumption, cursor, [ingredient_id])
+
                 # Delete from ingredient_quantity
                 # MySQL-only code:
                 cursor.execute('DELETE FROM Consumption WHERE consumption_id= %s', (ingredient_id,))
+                self._refresh_rollup(cursor, days)
 
-                # Ideally, return a success message or status
-                return "Deletion successful"
+            # The delete is committed when the connection is released
+            self.connection_manager.touch('Consumption', ROLLUP_TABLE)
+            # Ideally, return a success message or status
+            return "Deletion successful"
 
         except Exception as e:
             # Handle the error and perhaps return a meaningful message
             return f"Error: {e}"
 
+    def update_consumption(self, consumption_id, quantity):
+        """Log a consumption entry with a new quantity of its food, rollup included, in one transaction.
+
+        The entry moves to the Ingredient_Quantity row of that quantity (added
+        when missing) with one portion; when the same day and meal already log
+        that quantity, that entry gets a portion more instead, as save_consumption
+        would. Returns False when the entry does not exist.
+        """
+        ready = self._readiness()
+        native = native_date_reads(self.connection_manager, 'Consumption')
+        with self.connection_manager.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute('''
+                    SELECT IQ.ingredient_id, IQ.unit_id, c.consumption_date, c.entry_date, c.meal_type
+                    FROM Consumption c
+                    JOIN Ingredient_Quantity IQ ON IQ.ingredient_quantity_id = c.ingredient_quantity_id
+                    WHERE c.consumption_id = %s
+                ''', (consumption_id,))
+                row = cursor.fetchone()
+                if row is None:
+                    return False
+                ingredient_id, unit_id, consumption_date, entry_date, meal_type = row
+                days = self._rollup_days(daily_nutrition.days_of_consumption, cursor, [consumption_id], ready=ready)
+
+                ingredient_quantity_id, added = self._ingredient_quantity(cursor, quantity, ingredient_id, unit_id, ready)
+                # The same match as save_consumption
+                match_column, match_value = (('entry_date', entry_date) if native and entry_date is not None
+                                             else ('consumption_date', consumption_date))
+                cursor.execute(f'''
+                    SELECT consumption_id FROM Consumption
+                    WHERE ingredient_quantity_id = %s AND {match_column} = %s AND meal_type = %s AND consumption_id <> %s
+                    LIMIT 1
+                ''', (ingredient_quantity_id, match_value, meal_type, consumption_id))
+                same = cursor.fetchone()
+                if same:
+                    cursor.execute('UPDATE Consumption SET ingredient_quantity_portions = ingredient_quantity_portions + 1 '
+                                   'WHERE consumption_id = %s', (same[0],))
+                    cursor.execute('DELETE FROM Consumption WHERE consumption_id = %s', (consumption_id,))
+                else:
+                    cursor.execute('UPDATE Consumption SET ingredient_quantity_id = %s, ingredient_quantity_portions = 1 '
+                                   'WHERE consumption_id = %s', (ingredient_quantity_id, consumption_id))
+                self._refresh_rollup(cursor, days, ready=ready)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        self.connection_manager.touch('Consumption', ROLLUP_TABLE, *(('Ingredient_Quantity',) if added else ()))
+        return True
+
     def delete_ingredient(self, ingredient_id):
         try:
             with self.connection_manager.get_connection() as conn:
                 cursor = conn.cursor()
 
+                days = self._rollup_days(daily_nutrition.days_of_nutrition, cursor, ingredient_id)
+                recipes = self._vector_recipes(cursor, ingredient_ids=[ingredient_id])
+
                 # MySQL-only code:
                 # Delete from ingredient_quantity
                 cursor.execute('DELETE FROM Ingredient_Quantity WHERE ingredient_id= %s', (ingredient_id,))
@@ -164,11 +367,15 @@ class FoodDatabase:
                 cursor.execute('DELETE FROM Ingredient WHERE ingredient_id= %s', (ingredient_id,))
                 # Delete from Nutrition
                 cursor.execute('DELETE FROM Nutrition WHERE ingredient_id= %s', (ingredient_id,))
-                # Delete from ingredient
-                # Delete from Nutrition
+                if base_units_ready(self.connection_manager):
+                    cursor.execute(f'DELETE FROM {CONVERSIONS_TABLE} WHERE ingredient_id= %s', (ingredient_id,))
+                self._refresh_rollup(cursor, days)
+                self._refresh_vectors(cursor, recipes)
+                self._record_catalog_change(cursor, ingredient_id=ingredient_id)
 
-                # Ideally, return a success message or status
-                return "Deletion successful"
+            self.connection_manager.touch('Ingredient_Quantity', 'Ingredient', 'Nutrition', ROLLUP_TABLE, VECTOR_TABLE)
+            # Ideally, return a success message or status
+            return "Deletion successful"
 
         except Exception as e:
             # Handle the error and perhaps return a meaningful message
@@ -179,12 +386,19 @@ class FoodDatabase:
             with self.connection_manager.get_connection() as conn:
                 cursor = conn.cursor()
 
+                days = self._rollup_days(daily_nutrition.days_of_ingredient_quantity, cursor, ingredient_id)
+                recipes = self._vector_recipes(cursor, ingredient_quantity_ids=[ingredient_id])
+
                 # Delete from ingredient_quantity
                 # MySQL-only code:
                 cursor.execute('DELETE FROM Ingredient_Quantity WHERE ingredient_quantity_id= %s', (ingredient_id,))
+                self._refresh_rollup(cursor, days)
+                self._refresh_vectors(cursor, recipes)
+                self._record_catalog_change(cursor, ingredient_quantity_id=ingredient_id)
 
-                # Ideally, return a success message or status
-                return "Deletion successful"
+            self.connection_manager.touch('Ingredient_Quantity', ROLLUP_TABLE, VECTOR_TABLE)
+            # Ideally, return a success message or status
+            return "Deletion successful"
 
         except Exception as e:
             # Handle the error and perhaps return a meaningful message
@@ -196,8 +410,11 @@ class FoodDatabase:
             try:
                 # MySQL-only code:
                 cursor.execute('INSERT INTO Recipe_Ingredients (recipe_id, ingredient_quantity_id) VALUES (%s,%s)', (recipe_id, ingredient_quantity_id,))
+                self._refresh_vectors(cursor, [recipe_id])
+                self._refresh_rollup(cursor, self._rollup_days(daily_nutrition.days_of_recipe, cursor, recipe_id))
 
                 conn.commit()
+                self.connection_manager.touch('Recipe_Ingredients', ROLLUP_TABLE, VECTOR_TABLE)
                 return "Added Ingredient successful"
             finally:
                 cursor.close()
@@ -215,42 +432,67 @@ class FoodDatabase:
         return round(kcal / qty, 4), round(fats / qty, 4), round(carbs / qty, 4), round(fiber / qty, 4), round(
             net_carbs / qty, 4), round(protein / qty, 4)
 
-    def save_to_database(self, data, serv=1):
-        lines = data.strip().split("\n")
-        headers = lines[0].split(',')
-        entries = [dict(zip(headers, line.split(','))) for line in lines[1:]]
-        ingredients_qty_list = []
-
-        for entry in entries:
-            # Insert into Unit table
-            unit_id = self.save_unit(entry['unit'])
-
-            # Insert into Ingredient table
-            ingredient_id = self.save_ingredient(entry['ingr'])
-
-            # save ingredient quantity and get the id
-            ingredient_quantity_id = self.save_ingredient_qty(entry['qty'], ingredient_id, unit_id, serv)
-            ingredients_qty_list.append(ingredient_quantity_id)
-
-            # Convert Nutrition to Base Unit
-            kcal, fats, carbs, fiber, net_carbs, protein = self.converter_base_unit(entry['qty'], entry['kcal'], entry['fats'], entry['carbs'], entry['fiber'], entry['net_carbs'], entry['protein'])
+    def _ingest(self, cursor, entries, serv, ready):
+        """Batch-save analyzed entries on the caller's cursor (see ingredient_ingest.py).
+
+        `ready` is the caller's _readiness(), taken before its transaction opened.
+        """
+        key = canonical_key if ready.canonical_keys else None
+        result = ingredient_ingest.ingest(cursor, entries, serv, ingredient_key=key,
+                                          store_nutrition=store_nutrition if ready.base_units else None)
+        for iq_id in result['new_quantity_ids']:
+            self._record_catalog_change(cursor, ingredient_quantity_id=iq_id, ready=ready)
+        for ingredient_id in dict.fromkeys(result['nutrition_ingredient_ids']):
+            self._record_catalog_change(cursor, ingredient_id=ingredient_id, ready=ready)
+        if ready.base_units and result['nutrition_ingredient_ids'] and ready.rollup:
+            # A learnt conversion prices quantities that were logged before
+            days = set()
+            for ingredient_id in result['nutrition_ingredient_ids']:
+                days.update(daily_nutrition.days_of_nutrition(cursor, ingredient_id))
+            if days:
+                self._refresh_rollup(cursor, sorted(days), ready=ready)
+                result['tables'].add(ROLLUP_TABLE)
+        if result['nutrition_ingredient_ids']:
+            # New nutrition can complete recipes that already used these foods
+            recipes = self._vector_recipes(cursor, ingredient_ids=result['nutrition_ingredient_ids'], ready=ready)
+            if recipes:
+                self._refresh_vectors(cursor, recipes, ready=ready)
+                result['tables'].add(VECTOR_TABLE)
+        return result
+
+    def save_entries(self, entries, serv=None):
+        """Save analyzed entries (dicts with qty, unit, ingr and nutrients) in one transaction"""
+        ready = self._readiness()
+        with self.connection_manager.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                result = self._ingest(cursor, entries, serv, ready)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        if result['tables']:
+            self.connection_manager.touch(*result['tables'])
+        return result['quantity_ids']
 
-            # Save Nutritions
-            self.save_nutrition(ingredient_id, unit_id, kcal, fats, carbs, fiber, net_carbs, protein)
-        return ingredients_qty_list
+    def save_to_database(self, data, serv=1):
+        return self.save_entries(ingredient_ingest.parse_csv(data), serv)
 
     def save_recipe(self, date, recipe, serv, data):
-        # 1st Save Ingredients and Use Servings to scale down IQ and Nutrition's
-        # 2nd use the IQ_ids to save the ingredients to recipe_ingredients
+        # Ingredients (scaled down to one serving), the recipe and its links are saved in one transaction
 
         try:
-            ingredients_qty_list = self.save_to_database(data, serv)
+            entries = ingredient_ingest.parse_csv(data)
 
-            # Use a fresh connection for recipe creation
-            recipe_id = None
+            ready = self._readiness()
             with self.connection_manager.get_connection() as conn:
                 cursor = conn.cursor()
                 try:
+                    ingested = self._ingest(cursor, entries, serv, ready)
+                    ingredients_qty_list = ingested['quantity_ids']
+
                     # MySQL-only code:
                     # Check if recipe already exists
                     cursor.execute('SELECT recipe_id FROM Recipe WHERE recipe_name=%s', (recipe,))
@@ -263,20 +505,27 @@ class FoodDatabase:
                     else:
                         cursor.execute('INSERT INTO Recipe (recipe_name, recipe_date, servings) VALUES (%s,%s,%s)',
                                        (recipe, date, serv,))
-                        # Get the inserted recipe ID immediately
                         recipe_id = cursor.lastrowid
-                        conn.commit()
 
                     if not recipe_id:
                         raise Exception("Failed to get recipe ID")
 
+                    cursor.executemany('INSERT INTO Recipe_Ingredients (recipe_id, ingredient_quantity_id) VALUES (%s,%s)',
+                                       [(recipe_id, iq_id) for iq_id in ingredients_qty_list])
+                    self._refresh_vectors(cursor, [recipe_id], ready=ready)
+                    # An existing recipe may already have been eaten
+                    self._refresh_rollup(cursor, self._rollup_days(daily_nutrition.days_of_recipe, cursor, recipe_id,
+                                                                   ready=ready), ready=ready)
+
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
                 finally:
                     cursor.close()
 
-            # Link ingredients to recipe using separate connections
-            for ingredient_quantity_id in ingredients_qty_list:
-                self.save_recipe_ingredient(recipe_id, ingredient_quantity_id)
-
+            self.connection_manager.touch('Recipe', 'Recipe_Ingredients', ROLLUP_TABLE, VECTOR_TABLE,
+                                          *ingested['tables'])
             return ingredients_qty_list
 
         except Exception as e:
@@ -286,58 +535,47 @@ class FoodDatabase:
     def update_recipe(self, recipe_id, recipe_name, servings, csv_data):
         """Update an existing recipe with new data"""
         try:
-            # First, process ingredients outside of the main transaction
-            lines = csv_data.strip().split("\n")
-            headers = lines[0].split(',')
-            entries = [dict(zip(headers, line.split(','))) for line in lines[1:]]
-
-            # Process each ingredient and collect the IDs
-            ingredient_qty_ids = []
-
-            for entry in entries:
-                # Insert into Unit table
-                unit_id = self.save_unit(entry['unit'])
+            entries = ingredient_ingest.parse_csv(csv_data)
 
-                # Insert into Ingredient table
-                ingredient_id = self.save_ingredient(entry['ingr'])
-
-                # Save ingredient quantity and get the id
-                ingredient_quantity_id = self.save_ingredient_qty(entry['qty'], ingredient_id, unit_id, servings)
-                ingredient_qty_ids.append(ingredient_quantity_id)
-
-                # Convert Nutrition to Base Unit
-                kcal, fats, carbs, fiber, net_carbs, protein = self.converter_base_unit(
-                    entry['qty'], entry['kcal'], entry['fats'], entry['carbs'],
-                    entry['fiber'], entry['net_carbs'], entry['protein']
-                )
-
-                # Save Nutritions
-                self.save_nutrition(ingredient_id, unit_id, kcal, fats, carbs, fiber, net_carbs, protein)
-
-            # Now update the recipe in a single transaction
+            # Ingredients and the recipe change together in a single transaction
+            ready = self._readiness()
             with self.connection_manager.get_connection() as conn:
                 cursor = conn.cursor()
+                try:
+                    ingested = self._ingest(cursor, entries, servings, ready)
 
-                # First, delete existing recipe ingredients
-                # MySQL-only code:
-                cursor.execute('DELETE FROM Recipe_Ingredients WHERE recipe_id = %s', (recipe_id,))
+                    # First, delete existing recipe ingredients
+                    # MySQL-only code:
+                    cursor.execute('DELETE FROM Recipe_Ingredients WHERE recipe_id = %s', (recipe_id,))
 
-                # Update recipe basic info
-                # MySQL-only code:
-                cursor.execute('''
-                    UPDATE Recipe
-                    SET recipe_name = %s, servings = %s, recipe_date = %s
-                    WHERE recipe_id = %s
-                ''', (recipe_name, servings, datetime.now().strftime('%Y-%m-%d'), recipe_id))
+                    # Update recipe basic info
+                    # MySQL-only code:
+                    cursor.execute('''
+                        UPDATE Recipe
+                        SET recipe_name = %s, servings = %s, recipe_date = %s
+                        WHERE recipe_id = %s
+                    ''', (recipe_name, servings, datetime.now().strftime('%Y-%m-%d'), recipe_id))
 
-                # Link new ingredients to recipe
-                for iq_id in ingredient_qty_ids:
+                    # Link new ingredients to recipe
                     # MySQL-only code:
-                    cursor.execute('INSERT INTO Recipe_Ingredients (recipe_id, ingredient_quantity_id) VALUES (%s, %s)',
-                                 (recipe_id, iq_id))
+                    cursor.executemany('INSERT INTO Recipe_Ingredients (recipe_id, ingredient_quantity_id) VALUES (%s, %s)',
+                                       [(recipe_id, iq_id) for iq_id in ingested['quantity_ids']])
+                    self._refresh_vectors(cursor, [recipe_id], ready=ready)
 
-                conn.commit()
-                return True
+                    # Every day the recipe was eaten on changes with it
+                    self._refresh_rollup(cursor, self._rollup_days(daily_nutrition.days_of_recipe, cursor, recipe_id,
+                                                                   ready=ready), ready=ready)
+
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
+
+            self.connection_manager.touch('Recipe', 'Recipe_Ingredients', ROLLUP_TABLE, VECTOR_TABLE,
+                                          *ingested['tables'])
+            return True
 
         except Exception as e:
             print(f"Error updating recipe: {e}")
@@ -345,6 +583,13 @@ class FoodDatabase:
 
     def update_nutrition(self, iq_id, n):
         kcal, fats, carbs, fiber, net_carbs, protein = self.converter_base_unit(n['qty'], n['kcal'],n['fat'],n['carb'],n['fiber'],n['net_carb'],n['protein'])
+        if base_units_ready(self.connection_manager):
+            row = self.connection_manager.execute_query(
+                'SELECT ingredient_id, unit_id FROM Ingredient_Quantity WHERE ingredient_quantity_id=%s', (iq_id,), fetch_one=True)
+            if row:
+                self._save_base_nutrition(row['ingredient_id'], row['unit_id'],
+                                          (kcal, fats, carbs, fiber, net_carbs, protein), replace=True)
+            return
         with self.connection_manager.get_connection() as conn:
             cursor = conn.cursor()
             # MySQL-only code:
@@ -354,25 +599,34 @@ class FoodDatabase:
             AND unit_id=(SELECT unit_id FROM Ingredient_Quantity WHERE ingredient_quantity_id=%s)
             """
             cursor.execute(query,(kcal, fats, carbs, fiber, net_carbs, protein,iq_id,iq_id,))
+            cursor.execute('SELECT ingredient_id, unit_id FROM Ingredient_Quantity WHERE ingredient_quantity_id=%s', (iq_id,))
+            row = cursor.fetchone()
+            if row:
+                self._refresh_rollup(cursor, self._rollup_days(daily_nutrition.days_of_nutrition, cursor, row[0], row[1]))
+                self._refresh_vectors(cursor, self._vector_recipes(cursor, ingredient_ids=[row[0]]))
+                self._record_catalog_change(cursor, ingredient_id=row[0])
+        self.connection_manager.touch('Nutrition', ROLLUP_TABLE, VECTOR_TABLE)
 
     def fetch_all_nutrition(self):
         with self.connection_manager.get_connection() as conn:
             cursor = conn.cursor()
-            query = """SELECT
+            base_units = base_units_ready(self.connection_manager)
+            quantity = amount(base_units, 'iq')
+            query = f"""SELECT
                     iq.ingredient_quantity_id id,
                     iq.quantity qty,
                     U.unit_name unit,
                     I.ingredient_name ingredient,
-                    round(iq.quantity*N.kcal, 2) kcal,
-                    round(iq.quantity*N.fat, 2) fat,
-                    round(iq.quantity*N.carb, 2) carb,
-                    round(iq.quantity*N.fiber, 2) fiber,
-                    round(iq.quantity*N.net_carb, 2) net_carb,
-                    round(iq.quantity*N.protein, 2) protein
+                    round({quantity}*N.kcal, 2) kcal,
+                    round({quantity}*N.fat, 2) fat,
+                    round({quantity}*N.carb, 2) carb,
+                    round({quantity}*N.fiber, 2) fiber,
+                    round({quantity}*N.net_carb, 2) net_carb,
+                    round({quantity}*N.protein, 2) protein
                 FROM Ingredient_Quantity iq
                     LEFT JOIN Ingredient I ON I.ingredient_id = iq.ingredient_id
                     LEFT JOIN Unit U ON U.unit_id = iq.unit_id
-                    LEFT JOIN Nutrition N ON I.ingredient_id = N.ingredient_id AND U.unit_id = N.unit_id
+                    {nutrition_join(base_units, 'iq')}
                 ORDER BY iq.ingredient_quantity_id DESC"""
             cursor.execute(query)
 
@@ -401,22 +655,24 @@ class FoodDatabase:
     def fetch_nutrition(self, iq_id):
         with self.connection_manager.get_connection() as conn:
             cursor = conn.cursor()
+            base_units = base_units_ready(self.connection_manager)
+            quantity = amount(base_units, 'iq')
             # MySQL-only code:
-            query = """SELECT
+            query = f"""SELECT
                     iq.ingredient_quantity_id id,
                     iq.quantity qty,
                     U.unit_name unit,
                     I.ingredient_name ingredient,
-                    round(iq.quantity*N.kcal, 2) kcal,
-                    round(iq.quantity*N.fat, 2) fat,
-                    round(iq.quantity*N.carb, 2) carb,
-                    round(iq.quantity*N.fiber, 2) fiber,
-                    round(iq.quantity*N.net_carb, 2) net_carb,
-                    round(iq.quantity*N.protein, 2) protein
+                    round({quantity}*N.kcal, 2) kcal,
+                    round({quantity}*N.fat, 2) fat,
+                    round({quantity}*N.carb, 2) carb,
+                    round({quantity}*N.fiber, 2) fiber,
+                    round({quantity}*N.net_carb, 2) net_carb,
+                    round({quantity}*N.protein, 2) protein
                 FROM Ingredient_Quantity iq
                     LEFT JOIN Ingredient I ON I.ingredient_id = iq.ingredient_id
                     LEFT JOIN Unit U ON U.unit_id = iq.unit_id
-                    LEFT JOIN Nutrition N ON I.ingredient_id = N.ingredient_id AND U.unit_id = N.unit_id
+                    {nutrition_join(base_units, 'iq')}
                     WHERE iq.ingredient_quantity_id=%s"""
             cursor.execute(query,(iq_id,))
 
@@ -440,31 +696,56 @@ class FoodDatabase:
 
 
     def fetch_all_consumption(self):
+        return self._fetch_consumption()
+
+    def fetch_consumption_range(self, start, end):
+        """Consumption rows whose day falls in [start, end] (dates or legacy date strings)"""
+        return self._fetch_consumption(to_date(start), to_date(end))
+
+    def _date_range_predicate(self, alias, native):
+        """WHERE fragment bounding `alias`'s day to a [start, end] pair of parameters"""
+        if native:
+            # Range scan on the entry_date index
+            return f"{alias}.entry_date BETWEEN %s AND %s"
+        # Backfill still running: parse the legacy string in SQL (no index)
+        return f"{legacy_parse_sql(alias + '.consumption_date', escape_percent=True)} BETWEEN %s AND %s"
+
+    def _fetch_consumption(self, start=None, end=None):
+        native = native_date_reads(self.connection_manager, 'Consumption')
+        bounded = start is not None and end is not None
+        where = f"WHERE {self._date_range_predicate('c', native)}" if bounded else ''
+        base_units = base_units_ready(self.connection_manager)
+        quantity = amount(base_units)
         with self.connection_manager.get_connection() as conn:
             cursor = conn.cursor()
-            query = """SELECT
+            query = f"""SELECT
                         c.consumption_date date,
                         IQ.quantity*c.ingredient_quantity_portions qty,
                         U.unit_name unit,
                         I.ingredient_name ingredient,
-                        round(IQ.quantity*N.kcal*c.ingredient_quantity_portions, 2) kcal,
-                        round(IQ.quantity*N.fat*c.ingredient_quantity_portions, 2) fat,
-                        round(IQ.quantity*N.carb*c.ingredient_quantity_portions, 2) carb,
-                        round(IQ.quantity*N.fiber*c.ingredient_quantity_portions, 2) fiber,
-                        round(IQ.quantity*N.net_carb*c.ingredient_quantity_portions, 2) net_carb,
-                        round(IQ.quantity*N.protein*c.ingredient_quantity_portions, 2) protein,
+                        round({quantity}*N.kcal*c.ingredient_quantity_portions, 2) kcal,
+                        round({quantity}*N.fat*c.ingredient_quantity_portions, 2) fat,
+                        round({quantity}*N.carb*c.ingredient_quantity_portions, 2) carb,
+                        round({quantity}*N.fiber*c.ingredient_quantity_portions, 2) fiber,
+                        round({quantity}*N.net_carb*c.ingredient_quantity_portions, 2) net_carb,
+                        round({quantity}*N.protein*c.ingredient_quantity_portions, 2) protein,
                         c.consumption_id consumption_id,
                         c.ingredient_quantity_portions iqp,
                         IQ.ingredient_quantity_id,
-                        c.meal_type
+                        c.meal_type,
+                        {'c.entry_date' if native else 'NULL'} day
                         FROM Consumption c
                     LEFT JOIN Ingredient_Quantity IQ ON IQ.ingredient_quantity_id = c.ingredient_quantity_id
                     LEFT JOIN Unit U ON U.unit_id = IQ.unit_id
                     LEFT JOIN Ingredient I ON I.ingredient_id = IQ.ingredient_id
-                    LEFT JOIN Nutrition N ON I.ingredient_id = N.ingredient_id AND N.unit_id = U.unit_id
-                    ORDER BY date DESC, meal_type"""
+                    {nutrition_join(base_units)}
+                    {where}
+                    ORDER BY {'c.entry_date' if native else 'date'} DESC, meal_type"""
 
-            cursor.execute(query)
+            if bounded:
+                cursor.execute(query, (start, end))
+            else:
+                cursor.execute(query)
 
             # Fetch all rows
             nutrition = cursor.fetchall()
@@ -486,34 +767,66 @@ class FoodDatabase:
                     "consumption_id": nutrition[10],
                     "iqp": nutrition[11],
                     "iq_id":nutrition[12],
-                    "meal_type": nutrition[13] if len(nutrition) > 13 else 'other'
+                    "meal_type": nutrition[13] if len(nutrition) > 13 else 'other',
+                    # Native date of the row; parsed from the legacy string only until the backfill is done
+                    "day": nutrition[14] if native else to_date(nutrition[0])
                 })
 
             return nutrition_data
 
     def fetch_all_recipes(self):
+        return self._fetch_recipes(limit=20)
+
+    def fetch_recipe(self, recipe_id):
+        """One recipe with its totals (same shape as fetch_all_recipes), or None"""
+        recipes = self._fetch_recipes('WHERE r.recipe_id = %s', (recipe_id,))
+        return recipes[0] if recipes else None
+
+    def _fetch_recipes(self, where='', params=(), limit=None):
         with self.connection_manager.get_connection() as conn:
             cursor = conn.cursor()
-            query = """SELECT
+            if vectors_ready(self.connection_manager):
+                # Totals are the materialized per-serving vectors times the servings
+                query = f"""SELECT
+                            r.recipe_name,
+                            r.recipe_date,
+                            r.servings,
+                            round(rn.kcal*r.servings,0) kcal,
+                            round(rn.fat*r.servings,0) fat,
+                            round(rn.carb*r.servings,0) carb,
+                            round(rn.fiber*r.servings,0) fiber,
+                            round(rn.net_carb*r.servings,0) net_carb,
+                            round(rn.protein*r.servings,0) protein,
+                            r.recipe_id
+                         FROM Recipe r LEFT JOIN {VECTOR_TABLE} rn ON rn.recipe_id = r.recipe_id
+                         {where}
+                         ORDER BY r.recipe_date ASC"""
+            else:
+                base_units = base_units_ready(self.connection_manager)
+                quantity = amount(base_units)
+                query = f"""SELECT
                             r.recipe_name,
                             r.recipe_date,
                             r.servings,
-                            round(sum(N.kcal*IQ.quantity),0) kcal,
-                            round(sum(N.fat*IQ.quantity),0) fat,
-                            round(sum(N.carb*IQ.quantity),0) carb,
-                            round(sum(N.fiber*IQ.quantity),0) fiber,
-                            round(sum(N.net_carb*IQ.quantity),0) net_carb,
-                            round(sum(N.protein*IQ.quantity),0) protein,
+                            round(sum(N.kcal*{quantity}),0) kcal,
+                            round(sum(N.fat*{quantity}),0) fat,
+                            round(sum(N.carb*{quantity}),0) carb,
+                            round(sum(N.fiber*{quantity}),0) fiber,
+                            round(sum(N.net_carb*{quantity}),0) net_carb,
+                            round(sum(N.protein*{quantity}),0) protein,
                             r.recipe_id
                          FROM Recipe r LEFT JOIN Recipe_Ingredients RI ON r.recipe_id = RI.recipe_id
                                  LEFT JOIN Ingredient_Quantity IQ ON IQ.ingredient_quantity_id = RI.ingredient_quantity_id
                                  LEFT OUTER JOIN Ingredient I ON I.ingredient_id = IQ.ingredient_id
                                  LEFT JOIN Unit U ON U.unit_id = IQ.unit_id
-                                 LEFT JOIN Nutrition N ON IQ.unit_id = N.unit_id AND IQ.ingredient_id = N.ingredient_id
+                                 {nutrition_join(base_units)}
+                         {where}
                          GROUP BY r.recipe_id, r.recipe_name, r.recipe_date, r.servings
-                         ORDER BY r.recipe_date ASC LIMIT 20"""
+                         ORDER BY r.recipe_date ASC"""
+            if limit is not None:
+                query += f" LIMIT {int(limit)}"
 
-            cursor.execute(query)
+            cursor.execute(query, params)
 
             # Fetch all rows
             nutrition = cursor.fetchall()
@@ -568,11 +881,29 @@ class FoodDatabase:
             cursor.execute(query, (iq_id,))
             result = cursor.fetchone()
             return result[0], result[1]
+    def fetch_daily_nutrition(self, start, end):
+        """Per-day nutrition totals in [start, end], oldest first, with per-meal-type splits.
+
+        Reads the pre-summed daily_nutrition rollup; until it is available the
+        days are summed from the consumption rows of the range.
+        """
+        start, end = to_date(start), to_date(end)
+        if rollup_ready(self.connection_manager):
+            return daily_nutrition.fetch_days(self.connection_manager, start, end)
+
+        rows = []
+        for item in self.fetch_consumption_range(start, end) + self.fetch_recipe_consumption_range(start, end):
+            if item['day'] is None:
+                continue
+            row = {n: item.get(n) or 0 for n in daily_nutrition.NUTRIENTS}
+            row.update(day=item['day'], meal_type=item.get('meal_type') or 'other', items=1)
+            rows.append(row)
+        return daily_nutrition.group_days(rows)
+
     def get_avg_nutrition_consumed(self):
-        with self.connection_manager.get_connection() as conn:
-            cursor = conn.cursor()
-            # MySQL-only code:
-            query ="""
+        if rollup_ready(self.connection_manager):
+            # Average over the pre-summed days of the rollup
+            query = f"""
             SELECT
                 round(sum(kcal)/count(*),0) kcal,
                 round(sum(fat)/count(*),0) fat,
@@ -582,49 +913,110 @@ class FoodDatabase:
                 round(sum(protein)/count(*),0) protein,
                 COUNT(*) cnt
             FROM (SELECT
-                c.consumption_date date,
-                round(sum(IQ.quantity*N.kcal*c.ingredient_quantity_portions), 0) kcal,
-                round(sum(IQ.quantity*N.fat*c.ingredient_quantity_portions), 0) fat,
-                round(sum(IQ.quantity*N.carb*c.ingredient_quantity_portions), 0) carb,
-                round(sum(IQ.quantity*N.fiber*c.ingredient_quantity_portions), 0) fiber,
-                round(sum(IQ.quantity*N.net_carb*c.ingredient_quantity_portions), 0) net_carb,
-                round(sum(IQ.quantity*N.protein*c.ingredient_quantity_portions), 0) protein
-                FROM Consumption c
-            LEFT JOIN Ingredient_Quantity IQ ON IQ.ingredient_quantity_id = c.ingredient_quantity_id
-            LEFT JOIN Unit U ON U.unit_id = IQ.unit_id
-            LEFT JOIN Ingredient I ON I.ingredient_id = IQ.ingredient_id
-            LEFT JOIN Nutrition N ON I.ingredient_id = N.ingredient_id AND N.unit_id = U.unit_id
-            GROUP BY c.consumption_date
-            ORDER BY date DESC) AS daily_nutrition
+                day,
+                round(sum(kcal), 0) kcal,
+                round(sum(fat), 0) fat,
+                round(sum(carb), 0) carb,
+                round(sum(fiber), 0) fiber,
+                round(sum(net_carb), 0) net_carb,
+                round(sum(protein), 0) protein
+                FROM {ROLLUP_TABLE}
+                WHERE user_id = %s
+                GROUP BY day) AS days
             """
-            cursor.execute(query)
-            result = cursor.fetchone()
-            nutrition_data = {
-                "kcal": result[0],
-                "fat": result[1],
-                "carb": result[2],
-                "fiber": result[3],
-                "net_carb": result[4],
-                "protein": result[5],
-                "cnt":result[6]
-            }
-
-            return nutrition_data
+            result = self.connection_manager.execute_query(
+                query, (daily_nutrition.DEFAULT_USER,), fetch_one=True, cache_tables=(ROLLUP_TABLE,)
+            ) or {}
+            return {key: result.get(key) for key in ('kcal', 'fat', 'carb', 'fiber', 'net_carb', 'protein', 'cnt')}
+
+        # Same quantity as the rollup (food and recipe consumption per day), summed from the
+        # source rows. Group by the native day once both tables have it, so mixed legacy
+        # formats of one day count once
+        native = (native_date_reads(self.connection_manager, 'Consumption') and
+                  native_date_reads(self.connection_manager, 'recipe_consumption'))
+        food_day, recipe_day = ('c.entry_date', 'rc.entry_date') if native else ('c.consumption_date', 'rc.consumption_date')
+        base_units = base_units_ready(self.connection_manager)
+        quantity = amount(base_units)
+        # Cached until one of the joined tables is written
+        query =f"""
+        SELECT
+            round(sum(kcal)/count(*),0) kcal,
+            round(sum(fat)/count(*),0) fat,
+            round(sum(carb)/count(*),0) carb,
+            round(sum(fiber)/count(*),0) fiber,
+            round(sum(net_carb)/count(*),0) net_carb,
+            round(sum(protein)/count(*),0) protein,
+            COUNT(*) cnt
+        FROM (SELECT
+            src.date,
+            round(sum(src.kcal), 0) kcal,
+            round(sum(src.fat), 0) fat,
+            round(sum(src.carb), 0) carb,
+            round(sum(src.fiber), 0) fiber,
+            round(sum(src.net_carb), 0) net_carb,
+            round(sum(src.protein), 0) protein
+            FROM (
+                SELECT {food_day} date,
+                    {quantity}*N.kcal*c.ingredient_quantity_portions kcal,
+                    {quantity}*N.fat*c.ingredient_quantity_portions fat,
+                    {quantity}*N.carb*c.ingredient_quantity_portions carb,
+                    {quantity}*N.fiber*c.ingredient_quantity_portions fiber,
+                    {quantity}*N.net_carb*c.ingredient_quantity_portions net_carb,
+                    {quantity}*N.protein*c.ingredient_quantity_portions protein
+                FROM Consumption c
+                LEFT JOIN Ingredient_Quantity IQ ON IQ.ingredient_quantity_id = c.ingredient_quantity_id
+                {nutrition_join(base_units)}
+                WHERE {food_day} IS NOT NULL
+                UNION ALL
+                SELECT {recipe_day} date,
+                    SUM(N.kcal*{quantity}*rc.servings/r.servings) kcal,
+                    SUM(N.fat*{quantity}*rc.servings/r.servings) fat,
+                    SUM(N.carb*{quantity}*rc.servings/r.servings) carb,
+                    SUM(N.fiber*{quantity}*rc.servings/r.servings) fiber,
+                    SUM(N.net_carb*{quantity}*rc.servings/r.servings) net_carb,
+                    SUM(N.protein*{quantity}*rc.servings/r.servings) protein
+                FROM recipe_consumption rc
+                JOIN Recipe r ON r.recipe_id = rc.recipe_id
+                LEFT JOIN Recipe_Ingredients RI ON RI.recipe_id = r.recipe_id
+                LEFT JOIN Ingredient_Quantity IQ ON IQ.ingredient_quantity_id = RI.ingredient_quantity_id
+                {nutrition_join(base_units)}
+                WHERE {recipe_day} IS NOT NULL
+                GROUP BY rc.recipe_consumption_id, {recipe_day}
+            ) src
+        GROUP BY src.date) AS daily_nutrition
+        """
+        result = self.connection_manager.execute_query(
+            query, fetch_one=True, cache_tables=AVG_NUTRITION_TABLES
+        ) or {}
+        return {
+            "kcal": result.get('kcal'),
+            "fat": result.get('fat'),
+            "carb": result.get('carb'),
+            "fiber": result.get('fiber'),
+            "net_carb": result.get('net_carb'),
+            "protein": result.get('protein'),
+            "cnt": result.get('cnt')
+        }
 
     def delete_recipe(self, recipe_id):
         try:
             with self.connection_manager.get_connection() as conn:
                 cursor = conn.cursor()
 
+                days = self._rollup_days(daily_nutrition.days_of_recipe, cursor, recipe_id)
+
                 # MySQL-only code:
                 # First delete from Recipe_Ingredients
                 cursor.execute('DELETE FROM Recipe_Ingredients WHERE recipe_id = %s', (recipe_id,))
                 # Then delete from Recipe
                 cursor.execute('DELETE FROM Recipe WHERE recipe_id = %s', (recipe_id,))
                 # Then delete from Recipe
+                self._refresh_rollup(cursor, days)
+                self._refresh_vectors(cursor, [recipe_id])
 
                 # Commit the changes
                 conn.commit()
+                self.connection_manager.touch('Recipe', 'Recipe_Ingredients', ROLLUP_TABLE, VECTOR_TABLE)
 
                 return "Recipe deleted successfully"
 
@@ -646,12 +1038,16 @@ class FoodDatabase:
                 if favorite:
                     # Remove from favorites
                     cursor.execute('DELETE FROM Favorites WHERE ingredient_id = %s', (ingredient_id,))
+                    self._record_catalog_change(cursor, ingredient_id=ingredient_id)
                     conn.commit()
+                    self.connection_manager.touch('Favorites')
                     return False  # Unfavorited
                 else:
                     # Add to favorites
                     cursor.execute('INSERT INTO Favorites (ingredient_id) VALUES (%s)', (ingredient_id,))
+                    self._record_catalog_change(cursor, ingredient_id=ingredient_id)
                     conn.commit()
+                    self.connection_manager.touch('Favorites')
                     return True  # Favorited
 
         except Exception as e:
@@ -677,13 +1073,24 @@ class FoodDatabase:
             cursor = conn.cursor()
             try:
                 # MySQL-only code:
-                cursor.execute('''
-                    INSERT INTO recipe_consumption
-                    (recipe_id, consumption_date, meal_type, servings)
-                    VALUES (%s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE servings = VALUES(servings)
-                ''', (recipe_id, date, meal_type, servings))
+                if native_date_writes(self.connection_manager, 'recipe_consumption'):
+                    # Dual-write: legacy string column plus the native DATE column
+                    cursor.execute('''
+                        INSERT INTO recipe_consumption
+                        (recipe_id, consumption_date, meal_type, servings, entry_date)
+                        VALUES (%s, %s, %s, %s, %s)
+                        ON DUPLICATE KEY UPDATE servings = VALUES(servings), entry_date = VALUES(entry_date)
+                    ''', (recipe_id, date, meal_type, servings, to_date(date)))
+                else:
+                    cursor.execute('''
+                        INSERT INTO recipe_consumption
+                        (recipe_id, consumption_date, meal_type, servings)
+                        VALUES (%s, %s, %s, %s)
+                        ON DUPLICATE KEY UPDATE servings = VALUES(servings)
+                    ''', (recipe_id, date, meal_type, servings))
+                self._refresh_rollup(cursor, [to_date(date)])
                 conn.commit()
+                self.connection_manager.touch('recipe_consumption', ROLLUP_TABLE)
                 return True
             except Exception as e:
                 print(f"Error saving recipe consumption: {e}")
@@ -691,47 +1098,81 @@ class FoodDatabase:
 
     def fetch_recipe_consumption(self, date=None):
         """Fetch recipe consumption records"""
+        if date:
+            day = to_date(date)
+            if day is not None and native_date_reads(self.connection_manager, 'recipe_consumption'):
+                return self._fetch_recipe_consumption(day, day)
+            return self._fetch_recipe_consumption(legacy_date=date)
+        return self._fetch_recipe_consumption()
+
+    def fetch_recipe_consumption_range(self, start, end):
+        """Recipe consumption records whose day falls in [start, end]"""
+        return self._fetch_recipe_consumption(to_date(start), to_date(end))
+
+    def _fetch_recipe_consumption(self, start=None, end=None, legacy_date=None):
+        native = native_date_reads(self.connection_manager, 'recipe_consumption')
+        vectors = vectors_ready(self.connection_manager)
         with self.connection_manager.get_connection() as conn:
             cursor = conn.cursor()
-            if date:
-                query = '''
+            if vectors:
+                # servings x the recipe's per-serving vector: no ingredient join, no GROUP BY
+                query = f'''
                     SELECT rc.recipe_consumption_id, rc.recipe_id, rc.consumption_date,
                            rc.meal_type, rc.servings, r.recipe_name, r.servings as recipe_servings,
                            r.recipe_id,
-                           round(sum(N.kcal*IQ.quantity*rc.servings/r.servings),0) kcal,
-                           round(sum(N.fat*IQ.quantity*rc.servings/r.servings),0) fat,
-                           round(sum(N.carb*IQ.quantity*rc.servings/r.servings),0) carb,
-                           round(sum(N.protein*IQ.quantity*rc.servings/r.servings),0) protein
+                           round(rn.kcal*rc.servings,0) kcal,
+                           round(rn.fat*rc.servings,0) fat,
+                           round(rn.carb*rc.servings,0) carb,
+                           round(rn.protein*rc.servings,0) protein,
+                           {'rc.entry_date' if native else 'NULL'} day
                     FROM recipe_consumption rc
                     JOIN Recipe r ON rc.recipe_id = r.recipe_id
-                    LEFT JOIN Recipe_Ingredients RI ON r.recipe_id = RI.recipe_id
-                    LEFT JOIN Ingredient_Quantity IQ ON IQ.ingredient_quantity_id = RI.ingredient_quantity_id
-                    LEFT JOIN Unit U ON U.unit_id = IQ.unit_id
-                    LEFT JOIN Ingredient I ON I.ingredient_id = IQ.ingredient_id
-                    LEFT JOIN Nutrition N ON IQ.unit_id = N.unit_id AND IQ.ingredient_id = N.ingredient_id
-                    WHERE rc.consumption_date = %s
-                    GROUP BY rc.recipe_consumption_id
+                    LEFT JOIN {VECTOR_TABLE} rn ON rn.recipe_id = r.recipe_id
                 '''
-                cursor.execute(query, (date,))
+                group_by = ''
             else:
-                query = '''
+                base_units = base_units_ready(self.connection_manager)
+                quantity = amount(base_units)
+                query = f'''
                     SELECT rc.recipe_consumption_id, rc.recipe_id, rc.consumption_date,
                            rc.meal_type, rc.servings, r.recipe_name, r.servings as recipe_servings,
                            r.recipe_id,
-                           round(sum(N.kcal*IQ.quantity*rc.servings/r.servings),0) kcal,
-                           round(sum(N.fat*IQ.quantity*rc.servings/r.servings),0) fat,
-                           round(sum(N.carb*IQ.quantity*rc.servings/r.servings),0) carb,
-                           round(sum(N.protein*IQ.quantity*rc.servings/r.servings),0) protein
+                           round(sum(N.kcal*{quantity}*rc.servings/r.servings),0) kcal,
+                           round(sum(N.fat*{quantity}*rc.servings/r.servings),0) fat,
+                           round(sum(N.carb*{quantity}*rc.servings/r.servings),0) carb,
+                           round(sum(N.protein*{quantity}*rc.servings/r.servings),0) protein,
+                           {'rc.entry_date' if native else 'NULL'} day
                     FROM recipe_consumption rc
                     JOIN Recipe r ON rc.recipe_id = r.recipe_id
                     LEFT JOIN Recipe_Ingredients RI ON r.recipe_id = RI.recipe_id
                     LEFT JOIN Ingredient_Quantity IQ ON IQ.ingredient_quantity_id = RI.ingredient_quantity_id
                     LEFT JOIN Unit U ON U.unit_id = IQ.unit_id
                     LEFT JOIN Ingredient I ON I.ingredient_id = IQ.ingredient_id
-                    LEFT JOIN Nutrition N ON IQ.unit_id = N.unit_id AND IQ.ingredient_id = N.ingredient_id
-                    GROUP BY rc.recipe_consumption_id
-                    ORDER BY rc.consumption_date DESC
+                    {nutrition_join(base_units)}
+                '''
+                group_by = 'GROUP BY rc.recipe_consumption_id'
+            if legacy_date is not None:
+                query += f'''
+                    WHERE rc.consumption_date = %s
+                    {group_by}
                 '''
+                params = (legacy_date,)
+            elif start is not None and end is not None:
+                query += f'''
+                    WHERE {self._date_range_predicate('rc', native)}
+                    {group_by}
+                    ORDER BY {'rc.entry_date' if native else 'rc.consumption_date'} DESC
+                '''
+                params = (start, end)
+            else:
+                query += f'''
+                    {group_by}
+                    ORDER BY {'rc.entry_date' if native else 'rc.consumption_date'} DESC
+                '''
+                params = None
+            if params:
+                cursor.execute(query, params)
+            else:
                 cursor.execute(query)
 
             results = cursor.fetchall()
@@ -747,7 +1188,8 @@ class FoodDatabase:
                 'kcal': r[8],
                 'fat': r[9],
                 'carb': r[10],
-                'protein': r[11]
+                'protein': r[11],
+                'day': r[12] if native else to_date(r[2])
             } for r in results]
 
     def delete_recipe_consumption(self, recipe_consumption_id):
@@ -755,10 +1197,13 @@ class FoodDatabase:
         try:
             with self.connection_manager.get_connection() as conn:
                 cursor = conn.cursor()
+                days = self._rollup_days(daily_nutrition.days_of_recipe_consumption, cursor, [recipe_consumption_id])
                 # MySQL-only code:
                 cursor.execute('DELETE FROM recipe_consumption WHERE recipe_consumption_id = %s',
                              (recipe_consumption_id,))
+                self._refresh_rollup(cursor, days)
                 conn.commit()
+                self.connection_manager.touch('recipe_consumption', ROLLUP_TABLE)
                 return "Deletion successful"
         except Exception as e:
             return f"Error: {e}"
@@ -1,15 +1,15 @@
 from flask import Blueprint
 from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
 from flask_login import login_required
-from datetime import datetime
+from datetime import date as date_type, datetime
 from models.food import FoodDatabase
-import pandas as pd
-import io
+from models.services.aggregation import read_csv, to_csv
 from models import openai_utils
 
 food_blueprint = Blueprint('foods', __name__)
 food_db = FoodDatabase()
-temp_df = None
+# (columns, records) of the last OpenAI preview
+temp_results = None
 
 def transform_date_format(date_str):
     # Parse the input date string to a datetime object
@@ -28,13 +28,10 @@ def get_ingredients_from_recipes(recipes_ids):
     return ingredients_quantity_ids
 
 def save_ingredients():
-    global temp_df
-    temp_df.columns = temp_df.columns.str.strip()
-    ingredient_quantity_ids = food_db.save_to_database(temp_df.to_csv(index=False))
+    ingredient_quantity_ids = food_db.save_to_database(to_csv(*temp_results))
     return ingredient_quantity_ids
 
 def save_recipe(date, form):
-    global temp_df
     serv = 1
 
     if form['recipe'] is None:
@@ -44,8 +41,7 @@ def save_recipe(date, form):
         serv = form['serv']
 
     recipe_name = form['recipe']
-    temp_df.columns = temp_df.columns.str.strip()
-    ingredient_quantity_ids = food_db.save_recipe(date, recipe_name, serv, temp_df.to_csv(index=False))
+    ingredient_quantity_ids = food_db.save_recipe(date, recipe_name, serv, to_csv(*temp_results))
 
     return ingredient_quantity_ids
 
@@ -79,37 +75,19 @@ def nutrition(nutrition_id):
 @food_blueprint.route('/food', methods=['GET','POST'])
 @login_required
 def food():
-    global temp_df
     data = None
     columns = None
-    if temp_df is not None:
+    if temp_results is not None:
         current_date = datetime.now().strftime('%d.%m.%Y')
-        temp_df['date'] = current_date
-        data = temp_df.to_dict(orient='records')
-        columns = temp_df.columns
+        columns = temp_results[0] + ([] if 'date' in temp_results[0] else ['date'])
+        data = [dict(record, date=current_date) for record in temp_results[1]]
     all_nutritions = food_db.fetch_all_nutrition()
-    all_consumption = food_db.fetch_all_consumption()
-    df = pd.DataFrame(all_consumption)
-
-    # Convert date format and handle multiple formats
-    if not df.empty:
-        try:
-            # First try with pd.to_datetime without any format specification
-            df['date'] = pd.to_datetime(df['date'])
-        except:
-            # If that fails, try with dayfirst=True for DD.MM.YYYY formats
-            try:
-                df['date'] = pd.to_datetime(df['date'], dayfirst=True)
-            except:
-                # As a last resort, try to parse each date individually
-                df['date'] = df['date'].apply(lambda x: pd.to_datetime(x, errors='coerce'))
-
-        # Sort by date descending
-        df = df.sort_values(by='date', ascending=False)
-        # Convert date back to string format
-        df['date'] = df['date'].dt.strftime('%d.%m.%Y')
-
-    all_consumption = df.to_dict(orient='records')
+
+    # Rows carry their native day; no string parsing needed. Newest first, undated rows last
+    all_consumption = [
+        dict(row, date=row['day'].strftime('%d.%m.%Y') if row['day'] else None)
+        for row in sorted(food_db.fetch_all_consumption(), key=lambda row: row['day'] or date_type.min, reverse=True)
+    ]
     # filtered_nutritions = all_nutritions['ingredient'].unique()
     # print(filtered_nutritions)
     # print(all_nutritions.sort_values(by='ingredient'))
@@ -154,7 +132,7 @@ def consume_food():
 @food_blueprint.route('/preview_openai_response', methods=['POST'])
 @login_required
 def preview_openai_response():
-    global temp_df
+    global temp_results
     try:
         user_input = request.form['foods']
         print(f"OpenAI request for: {user_input}")
@@ -163,15 +141,14 @@ def preview_openai_response():
         response = openai_utils.get_openai_response(user_input)
         print(f"OpenAI response received: {response[:100]}...")
 
-        # Convert the response to a DataFrame
-        data_io = io.StringIO(response)
-        temp_df = pd.read_csv(data_io)
-        print(f"DataFrame created successfully with {len(temp_df)} rows")
-        print(f"DataFrame columns: {list(temp_df.columns)}")
+        # Parse the CSV response into columns and records
+        temp_results = read_csv(response)
+        print(f"Parsed {len(temp_results[1])} rows")
+        print(f"Columns: {temp_results[0]}")
 
     except Exception as e:
         print(f"Error in preview_openai_response: {str(e)}")
-        temp_df = None
+        temp_results = None
 
     return redirect(url_for('foods.food'))
 
@@ -241,7 +218,7 @@ def remove_consumption():
 @food_blueprint.route('/handle_food_actions', methods=['POST'])
 @login_required
 def handle_food_actions():
-    global temp_df
+    global temp_results
     button_clicked = request.form['action']
 
     date = datetime.now().strftime('%d.%m.%Y')
@@ -267,16 +244,16 @@ def handle_food_actions():
             "fiber":request.form["fiber"],
             "kcal":request.form["kcal"]
         }
-        temp_df = pd.DataFrame([ingredient_obj])
+        temp_results = (list(ingredient_obj), [ingredient_obj])
         ingredient_quantity_ids = save_ingredients()
 
     else:
-        temp_df = None
+        temp_results = None
         return redirect(url_for('foods.food'))
 
     if 'consumption' in request.form:
         add_foods_to_consumption(date, ingredient_quantity_ids)
 
-    temp_df = None
+    temp_results = None
 
     return redirect(url_for('foods.food'))
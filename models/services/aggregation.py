@@ -0,0 +1,195 @@
+"""
+Lightweight aggregation for request handlers.
+
+Request paths wrapped a handful of rows (one analysis of five foods, a month
+of daily totals, 30 calorie entries) in pandas DataFrames: importing pandas
+added hundreds of milliseconds to every worker's boot, and each DataFrame cost
+far more to build than the arithmetic done on it. This module covers what
+those handlers used, on plain rows:
+- read_csv() / to_csv(): the analyzers' CSV answers as (columns, records),
+  with one type per column as pd.read_csv inferred it;
+- to_number(): pd.to_numeric(errors='coerce') with a default;
+- DayColumns: a date-keyed dataset as sorted days plus one array('d') per
+  numeric field (NaN where missing) and plain lists for text fields;
+- total(), mean(), group_by(), rolling_mean() and value_counts(), skipping
+  NaN like their pandas counterparts.
+
+Days are parsed with native_dates.to_date. pandas stays in the batch jobs and
+benchmarks under scripts/ (see scripts/benchmark_aggregation.py).
+"""
+import csv
+import io
+import math
+from array import array
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+from models.database.native_dates import to_date
+
+NAN = float('nan')
+
+# Cells read as missing, as pd.read_csv's default na_values
+NA_VALUES = {'', '#N/A', '#NA', 'N/A', 'NA', 'n/a', 'NULL', 'null', 'NaN', 'nan', '-NaN', '-nan', 'None', '<NA>'}
+
+
+# ============== CSV ==============
+
+def _column_type(cells: Iterable[Optional[str]]) -> Callable[[str], object]:
+    """int when every present cell is an integer, float when every one is a number, else str"""
+    cast = int
+    for cell in cells:
+        if cell is None:
+            continue
+        if cast is int:
+            try:
+                int(cell)
+                continue
+            except ValueError:
+                cast = float
+        try:
+            float(cell)
+        except ValueError:
+            return str
+    return cast
+
+
+def read_csv(text: str) -> Tuple[List[str], List[Dict]]:
+    """Columns and records of a CSV text with a header line; missing cells are None.
+
+    Header names are stripped. A numeric column with a missing cell stays
+    numeric (pandas would make it float and the cell NaN). Raises ValueError
+    on a line with more cells than the header, as pd.read_csv does.
+    """
+    lines = [line for line in csv.reader(io.StringIO(text or '')) if any(cell.strip() for cell in line)]
+    if not lines:
+        raise ValueError('No columns to parse from the CSV text')
+    columns = [name.strip() for name in lines[0]]
+    rows = []
+    for number, line in enumerate(lines[1:], start=2):
+        if len(line) > len(columns):
+            raise ValueError(f'Expected {len(columns)} fields in line {number}, saw {len(line)}')
+        cells = [None if cell.strip() in NA_VALUES else cell for cell in line]
+        rows.append(cells + [None] * (len(columns) - len(cells)))
+
+    casts = [_column_type(row[i] for row in rows) for i in range(len(columns))]
+    records = [{column: None if cell is None else cast(cell) for column, cast, cell in zip(columns, casts, row)}
+               for row in rows]
+    return columns, records
+
+
+def to_csv(columns: Sequence[str], records: Iterable[Dict]) -> str:
+    """CSV text of `records` in `columns` order (missing values as empty cells)"""
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    writer.writerow(columns)
+    for record in records:
+        writer.writerow(['' if record.get(column) is None else record[column] for column in columns])
+    return out.getvalue()
+
+
+def to_number(value, default: float = 0.0) -> float:
+    """`value` as a float, or `default` when it is missing or not a number"""
+    if value is None or isinstance(value, bool):
+        return default
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return default
+    return default if math.isnan(number) else number
+
+
+# ============== Date-keyed columns ==============
+
+def _float(value) -> float:
+    return to_number(value, NAN)
+
+
+@dataclass
+class DayColumns:
+    """One date-keyed dataset: `days` oldest first, a float array per numeric field, a list per text field"""
+    days: List[date] = field(default_factory=list)
+    values: Dict[str, array] = field(default_factory=dict)
+    text: Dict[str, List] = field(default_factory=dict)
+
+    @classmethod
+    def from_records(cls, rows: Iterable[Dict], numeric: Sequence[str], text: Sequence[str] = (),
+                     start: Optional[date] = None, end: Optional[date] = None, day: str = 'day') -> 'DayColumns':
+        """Rows with a parsable `day` inside [start, end], sorted by day (stable for equal days)"""
+        kept = []
+        for row in rows:
+            parsed = to_date(row.get(day))
+            if parsed is not None and (start is None or parsed >= start) and (end is None or parsed <= end):
+                kept.append((parsed, row))
+        kept.sort(key=lambda pair: pair[0])
+        return cls(
+            days=[parsed for parsed, _ in kept],
+            values={name: array('d', (_float(row.get(name)) for _, row in kept)) for name in numeric},
+            text={name: [row.get(name) for _, row in kept] for name in text}
+        )
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    @property
+    def empty(self) -> bool:
+        return not self.days
+
+    def __getitem__(self, name: str):
+        return self.values[name] if name in self.values else self.text[name]
+
+    def iso_days(self) -> List[str]:
+        return [day.isoformat() for day in self.days]
+
+    def __sizeof__(self):
+        return (object.__sizeof__(self) + len(self.days) * 32
+                + sum(len(column) * column.itemsize for column in self.values.values())
+                + sum(len(column) * 8 for column in self.text.values()))
+
+
+# ============== Aggregates ==============
+
+def total(values: Iterable[float]) -> float:
+    """Sum skipping NaN (0.0 for none)"""
+    return math.fsum(value for value in values if not math.isnan(value))
+
+
+def mean(values: Iterable[float]) -> float:
+    """Mean skipping NaN (NaN for none)"""
+    present = [value for value in values if not math.isnan(value)]
+    return math.fsum(present) / len(present) if present else NAN
+
+
+def group_by(keys: Sequence[Hashable], columns: Dict[str, Sequence[float]], how: str = 'sum'
+             ) -> Tuple[List[Hashable], Dict[str, array]]:
+    """Aggregate every column per key ('sum' or 'mean', skipping NaN); keys in order of first appearance"""
+    aggregate = {'sum': total, 'mean': mean}[how]
+    positions: Dict[Hashable, List[int]] = {}
+    for i, key in enumerate(keys):
+        positions.setdefault(key, []).append(i)
+    return list(positions), {
+        name: array('d', (aggregate(values[i] for i in rows) for rows in positions.values()))
+        for name, values in columns.items()
+    }
+
+
+def rolling_mean(values: Sequence[float], window: int, min_periods: int = 1) -> array:
+    """Mean of each value with the window-1 before it (NaN skipped, NaN below min_periods), in O(n)"""
+    result = array('d', [NAN]) * len(values)
+    running, count = 0.0, 0
+    for i, value in enumerate(values):
+        if not math.isnan(value):
+            running += value
+            count += 1
+        if i >= window and not math.isnan(values[i - window]):
+            running -= values[i - window]
+            count -= 1
+        if count >= min_periods:
+            result[i] = running / count
+    return result
+
+
+def value_counts(values: Iterable, top: Optional[int] = None) -> List[Tuple[object, int]]:
+    """(value, count) most frequent first, missing values left out"""
+    return Counter(value for value in values if value is not None).most_common(top)
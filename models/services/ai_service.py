@@ -1,7 +1,10 @@
 from models import openai_utils
 from models.food import FoodDatabase
-import pandas as pd
-import io
+from models.database.ai_results import get_result_store
+from models.database.ai_text_cache import get_text_cache
+from models.services.aggregation import read_csv, to_csv, to_number
+from models.services.product_scan import MAX_SCAN_PRODUCTS, product_records, scan_products
+import time
 from datetime import datetime
 from flask import session
 import uuid
@@ -10,35 +13,32 @@ class AIService:
     def __init__(self):
         self.food_db = FoodDatabase()
 
-    def _get_session_key(self):
-        """Get a unique session key for storing results"""
+    @property
+    def result_store(self):
+        return get_result_store(self.food_db.connection_manager)
+
+    def _get_session_id(self):
+        """Get the id the results of this session are stored under"""
         if 'ai_session_id' not in session:
             session['ai_session_id'] = str(uuid.uuid4())
-        return f"ai_results_{session['ai_session_id']}"
-
-    def _store_results(self, results_df):
-        """Store results in session"""
-        session_key = self._get_session_key()
-        # Store as CSV string in session
-        session[session_key] = results_df.to_csv(index=False)
+        # Results used to live in the cookie itself; drop them from older sessions
+        legacy_key = f"ai_results_{session['ai_session_id']}"
+        if legacy_key in session:
+            session.pop(legacy_key)
+        return session['ai_session_id']
+
+    def _store_results(self, columns, records):
+        """Store results server-side; the session only carries their id"""
+        self.result_store.put(self._get_session_id(), columns, records)
         session.permanent = True
 
     def _get_stored_results(self):
-        """Get stored results from session"""
-        session_key = self._get_session_key()
-        if session_key in session:
-            try:
-                data_io = io.StringIO(session[session_key])
-                return pd.read_csv(data_io)
-            except:
-                return None
-        return None
+        """Get stored results (columns and records), or None"""
+        return self.result_store.get(self._get_session_id())
 
     def _clear_stored_results(self):
-        """Clear stored results from session"""
-        session_key = self._get_session_key()
-        if session_key in session:
-            session.pop(session_key, None)
+        """Clear stored results"""
+        self.result_store.delete(self._get_session_id())
 
     def analyze_foods(self, user_input):
         """Analyze foods using OpenAI (text-based)"""
@@ -46,19 +46,15 @@ class AIService:
         self._clear_stored_results()
 
         try:
-            # Get OpenAI response
-            response = openai_utils.get_openai_response(user_input)
+            # Get OpenAI response; items analyzed before come from the text cache
+            response = get_text_cache(self.food_db.connection_manager).analyze(
+                user_input, openai_utils.get_openai_response)
 
             # Parse CSV response
-            data_io = io.StringIO(response)
-            temp_results = pd.read_csv(data_io)
-
-            # Store results in session
-            self._store_results(temp_results)
+            columns, results = read_csv(response)
 
-            # Convert results for display
-            results = temp_results.to_dict(orient='records')
-            columns = temp_results.columns.tolist()
+            # Store results server-side
+            self._store_results(columns, results)
 
             return {
                 'success': True,
@@ -84,15 +80,10 @@ class AIService:
             response = openai_utils.analyze_meal_image(base64_image)
 
             # Parse CSV response
-            data_io = io.StringIO(response)
-            temp_results = pd.read_csv(data_io)
+            columns, results = read_csv(response)
 
-            # Store results in session
-            self._store_results(temp_results)
-
-            # Convert results for display
-            results = temp_results.to_dict(orient='records')
-            columns = temp_results.columns.tolist()
+            # Store results server-side
+            self._store_results(columns, results)
 
             return {
                 'success': True,
@@ -118,15 +109,10 @@ class AIService:
             response = openai_utils.analyze_nutrition_label(base64_image, food_name)
 
             # Parse CSV response
-            data_io = io.StringIO(response)
-            temp_results = pd.read_csv(data_io)
-
-            # Store results in session
-            self._store_results(temp_results)
+            columns, results = read_csv(response)
 
-            # Convert results for display
-            results = temp_results.to_dict(orient='records')
-            columns = temp_results.columns.tolist()
+            # Store results server-side
+            self._store_results(columns, results)
 
             return {
                 'success': True,
@@ -152,15 +138,10 @@ class AIService:
             response = openai_utils.analyze_product_images(nutrition_base64, front_base64)
 
             # Parse CSV response
-            data_io = io.StringIO(response)
-            temp_results = pd.read_csv(data_io)
+            columns, results = read_csv(response)
 
-            # Store results in session
-            self._store_results(temp_results)
-
-            # Convert results for display
-            results = temp_results.to_dict(orient='records')
-            columns = temp_results.columns.tolist()
+            # Store results server-side
+            self._store_results(columns, results)
 
             return {
                 'success': True,
@@ -176,59 +157,121 @@ class AIService:
                 'error': f'Error analyzing product photos: {str(e)}'
             }
 
-    def save_analysis_results(self):
-        """Save analyzed foods to database"""
-        temp_results = self._get_stored_results()
+    @staticmethod
+    def _prepare_entries(records):
+        """Analysis results as save_entries() records (qty, unit, ingr, kcal, fats, ...)"""
+        # Map column names to expected format
+        column_mapping = {
+            'qty': 'qty',
+            'quantity': 'qty',
+            'unit': 'unit',
+            'unit_name': 'unit',
+            'ingr': 'ingr',
+            'ingredient': 'ingr',
+            'ingredient_name': 'ingr',
+            'kcal': 'kcal',
+            'calories': 'kcal',
+            'fats': 'fats',
+            'fat': 'fats',
+            'carbs': 'carbs',
+            'carb': 'carbs',
+            'fiber': 'fiber',
+            'net_carbs': 'net_carbs',
+            'net_carb': 'net_carbs',
+            'protein': 'protein'
+        }
+
+        required_columns = ['qty', 'unit', 'ingr', 'kcal', 'fats', 'carbs', 'fiber', 'net_carbs', 'protein']
+        numeric_columns = ['qty', 'kcal', 'fats', 'carbs', 'fiber', 'net_carbs', 'protein']
+
+        entries = []
+        for record in records:
+            # Rename columns to match expected format (later duplicates win, as with a DataFrame rename)
+            entry = {column_mapping.get(column.strip(), column.strip()): value for column, value in record.items()}
+            if 'net_carbs' not in entry:
+                # Calculate net carbs if missing
+                entry['net_carbs'] = to_number(entry.get('carbs')) - to_number(entry.get('fiber'))
+            # Missing columns default to 0, numbers that do not parse to 0
+            entry = {col: entry.get(col, 0) for col in required_columns}
+            for col in numeric_columns:
+                entry[col] = to_number(entry[col])
+            entries.append(entry)
+        return entries
+
+    def _scan_key(self, session_id=None):
+        return f"{session_id or self._get_session_id()}:scan"
+
+    def scan_products(self, pairs, session_id):
+        """Analyze (nutrition_base64, front_base64) pairs concurrently, yielding each product as it completes.
+
+        `session_id` is resolved by the caller before streaming starts (the
+        session cannot change once the response is under way). Successful
+        products are kept server-side until save_scanned_products().
+        """
+        if len(pairs) > MAX_SCAN_PRODUCTS:
+            raise ValueError(f'At most {MAX_SCAN_PRODUCTS} products per scan')
+
+        started = time.perf_counter()
+        products = []
+        try:
+            for product in scan_products(pairs, openai_utils.analyze_product_images):
+                products.append(product)
+                yield product
+        finally:
+            # Keep what finished even when the client went away mid-stream
+            columns, records = product_records(products)
+            self.result_store.put(self._scan_key(session_id), columns, records)
+
+        yield {
+            'done': True,
+            'products': len(pairs),
+            'succeeded': sum(product['success'] for product in products),
+            'seconds': round(time.perf_counter() - started, 2)
+        }
+
+    def save_scanned_products(self, accepted_indices):
+        """Save the accepted products of the last scan in one transaction"""
+        scan = self.result_store.get(self._scan_key())
+        if scan is None:
+            return {
+                'success': False,
+                'error': 'No scanned products to save. Please scan products first.'
+            }
 
-        if temp_results is not None:
-            try:
-                # Clean column names and ensure they match expected format
-                temp_results.columns = temp_results.columns.str.strip()
-
-                # Map column names to expected format
-                column_mapping = {
-                    'qty': 'qty',
-                    'quantity': 'qty',
-                    'unit': 'unit',
-                    'unit_name': 'unit',
-                    'ingr': 'ingr',
-                    'ingredient': 'ingr',
-                    'ingredient_name': 'ingr',
-                    'kcal': 'kcal',
-                    'calories': 'kcal',
-                    'fats': 'fats',
-                    'fat': 'fats',
-                    'carbs': 'carbs',
-                    'carb': 'carbs',
-                    'fiber': 'fiber',
-                    'net_carbs': 'net_carbs',
-                    'net_carb': 'net_carbs',
-                    'protein': 'protein'
+        try:
+            accepted = {int(idx) for idx in accepted_indices}
+            rows = [row for row in scan.records if row['product'] in accepted]
+            if not rows:
+                return {
+                    'success': False,
+                    'error': 'No scanned products selected'
                 }
 
-                # Rename columns to match expected format
-                temp_results = temp_results.rename(columns=column_mapping)
+            records = [{column: row.get(column) for column in scan.columns if column != 'product'} for row in rows]
+            self.food_db.save_entries(self._prepare_entries(records), serv=1)
+            self.result_store.delete(self._scan_key())
+
+            return {
+                'success': True,
+                'message': f'{len({row["product"] for row in rows})} product(s) saved to database successfully!'
+            }
 
-                # Ensure all required columns exist with default values if missing
-                required_columns = ['qty', 'unit', 'ingr', 'kcal', 'fats', 'carbs', 'fiber', 'net_carbs', 'protein']
-                for col in required_columns:
-                    if col not in temp_results.columns:
-                        if col == 'net_carbs':
-                            # Calculate net carbs if missing
-                            temp_results[col] = temp_results.get('carbs', 0) - temp_results.get('fiber', 0)
-                        else:
-                            temp_results[col] = 0
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Error saving products: {str(e)}'
+            }
 
-                # Ensure numeric columns are properly formatted
-                numeric_columns = ['qty', 'kcal', 'fats', 'carbs', 'fiber', 'net_carbs', 'protein']
-                for col in numeric_columns:
-                    temp_results[col] = pd.to_numeric(temp_results[col], errors='coerce').fillna(0)
+    def save_analysis_results(self):
+        """Save analyzed foods to database"""
+        temp_results = self._get_stored_results()
 
-                # Reorder columns to match expected format
-                temp_results = temp_results[required_columns]
+        if temp_results is not None:
+            try:
+                entries = self._prepare_entries(temp_results.records)
 
-                # Save to database
-                self.food_db.save_to_database(temp_results.to_csv(index=False))
+                # Save to database in one transaction (records, not CSV: names may contain commas)
+                self.food_db.save_entries(entries, serv=1)
 
                 # Clear stored results after successful save
                 self._clear_stored_results()
@@ -263,16 +306,16 @@ class AIService:
         try:
             # Filter results based on selected indices
             included_indices = [int(idx) for idx in included_indices]
-            selected_results = temp_results.iloc[included_indices]
+            selected_results = [temp_results.records[idx] for idx in included_indices]
 
-            if selected_results.empty:
+            if not selected_results:
                 return {
                     'success': False,
                     'error': 'No ingredients selected for the recipe'
                 }
 
             # Save ingredients to database first (to get IDs)
-            csv_data = selected_results.to_csv(index=False)
+            csv_data = to_csv(temp_results.columns, selected_results)
 
             # Save recipe
             date = datetime.now().strftime('%Y-%m-%d')
@@ -6,6 +6,11 @@ import logging
 from datetime import datetime, date, timedelta
 from typing import Optional, List, Dict, Any, Tuple
 from models.database.connection_manager import get_db_manager
+from models.database.keyset import after_condition, cached_count, cursor_values, keyset_page
+from models.database import weight_series
+from models.database.energy_balance import invalidate as invalidate_energy
+from models.database.native_dates import to_date
+from models.services.weight_trend import load_trend, record_weight
 
 logger = logging.getLogger(__name__)
 
@@ -177,6 +182,9 @@ class CyclingReadinessService:
                 tss, avg_cadence, kcal_active, kcal_total
             ))
             conn.commit()
+            self.connection_manager.touch('cycling_workouts')
+            # kcal_active is the activity of days without a calorie entry
+            invalidate_energy(self.connection_manager, [to_date(date)], user_id=self.user_id)
             return cursor.lastrowid
 
     def get_cycling_workouts(self, limit: int = 30, offset: int = 0) -> List[Dict]:
@@ -198,6 +206,47 @@ class CyclingReadinessService:
                 ''', (limit, offset))
             return cursor.fetchall()
 
+    def get_cycling_workouts_page(self, limit: int = 30, cursor: str = None,
+                                  include_total: bool = False) -> Dict[str, Any]:
+        """
+        Cycling workouts after `cursor`, newest first.
+
+        Keyset on (date, start_time, id), so deep pages cost the same as the
+        first; workouts without a start time come last within their day.
+
+        Returns:
+            {'items', 'has_more', 'next_cursor'} plus a cached 'total' when asked
+        """
+        after = cursor_values(cursor, 'cycling_workouts', 3)
+        conditions, params = [], []
+        if self.user_id:
+            conditions.append('user_id = %s')
+            params.append(self.user_id)
+        if after:
+            condition, after_params = after_condition(
+                [('date', False), ('start_time', True), ('id', False)], after)
+            conditions.append(condition)
+            params.extend(after_params)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        with self.get_connection() as conn:
+            db_cursor = conn.cursor(dictionary=True)
+            db_cursor.execute(f'''
+                SELECT * FROM cycling_workouts
+                {where}
+                ORDER BY date DESC, start_time DESC, id DESC
+                LIMIT %s
+            ''', (*params, limit + 1))
+            rows = db_cursor.fetchall()
+
+        page = keyset_page(rows, limit, 'cycling_workouts', lambda row: (row['date'], row['start_time'], row['id']))
+        if include_total:
+            page['total'] = cached_count(
+                self.connection_manager, ('cycling_workouts',),
+                'SELECT COUNT(*) AS total FROM cycling_workouts' + (' WHERE user_id = %s' if self.user_id else ''),
+                (self.user_id,) if self.user_id else ())
+        return page
+
     def get_cycling_workout_by_id(self, workout_id: int) -> Optional[Dict]:
         """Get a specific cycling workout"""
         with self.get_connection() as conn:
@@ -228,38 +277,50 @@ class CyclingReadinessService:
 
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            cursor.execute('SELECT date FROM cycling_workouts WHERE id = %s', (workout_id,))
+            before = cursor.fetchone()
             cursor.execute(query, values)
             conn.commit()
-            return cursor.rowcount > 0
+            self.connection_manager.touch('cycling_workouts')
+            updated = cursor.rowcount > 0
+        if updated:
+            invalidate_energy(self.connection_manager,
+                              [to_date(before[0]) if before else None, to_date(kwargs.get('date'))],
+                              user_id=self.user_id)
+        return updated
 
     def delete_cycling_workout(self, workout_id: int) -> bool:
         """Delete a cycling workout"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            cursor.execute('SELECT date FROM cycling_workouts WHERE id = %s', (workout_id,))
+            before = cursor.fetchone()
             cursor.execute('DELETE FROM cycling_workouts WHERE id = %s', (workout_id,))
             conn.commit()
-            return cursor.rowcount > 0
+            self.connection_manager.touch('cycling_workouts')
+            deleted = cursor.rowcount > 0
+        if deleted and before:
+            invalidate_energy(self.connection_manager, [to_date(before[0])], user_id=self.user_id)
+        return deleted
 
     def get_cycling_stats(self, days: int = 30) -> Dict[str, Any]:
-        """Get cycling statistics for the last N days"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
-            start_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-
-            cursor.execute('''
-                SELECT
-                    COUNT(*) as total_workouts,
-                    COALESCE(SUM(duration_sec), 0) as total_duration_sec,
-                    COALESCE(SUM(distance_km), 0) as total_distance_km,
-                    COALESCE(AVG(avg_power_w), 0) as avg_power,
-                    COALESCE(AVG(avg_heart_rate), 0) as avg_heart_rate,
-                    COALESCE(SUM(tss), 0) as total_tss,
-                    COALESCE(SUM(kcal_active), 0) as total_kcal
-                FROM cycling_workouts
-                WHERE date >= %s
-            ''', (start_date,))
-
-            return cursor.fetchone() or {}
+        """Get cycling statistics for the last N days (cached until a workout is written)"""
+        start_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+
+        result = self.connection_manager.execute_query('''
+            SELECT
+                COUNT(*) as total_workouts,
+                COALESCE(SUM(duration_sec), 0) as total_duration_sec,
+                COALESCE(SUM(distance_km), 0) as total_distance_km,
+                COALESCE(AVG(avg_power_w), 0) as avg_power,
+                COALESCE(AVG(avg_heart_rate), 0) as avg_heart_rate,
+                COALESCE(SUM(tss), 0) as total_tss,
+                COALESCE(SUM(kcal_active), 0) as total_kcal
+            FROM cycling_workouts
+            WHERE date >= %s
+        ''', (start_date,), fetch_one=True, cache_tables=('cycling_workouts',))
+
+        return result or {}
 
     def get_cycling_workout_by_date(self, workout_date: str) -> Optional[Dict]:
         """Get cycling workout for a specific date"""
@@ -2288,7 +2349,8 @@ class CyclingReadinessService:
         VO2 Index = peak_power_w / weight_kg (W/kg)
         
         Args:
-            weight_kg: Athlete weight in kg. If None, uses DEFAULT_ATHLETE_WEIGHT_KG
+            weight_kg: Athlete weight in kg. If None, uses the current trend weight,
+                or DEFAULT_ATHLETE_WEIGHT_KG when there are no weigh-ins
             weeks: Number of weeks to look back (default 12)
         
         Returns:
@@ -2300,9 +2362,10 @@ class CyclingReadinessService:
                 "vo2_index": float | None
             }, ...]
         """
-        # Use default weight if not provided
+        # Use the trend weight (or the default) if not provided
         if weight_kg is None:
-            weight_kg = self.DEFAULT_ATHLETE_WEIGHT_KG
+            latest = self._weight_trend().latest() if weight_series.series_ready(self.connection_manager) else None
+            weight_kg = latest['trend_kg'] if latest else self.DEFAULT_ATHLETE_WEIGHT_KG
         
         with self.get_connection() as conn:
             cursor = conn.cursor(dictionary=True)
@@ -2374,6 +2437,10 @@ class CyclingReadinessService:
 
     # ============== Body Weight Methods ==============
 
+    def _weight_trend(self):
+        """Trend of this user's weight series (see models/services/weight_trend.py)"""
+        return load_trend(self.connection_manager, self.user_id or weight_series.DEFAULT_USER)
+
     def get_body_weights(self, weeks: int = 12) -> List[Dict[str, Any]]:
         """
         Get body weight entries for the last N weeks.
@@ -2382,8 +2449,18 @@ class CyclingReadinessService:
             weeks: Number of weeks to look back (default 12)
         
         Returns:
-            List of weight entries sorted by date ascending
+            List of weight entries sorted by date ascending, each with its
+            smoothed trend weight once the weight stores are merged
         """
+        if weight_series.series_ready(self.connection_manager):
+            trend = self._weight_trend()
+            start = date.today() - timedelta(weeks=weeks)
+            return [{
+                'date': day.strftime('%Y-%m-%d'),
+                'weight_kg': trend.weights[i],
+                'trend_kg': round(trend.level[i], 2)
+            } for i, day in enumerate(trend.days) if day >= start]
+
         with self.get_connection() as conn:
             cursor = conn.cursor(dictionary=True)
             
@@ -2413,6 +2490,22 @@ class CyclingReadinessService:
         Returns:
             Dict with success status and saved entry
         """
+        if weight_series.series_ready(self.connection_manager):
+            try:
+                record_weight(self.connection_manager, datetime.strptime(date_str, '%Y-%m-%d').date(), weight_kg,
+                              self.user_id or weight_series.DEFAULT_USER, weight_series.SOURCE_CYCLING)
+                return {
+                    'success': True,
+                    'date': date_str,
+                    'weight_kg': weight_kg
+                }
+            except Exception as e:
+                logger.error(f"Error saving body weight: {e}")
+                return {
+                    'success': False,
+                    'error': str(e)
+                }
+
         with self.get_connection() as conn:
             cursor = conn.cursor()
             
@@ -2451,6 +2544,11 @@ class CyclingReadinessService:
         Returns:
             Weight in kg, or None if no entry found
         """
+        if weight_series.series_ready(self.connection_manager):
+            trend = self._weight_trend()
+            i = trend.index_on(datetime.strptime(target_date, '%Y-%m-%d').date())
+            return trend.weights[i] if i is not None else None
+
         with self.get_connection() as conn:
             cursor = conn.cursor(dictionary=True)
             
@@ -2469,6 +2567,9 @@ class CyclingReadinessService:
         """
         Compute weekly VO2 index using dynamic weight from body_weights table.
         
+        Once the weight stores are merged, each week uses the trend weight as of
+        its last day (one series read instead of a lookup per week).
+        
         Args:
             weeks: Number of weeks to look back (default 12)
         
@@ -2497,6 +2598,7 @@ class CyclingReadinessService:
             ''', (self.user_id, weeks))
             
             weeks_data = cursor.fetchall()
+            trend = self._weight_trend() if weight_series.series_ready(self.connection_manager) else None
             
             result = []
             for w in weeks_data:
@@ -2509,8 +2611,12 @@ class CyclingReadinessService:
                 week_end = w['week_end'].strftime('%Y-%m-%d') if hasattr(w['week_end'], 'strftime') else str(w['week_end'])
                 peak_power = float(w['peak_power_w'])
                 
-                # Get weight for this week (latest entry on or before week end)
-                weight_kg = self.get_weight_for_date(week_end)
+                # Get weight for this week (trend, or latest entry, as of week end)
+                if trend is not None:
+                    level = trend.level_on(datetime.strptime(week_end, '%Y-%m-%d').date())
+                    weight_kg = round(level, 2) if level is not None else None
+                else:
+                    weight_kg = self.get_weight_for_date(week_end)
                 
                 # Calculate VO2 index if weight available
                 vo2_index = round(peak_power / weight_kg, 2) if weight_kg and weight_kg > 0 else None
@@ -2747,6 +2853,7 @@ class CyclingReadinessService:
                     workout_id
                 ))
                 conn.commit()
+                self.connection_manager.touch('ai_workout_analyses')
                 analysis_id = existing['id']
             else:
                 # Insert new
@@ -2776,6 +2883,7 @@ class CyclingReadinessService:
                     data.get('prompt_version')
                 ))
                 conn.commit()
+                self.connection_manager.touch('ai_workout_analyses')
                 analysis_id = cursor.lastrowid
             
             # Return the saved record
@@ -2817,19 +2925,63 @@ class CyclingReadinessService:
                 FROM ai_workout_analyses a
                 LEFT JOIN cycling_workouts w ON a.workout_id = w.id
                 WHERE a.user_id = %s
-                ORDER BY a.date DESC, a.created_at DESC
+                ORDER BY a.date DESC, a.created_at DESC, a.id DESC
                 LIMIT %s OFFSET %s
             ''', (self.user_id, limit, offset))
             return cursor.fetchall()
 
-    def get_analysis_count(self) -> int:
-        """Get total count of analyses for pagination."""
+    def get_analysis_history_page(self, limit: int = 20, cursor: str = None,
+                                  include_total: bool = False) -> Dict[str, Any]:
+        """
+        AI workout analyses after `cursor`, newest first (keyset on date, created_at, id).
+
+        Args:
+            limit: Max number of results
+            cursor: next_cursor of the previous page (None for the first page)
+            include_total: Add the cached analysis count as 'total'
+
+        Returns:
+            {'items', 'has_more', 'next_cursor'} with the same rows as get_analysis_history
+        """
+        after = cursor_values(cursor, 'ai_analyses', 3)
+        condition, params = after_condition(
+            [('a.date', False), ('a.created_at', False), ('a.id', False)], after) if after else ('1=1', ())
+
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT COUNT(*) FROM ai_workout_analyses WHERE user_id = %s
-            ''', (self.user_id,))
-            return cursor.fetchone()[0]
+            db_cursor = conn.cursor(dictionary=True)
+            db_cursor.execute(f'''
+                SELECT 
+                    a.id,
+                    a.workout_id,
+                    a.date,
+                    a.overall_score,
+                    a.compliance_score,
+                    a.execution_label,
+                    a.fatigue_risk,
+                    a.notes_short,
+                    a.created_at,
+                    a.updated_at,
+                    w.duration_sec as workout_duration_sec,
+                    w.avg_power_w as workout_avg_power_w,
+                    w.avg_heart_rate as workout_avg_hr_bpm
+                FROM ai_workout_analyses a
+                LEFT JOIN cycling_workouts w ON a.workout_id = w.id
+                WHERE a.user_id = %s AND {condition}
+                ORDER BY a.date DESC, a.created_at DESC, a.id DESC
+                LIMIT %s
+            ''', (self.user_id, *params, limit + 1))
+            rows = db_cursor.fetchall()
+
+        page = keyset_page(rows, limit, 'ai_analyses', lambda row: (row['date'], row['created_at'], row['id']))
+        if include_total:
+            page['total'] = self.get_analysis_count()
+        return page
+
+    def get_analysis_count(self) -> int:
+        """Get total count of analyses for pagination (cached until analyses or workouts change)."""
+        return cached_count(
+            self.connection_manager, ('ai_workout_analyses', 'cycling_workouts'),
+            'SELECT COUNT(*) AS total FROM ai_workout_analyses WHERE user_id = %s', (self.user_id,))
 
     @staticmethod
     def format_analysis_json(analysis: Dict[str, Any], workout: Dict[str, Any] = None) -> Dict[str, Any]:
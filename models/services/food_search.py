@@ -0,0 +1,370 @@
+"""
+In-process ranked search over ingredient names.
+
+get_foods_paginated used to search with `ingredient_name LIKE '%term%'`,
+which cannot use an index and re-ran the catalog join plus a COUNT(*) per
+keystroke. FoodSearchIndex indexes the names of the worker's food catalog
+(models/database/food_catalog.py) and answers from memory:
+
+- name prefix:  the whole name starts with the query ("chicken b")
+- token prefix: every query word starts a word of the name ("bre chick")
+- fuzzy:        trigram similarity, for typos ("chiken")
+
+Matches rank by match quality first (exact, name prefix, token prefix,
+fuzzy), then favorites, then how often the ingredient was eaten, then
+shorter names. The index follows catalog patches row by row through
+FoodCatalog.subscribe(); without the catalog_changes log it rebuilds when
+the catalog tables' data version changes.
+"""
+import re
+import time
+import heapq
+import bisect
+import logging
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+from models.database.food_catalog import CATALOG_TABLES, changes_ready
+
+logger = logging.getLogger(__name__)
+
+# Match quality tiers (higher is better)
+EXACT, NAME_PREFIX, TOKEN_PREFIX, FUZZY = 3, 2, 1, 0
+
+# Minimum trigram (Jaccard) similarity of a misspelled word
+FUZZY_THRESHOLD = 0.3
+# Consumption counts are a ranking hint; refresh them at most this often
+FREQUENCY_SECONDS = 300
+# Best name-prefix matches remembered per short query ("c", "ch") until the index changes
+TOP_PREFIX = 50
+# Rebuild interval without the change log and without the query cache
+REBUILD_SECONDS = 300
+
+_SEPARATORS = re.compile(r'[\W_]+')
+_TOKEN_END = '\uffff'
+
+
+def normalize(text: str) -> str:
+    """Lowercase, accent-free, single-spaced words"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _SEPARATORS.sub(' ', text.lower()).strip()
+
+
+def trigrams(normalized: str) -> Set[str]:
+    grams = set()
+    for token in normalized.split():
+        padded = f'  {token} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class FoodSearchIndex:
+    """Name index over one worker's food catalog"""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._lock = threading.RLock()
+        self._rows: Dict[int, Dict] = {}                # ingredient_quantity_id -> catalog row
+        self._quantities: Dict[int, Set[int]] = {}      # ingredient_id -> its ingredient_quantity_ids
+        self._names: Dict[int, str] = {}                # ingredient_id -> normalized name
+        self._sorted_names: List[Tuple[str, int]] = []
+        self._postings: Dict[str, Set[int]] = {}        # name word -> ingredient_ids
+        self._sorted_tokens: List[str] = []
+        self._token_trigrams: Dict[str, Set[str]] = {}  # trigram -> name words
+        self._favorites: Set[int] = set()
+        self._frequency: Dict[int, int] = {}
+        self._frequency_at = 0.0
+        self._score: Dict[int, float] = {}              # popularity: favorite, then uses, then shorter
+        self._top_prefix: Dict[str, List[int]] = {}
+        self._built = False
+        self._built_version = None
+        self._built_at = 0.0
+        catalog.subscribe(self._on_catalog_change)
+
+    # ============== Maintenance ==============
+
+    def _on_catalog_change(self, removed_ids, foods):
+        with self._lock:
+            self._top_prefix.clear()
+            if removed_ids is None:
+                self._build(foods)
+                return
+            for iq_id in removed_ids:
+                self._remove_row(iq_id)
+            for food in foods:
+                self._add_row(food)
+
+    def _build(self, foods):
+        self._rows, self._quantities, self._names = {}, {}, {}
+        self._postings, self._token_trigrams, self._favorites, self._score = {}, {}, set(), {}
+        self._top_prefix = {}
+        for food in foods:
+            ingredient_id = food['ingredient_id']
+            self._rows[food['id']] = food
+            self._quantities.setdefault(ingredient_id, set()).add(food['id'])
+            if food['is_favorite']:
+                self._favorites.add(ingredient_id)
+            if ingredient_id not in self._names:
+                name = self._names[ingredient_id] = normalize(food['ingredient'])
+                for token in name.split():
+                    self._postings.setdefault(token, set()).add(ingredient_id)
+        self._sorted_names = sorted((name, ingredient_id) for ingredient_id, name in self._names.items())
+        self._sorted_tokens = sorted(self._postings)
+        for token in self._sorted_tokens:
+            self._add_token_trigrams(token)
+        for ingredient_id in self._names:
+            self._rescore(ingredient_id)
+        self._built = True
+
+    def _add_row(self, food):
+        ingredient_id = food['ingredient_id']
+        self._rows[food['id']] = food
+        self._quantities.setdefault(ingredient_id, set()).add(food['id'])
+        if food['is_favorite']:
+            self._favorites.add(ingredient_id)
+        else:
+            self._favorites.discard(ingredient_id)
+        if ingredient_id not in self._names:
+            name = self._names[ingredient_id] = normalize(food['ingredient'])
+            bisect.insort(self._sorted_names, (name, ingredient_id))
+            for token in name.split():
+                if token not in self._postings:
+                    self._postings[token] = set()
+                    bisect.insort(self._sorted_tokens, token)
+                    self._add_token_trigrams(token)
+                self._postings[token].add(ingredient_id)
+        self._rescore(ingredient_id)
+
+    def _remove_row(self, iq_id):
+        food = self._rows.pop(iq_id, None)
+        if food is None:
+            return
+        ingredient_id = food['ingredient_id']
+        quantities = self._quantities.get(ingredient_id, set())
+        quantities.discard(iq_id)
+        if quantities:
+            return
+        # Last quantity of the ingredient: drop its name
+        self._quantities.pop(ingredient_id, None)
+        self._favorites.discard(ingredient_id)
+        self._score.pop(ingredient_id, None)
+        name = self._names.pop(ingredient_id, None)
+        if name is None:
+            return
+        position = bisect.bisect_left(self._sorted_names, (name, ingredient_id))
+        if position < len(self._sorted_names) and self._sorted_names[position] == (name, ingredient_id):
+            del self._sorted_names[position]
+        for token in set(name.split()):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.discard(ingredient_id)
+            if not postings:
+                # Nobody uses the word anymore
+                del self._postings[token]
+                del self._sorted_tokens[bisect.bisect_left(self._sorted_tokens, token)]
+                for gram in trigrams(token):
+                    words = self._token_trigrams.get(gram)
+                    if words is not None:
+                        words.discard(token)
+                        if not words:
+                            del self._token_trigrams[gram]
+
+    def _add_token_trigrams(self, token):
+        for gram in trigrams(token):
+            self._token_trigrams.setdefault(gram, set()).add(token)
+
+    def _rescore(self, ingredient_id):
+        self._score[ingredient_id] = (
+            (ingredient_id in self._favorites) * 1e12
+            + self._frequency.get(ingredient_id, 0) * 1e3
+            - min(len(self._names.get(ingredient_id, '')), 999)
+        )
+
+    def _sync(self):
+        """Bring the index up to date with the catalog (outside the index lock)"""
+        manager = self.catalog.manager
+        if changes_ready(manager):
+            foods = self.catalog.foods()  # patches arrive through _on_catalog_change
+            if not self._built:
+                with self._lock:
+                    if not self._built:
+                        self._build(foods)
+            return
+
+        version = manager.data_version(*CATALOG_TABLES)
+        stale = not self._built or version != self._built_version or (
+            not version and time.monotonic() - self._built_at > REBUILD_SECONDS)
+        if stale:
+            foods = self.catalog.foods()
+            with self._lock:
+                self._build(foods)
+                self._built_version = version
+                self._built_at = time.monotonic()
+
+    def _refresh_frequency(self):
+        if time.monotonic() - self._frequency_at < FREQUENCY_SECONDS:
+            return
+        self._frequency_at = time.monotonic()
+        try:
+            rows = self.catalog.manager.execute_query('''
+                SELECT IQ.ingredient_id AS ingredient_id, COUNT(*) AS uses
+                FROM Consumption c
+                JOIN Ingredient_Quantity IQ ON IQ.ingredient_quantity_id = c.ingredient_quantity_id
+                GROUP BY IQ.ingredient_id
+            ''', fetch_all=True) or []
+        except Exception as e:
+            logger.warning(f"Could not load consumption frequency: {e}")
+            return
+        frequency = {row['ingredient_id']: int(row['uses']) for row in rows}
+        with self._lock:
+            changed = {i for i in frequency.keys() | self._frequency.keys()
+                       if frequency.get(i) != self._frequency.get(i)}
+            self._frequency = frequency
+            if changed:
+                self._top_prefix.clear()
+            for ingredient_id in changed & self._names.keys():
+                self._rescore(ingredient_id)
+
+    # ============== Queries ==============
+
+    def _word_matches(self, word: str, fuzzy: bool) -> Set[int]:
+        """Ingredients with a name word starting with `word` (or, when fuzzy, spelled like it)"""
+        low = bisect.bisect_left(self._sorted_tokens, word)
+        high = bisect.bisect_left(self._sorted_tokens, word + _TOKEN_END)
+        tokens = self._sorted_tokens[low:high]
+        if fuzzy and len(word) >= 3:
+            grams = trigrams(word)
+            shared = Counter()
+            for gram in grams:
+                shared.update(self._token_trigrams.get(gram, ()))
+            tokens += [
+                token for token, count in shared.items()
+                if count / (len(grams) + len(trigrams(token)) - count) >= FUZZY_THRESHOLD
+            ]
+        if len(tokens) == 1:
+            return self._postings[tokens[0]]
+        return set().union(*(self._postings[token] for token in tokens))
+
+    def _ranked(self, query: str, limit: Optional[int], complete: bool = False) -> Tuple[List[Tuple[int, int]], Set[int]]:
+        """(tier, ingredient_id) of the best `limit` matches, best first, and the ids matched.
+
+        Tiers that cannot improve the first `limit` results are skipped
+        unless `complete` asks for every match (to count them).
+        """
+        results: List[Tuple[int, int]] = []
+        seen: Set[int] = set()
+        words = query.split()
+        if not words:
+            return results, seen
+        score = self._score.__getitem__
+
+        def add(candidates, tier):
+            wanted = None if limit is None else limit - len(results)
+            if wanted is None:
+                chosen = sorted(candidates, key=score, reverse=True)
+            elif wanted > 0:
+                chosen = heapq.nlargest(wanted, candidates, key=score)
+            else:
+                chosen = []
+            results.extend((tier, ingredient_id) for ingredient_id in chosen)
+            seen.update(candidates)
+
+        def done():
+            return not complete and limit is not None and len(results) >= limit
+
+        # Exact and whole-name prefix matches (the exact ones sort first in the range)
+        low = bisect.bisect_left(self._sorted_names, (query,))
+        high = bisect.bisect_left(self._sorted_names, (query + _TOKEN_END,))
+        split = low
+        while split < high and self._sorted_names[split][0] == query:
+            split += 1
+        add([ingredient_id for _, ingredient_id in self._sorted_names[low:split]], EXACT)
+        if not done():
+            wanted = None if limit is None else limit - len(results)
+            if not complete and wanted is not None and wanted <= TOP_PREFIX and high - split > TOP_PREFIX:
+                # Short, popular prefixes ("c", "ch"): keep their best names between changes
+                top = self._top_prefix.get(query)
+                if top is None:
+                    top = self._top_prefix[query] = heapq.nlargest(
+                        TOP_PREFIX, (ingredient_id for _, ingredient_id in self._sorted_names[split:high]), key=score)
+                results.extend((NAME_PREFIX, ingredient_id) for ingredient_id in top[:wanted])
+                seen.update(top)
+            else:
+                add([ingredient_id for _, ingredient_id in self._sorted_names[split:high]], NAME_PREFIX)
+
+        # Every query word starts a word of the name, in any order; then the same with typos
+        for tier, fuzzy in ((TOKEN_PREFIX, False), (FUZZY, True)):
+            if done():
+                break
+            candidates = None
+            for word in sorted(words, key=len, reverse=True):
+                matches = self._word_matches(word, fuzzy)
+                candidates = set(matches) if candidates is None else candidates & matches
+                if not candidates:
+                    break
+            add(candidates - seen, tier)
+
+        return results, seen
+
+    def _newest_first(self, ingredient_id) -> List[Dict]:
+        return [self._rows[iq_id] for iq_id in sorted(self._quantities[ingredient_id], reverse=True)]
+
+    def autocomplete(self, text: str, limit: int = 10) -> List[Dict]:
+        """Best `limit` ingredients for `text`, one entry each (its newest quantity)"""
+        query = normalize(text)
+        if not query:
+            return []
+        self._sync()
+        self._refresh_frequency()
+        with self._lock:
+            ranked, _ = self._ranked(query, limit)
+            return [dict(self._rows[max(self._quantities[ingredient_id])], match=tier)
+                    for tier, ingredient_id in ranked]
+
+    def search_page(self, text: str, offset: int, count: int, keep=None) -> Tuple[List[Dict], int]:
+        """Catalog rows `offset`..`offset + count` of the ranked matches and the number of matching rows.
+
+        Rows of one ingredient follow each other, newest quantity first.
+        `keep(row)` filters rows; without it only the page is ranked.
+        """
+        query = normalize(text)
+        if not query:
+            return [], 0
+        self._sync()
+        self._refresh_frequency()
+        with self._lock:
+            if keep is None:
+                # Every ingredient contributes at least one row, so offset + count ingredients cover the page
+                ranked, matched = self._ranked(query, offset + count, complete=True)
+                rows = [row for _, ingredient_id in ranked for row in self._newest_first(ingredient_id)]
+                return rows[offset:offset + count], sum(len(self._quantities[i]) for i in matched)
+
+            ranked, _ = self._ranked(query, None)
+            rows = [row for _, ingredient_id in ranked for row in self._newest_first(ingredient_id) if keep(row)]
+            return rows[offset:offset + count], len(rows)
+
+    def stats(self) -> Dict:
+        return {
+            'ingredients': len(self._names),
+            'rows': len(self._rows),
+            'words': len(self._sorted_tokens),
+            'trigrams': len(self._token_trigrams)
+        }
+
+
+_index_lock = threading.Lock()
+
+
+def get_search_index(catalog) -> FoodSearchIndex:
+    """The search index of a worker's food catalog"""
+    index = getattr(catalog, '_search_index', None)
+    if index is None:
+        with _index_lock:
+            index = getattr(catalog, '_search_index', None)
+            if index is None:
+                index = catalog._search_index = FoodSearchIndex(catalog)
+    return index
@@ -1,33 +1,45 @@
 from models.food import FoodDatabase
-import pandas as pd
 import io
-import time
+import os
+import sys
+import threading
+import subprocess
+from models.database.catalog_import import CatalogImporter, get_import, import_path
+from models.database.food_catalog import CATALOG_COUNT_QUERY, CATALOG_TABLES, catalog_query, fetch_foods, get_catalog
+from models.database.keyset import (
+    InvalidCursor, after_condition, cached_count, cursor_values, encode_cursor, keyset_page
+)
+from models.database.unit_conversion import amount, base_units_ready, nutrition_join
+from models.services.food_search import get_search_index
+
+IMPORT_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             'scripts', 'import_food_catalog.py')
+# Imports started from the API that may run at once, across all workers
+MAX_RUNNING_IMPORTS = int(os.getenv('CATALOG_IMPORT_MAX_RUNNING', '1'))
 
 class FoodService:
     def __init__(self):
         self.food_db = FoodDatabase()
-        self._cache_timestamp = 0
-        self._cached_foods = None
-        self._cache_duration = 300  # 5 minutes cache
 
-    def _is_cache_valid(self):
-        """Check if cache is still valid"""
-        return (time.time() - self._cache_timestamp) < self._cache_duration
+    @property
+    def catalog(self):
+        """Worker-wide food catalog, kept in sync across workers (see food_catalog.py)"""
+        return get_catalog(self.food_db.connection_manager)
+
+    @property
+    def search_index(self):
+        """Ranked name index over the catalog (see food_search.py)"""
+        return get_search_index(self.catalog)
 
     def get_all_foods_with_favorites(self, use_cache=True):
-        """Get all foods with favorite status - optimized with caching"""
-        if use_cache and self._cached_foods and self._is_cache_valid():
-            return self._cached_foods
+        """Get all foods with favorite status from the shared catalog.
 
+        The returned rows are shared with other requests; copy before modifying.
+        """
         try:
-            # Use optimized query that joins favorites in a single database call
-            foods = self._get_foods_with_favorites_optimized()
-
             if use_cache:
-                self._cached_foods = foods
-                self._cache_timestamp = time.time()
-
-            return foods
+                return self.catalog.foods()
+            return self._get_foods_with_favorites_optimized()
         except Exception as e:
             print(f"Error fetching foods: {e}")
             # Fallback to original method
@@ -37,76 +49,7 @@ class FoodService:
         """Optimized query to get foods with favorites in single database call"""
         with self.food_db.connection_manager.get_connection() as conn:
             cursor = conn.cursor()
-
-            if self.food_db.connection_manager.use_mysql:
-                query = """
-                SELECT
-                    iq.ingredient_quantity_id as id,
-                    iq.quantity as qty,
-                    U.unit_name as unit,
-                    I.ingredient_name as ingredient,
-                    ROUND(iq.quantity * N.kcal, 2) as kcal,
-                    ROUND(iq.quantity * N.fat, 2) as fat,
-                    ROUND(iq.quantity * N.carb, 2) as carb,
-                    ROUND(iq.quantity * N.fiber, 2) as fiber,
-                    ROUND(iq.quantity * N.net_carb, 2) as net_carb,
-                    ROUND(iq.quantity * N.protein, 2) as protein,
-                    I.ingredient_id,
-                    CASE WHEN F.ingredient_id IS NOT NULL THEN 1 ELSE 0 END as is_favorite
-                FROM Ingredient_Quantity iq
-                LEFT JOIN Ingredient I ON I.ingredient_id = iq.ingredient_id
-                LEFT JOIN Unit U ON U.unit_id = iq.unit_id
-                LEFT JOIN Nutrition N ON I.ingredient_id = N.ingredient_id AND U.unit_id = N.unit_id
-                LEFT JOIN Favorites F ON I.ingredient_id = F.ingredient_id
-                ORDER BY iq.ingredient_quantity_id DESC
-                LIMIT 1000
-                """
-            else:
-                query = """
-                SELECT
-                    iq.ingredient_quantity_id as id,
-                    iq.quantity as qty,
-                    U.unit_name as unit,
-                    I.ingredient_name as ingredient,
-                    ROUND(iq.quantity * N.kcal, 2) as kcal,
-                    ROUND(iq.quantity * N.fat, 2) as fat,
-                    ROUND(iq.quantity * N.carb, 2) as carb,
-                    ROUND(iq.quantity * N.fiber, 2) as fiber,
-                    ROUND(iq.quantity * N.net_carb, 2) as net_carb,
-                    ROUND(iq.quantity * N.protein, 2) as protein,
-                    I.ingredient_id,
-                    CASE WHEN F.ingredient_id IS NOT NULL THEN 1 ELSE 0 END as is_favorite
-                FROM Ingredient_Quantity iq
-                LEFT JOIN Ingredient I ON I.ingredient_id = iq.ingredient_id
-                LEFT JOIN Unit U ON U.unit_id = iq.unit_id
-                LEFT JOIN Nutrition N ON I.ingredient_id = N.ingredient_id AND U.unit_id = N.unit_id
-                LEFT JOIN Favorites F ON I.ingredient_id = F.ingredient_id
-                ORDER BY iq.ingredient_quantity_id DESC
-                LIMIT 1000
-                """
-
-            cursor.execute(query)
-            results = cursor.fetchall()
-
-            # Convert to list of dictionaries
-            foods = []
-            for row in results:
-                foods.append({
-                    "id": row[0],
-                    "qty": row[1] or 0,
-                    "unit": row[2] or "",
-                    "ingredient": row[3] or "",
-                    "kcal": row[4] or 0,
-                    "fat": row[5] or 0,
-                    "carb": row[6] or 0,
-                    "fiber": row[7] or 0,
-                    "net_carb": row[8] or 0,
-                    "protein": row[9] or 0,
-                    "ingredient_id": row[10],
-                    "is_favorite": bool(row[11])
-                })
-
-            return foods
+            return fetch_foods(cursor, base_units=self._base_units())
 
     def _get_foods_with_favorites_fallback(self):
         """Fallback method using original approach"""
@@ -127,18 +70,47 @@ class FoodService:
         return foods
 
     def invalidate_cache(self):
-        """Invalidate the foods cache"""
-        self._cached_foods = None
-        self._cache_timestamp = 0
+        """Force this worker to reload the catalog (writes through FoodDatabase are picked up without it)"""
+        self.catalog.invalidate()
+
+    def start_catalog_import(self, path, source=None, update_nutrition=False):
+        """Import a nutrition CSV in a separate process; returns its catalog_imports row.
+
+        Importing a file that was interrupted resumes it; a file that was
+        already imported returns the finished row. `path` must be in
+        IMPORT_DIR: it is moved to the import's kept upload, which
+        scripts/import_food_catalog.py deletes once the import is done, so
+        the import survives worker restarts and can be resumed from it.
+        Raises TooManyImports while MAX_RUNNING_IMPORTS imports are running.
+        """
+        importer = CatalogImporter(self.food_db.connection_manager, update_nutrition=update_nutrition)
+        try:
+            state = importer.begin(path, source, max_running=MAX_RUNNING_IMPORTS)
+        except Exception:
+            os.remove(path)
+            raise
+        if state['status'] == 'done':
+            os.remove(path)
+            return state
+
+        os.replace(path, import_path(state['import_id']))
+        command = [sys.executable, IMPORT_SCRIPT, '--import-id', str(state['import_id'])]
+        if update_nutrition:
+            command.append('--update-nutrition')
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL, start_new_session=True)
+        # Reap the importer when it exits so it does not linger as a zombie of this worker
+        threading.Thread(target=process.wait, name=f"catalog-import-{state['import_id']}", daemon=True).start()
+        return state
+
+    def get_catalog_import(self, import_id):
+        """Progress of a catalog import, or None"""
+        return get_import(self.food_db.connection_manager, import_id)
 
     def toggle_favorite(self, ingredient_id):
         """Toggle favorite status for an ingredient"""
         try:
             is_favorited = self.food_db.toggle_favorite(ingredient_id)
 
-            # Invalidate cache when favorites change
-            self.invalidate_cache()
-
             if is_favorited is not None:
                 message = "Added to favorites!" if is_favorited else "Removed from favorites!"
                 return {
@@ -169,7 +141,7 @@ class FoodService:
                         'error': f'Missing required field: {field}'
                     }
 
-            # Prepare data for CSV format expected by save_to_database
+            # Prepare the entry expected by save_entries
             ingredient_obj = {
                 "qty": float(food_data['quantity']),
                 "unit": food_data['unit'].strip(),
@@ -182,15 +154,8 @@ class FoodService:
                 "kcal": float(food_data['calories'])
             }
 
-            # Convert to DataFrame and then CSV
-            df = pd.DataFrame([ingredient_obj])
-            csv_data = df.to_csv(index=False)
-
             # Save to database
-            result = self.food_db.save_to_database(csv_data)
-
-            # Invalidate cache when new food is added
-            self.invalidate_cache()
+            result = self.food_db.save_entries([ingredient_obj], serv=1)
 
             if result:
                 return {
@@ -238,9 +203,6 @@ class FoodService:
 
             self.food_db.update_nutrition(iq_id, updated_nutrition)
 
-            # Invalidate cache when food is updated
-            self.invalidate_cache()
-
             return {
                 'success': True,
                 'message': 'Food updated successfully!'
@@ -262,9 +224,6 @@ class FoodService:
         try:
             self.food_db.delete_ingredient_qty(iq_id)
 
-            # Invalidate cache when food is deleted
-            self.invalidate_cache()
-
             return {
                 'success': True,
                 'message': 'Food deleted successfully!'
@@ -296,60 +255,167 @@ class FoodService:
                 'error': str(e)
             }
 
+    def autocomplete(self, query, limit=10):
+        """Ranked name suggestions for a partially typed food name"""
+        try:
+            return {
+                'success': True,
+                'query': query,
+                'results': self.search_index.autocomplete(query, limit)
+            }
+        except Exception as e:
+            print(f"Error in autocomplete: {e}")
+            return {'success': False, 'error': str(e), 'results': []}
+
+    def _search_filter(self, filters):
+        """Predicate applying `filters` to index results, or None without filters"""
+        bounds = [('min_calories', 'kcal', 1), ('max_calories', 'kcal', -1),
+                  ('min_protein', 'protein', 1), ('max_protein', 'protein', -1)]
+        active = [(field, sign, float(filters[name])) for name, field, sign in bounds if filters.get(name)]
+
+        if not active and not filters.get('favorites_only'):
+            return None
+
+        def keep(food):
+            return ((not filters.get('favorites_only') or food['is_favorite']) and
+                    all(sign * (float(food[field]) - limit) >= 0 for field, sign, limit in active))
+        return keep
+
+    def _search_paginated(self, page, per_page, search, filters):
+        """Search page from the in-memory index, ranked by relevance instead of recency"""
+        keep = self._search_filter(filters)
+        foods, total = self.search_index.search_page(search, (page - 1) * per_page, per_page, keep)
+        return {
+            'success': True,
+            'foods': foods,
+            'total': total,
+            'page': page,
+            'per_page': per_page,
+            'total_pages': (total + per_page - 1) // per_page
+        }
+
     def get_foods_paginated(self, page=1, per_page=24, search='', filters=None):
         """Get paginated foods with search and filters"""
         if filters is None:
             filters = {}
 
-        try:
-            with self.food_db.connection_manager.get_connection() as conn:
-                cursor = conn.cursor()
-
-                # Build WHERE clause
-                where_conditions = []
-                params = []
-
-                if search:
-                    where_conditions.append("I.ingredient_name LIKE %s" if self.food_db.connection_manager.use_mysql else "I.ingredient_name LIKE ?")
-                    params.append(f'%{search}%')
-
-                if filters.get('favorites_only'):
-                    where_conditions.append("F.ingredient_id IS NOT NULL")
-
-                if filters.get('min_calories'):
-                    where_conditions.append("ROUND(iq.quantity * N.kcal, 2) >= %s" if self.food_db.connection_manager.use_mysql else "ROUND(iq.quantity * N.kcal, 2) >= ?")
-                    params.append(filters['min_calories'])
+        if search:
+            try:
+                return self._search_paginated(page, per_page, search, filters)
+            except Exception as e:
+                # Fall back to the SQL search
+                print(f"Error in indexed search: {e}")
+
+        return self._get_foods_paginated_sql(page, per_page, search, filters)
+
+    def _base_units(self):
+        """True when Nutrition is stored per base unit (see unit_conversion.py)"""
+        return base_units_ready(self.food_db.connection_manager)
+
+    def _sql_filters(self, search, filters):
+        """WHERE conditions and params for the catalog query"""
+        where_conditions = []
+        params = []
+
+        if search:
+            where_conditions.append("I.ingredient_name LIKE %s")
+            params.append(f'%{search}%')
+
+        if filters.get('favorites_only'):
+            where_conditions.append("F.ingredient_id IS NOT NULL")
+
+        quantity = amount(self._base_units(), 'iq')
+        for name, condition in (('min_calories', f"ROUND({quantity} * N.kcal, 2) >= %s"),
+                                ('max_calories', f"ROUND({quantity} * N.kcal, 2) <= %s"),
+                                ('min_protein', f"ROUND({quantity} * N.protein, 2) >= %s"),
+                                ('max_protein', f"ROUND({quantity} * N.protein, 2) <= %s")):
+            if filters.get(name):
+                where_conditions.append(condition)
+                params.append(filters[name])
+
+        return where_conditions, params
+
+    def get_foods_after(self, cursor=None, per_page=24, search='', filters=None, include_total=False):
+        """Keyset page of foods after `cursor` (newest first; by relevance when searching).
+
+        Returns next_cursor/has_more instead of page numbers; `total` is only
+        added when asked for and comes from the in-memory catalog, the search
+        index or a cached count, never a COUNT(*) per request.
+        """
+        if filters is None:
+            filters = {}
 
-                if filters.get('max_calories'):
-                    where_conditions.append("ROUND(iq.quantity * N.kcal, 2) <= %s" if self.food_db.connection_manager.use_mysql else "ROUND(iq.quantity * N.kcal, 2) <= ?")
-                    params.append(filters['max_calories'])
+        if search:
+            # Ranked results live in memory, so their cursor is a position in the ranking
+            after = cursor_values(cursor, 'food_search', 2)
+            if after and after[0] != search:
+                raise InvalidCursor('Cursor belongs to another search')
+            offset = after[1] if after else 0
+            if not isinstance(offset, int) or offset < 0:
+                raise InvalidCursor('Invalid pagination cursor')
+            foods, total = self.search_index.search_page(search, offset, per_page, self._search_filter(filters))
+            has_more = total > offset + per_page
+            page = {
+                'success': True,
+                'foods': foods,
+                'per_page': per_page,
+                'has_more': has_more,
+                'next_cursor': encode_cursor('food_search', [search, offset + per_page]) if has_more else None
+            }
+            if include_total:
+                page['total'] = total
+            return page
+
+        after = cursor_values(cursor, 'foods', 1)
+        where_conditions, params = self._sql_filters('', filters)
+        if after:
+            condition, after_params = after_condition([('iq.ingredient_quantity_id', False)], after)
+            where_conditions.append(condition)
+            params.extend(after_params)
+        where_clause = " WHERE " + " AND ".join(where_conditions) if where_conditions else ""
 
-                if filters.get('min_protein'):
-                    where_conditions.append("ROUND(iq.quantity * N.protein, 2) >= %s" if self.food_db.connection_manager.use_mysql else "ROUND(iq.quantity * N.protein, 2) >= ?")
-                    params.append(filters['min_protein'])
+        with self.food_db.connection_manager.get_connection() as conn:
+            db_cursor = conn.cursor()
+            rows = fetch_foods(db_cursor, where_clause, tuple(params), limit=per_page + 1,
+                               base_units=self._base_units())
+
+        page = keyset_page(rows, per_page, 'foods', lambda food: (food['id'],))
+        result = {
+            'success': True,
+            'foods': page['items'],
+            'per_page': per_page,
+            'has_more': page['has_more'],
+            'next_cursor': page['next_cursor']
+        }
+        if include_total:
+            where_conditions, params = self._sql_filters('', filters)
+            if where_conditions:
+                result['total'] = cached_count(
+                    self.food_db.connection_manager, CATALOG_TABLES,
+                    catalog_query(CATALOG_COUNT_QUERY, " WHERE " + " AND ".join(where_conditions), self._base_units()),
+                    tuple(params))
+            else:
+                result['total'] = len(self.catalog.foods())
+        return result
 
-                if filters.get('max_protein'):
-                    where_conditions.append("ROUND(iq.quantity * N.protein, 2) <= %s" if self.food_db.connection_manager.use_mysql else "ROUND(iq.quantity * N.protein, 2) <= ?")
-                    params.append(filters['max_protein'])
+    def _get_foods_paginated_sql(self, page, per_page, search, filters):
+        """Paginated foods straight from the database, newest first"""
+        try:
+            with self.food_db.connection_manager.get_connection() as conn:
+                cursor = conn.cursor()
 
+                where_conditions, params = self._sql_filters(search, filters)
                 where_clause = " WHERE " + " AND ".join(where_conditions) if where_conditions else ""
 
-                # Count total items
-                count_query = f"""
-                SELECT COUNT(*)
-                FROM Ingredient_Quantity iq
-                LEFT JOIN Ingredient I ON I.ingredient_id = iq.ingredient_id
-                LEFT JOIN Unit U ON U.unit_id = iq.unit_id
-                LEFT JOIN Nutrition N ON I.ingredient_id = N.ingredient_id AND U.unit_id = N.unit_id
-                LEFT JOIN Favorites F ON I.ingredient_id = F.ingredient_id
-                {where_clause}
-                """
-
-                cursor.execute(count_query, params)
-                total_count = cursor.fetchone()[0]
+                # Cached until the catalog tables change instead of a COUNT(*) per request
+                total_count = cached_count(self.food_db.connection_manager, CATALOG_TABLES,
+                                           catalog_query(CATALOG_COUNT_QUERY, where_clause, self._base_units()),
+                                           tuple(params))
 
                 # Get paginated data
                 offset = (page - 1) * per_page
+                base_units = self._base_units()
+                quantity = amount(base_units, 'iq')
 
                 if self.food_db.connection_manager.use_mysql:
                     data_query = f"""
@@ -358,18 +424,18 @@ class FoodService:
                         iq.quantity as qty,
                         U.unit_name as unit,
                         I.ingredient_name as ingredient,
-                        ROUND(iq.quantity * N.kcal, 2) as kcal,
-                        ROUND(iq.quantity * N.fat, 2) as fat,
-                        ROUND(iq.quantity * N.carb, 2) as carb,
-                        ROUND(iq.quantity * N.fiber, 2) as fiber,
-                        ROUND(iq.quantity * N.net_carb, 2) as net_carb,
-                        ROUND(iq.quantity * N.protein, 2) as protein,
+                        ROUND({quantity} * N.kcal, 2) as kcal,
+                        ROUND({quantity} * N.fat, 2) as fat,
+                        ROUND({quantity} * N.carb, 2) as carb,
+                        ROUND({quantity} * N.fiber, 2) as fiber,
+                        ROUND({quantity} * N.net_carb, 2) as net_carb,
+                        ROUND({quantity} * N.protein, 2) as protein,
                         I.ingredient_id,
                         CASE WHEN F.ingredient_id IS NOT NULL THEN 1 ELSE 0 END as is_favorite
                     FROM Ingredient_Quantity iq
                     LEFT JOIN Ingredient I ON I.ingredient_id = iq.ingredient_id
                     LEFT JOIN Unit U ON U.unit_id = iq.unit_id
-                    LEFT JOIN Nutrition N ON I.ingredient_id = N.ingredient_id AND U.unit_id = N.unit_id
+                    {nutrition_join(base_units, 'iq')}
                     LEFT JOIN Favorites F ON I.ingredient_id = F.ingredient_id
                     {where_clause}
                     ORDER BY iq.ingredient_quantity_id DESC
@@ -383,18 +449,18 @@ class FoodService:
                         iq.quantity as qty,
                         U.unit_name as unit,
                         I.ingredient_name as ingredient,
-                        ROUND(iq.quantity * N.kcal, 2) as kcal,
-                        ROUND(iq.quantity * N.fat, 2) as fat,
-                        ROUND(iq.quantity * N.carb, 2) as carb,
-                        ROUND(iq.quantity * N.fiber, 2) as fiber,
-                        ROUND(iq.quantity * N.net_carb, 2) as net_carb,
-                        ROUND(iq.quantity * N.protein, 2) as protein,
+                        ROUND({quantity} * N.kcal, 2) as kcal,
+                        ROUND({quantity} * N.fat, 2) as fat,
+                        ROUND({quantity} * N.carb, 2) as carb,
+                        ROUND({quantity} * N.fiber, 2) as fiber,
+                        ROUND({quantity} * N.net_carb, 2) as net_carb,
+                        ROUND({quantity} * N.protein, 2) as protein,
                         I.ingredient_id,
                         CASE WHEN F.ingredient_id IS NOT NULL THEN 1 ELSE 0 END as is_favorite
                     FROM Ingredient_Quantity iq
                     LEFT JOIN Ingredient I ON I.ingredient_id = iq.ingredient_id
                     LEFT JOIN Unit U ON U.unit_id = iq.unit_id
-                    LEFT JOIN Nutrition N ON I.ingredient_id = N.ingredient_id AND U.unit_id = N.unit_id
+                    {nutrition_join(base_units, 'iq')}
                     LEFT JOIN Favorites F ON I.ingredient_id = F.ingredient_id
                     {where_clause}
                     ORDER BY iq.ingredient_quantity_id DESC
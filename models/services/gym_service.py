@@ -2,6 +2,7 @@ import os
 import json
 from datetime import datetime, timedelta
 from models.database.connection_manager import get_db_manager
+from models.database.keyset import after_condition, cached_count, cursor_values, keyset_page
 from models.services.progression import ProgressionService
 
 class GymService:
@@ -67,6 +68,7 @@ class GymService:
             cursor.execute('INSERT INTO workout_sessions (user_id, date, started_at, status) VALUES (%s, %s, %s, %s)',
                          (self.user_id, now.date(), now, 'in_progress'))
             conn.commit()
+            self.connection_manager.touch('workout_sessions')
             return cursor.lastrowid
 
     def log_set(self, session_id, exercise_id, set_number, weight, reps, duration_seconds=0):
@@ -122,6 +124,32 @@ class GymService:
             ''', (self.user_id, limit))
             return cursor.fetchall()
 
+    def get_user_workouts_page(self, limit=20, cursor=None, include_total=False):
+        """Workout history page after `cursor` (keyset on date, id; newest first)"""
+        after = cursor_values(cursor, 'gym_workouts', 2)
+        condition, params = after_condition([('ws.date', False), ('ws.id', False)], after) if after else ('1=1', ())
+        with self.get_connection() as conn:
+            db_cursor = conn.cursor()
+            db_cursor.execute(f'''
+                SELECT ws.id, ws.user_id, ws.date, ws.started_at, ws.completed_at, ws.status, ws.notes,
+                       COUNT(wset.id) as total_sets,
+                       SUM(wset.weight * wset.reps) as total_volume
+                FROM workout_sessions ws
+                LEFT JOIN workout_sets wset ON ws.id = wset.session_id
+                WHERE ws.user_id = %s AND {condition}
+                GROUP BY ws.id, ws.user_id, ws.date, ws.started_at, ws.completed_at, ws.status, ws.notes
+                ORDER BY ws.date DESC, ws.id DESC
+                LIMIT %s
+            ''', (self.user_id, *params, limit + 1))
+            rows = db_cursor.fetchall()
+
+        page = keyset_page(rows, limit, 'gym_workouts', lambda row: (row[2], row[0]))
+        if include_total:
+            page['total'] = cached_count(
+                self.connection_manager, ('workout_sessions',),
+                'SELECT COUNT(*) AS total FROM workout_sessions WHERE user_id = %s', (self.user_id,))
+        return page
+
     def get_workout_details(self, workout_id):
         """Get detailed workout information"""
         with self.get_connection() as conn:
@@ -233,6 +261,7 @@ class GymService:
                 cursor.execute('DELETE FROM workout_sessions WHERE id = %s AND user_id = %s',
                              (workout_id, self.user_id))
                 conn.commit()
+                self.connection_manager.touch('workout_sessions', 'workout_sets')
 
                 return cursor.rowcount > 0
         except Exception as e:
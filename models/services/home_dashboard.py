@@ -0,0 +1,110 @@
+"""
+Precomputed summary and chart series of the home dashboard.
+
+home() used to fetch the consumption of the last HOME_CHART_DAYS days, every
+calorie and weight measurement and the average day on each visit, build
+three DataFrames from them and render every data point into the page. The
+page is now a shell rendered from the summary (average day, trend weight,
+maintenance calories from models/services/tdee.py); its charts load the series from /home/series. Both come from one value that
+is:
+- built without pandas from the per-day totals (fetch_daily_nutrition, the
+  daily_nutrition rollup once available), the calorie rows and the weight
+  trend (models/services/weight_trend.py), which already carry their day;
+- downsampled to MAX_POINTS per series by averaging consecutive points, since
+  the calorie and weight histories grow without bound;
+- cached per data version of HOME_TABLES (connection_manager.cached_value)
+  together with a content ETag and the time it was built, which the endpoint
+  sends as ETag / Last-Modified so an unchanged dashboard is a 304.
+The days that ended since the last visit are added to energy_balance before
+the cache is looked up, so building the dashboard itself never writes.
+"""
+import json
+import hashlib
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from models.database.daily_nutrition import DEFAULT_USER
+from models.services import tdee
+from models.services.weight_trend import WeightTrend, load_trend
+
+# Days of nutrition history charted on the home dashboard
+HOME_CHART_DAYS = 30
+# Longest series sent to the browser; longer ones are averaged down to this
+MAX_POINTS = 120
+
+# Every table the dashboard is derived from; a write to any of them rebuilds it
+HOME_TABLES = (
+    'Consumption', 'recipe_consumption', 'daily_nutrition', 'Ingredient_Quantity', 'Nutrition',
+    'Unit', 'Ingredient', 'Recipe', 'Recipe_Ingredients', 'calorie_tracking', 'body_weight_tracking', 'body_weights',
+    'cycling_workouts', 'energy_balance'
+)
+
+AVG_FIELDS = ('kcal', 'fat', 'carb', 'fiber', 'net_carb', 'protein', 'cnt')
+
+Point = Tuple[date, float]
+
+
+def downsample(points: List[Point], max_points: int = MAX_POINTS) -> List[Point]:
+    """At most `max_points` points: consecutive buckets of equal size, each at its first day with its mean"""
+    if len(points) <= max_points:
+        return points
+    size = -(-len(points) // max_points)
+    buckets = [points[i:i + size] for i in range(0, len(points), size)]
+    return [(bucket[0][0], sum(value for _, value in bucket) / len(bucket)) for bucket in buckets]
+
+
+def _points(rows: Iterable[Dict], field: str) -> List[Point]:
+    """(day, value) of the rows with both, oldest first"""
+    return sorted((row['day'], float(row[field])) for row in rows
+                  if row.get('day') is not None and row.get(field) not in (None, ''))
+
+
+def _series(points: List[Point]) -> Dict[str, List]:
+    points = downsample(points)
+    return {'dates': [day.isoformat() for day, _ in points], 'values': [round(value, 1) for _, value in points]}
+
+
+def summarize(avg_consumed: Optional[Dict], trend: WeightTrend, energy: Optional[Dict] = None) -> Dict:
+    """The figures the dashboard shell renders"""
+    avg_consumed = {field: (avg_consumed or {}).get(field) or 0 for field in AVG_FIELDS}
+    # Smoothed current weight instead of a mean over the whole history
+    trend_weight = round(trend.level[-1], 1) if len(trend) else 0
+    return {'avg_consumed': avg_consumed, 'trend_weight': trend_weight, 'energy': energy}
+
+
+def build_home(food_db, calorie_weight, today: date, user_id: str = DEFAULT_USER,
+               days: int = HOME_CHART_DAYS) -> Dict:
+    """Summary and chart series of `user_id`'s dashboard, with the series' ETag and build time"""
+    totals = food_db.fetch_daily_nutrition(today - timedelta(days=days), today)
+    # The nutrition log's weigh-ins plus the user's own
+    trend = load_trend(food_db.connection_manager, user_id)
+    series = {
+        # Macros in kcal, as charted against the day's energy
+        'macros': {
+            'dates': [row['day'].isoformat() for row in totals],
+            'kcal': [round(row['kcal'], 1) for row in totals],
+            'protein': [round(row['protein'] * 4, 1) for row in totals],
+            'carb': [round(row['carb'] * 4, 1) for row in totals],
+            'fat': [round(row['fat'] * 9, 1) for row in totals]
+        },
+        'calories': _series(_points(calorie_weight.fetch_calories(), 'calories')),
+        'weight': dict(_series(list(zip(trend.days, trend.weights))),
+                       trend=_series(list(zip(trend.days, trend.level)))['values'])
+    }
+    encoded = json.dumps(series, sort_keys=True).encode()
+    return {
+        'summary': summarize(food_db.get_avg_nutrition_consumed(), trend,
+                             tdee.current(food_db.connection_manager, today, user_id)),
+        'series': series,
+        'etag': hashlib.sha1(encoded).hexdigest(),
+        'last_modified': datetime.now(timezone.utc).replace(microsecond=0)
+    }
+
+
+def load_home(food_db, calorie_weight, today: Optional[date] = None, user_id: str = DEFAULT_USER) -> Dict:
+    """`user_id`'s dashboard of `today`, reused until one of HOME_TABLES is written"""
+    today = today or datetime.now().date()
+    tdee.refresh(food_db.connection_manager, today, user_id)
+    return food_db.connection_manager.cached_value(
+        ('home_dashboard', today, user_id), HOME_TABLES, lambda: build_home(food_db, calorie_weight, today, user_id)
+    )
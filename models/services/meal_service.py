@@ -1,6 +1,16 @@
 from models.food import FoodDatabase
-from datetime import datetime, timedelta
-import pandas as pd
+from datetime import date, datetime, timedelta
+from models.database.food_catalog import get_catalog
+from models.services.nutrient_matrix import get_nutrient_matrix
+
+MEAL_TYPES = ['breakfast', 'lunch', 'dinner', 'snacks', 'other']
+
+# Day/meal total key -> consumption row field
+TOTAL_SOURCES = {'calories': 'kcal', 'protein': 'protein', 'carbs': 'carb', 'fat': 'fat'}
+TOTAL_KEYS = list(TOTAL_SOURCES)
+
+MAX_GAP_COMBOS = 5
+MAX_GAP_ITEMS = 3
 
 class MealService:
     def __init__(self):
@@ -17,102 +27,13 @@ class MealService:
         else:
             selected_date = datetime.now()
 
-        # Get all consumption data
-        all_consumption = self.food_db.fetch_all_consumption()
-        consumption_df = pd.DataFrame(all_consumption)
-
-        # Get recipe consumption data
-        all_recipe_consumption = self.food_db.fetch_recipe_consumption()
-        recipe_consumption_df = pd.DataFrame(all_recipe_consumption)
-
-        # Initialize meal types and data structures
-        meal_types = ['breakfast', 'lunch', 'dinner', 'snacks', 'other']
-        meals_by_type = {meal: [] for meal in meal_types}
-        daily_totals = {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0}
-        meal_totals = {meal: {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0} for meal in meal_types}
-
-        if not consumption_df.empty:
-            # Handle date formats
-            consumption_df['date'] = consumption_df['date'].apply(self._parse_date)
-
-            # Filter for selected date
-            selected_date_normalized = pd.Timestamp(selected_date).normalize()
-            day_consumption = consumption_df[consumption_df['date'] == selected_date_normalized]
-
-            if not day_consumption.empty:
-                # Process meals by type
-                for meal_type in meal_types:
-                    meal_data = day_consumption[day_consumption['meal_type'] == meal_type]
-                    if not meal_data.empty:
-                        meals_by_type[meal_type] = meal_data.to_dict(orient='records')
-                        # Calculate totals
-                        meal_totals[meal_type]['calories'] = round(meal_data['kcal'].sum(), 1)
-                        meal_totals[meal_type]['protein'] = round(meal_data['protein'].sum(), 1)
-                        meal_totals[meal_type]['carbs'] = round(meal_data['carb'].sum(), 1)
-                        meal_totals[meal_type]['fat'] = round(meal_data['fat'].sum(), 1)
-
-                # Calculate daily totals
-                daily_totals['calories'] = round(day_consumption['kcal'].sum(), 1)
-                daily_totals['protein'] = round(day_consumption['protein'].sum(), 1)
-                daily_totals['carbs'] = round(day_consumption['carb'].sum(), 1)
-                daily_totals['fat'] = round(day_consumption['fat'].sum(), 1)
-
-            # Format dates back to string
-            for meal_type, meals in meals_by_type.items():
-                for meal in meals:
-                    if isinstance(meal.get('date'), pd.Timestamp):
-                        meal['date'] = meal['date'].strftime('%d.%m.%Y')
-
-        # Process recipe consumption data
-        if not recipe_consumption_df.empty:
-            # Handle date formats
-            recipe_consumption_df['date'] = recipe_consumption_df['date'].apply(self._parse_date)
-
-            # Filter for selected date
-            day_recipes = recipe_consumption_df[recipe_consumption_df['date'] == selected_date_normalized]
-
-            if not day_recipes.empty:
-                # Add recipes to meals by type
-                for meal_type in meal_types:
-                    recipe_data = day_recipes[day_recipes['meal_type'] == meal_type]
-                    if not recipe_data.empty:
-                        # Convert recipe data to match regular food format
-                        recipe_items = []
-                        for _, recipe in recipe_data.iterrows():
-                            recipe_item = {
-                                'date': recipe['date'].strftime('%d.%m.%Y'),
-                                'qty': recipe['servings'],
-                                'unit': 'serving(s)',
-                                'ingredient': f"[Recipe] {recipe['recipe_name']}",
-                                'kcal': recipe['kcal'],
-                                'fat': recipe['fat'],
-                                'carb': recipe['carb'],
-                                'protein': recipe['protein'],
-                                'recipe_consumption_id': recipe['recipe_consumption_id'],
-                                'recipe_id': recipe['recipe_id'],
-                                'is_recipe': True
-                            }
-                            recipe_items.append(recipe_item)
-
-                        # Add recipe items to the meal type
-                        meals_by_type[meal_type].extend(recipe_items)
-
-                        # Update totals
-                        meal_totals[meal_type]['calories'] += round(recipe_data['kcal'].sum(), 1)
-                        meal_totals[meal_type]['protein'] += round(recipe_data['protein'].sum(), 1)
-                        meal_totals[meal_type]['carbs'] += round(recipe_data['carb'].sum(), 1)
-                        meal_totals[meal_type]['fat'] += round(recipe_data['fat'].sum(), 1)
-
-                        daily_totals['calories'] += round(recipe_data['kcal'].sum(), 1)
-                        daily_totals['protein'] += round(recipe_data['protein'].sum(), 1)
-                        daily_totals['carbs'] += round(recipe_data['carb'].sum(), 1)
-                        daily_totals['fat'] += round(recipe_data['fat'].sum(), 1)
+        day = self._aggregate_days(selected_date.date(), selected_date.date())[selected_date.date()]
 
         # Format dates for template
         return {
-            'meals_by_type': meals_by_type,
-            'meal_totals': meal_totals,
-            'daily_totals': daily_totals,
+            'meals_by_type': day['meals'],
+            'meal_totals': day['meal_totals'],
+            'daily_totals': day['totals'],
             'selected_date': selected_date.strftime('%Y-%m-%d'),
             'display_date': selected_date.strftime('%A, %B %d, %Y'),
             'prev_date': (selected_date - timedelta(days=1)).strftime('%Y-%m-%d'),
@@ -133,108 +54,174 @@ class MealService:
         # Adjust to start of week (Monday)
         days_since_monday = week_start.weekday()
         week_start = week_start - timedelta(days=days_since_monday)
+        week_end = week_start + timedelta(days=6)
 
-        # Get all consumption data
-        all_consumption = self.food_db.fetch_all_consumption()
-        consumption_df = pd.DataFrame(all_consumption)
-
-        # Get recipe consumption data
-        all_recipe_consumption = self.food_db.fetch_recipe_consumption()
-        recipe_consumption_df = pd.DataFrame(all_recipe_consumption)
+        days = self._aggregate_days(week_start.date(), week_end.date())
 
-        # Initialize week data
         week_data = {}
-
-        # Process each day of the week
-        for day_offset in range(7):
+        for day_offset, (day, aggregate) in enumerate(days.items()):
             current_date = week_start + timedelta(days=day_offset)
-            date_key = current_date.strftime('%Y-%m-%d')
-
-            week_data[date_key] = {
+            week_data[day.strftime('%Y-%m-%d')] = {
                 'date': current_date,
                 'display_date': current_date.strftime('%A, %b %d'),
-                'meals': {'breakfast': [], 'lunch': [], 'dinner': [], 'snacks': [], 'other': []},
-                'totals': {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0}
+                'meals': aggregate['meals'],
+                'totals': aggregate['totals']
             }
 
-            if not consumption_df.empty and 'date' in consumption_df.columns:
-                consumption_df['date'] = consumption_df['date'].apply(self._parse_date)
-
-                # Filter for current date
-                current_date_normalized = pd.Timestamp(current_date).normalize()
-                day_consumption = consumption_df[consumption_df['date'] == current_date_normalized]
-
-                if not day_consumption.empty:
-                    # Group by meal type
-                    for meal_type in ['breakfast', 'lunch', 'dinner', 'snacks', 'other']:
-                        meal_data = day_consumption[day_consumption['meal_type'] == meal_type]
-                        if not meal_data.empty:
-                            week_data[date_key]['meals'][meal_type] = meal_data.to_dict(orient='records')
-
-                    # Calculate daily totals
-                    week_data[date_key]['totals']['calories'] = round(day_consumption['kcal'].sum(), 1)
-                    week_data[date_key]['totals']['protein'] = round(day_consumption['protein'].sum(), 1)
-                    week_data[date_key]['totals']['carbs'] = round(day_consumption['carb'].sum(), 1)
-                    week_data[date_key]['totals']['fat'] = round(day_consumption['fat'].sum(), 1)
-
-            # Process recipe consumption data
-            if not recipe_consumption_df.empty:
-                # Handle date formats
-                recipe_consumption_df['date'] = recipe_consumption_df['date'].apply(self._parse_date)
-
-                # Filter for current date
-                day_recipes = recipe_consumption_df[recipe_consumption_df['date'] == current_date_normalized]
-
-                if not day_recipes.empty:
-                    # Group by meal type
-                    for meal_type in ['breakfast', 'lunch', 'dinner', 'snacks', 'other']:
-                        recipe_data = day_recipes[day_recipes['meal_type'] == meal_type]
-                        if not recipe_data.empty:
-                            # Convert recipe data to match regular food format
-                            recipe_items = []
-                            for _, recipe in recipe_data.iterrows():
-                                recipe_item = {
-                                    'date': recipe['date'].strftime('%d.%m.%Y'),
-                                    'qty': recipe['servings'],
-                                    'unit': 'serving(s)',
-                                    'ingredient': f"[Recipe] {recipe['recipe_name']}",
-                                    'kcal': recipe['kcal'],
-                                    'fat': recipe['fat'],
-                                    'carb': recipe['carb'],
-                                    'protein': recipe['protein'],
-                                    'recipe_consumption_id': recipe['recipe_consumption_id'],
-                                    'recipe_id': recipe['recipe_id'],
-                                    'is_recipe': True
-                                }
-                                recipe_items.append(recipe_item)
-
-                            # Add recipe items to the meal type
-                            week_data[date_key]['meals'][meal_type].extend(recipe_items)
-
-                            # Update totals
-                            week_data[date_key]['totals']['calories'] += round(recipe_data['kcal'].sum(), 1)
-                            week_data[date_key]['totals']['protein'] += round(recipe_data['protein'].sum(), 1)
-                            week_data[date_key]['totals']['carbs'] += round(recipe_data['carb'].sum(), 1)
-                            week_data[date_key]['totals']['fat'] += round(recipe_data['fat'].sum(), 1)
-
-        # Calculate week totals
-        week_totals = {
-            'calories': sum(day['totals']['calories'] for day in week_data.values()),
-            'protein': sum(day['totals']['protein'] for day in week_data.values()),
-            'carbs': sum(day['totals']['carbs'] for day in week_data.values()),
-            'fat': sum(day['totals']['fat'] for day in week_data.values())
-        }
-
         return {
             'week_data': week_data,
-            'week_totals': week_totals,
+            'week_totals': self._sum_totals(days.values()),
             'week_start': week_start.strftime('%Y-%m-%d'),
-            'week_display': f"{week_start.strftime('%b %d')} - {(week_start + timedelta(days=6)).strftime('%b %d, %Y')}",
+            'week_display': f"{week_start.strftime('%b %d')} - {week_end.strftime('%b %d, %Y')}",
             'prev_week': (week_start - timedelta(days=7)).strftime('%Y-%m-%d'),
             'next_week': (week_start + timedelta(days=7)).strftime('%Y-%m-%d'),
             'now': datetime.now
         }
 
+    def get_monthly_meals(self, month_str=None):
+        """Get daily and per-meal totals for a calendar month (month_str is YYYY-MM)"""
+        try:
+            month_start = datetime.strptime(month_str, '%Y-%m').date() if month_str else None
+        except ValueError:
+            month_start = None
+        if month_start is None:
+            month_start = date.today().replace(day=1)
+
+        next_month = (month_start + timedelta(days=32)).replace(day=1)
+        month_end = next_month - timedelta(days=1)
+        prev_month = (month_start - timedelta(days=1)).replace(day=1)
+
+        days = self._aggregate_days(month_start, month_end)
+        logged_days = [day for day in days.values() if day['items']]
+
+        month_data = {}
+        for day, aggregate in days.items():
+            month_data[day.strftime('%Y-%m-%d')] = {
+                'date': day,
+                'day_number': day.day,
+                'totals': aggregate['totals'],
+                'meal_totals': aggregate['meal_totals'],
+                'items': aggregate['items']
+            }
+
+        # Calendar grid: weeks starting on Monday, None for padding days
+        cells = [None] * month_start.weekday() + list(month_data)
+        cells += [None] * (-len(cells) % 7)
+        calendar_weeks = [cells[i:i + 7] for i in range(0, len(cells), 7)]
+
+        month_totals = self._sum_totals(days.values())
+        return {
+            'month_data': month_data,
+            'calendar_weeks': calendar_weeks,
+            'month_totals': month_totals,
+            'month_averages': {
+                key: round(value / len(logged_days), 1) if logged_days else 0
+                for key, value in month_totals.items()
+            },
+            'logged_days': len(logged_days),
+            'month': month_start.strftime('%Y-%m'),
+            'month_display': month_start.strftime('%B %Y'),
+            'prev_month': prev_month.strftime('%Y-%m'),
+            'next_month': next_month.strftime('%Y-%m'),
+            'today': date.today().strftime('%Y-%m-%d')
+        }
+
+    def _aggregate_days(self, start, end):
+        """Per-day meal items and totals for [start, end], oldest first.
+
+        Loads the range once (food and recipe consumption) and distributes
+        every row to its day and meal type in a single pass.
+        """
+        days = {}
+        day = start
+        while day <= end:
+            days[day] = {
+                'meals': {meal: [] for meal in MEAL_TYPES},
+                'meal_totals': {meal: dict.fromkeys(TOTAL_KEYS, 0) for meal in MEAL_TYPES},
+                'totals': dict.fromkeys(TOTAL_KEYS, 0),
+                'items': 0
+            }
+            day += timedelta(days=1)
+
+        for item in self.food_db.fetch_consumption_range(start, end):
+            aggregate = days.get(item['day'])
+            if aggregate is not None:
+                item['date'] = item['day'].strftime('%d.%m.%Y')
+                self._add_item(aggregate, item.get('meal_type'), item)
+
+        for recipe in self.food_db.fetch_recipe_consumption_range(start, end):
+            aggregate = days.get(recipe['day'])
+            if aggregate is not None:
+                # Convert recipe data to match regular food format
+                self._add_item(aggregate, recipe['meal_type'], {
+                    'date': recipe['day'].strftime('%d.%m.%Y'),
+                    'qty': recipe['servings'],
+                    'unit': 'serving(s)',
+                    'ingredient': f"[Recipe] {recipe['recipe_name']}",
+                    'kcal': recipe['kcal'],
+                    'fat': recipe['fat'],
+                    'carb': recipe['carb'],
+                    'protein': recipe['protein'],
+                    'recipe_consumption_id': recipe['recipe_consumption_id'],
+                    'recipe_id': recipe['recipe_id'],
+                    'is_recipe': True
+                })
+
+        for aggregate in days.values():
+            aggregate['totals'] = self._round_totals(aggregate['totals'])
+            aggregate['meal_totals'] = {
+                meal: self._round_totals(totals) for meal, totals in aggregate['meal_totals'].items()
+            }
+        return days
+
+    @staticmethod
+    def _add_item(aggregate, meal_type, item):
+        amounts = {key: float(item.get(source) or 0) for key, source in TOTAL_SOURCES.items()}
+        for key, amount in amounts.items():
+            aggregate['totals'][key] += amount
+        aggregate['items'] += 1
+        # Items of unknown meal types count toward the day but are not listed
+        if meal_type in aggregate['meals']:
+            aggregate['meals'][meal_type].append(item)
+            for key, amount in amounts.items():
+                aggregate['meal_totals'][meal_type][key] += amount
+
+    @staticmethod
+    def _round_totals(totals):
+        return {key: round(value, 1) for key, value in totals.items()}
+
+    @staticmethod
+    def _sum_totals(days):
+        return {key: round(sum(day['totals'][key] for day in days), 1) for key in TOTAL_KEYS}
+
+    def suggest_for_macro_gap(self, date_str, targets, combos=3, max_items=3):
+        """Food combinations that close the gap between `targets` and what was eaten on the day.
+
+        `targets` maps day total keys (calories, protein, carbs, fat) to goals;
+        macros without a goal are not scored.
+        """
+        day = self.get_daily_meals(date_str)
+        eaten = day['daily_totals']
+        goals = {key: float(value) for key, value in targets.items() if key in TOTAL_SOURCES and value is not None}
+        if not goals:
+            raise ValueError('At least one of calories, protein, carbs or fat is required')
+
+        remaining = {key: round(max(goal - eaten[key], 0), 1) for key, goal in goals.items()}
+        matrix = get_nutrient_matrix(get_catalog(self.food_db.connection_manager))
+        suggestions = matrix.suggest(
+            {TOTAL_SOURCES[key]: value for key, value in remaining.items()},
+            combos=max(1, min(int(combos), MAX_GAP_COMBOS)),
+            max_items=max(1, min(int(max_items), MAX_GAP_ITEMS)),
+            nutrients=[TOTAL_SOURCES[key] for key in goals]
+        )
+        return {
+            'date': day['selected_date'],
+            'targets': goals,
+            'eaten': eaten,
+            'remaining': remaining,
+            'suggestions': suggestions
+        }
+
     def add_food_to_meal(self, food_id, meal_type, quantity, date_str):
         """Add food to a meal"""
         try:
@@ -298,39 +285,12 @@ class MealService:
     def update_consumption(self, consumption_id, new_quantity):
         """Update consumption quantity"""
         try:
-            # Get consumption details
-            all_consumption = self.food_db.fetch_all_consumption()
-            consumption_item = next((c for c in all_consumption if c['consumption_id'] == consumption_id), None)
-
-            if not consumption_item:
+            if not self.food_db.update_consumption(consumption_id, new_quantity):
                 return {'success': False, 'error': 'Consumption item not found'}
-
-            # Delete old consumption
-            self.food_db.delete_consumption(consumption_id)
-
-            # Add new consumption with updated quantity
-            ingredient_id, unit_id = self.food_db.get_unit_ingredient_from_iq(consumption_item['iq_id'])
-            new_iq_id = self.food_db.save_ingredient_qty(new_quantity, ingredient_id, unit_id)
-            self.food_db.save_consumption(
-                consumption_item['date'],
-                new_iq_id,
-                consumption_item.get('meal_type', 'other')
-            )
-
             return {'success': True}
         except Exception as e:
             return {'success': False, 'error': str(e)}
 
-    def _parse_date(self, date_str):
-        """Parse dates in multiple formats"""
-        formats = ['%d.%m.%Y', '%Y-%m-%d', '%Y/%m/%d', '%d/%m/%Y']
-        for fmt in formats:
-            try:
-                return pd.to_datetime(date_str, format=fmt)
-            except:
-                continue
-        return pd.to_datetime(date_str)
-
     def _convert_date_format(self, date_str):
         """Convert date to the format expected by the database"""
         if '-' in date_str and len(date_str.split('-')[0]) == 4:
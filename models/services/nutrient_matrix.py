@@ -0,0 +1,228 @@
+"""
+In-memory food x nutrient matrix and the macro-gap suggester.
+
+NutrientMatrix holds the nutrients (kcal, fat, carb, fiber, net_carb,
+protein) of every catalog food (Ingredient_Quantity) as a float64 NumPy
+array, stored nutrient-major so every nutrient is one contiguous row, built from the worker's food catalog (food_catalog.py) and
+rebuilt after the catalog changes, the same way the search index follows it.
+
+suggest() answers "what can I still eat to close today's macro gap": it
+scores foods against the remaining kcal/protein/carb/fat in one vectorized
+pass, keeps the POOL_SIZE best single fits and grows 1-3 food combinations
+from them with a small beam search. Every food gets the portion (in
+PORTION_STEP multiples of its catalog quantity) that best fits what is left,
+and overshooting a macro costs OVERSHOOT times more than falling short.
+"""
+import time
+import threading
+from operator import itemgetter
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from models.database.food_catalog import CATALOG_TABLES, changes_ready
+
+NUTRIENTS = ('kcal', 'fat', 'carb', 'fiber', 'net_carb', 'protein')
+GAP_NUTRIENTS = ('kcal', 'protein', 'carb', 'fat')
+
+# Gaps smaller than this still weigh as this much, so a nearly closed macro does not dominate
+GAP_FLOOR = {'kcal': 50.0, 'protein': 5.0, 'carb': 5.0, 'fat': 3.0}
+PORTION_STEP = 0.25
+MIN_PORTION = 0.5
+MAX_PORTION = 3.0
+OVERSHOOT = 3.0
+# Best single foods the combinations are built from, and combinations kept per size
+POOL_SIZE = 1500
+BEAM_WIDTH = 40
+# Rebuild interval without the change log and without the query cache
+REBUILD_SECONDS = 300
+
+
+class NutrientMatrix:
+    """Nutrients of every catalog food as a (NUTRIENTS x foods) array"""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._lock = threading.Lock()
+        self.values = np.empty((len(NUTRIENTS), 0))
+        self.ingredient_ids = np.empty(0, dtype=np.int64)
+        self._foods: List[Dict] = []
+        self._positions: Dict[int, int] = {}
+        self._dirty = True
+        self._built_version = None
+        self._built_at = 0.0
+        catalog.subscribe(self._on_catalog_change)
+
+    def _on_catalog_change(self, removed_ids, foods):
+        self._dirty = True
+
+    def _sync(self):
+        """Rebuild the arrays when the catalog changed since the last build"""
+        manager = self.catalog.manager
+        if changes_ready(manager):
+            foods = self.catalog.foods()  # patches mark the matrix dirty through _on_catalog_change
+            if self._dirty:
+                self._build(foods)
+            return
+
+        version = manager.data_version(*CATALOG_TABLES)
+        if self._dirty or version != self._built_version or (
+                not version and time.monotonic() - self._built_at > REBUILD_SECONDS):
+            self._build(self.catalog.foods())
+            self._built_version = version
+
+    def _build(self, foods: List[Dict]):
+        self._dirty = False
+        values = np.array([itemgetter(*NUTRIENTS)(food) for food in foods], dtype=np.float64).reshape(
+            len(foods), len(NUTRIENTS)).T.copy()
+        ingredient_ids = np.array([food['ingredient_id'] or 0 for food in foods], dtype=np.int64)
+        positions = {food['id']: i for i, food in enumerate(foods)}
+        with self._lock:
+            self.values, self.ingredient_ids, self._foods, self._positions = values, ingredient_ids, foods, positions
+            self._built_at = time.monotonic()
+
+    def _snapshot(self):
+        self._sync()
+        with self._lock:
+            return self.values, self.ingredient_ids, self._foods, self._positions
+
+    def stats(self) -> Dict:
+        return {'foods': len(self._foods), 'bytes': int(self.values.nbytes + self.ingredient_ids.nbytes)}
+
+    # ============== Lookups ==============
+
+    def totals(self, items: Sequence) -> Dict[str, float]:
+        """Nutrient totals of (ingredient_quantity_id, portions) pairs; unknown ids count as zero"""
+        values, _, _, positions = self._snapshot()
+        known = [(positions[iq_id], float(portions or 0)) for iq_id, portions in items if iq_id in positions]
+        if not known:
+            return dict.fromkeys(NUTRIENTS, 0.0)
+        rows, portions = zip(*known)
+        summed = values[:, list(rows)] @ np.asarray(portions)
+        return {n: float(v) for n, v in zip(NUTRIENTS, summed)}
+
+    # ============== Macro gap ==============
+
+    def suggest(self, remaining: Dict[str, float], combos: int = 3, max_items: int = 3,
+                nutrients: Sequence[str] = GAP_NUTRIENTS) -> List[Dict]:
+        """Up to `combos` food combinations of 1..`max_items` foods that best fill `remaining`.
+
+        Only `nutrients` are scored; negative remainders count as zero (any
+        more of that nutrient is overshoot). Best fit first.
+        """
+        values, ingredient_ids, foods, _ = self._snapshot()
+        nutrients = [n for n in nutrients if n in GAP_NUTRIENTS]
+        target = np.array([max(float(remaining.get(n) or 0), 0.0) for n in nutrients])
+        if not len(foods) or not target.any():
+            return []
+
+        # Relative units: a 10% miss costs the same on every macro
+        weights = 1.0 / np.maximum(target, [GAP_FLOOR[n] for n in nutrients])
+        scaled = values[[NUTRIENTS.index(n) for n in nutrients]] * weights[:, None]
+        goal = target * weights
+        empty_error = float(goal @ goal)
+
+        candidates = np.flatnonzero((scaled > 0).any(axis=0))
+        if not len(candidates):
+            return []
+        if len(candidates) < len(foods):
+            scaled = scaled[:, candidates]
+        _, errors, _ = _fit(scaled, np.einsum('km,km->m', scaled, scaled), goal[None, :])
+        if len(candidates) > POOL_SIZE:
+            best = np.argpartition(errors[0], POOL_SIZE)[:POOL_SIZE]
+            candidates, scaled = candidates[best], scaled[:, best]
+        pool = np.ascontiguousarray(scaled)
+        pool_norms = np.einsum('km,km->m', pool, pool)
+        pool_ingredients = ingredient_ids[candidates]
+
+        # Every beam combination is extended with every pool food in one (beam x pool) pass
+        beam, residuals = [()], goal[None, :]
+        found = {}
+        for _ in range(max_items):
+            portions, errors, left = _fit(pool, pool_norms, residuals)
+            for row, items in enumerate(beam):
+                if items:
+                    # One quantity per ingredient in a combination
+                    errors[row, np.isin(pool_ingredients, [pool_ingredients[j] for j, _ in items])] = np.inf
+            flat = errors.ravel()
+            keep = min(4 * BEAM_WIDTH, flat.size)
+            top = np.argpartition(flat, keep - 1)[:keep]
+            next_beam, next_residuals, seen = [], [], set()
+            for index in top[np.argsort(flat[top])]:
+                if not np.isfinite(flat[index]) or len(next_beam) == BEAM_WIDTH:
+                    break
+                row, j = divmod(int(index), pool.shape[1])
+                combo = tuple(sorted(beam[row] + ((j, float(portions[row, j])),)))
+                key = frozenset(int(pool_ingredients[i]) for i, _ in combo)
+                if key in seen:
+                    continue
+                seen.add(key)
+                next_beam.append(combo)
+                next_residuals.append(left[row, :, j])
+                if flat[index] < empty_error:
+                    found[key] = (float(flat[index]), combo)
+            if not next_beam:
+                break
+            beam, residuals = next_beam, np.array(next_residuals)
+
+        best = sorted(found.values(), key=lambda entry: entry[0])[:combos]
+        return [self._describe(combo, error, empty_error, candidates, foods, values, target, nutrients)
+                for error, combo in best]
+
+    @staticmethod
+    def _describe(combo, error, empty_error, candidates, foods, values, target, nutrients) -> Dict:
+        items = []
+        totals = np.zeros(len(NUTRIENTS))
+        for j, portions in combo:
+            row = int(candidates[j])
+            food = foods[row]
+            amounts = values[:, row] * portions
+            totals += amounts
+            items.append({
+                'id': food['id'],
+                'ingredient_id': food['ingredient_id'],
+                'ingredient': food['ingredient'],
+                'portions': portions,
+                'qty': round(float(food['qty'] or 0) * portions, 2),
+                'unit': food['unit'],
+                **{n: round(float(a), 1) for n, a in zip(NUTRIENTS, amounts)}
+            })
+        after = {n: round(float(t - totals[NUTRIENTS.index(n)]), 1) + 0.0 for n, t in zip(nutrients, target)}
+        return {
+            'items': items,
+            'totals': {n: round(float(t), 1) for n, t in zip(NUTRIENTS, totals)},
+            'remaining_after': after,
+            # Share of the (weighted) gap the combination closes, 100 is a perfect fit
+            'match': round(100 * (1 - (error / empty_error) ** 0.5), 1)
+        }
+
+
+def _fit(columns: np.ndarray, norms: np.ndarray, residuals: np.ndarray):
+    """Best portion of every food for every residual, the error left after adding it and what is left.
+
+    `columns` is (nutrients x foods) without all-zero foods, `residuals`
+    (beam x nutrients); the results are (beam x foods) and
+    (beam x nutrients x foods).
+    """
+    portions = (residuals @ columns) / norms
+    np.rint(portions / PORTION_STEP, out=portions)
+    portions *= PORTION_STEP
+    np.clip(portions, MIN_PORTION, MAX_PORTION, out=portions)
+    left = residuals[:, :, None] - portions[:, None, :] * columns[None, :, :]
+    over = np.minimum(left, 0)
+    errors = np.einsum('bkm,bkm->bm', left, left) + (OVERSHOOT - 1) * np.einsum('bkm,bkm->bm', over, over)
+    return portions, errors, left
+
+
+_matrix_lock = threading.Lock()
+
+
+def get_nutrient_matrix(catalog) -> NutrientMatrix:
+    """The nutrient matrix of a worker's food catalog"""
+    matrix = getattr(catalog, '_nutrient_matrix', None)
+    if matrix is None:
+        with _matrix_lock:
+            matrix = getattr(catalog, '_nutrient_matrix', None)
+            if matrix is None:
+                matrix = catalog._nutrient_matrix = NutrientMatrix(catalog)
+    return matrix
@@ -0,0 +1,96 @@
+"""
+Concurrent analysis of many product photo pairs (nutrition label + front).
+
+A shopping haul of ten products used to be ten label_auto requests, each
+waiting for its own vision round trip. scan_products() runs the analyses
+on a bounded thread pool (SCAN_WORKERS at a time, so one batch cannot eat
+the account's rate limit) and yields each product as soon as it finishes.
+Rate-limited (429) and transient server errors are retried with
+exponential backoff, honouring the Retry-After header when the API sends
+one.
+"""
+import os
+import time
+import random
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+from models.services.aggregation import read_csv
+
+logger = logging.getLogger(__name__)
+
+SCAN_WORKERS = int(os.getenv('AI_SCAN_WORKERS', '4'))
+MAX_SCAN_PRODUCTS = 20
+MAX_ATTEMPTS = 4
+BACKOFF_SECONDS = 2.0
+MAX_BACKOFF_SECONDS = 30.0
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """Seconds to wait before retrying `error`, or 0 when it should not be retried"""
+    status = getattr(error, 'status_code', None)
+    if status is None and type(error).__name__ in ('APITimeoutError', 'APIConnectionError'):
+        status = 503
+    if status != 429 and not (status and status >= 500):
+        return 0
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    try:
+        if retry_after:
+            return min(float(retry_after), MAX_BACKOFF_SECONDS)
+    except ValueError:
+        pass
+    # Jitter keeps the pool's retries from hitting the API in lockstep
+    return min(BACKOFF_SECONDS * 2 ** (attempt - 1), MAX_BACKOFF_SECONDS) * random.uniform(0.75, 1.25)
+
+
+def analyze_pair(analyze: Callable[[str, str], str], index: int, nutrition_base64: str, front_base64: str) -> Dict:
+    """Analyze one product, retrying rate limits; never raises"""
+    started = time.perf_counter()
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            # Missing values are None, so every streamed line is valid JSON
+            columns, results = read_csv(analyze(nutrition_base64, front_base64))
+            return {
+                'index': index,
+                'success': True,
+                'columns': columns,
+                'results': results,
+                'attempts': attempt,
+                'seconds': round(time.perf_counter() - started, 2)
+            }
+        except Exception as e:
+            delay = _retry_delay(e, attempt) if attempt < MAX_ATTEMPTS else 0
+            if not delay:
+                return {
+                    'index': index,
+                    'success': False,
+                    'error': f'Error analyzing product photos: {str(e)}',
+                    'attempts': attempt,
+                    'seconds': round(time.perf_counter() - started, 2)
+                }
+            logger.info(f"Product {index} rate limited (attempt {attempt}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def scan_products(pairs: Sequence[Tuple[str, str]], analyze: Callable[[str, str], str],
+                  workers: int = SCAN_WORKERS) -> Iterator[Dict]:
+    """Analyze (nutrition_base64, front_base64) pairs concurrently, yielding results as they complete"""
+    if not pairs:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pairs))), thread_name_prefix='product-scan') as executor:
+        futures = [executor.submit(analyze_pair, analyze, index, nutrition, front)
+                   for index, (nutrition, front) in enumerate(pairs)]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def product_records(products: List[Dict]) -> Tuple[List[str], List[Dict]]:
+    """Columns and rows of the successful products, each row tagged with its product index"""
+    columns, records = ['product'], []
+    for product in sorted(products, key=lambda p: p['index']):
+        if product['success']:
+            columns += [column for column in product['columns'] if column not in columns]
+            records += [dict(row, product=product['index']) for row in product['results']]
+    return columns, records
@@ -19,8 +19,7 @@ class RecipeService:
 
     def get_recipe_detail(self, recipe_id):
         """Get detailed recipe information"""
-        all_recipes = self.food_db.fetch_all_recipes()
-        recipe = next((r for r in all_recipes if r['recipe_id'] == recipe_id), None)
+        recipe = self.food_db.fetch_recipe(recipe_id)
 
         if not recipe:
             return None
@@ -49,8 +48,7 @@ class RecipeService:
 
     def get_recipe_for_edit(self, recipe_id):
         """Get recipe data for editing"""
-        all_recipes = self.food_db.fetch_all_recipes()
-        recipe = next((r for r in all_recipes if r['recipe_id'] == recipe_id), None)
+        recipe = self.food_db.fetch_recipe(recipe_id)
 
         if not recipe:
             return None
@@ -152,8 +150,7 @@ class RecipeService:
 
     def delete_recipe(self, recipe_id):
         """Delete a recipe"""
-        all_recipes = self.food_db.fetch_all_recipes()
-        recipe = next((r for r in all_recipes if r['recipe_id'] == recipe_id), None)
+        recipe = self.food_db.fetch_recipe(recipe_id)
 
         if not recipe:
             return {'success': False, 'error': 'Recipe not found'}
@@ -0,0 +1,203 @@
+"""
+Adaptive maintenance calories (TDEE) from intake, activity and weight trend.
+
+Over a few weeks, what was eaten minus what the body stored is what it
+burned. For each day the estimator looks at the last WINDOW_DAYS of
+- intake: the day's kcal from the daily_nutrition rollup; days without any
+  log are left out of the mean rather than counted as zero;
+- activity: active kcal from calorie_tracking, or the day's cycling
+  kcal_active (the user's own and unowned workouts) when there is no
+  calorie entry;
+- weight: the Kalman trend of the user's weight series (see
+  models/services/weight_trend.py), whose change over the window is stored
+  or lost energy at KCAL_PER_KG;
+and takes mean intake - KCAL_PER_KG * trend change per day as that day's
+maintenance. It jumps as days enter and leave the window, so the published
+TDEE follows it exponentially with a half-life of SMOOTHING_DAYS. TDEE minus
+the window's mean activity is the base burn, and base plus a day's activity
+is what that day is expected to cost.
+
+EnergyBalance.advance() moves the window by one day with running sums, in
+O(1). refresh() appends the days that ended since the last stored row of
+energy_balance, resuming from the last WINDOW_DAYS rows; writers drop the
+rows whose inputs they change (energy_balance.invalidate), so a past edit
+recomputes from that day on and a new day costs one advance().
+
+Estimates are stored per user. The nutrition log, calorie entries and
+unowned weigh-ins have no owner (DEFAULT_USER) and count for every user,
+as in weight_series.fetch().
+"""
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Deque, Dict, List, Optional, Tuple
+
+from models.database import daily_nutrition, energy_balance
+from models.database.daily_nutrition import DEFAULT_USER, ROLLUP_TABLE
+from models.database.energy_balance import WINDOW_DAYS
+from models.database.index_advisor import table_columns
+from models.database.native_dates import native_date_reads, to_date
+from models.services.weight_trend import load_trend
+
+# Energy stored in a kilogram of body weight change
+KCAL_PER_KG = 7700
+# Logged days a window needs before its intake mean is trusted
+MIN_INTAKE_DAYS = 10
+# Half-life of the published TDEE following the daily maintenance estimate
+SMOOTHING_DAYS = 7.0
+
+Inputs = Tuple[Optional[float], Optional[float], Optional[float]]
+
+
+@dataclass
+class EnergyBalance:
+    """The last WINDOW_DAYS of (intake, active, trend weight) with running sums, and the TDEE after them"""
+    window: Deque[Inputs] = field(default_factory=deque)
+    intake_sum: float = 0.0
+    intake_days: int = 0
+    active_sum: float = 0.0
+    active_days: int = 0
+    tdee: Optional[float] = None
+
+    @classmethod
+    def resume(cls, rows: List[Dict]) -> 'EnergyBalance':
+        """State after the stored `rows` (consecutive days, oldest first)"""
+        balance = cls()
+        for row in rows[-WINDOW_DAYS:]:
+            balance._push((row['intake_kcal'], row['active_kcal'], row['trend_kg']))
+        balance.tdee = rows[-1]['tdee_kcal'] if rows else None
+        return balance
+
+    def _push(self, inputs: Inputs):
+        if len(self.window) == WINDOW_DAYS:
+            intake, active, _ = self.window.popleft()
+            if intake is not None:
+                self.intake_sum -= intake
+                self.intake_days -= 1
+            if active is not None:
+                self.active_sum -= active
+                self.active_days -= 1
+        intake, active, _ = inputs
+        self.window.append(inputs)
+        if intake is not None:
+            self.intake_sum += intake
+            self.intake_days += 1
+        if active is not None:
+            self.active_sum += active
+            self.active_days += 1
+
+    def advance(self, day: date, intake: Optional[float], active: Optional[float],
+                trend_kg: Optional[float]) -> Dict:
+        """Take in the next day's inputs and return its energy_balance row"""
+        self._push((intake, active, trend_kg))
+        first, last = self.window[0][2], self.window[-1][2]
+        maintenance = None
+        if self.intake_days >= MIN_INTAKE_DAYS and first is not None and last is not None:
+            stored_per_day = KCAL_PER_KG * (last - first) / (len(self.window) - 1)
+            maintenance = self.intake_sum / self.intake_days - stored_per_day
+        if maintenance is not None:
+            alpha = 1 - 0.5 ** (1 / SMOOTHING_DAYS)
+            self.tdee = maintenance if self.tdee is None else self.tdee + alpha * (maintenance - self.tdee)
+        return {
+            'day': day,
+            'intake_kcal': intake,
+            'active_kcal': active,
+            'trend_kg': trend_kg,
+            'maintenance_kcal': maintenance,
+            'tdee_kcal': self.tdee,
+            'active_avg_kcal': self.active_sum / self.active_days if self.active_days else None
+        }
+
+
+def _activity(manager, start: date, end: date, user_id: str = DEFAULT_USER) -> Dict[date, float]:
+    """Active kcal per day in [start, end]: calorie_tracking, else the day's cycling kcal_active of `user_id`"""
+    active: Dict[date, float] = {}
+    if table_columns(manager, 'cycling_workouts'):
+        for row in manager.execute_query('''
+            SELECT date, SUM(kcal_active) AS kcal
+            FROM cycling_workouts
+            WHERE date BETWEEN %s AND %s AND kcal_active IS NOT NULL
+              AND (user_id IN (%s, %s) OR user_id IS NULL)
+            GROUP BY date
+        ''', (start, end, user_id, DEFAULT_USER), fetch_all=True, cache_tables=('cycling_workouts',)) or []:
+            active[to_date(row['date'])] = float(row['kcal'])
+
+    if native_date_reads(manager, 'calorie_tracking'):
+        rows = manager.execute_query('SELECT entry_date AS day, calories FROM calorie_tracking '
+                                     'WHERE entry_date BETWEEN %s AND %s', (start, end),
+                                     fetch_all=True, cache_tables=('calorie_tracking',)) or []
+    else:
+        rows = manager.execute_query('SELECT date AS day, calories FROM calorie_tracking',
+                                     fetch_all=True, cache_tables=('calorie_tracking',)) or []
+    for row in rows:
+        day = to_date(row['day'])
+        if day is not None and start <= day <= end and row['calories'] not in (None, ''):
+            active[day] = float(row['calories'])
+    return active
+
+
+def refresh(manager, today: date, user_id: str = DEFAULT_USER) -> int:
+    """Store the estimates of the days before `today` that are not stored yet; returns how many were added"""
+    if not energy_balance.energy_ready(manager):
+        return 0
+    end = today - timedelta(days=1)
+    last = energy_balance.last_day(manager, user_id)
+    if last is not None and last >= end:
+        return 0
+
+    if last is None:
+        # The nutrition log is unowned: every user's intake is DEFAULT_USER's rollup
+        row = manager.execute_query(f'SELECT MIN(day) AS day FROM {ROLLUP_TABLE} WHERE user_id = %s', (DEFAULT_USER,),
+                                    fetch_one=True, cache_tables=(ROLLUP_TABLE,))
+        start = to_date(row['day']) if row else None
+        if start is None or start > end:
+            return 0
+        balance = EnergyBalance()
+    else:
+        start = last + timedelta(days=1)
+        balance = EnergyBalance.resume(
+            energy_balance.fetch_rows(manager, last - timedelta(days=WINDOW_DAYS - 1), last, user_id))
+
+    intake = {row['day']: row['kcal'] for row in daily_nutrition.fetch_days(manager, start, end, DEFAULT_USER)
+              if row['items']}
+    active = _activity(manager, start, end, user_id)
+    trend = load_trend(manager, user_id)
+
+    rows = []
+    day = start
+    while day <= end:
+        level = trend.level_on(day)
+        rows.append(balance.advance(day, intake.get(day), active.get(day),
+                                    round(level, 3) if level is not None else None))
+        day += timedelta(days=1)
+    energy_balance.store_rows(manager, rows, user_id)
+    return len(rows)
+
+
+def load_days(manager, start: date, end: date, today: Optional[date] = None,
+              user_id: str = DEFAULT_USER) -> List[Dict]:
+    """Stored estimates of [start, end] (days before `today`), brought up to date first"""
+    refresh(manager, today or date.today(), user_id)
+    if not energy_balance.energy_ready(manager):
+        return []
+    return energy_balance.fetch_rows(manager, start, end, user_id)
+
+
+def current(manager, today: Optional[date] = None, user_id: str = DEFAULT_USER) -> Optional[Dict]:
+    """Latest TDEE with its base burn and what `today` is expected to cost, or None before enough data"""
+    today = today or date.today()
+    rows = load_days(manager, today - timedelta(days=WINDOW_DAYS), today, today, user_id)
+    latest = next((row for row in reversed(rows) if row['tdee_kcal'] is not None), None)
+    if latest is None:
+        return None
+    base = latest['tdee_kcal'] - (latest['active_avg_kcal'] or 0)
+    active_today = _activity(manager, today, today, user_id).get(today)
+    return {
+        'as_of': to_date(latest['day']).isoformat(),
+        'tdee_kcal': round(latest['tdee_kcal']),
+        'maintenance_kcal': round(latest['maintenance_kcal']) if latest['maintenance_kcal'] is not None else None,
+        'base_kcal': round(base),
+        'active_avg_kcal': round(latest['active_avg_kcal']) if latest['active_avg_kcal'] is not None else None,
+        'expected_today_kcal': round(base + active_today) if active_today is not None else None,
+        'trend_kg': latest['trend_kg']
+    }
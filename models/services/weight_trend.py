@@ -0,0 +1,147 @@
+"""
+Body weight trend: EWMA and Kalman smoothing of the weight series.
+
+A single weigh-in swings by a kilogram with water and food, so neither the
+latest value nor a plain mean is the weight the dashboard and W/kg want.
+Two smoothers run over the series of weight_series.fetch(), both in one pass
+over array('d') columns and both aware of uneven gaps between weigh-ins:
+- EWMA: exponential average with a half-life of HALF_LIFE_DAYS, so a gap of
+  a week moves the average as far as seven daily weigh-ins would;
+- Kalman: local level model, the true weight drifting by PROCESS_VARIANCE
+  per day and each weigh-in off by MEASUREMENT_VARIANCE; its variance gives
+  the uncertainty of the trend.
+
+load_trend() keeps one WeightTrend per reader (a user, or DEFAULT_USER for
+the nutrition log alone) per data version of the series tables. record_weight() stores a
+weigh-in and, when it is the newest point of a cached trend and nothing
+else was written in between, extends that trend in O(1) under the new data
+version instead of rebuilding it.
+"""
+import math
+import threading
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from models.database import weight_series
+from models.database.daily_nutrition import DEFAULT_USER
+from models.database.weight_series import SERIES_TABLE, SERIES_TABLES
+
+# Days after which a weigh-in counts half in the EWMA
+HALF_LIFE_DAYS = 7.0
+# Daily drift of the true weight (kg²) and noise of one weigh-in (kg², about ±0.6 kg)
+PROCESS_VARIANCE = 0.01
+MEASUREMENT_VARIANCE = 0.36
+
+
+@dataclass
+class WeightTrend:
+    """Weigh-ins oldest first with their EWMA, Kalman level and the level's variance"""
+    days: List[date] = field(default_factory=list)
+    weights: array = field(default_factory=lambda: array('d'))
+    ewma: array = field(default_factory=lambda: array('d'))
+    level: array = field(default_factory=lambda: array('d'))
+    variance: array = field(default_factory=lambda: array('d'))
+
+    @classmethod
+    def build(cls, points: Sequence[Tuple[date, float]]) -> 'WeightTrend':
+        trend = cls()
+        for day, weight in points:
+            trend.append(day, weight)
+        return trend
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def append(self, day: date, weight: float) -> bool:
+        """Extend the trend by a weigh-in after its last day in O(1); False when `day` is not after it"""
+        if self.days and day <= self.days[-1]:
+            return False
+        if not self.days:
+            ewma, level, variance = weight, weight, MEASUREMENT_VARIANCE
+        else:
+            gap = (day - self.days[-1]).days
+            alpha = 1 - 0.5 ** (gap / HALF_LIFE_DAYS)
+            ewma = self.ewma[-1] + alpha * (weight - self.ewma[-1])
+            predicted = self.variance[-1] + PROCESS_VARIANCE * gap
+            gain = predicted / (predicted + MEASUREMENT_VARIANCE)
+            level = self.level[-1] + gain * (weight - self.level[-1])
+            variance = (1 - gain) * predicted
+        self.days.append(day)
+        self.weights.append(weight)
+        self.ewma.append(ewma)
+        self.level.append(level)
+        self.variance.append(variance)
+        return True
+
+    def index_on(self, day: date) -> Optional[int]:
+        """Position of the last weigh-in on or before `day`"""
+        i = bisect_right(self.days, day) - 1
+        return i if i >= 0 else None
+
+    def level_on(self, day: date) -> Optional[float]:
+        """Kalman trend weight as of `day` (its last weigh-in on or before it)"""
+        i = self.index_on(day)
+        return self.level[i] if i is not None else None
+
+    def latest(self) -> Optional[Dict]:
+        if not self.days:
+            return None
+        return {
+            'date': self.days[-1].isoformat(),
+            'weight_kg': self.weights[-1],
+            'ewma_kg': round(self.ewma[-1], 2),
+            'trend_kg': round(self.level[-1], 2),
+            'trend_sd_kg': round(math.sqrt(self.variance[-1]), 2)
+        }
+
+    def __sizeof__(self):
+        return (object.__sizeof__(self) + len(self.days) * 32
+                + sum(len(column) * column.itemsize for column in (self.weights, self.ewma, self.level, self.variance)))
+
+
+# Per-process trends: (manager id, reader) -> (data version, trend)
+_trends: Dict[Tuple[int, str], Tuple[tuple, WeightTrend]] = {}
+_lock = threading.Lock()
+
+
+def load_trend(manager, user_id: str = DEFAULT_USER) -> WeightTrend:
+    """Trend of `user_id`'s series (see weight_series.fetch), rebuilt only when the series changed"""
+    key = (id(manager), user_id)
+    version = manager.data_version(*SERIES_TABLES)
+    with _lock:
+        cached = _trends.get(key)
+    if version and cached is not None and cached[0] == version:
+        return cached[1]
+    trend = WeightTrend.build(weight_series.fetch(manager, user_id))
+    if version:
+        with _lock:
+            _trends[key] = (version, trend)
+    return trend
+
+
+def _reads(reader: str, owner: str) -> bool:
+    """True when a weigh-in of `owner` is part of the series `reader` reads (see weight_series.fetch)"""
+    return owner in (reader, DEFAULT_USER)
+
+
+def record_weight(manager, day: date, weight_kg: float, user_id: str = DEFAULT_USER,
+                  source: str = weight_series.SOURCE_LOG, replace: bool = True):
+    """Store a weigh-in in the merged series and extend the cached trends it is the newest point of"""
+    before = manager.data_version(*SERIES_TABLES)
+    weight_series.record(manager, day, weight_kg, user_id, source, replace)
+    after = manager.data_version(*SERIES_TABLES)
+    # Our own write is the only change when exactly the series table moved by one
+    expected = tuple(v + 1 if table == SERIES_TABLE else v
+                     for table, v in zip(sorted(SERIES_TABLES), before)) if before else None
+    with _lock:
+        for key, (version, trend) in list(_trends.items()):
+            if key[0] != id(manager) or version != before:
+                continue
+            # A reader that does not see this weigh-in keeps its trend as is
+            if after == expected and (not _reads(key[1], user_id) or trend.append(day, weight_kg)):
+                _trends[key] = (after, trend)
+            else:
+                del _trends[key]
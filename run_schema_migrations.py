@@ -73,6 +73,72 @@ def run_all_migrations():
     except ImportError as e:
         logger.warning(f"Could not import add_ai_profiles: {e}")
     
+    try:
+        from migrations.add_user_date_indexes import run_migration as migrate_user_date_indexes
+        migrations.append(('add_user_date_indexes', migrate_user_date_indexes))
+    except ImportError as e:
+        logger.warning(f"Could not import add_user_date_indexes: {e}")
+    
+    try:
+        from migrations.add_native_date_columns import run_migration as migrate_native_dates
+        migrations.append(('add_native_date_columns', migrate_native_dates))
+    except ImportError as e:
+        logger.warning(f"Could not import add_native_date_columns: {e}")
+    
+    try:
+        from migrations.add_daily_nutrition_rollup import run_migration as migrate_daily_nutrition
+        migrations.append(('add_daily_nutrition_rollup', migrate_daily_nutrition))
+    except ImportError as e:
+        logger.warning(f"Could not import add_daily_nutrition_rollup: {e}")
+    
+    try:
+        from migrations.add_catalog_changes import run_migration as migrate_catalog_changes
+        migrations.append(('add_catalog_changes', migrate_catalog_changes))
+    except ImportError as e:
+        logger.warning(f"Could not import add_catalog_changes: {e}")
+    
+    try:
+        from migrations.add_recipe_nutrition import run_migration as migrate_recipe_nutrition
+        migrations.append(('add_recipe_nutrition', migrate_recipe_nutrition))
+    except ImportError as e:
+        logger.warning(f"Could not import add_recipe_nutrition: {e}")
+    
+    try:
+        from migrations.add_ai_results import run_migration as migrate_ai_results
+        migrations.append(('add_ai_results', migrate_ai_results))
+    except ImportError as e:
+        logger.warning(f"Could not import add_ai_results: {e}")
+    
+    try:
+        from migrations.add_ai_text_cache import run_migration as migrate_ai_text_cache
+        migrations.append(('add_ai_text_cache', migrate_ai_text_cache))
+    except ImportError as e:
+        logger.warning(f"Could not import add_ai_text_cache: {e}")
+    
+    try:
+        from migrations.add_ingredient_canonical_key import run_migration as migrate_ingredient_canonical_key
+        migrations.append(('add_ingredient_canonical_key', migrate_ingredient_canonical_key))
+    except ImportError as e:
+        logger.warning(f"Could not import add_ingredient_canonical_key: {e}")
+    
+    try:
+        from migrations.add_unit_conversions import run_migration as migrate_unit_conversions
+        migrations.append(('add_unit_conversions', migrate_unit_conversions))
+    except ImportError as e:
+        logger.warning(f"Could not import add_unit_conversions: {e}")
+    
+    try:
+        from migrations.add_weight_series import run_migration as migrate_weight_series
+        migrations.append(('add_weight_series', migrate_weight_series))
+    except ImportError as e:
+        logger.warning(f"Could not import add_weight_series: {e}")
+    
+    try:
+        from migrations.add_energy_balance import run_migration as migrate_energy_balance
+        migrations.append(('add_energy_balance', migrate_energy_balance))
+    except ImportError as e:
+        logger.warning(f"Could not import add_energy_balance: {e}")
+    
     try:
         from migrations.seed_ai_profiles import seed_profiles as seed_ai_profiles
         migrations.append(('seed_ai_profiles', seed_ai_profiles))
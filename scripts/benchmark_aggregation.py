@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Per-request CPU of the request handlers' aggregations, pandas vs plain rows.
+
+Times the work one request does on each path with both implementations:
+- an analyzer answer: CSV text parsed and prepared as save_entries() records;
+- the analytics frame of one range: daily totals, weights and logged items
+  as date-keyed columns, summarized and averaged per ISO week;
+and the import cost a worker pays once for pandas vs models.services.aggregation.
+
+Usage:
+    python scripts/benchmark_aggregation.py [--rows 10] [--days 30] [--repeat 500]
+"""
+
+import io
+import os
+import sys
+import random
+import argparse
+import statistics
+import subprocess
+import time
+from datetime import date, timedelta
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import pandas as pd
+
+from models.services.aggregation import DayColumns, group_by, mean, read_csv, to_number, total, value_counts
+
+FOODS = ('chicken breast', 'brown rice', 'olive oil', 'broccoli', 'greek yogurt', 'rolled oats', 'banana',
+         'almond butter', 'salmon fillet', 'sweet potato', 'whole egg', 'spinach', 'cheddar cheese')
+MACROS = ['kcal', 'protein', 'carb', 'fat']
+REQUIRED = ['qty', 'unit', 'ingr', 'kcal', 'fats', 'carbs', 'fiber', 'net_carbs', 'protein']
+NUMERIC = ['qty', 'kcal', 'fats', 'carbs', 'fiber', 'net_carbs', 'protein']
+
+
+def analysis_csv(rows: int) -> str:
+    """An answer shaped like the analyzers' CSV"""
+    rng = random.Random(3)
+    lines = ['qty, unit, ingr, kcal, fats, carbs, fiber, net_carbs, protein']
+    for i in range(rows):
+        carbs, fiber = rng.uniform(0, 60), rng.uniform(0, 8)
+        lines.append(f"{rng.choice([50, 100, 150, 200])},g,{rng.choice(FOODS)} {i},{rng.uniform(20, 600):.1f},"
+                     f"{rng.uniform(0, 30):.1f},{carbs:.1f},{fiber:.1f},{carbs - fiber:.1f},{rng.uniform(0, 40):.1f}")
+    return '\n'.join(lines)
+
+
+def entries_pandas(text: str):
+    frame = pd.read_csv(io.StringIO(text))
+    frame.columns = frame.columns.str.strip()
+    for col in NUMERIC:
+        frame[col] = pd.to_numeric(frame[col], errors='coerce').fillna(0)
+    return frame[REQUIRED].to_dict('records')
+
+
+def entries_rows(text: str):
+    _, records = read_csv(text)
+    entries = []
+    for record in records:
+        entry = {column.strip(): value for column, value in record.items()}
+        entry = {col: entry.get(col, 0) for col in REQUIRED}
+        for col in NUMERIC:
+            entry[col] = to_number(entry[col])
+        entries.append(entry)
+    return entries
+
+
+def range_rows(days: int, per_day: int = 6):
+    """(daily totals, weights, logged items) of `days` days, as the fetchers return them"""
+    rng = random.Random(5)
+    end = date(2024, 6, 30)
+    totals, weights, items = [], [], []
+    for offset in range(days):
+        day = end - timedelta(days=offset)
+        logged = [{'day': day, 'ingredient': rng.choice(FOODS), 'kcal': rng.uniform(50, 600),
+                   'protein': rng.uniform(0, 40), 'carb': rng.uniform(0, 60), 'fat': rng.uniform(0, 30)}
+                  for _ in range(per_day)]
+        items += logged
+        totals.append(dict({macro: sum(row[macro] for row in logged) for macro in MACROS}, day=day, items=per_day))
+        weights.append({'day': day, 'weight': 80 - offset * 0.02})
+    return end - timedelta(days=days), end, totals, weights, items
+
+
+def analytics_pandas(start, end, totals, weights, items):
+    def frame(rows):
+        df = pd.DataFrame(rows)
+        df['date'] = pd.to_datetime(df['day'])
+        df = df[(df['date'] >= pd.Timestamp(start)) & (df['date'] <= pd.Timestamp(end))]
+        return df.sort_values('date')
+
+    days, weight, logged = frame(totals), frame(weights), frame(items)
+    summary = {macro: round(days[macro].mean(), 1) for macro in MACROS}
+    series = {'dates': days['date'].dt.strftime('%Y-%m-%d').tolist(), 'weights': weight['weight'].tolist()}
+    frequency = logged['ingredient'].value_counts().head(10).to_dict()
+    logged['week'] = logged['date'].dt.to_period('W')
+    weekly = logged.groupby('week')[MACROS].mean().round(1).to_dict('records')
+    return summary, series, frequency, weekly
+
+
+def analytics_rows(start, end, totals, weights, items):
+    days = DayColumns.from_records(totals, MACROS + ['items'], start=start, end=end)
+    weight = DayColumns.from_records(weights, ['weight'], start=start, end=end)
+    logged = DayColumns.from_records(items, MACROS, text=['ingredient'], start=start, end=end)
+    summary = {macro: round(mean(days[macro]), 1) for macro in MACROS}
+    series = {'dates': days.iso_days(), 'weights': weight['weight'].tolist()}
+    frequency = dict(value_counts(logged['ingredient'], 10))
+    weeks = [day.isocalendar()[:2] for day in logged.days]
+    _, averages = group_by(weeks, {macro: logged[macro] for macro in MACROS}, how='mean')
+    weekly = [{macro: round(averages[macro][i], 1) for macro in MACROS} for i in range(len(averages['kcal']))]
+    return summary, series, frequency, weekly, total(days['items'])
+
+
+def timings_ms(func, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def import_ms(module: str, repeat: int = 5) -> float:
+    """Median wall time of a fresh interpreter importing `module`, minus the bare interpreter"""
+    def run(code):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=project_root, check=True)
+        return (time.perf_counter() - started) * 1000
+    return statistics.median(run(f'import {module}') - run('pass') for _ in range(repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare pandas with the plain-row aggregations per request')
+    parser.add_argument('--rows', type=int, default=10, help='foods in one analyzer answer')
+    parser.add_argument('--days', type=int, default=30, help='days in one analytics range')
+    parser.add_argument('--repeat', type=int, default=500)
+    args = parser.parse_args()
+
+    text = analysis_csv(args.rows)
+    assert entries_pandas(text) == entries_rows(text)
+    data = range_rows(args.days)
+
+    cases = (
+        (f'analysis, {args.rows} foods', lambda: entries_pandas(text), lambda: entries_rows(text)),
+        (f'analytics, {args.days} days', lambda: analytics_pandas(*data), lambda: analytics_rows(*data)),
+    )
+
+    print(f"\n{'per request':<30}{'pandas ms':>11}{'rows ms':>10}{'saved ms':>10}")
+    for name, with_pandas, with_rows in cases:
+        before = statistics.median(timings_ms(with_pandas, args.repeat))
+        after = statistics.median(timings_ms(with_rows, args.repeat))
+        print(f"{name:<30}{before:>11.3f}{after:>10.3f}{before - after:>10.3f}")
+
+    print(f"\n{'import (once per worker)':<30}{'ms':>11}")
+    for module in ('pandas', 'models.services.aggregation'):
+        print(f"{module:<30}{import_ms(module):>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
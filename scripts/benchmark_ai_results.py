@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Session cookie size and per-request load time of AI analysis results.
+
+Compares the previous storage (the result table as a CSV string inside the
+Flask cookie session, parsed with pd.read_csv on every follow-up request)
+with the server-side result store (only ai_session_id in the cookie),
+served from the worker's LRU and from the ai_analysis_results spill table.
+
+Usage:
+    python scripts/benchmark_ai_results.py [--rows 20] [--repeat 200]
+"""
+
+import io
+import os
+import sys
+import uuid
+import random
+import argparse
+import tempfile
+import statistics
+import time
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+os.environ['DB_ENGINE'] = 'sqlite'
+os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='bench_ai_results_'), 'bench.db')
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import pandas as pd
+from flask import Flask
+
+from models.database.connection_manager import get_db_manager
+from models.database.ai_results import AnalysisResultStore, create_table
+
+FOODS = ('chicken breast', 'brown rice', 'olive oil', 'broccoli', 'greek yogurt', 'rolled oats', 'banana',
+         'almond butter', 'salmon fillet', 'sweet potato', 'whole egg', 'spinach', 'cheddar cheese')
+
+
+def analysis(rows: int) -> pd.DataFrame:
+    """A result table shaped like the analyzers' CSV"""
+    rng = random.Random(3)
+    lines = ['qty,unit,ingr,kcal,fats,carbs,fiber,net_carbs,protein']
+    for i in range(rows):
+        carbs, fiber = rng.uniform(0, 60), rng.uniform(0, 8)
+        lines.append(f"{rng.choice([50, 100, 150, 200])},g,{rng.choice(FOODS)} {i},{rng.uniform(20, 600):.1f},"
+                     f"{rng.uniform(0, 30):.1f},{carbs:.1f},{fiber:.1f},{carbs - fiber:.1f},{rng.uniform(0, 40):.1f}")
+    return pd.read_csv(io.StringIO('\n'.join(lines)))
+
+
+def timings_ms(func, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare CSV-in-session with the server-side result store')
+    parser.add_argument('--rows', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.secret_key = 'benchmark'
+    serializer = app.session_interface.get_signing_serializer(app)
+
+    frame = analysis(args.rows)
+    session_id = str(uuid.uuid4())
+    csv_data = frame.to_csv(index=False)
+    old_cookie = serializer.dumps({'ai_session_id': session_id, f'ai_results_{session_id}': csv_data,
+                                   '_permanent': True})
+    new_cookie = serializer.dumps({'ai_session_id': session_id, '_permanent': True})
+
+    manager = get_db_manager()
+    create_table(manager)
+    store = AnalysisResultStore(manager)
+    store.put(session_id, frame.columns.tolist(), frame.to_dict(orient='records'))
+
+    def from_spill():
+        store._entries.clear()
+        result = store.get(session_id)
+        return pd.DataFrame.from_records(result.records, columns=result.columns)
+
+    def from_lru():
+        result = store.get(session_id)
+        return pd.DataFrame.from_records(result.records, columns=result.columns)
+
+    loaders = (
+        ('CSV in session', lambda: pd.read_csv(io.StringIO(csv_data))),
+        ('store, LRU', from_lru),
+        ('store, spill table', from_spill),
+    )
+    assert from_lru().equals(pd.read_csv(io.StringIO(csv_data)))
+
+    print(f"{args.rows} analyzed foods")
+    print(f"session cookie: {len(old_cookie)} bytes with the CSV, {len(new_cookie)} bytes with the id only")
+    print(f"\n{'results loaded from':<22}{'median ms':>11}{'max ms':>9}")
+    for name, load in loaders:
+        timings = timings_ms(load, args.repeat)
+        print(f"{name:<22}{statistics.median(timings):>11.3f}{max(timings):>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Latency of the date-bounded consumption readers against the full-history ones.
+
+Fills a temporary SQLite database with synthetic food logs and, at 1, 3 and 10
+years of history, times what the dashboard, meal planner and analytics pages
+do for a day, a week and 30 days:
+
+- before: fetch_all_consumption() / fetch_recipe_consumption() and a filter
+  on the returned rows (what the callers did in pandas);
+- after:  fetch_consumption_range() / fetch_recipe_consumption_range().
+
+It also times the MealService day, week and month views, which load their
+range once and aggregate it in a single pass; they should stay flat as the
+history grows.
+
+Usage:
+    python scripts/benchmark_consumption_range.py [--years 1,3,10] [--items-per-day N] [--repeat N]
+
+Example:
+    python scripts/benchmark_consumption_range.py --years 1,3,10 --repeat 10
+"""
+
+import os
+import sys
+import random
+import argparse
+import tempfile
+import statistics
+import time
+from datetime import date, timedelta
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+os.environ['DB_ENGINE'] = 'sqlite'
+os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='bench_consumption_'), 'bench.db')
+os.environ['QUERY_CACHE_ENABLED'] = 'false'
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from models.database.connection_manager import get_db_manager
+from models.food import FoodDatabase
+from models.services.meal_service import MealService
+
+MEAL_TYPES = ('breakfast', 'lunch', 'dinner', 'snacks')
+WINDOWS = (('day', 1), ('week', 7), ('30 days', 30))
+
+
+def create_catalog(manager, ingredients: int = 200, recipes: int = 40):
+    rng = random.Random(1)
+    manager.execute_query("INSERT INTO Unit (unit_name) VALUES ('g')")
+    manager.execute_many('INSERT INTO Ingredient (ingredient_name) VALUES (%s)',
+                         [(f'ingredient {i}',) for i in range(1, ingredients + 1)])
+    manager.execute_many('''
+        INSERT INTO Nutrition (ingredient_id, unit_id, kcal, fat, carb, fiber, net_carb, protein)
+        VALUES (%s, 1, %s, %s, %s, %s, %s, %s)
+    ''', [(i, rng.uniform(0.5, 9), rng.uniform(0, 1), rng.uniform(0, 1), rng.uniform(0, 0.2),
+           rng.uniform(0, 0.8), rng.uniform(0, 0.5)) for i in range(1, ingredients + 1)])
+    manager.execute_many('INSERT INTO Ingredient_Quantity (ingredient_id, unit_id, quantity) VALUES (%s, 1, %s)',
+                         [(i, rng.choice([50, 100, 150, 200])) for i in range(1, ingredients + 1)])
+    manager.execute_many('INSERT INTO Recipe (recipe_name, servings) VALUES (%s, %s)',
+                         [(f'recipe {r}', rng.randint(1, 6)) for r in range(1, recipes + 1)])
+    manager.execute_many('INSERT INTO Recipe_Ingredients (recipe_id, ingredient_quantity_id) VALUES (%s, %s)',
+                         [(r, rng.randint(1, ingredients)) for r in range(1, recipes + 1) for _ in range(6)])
+    return ingredients, recipes
+
+
+def log_days(manager, first: date, last: date, catalog, items_per_day: int):
+    """Insert synthetic logs for every day in [first, last] (dual-written like the app does)"""
+    ingredients, recipes = catalog
+    rng = random.Random(first.toordinal())
+    consumption, recipe_consumption = [], []
+    day = first
+    while day <= last:
+        legacy = day.strftime('%d.%m.%Y')
+        for item in range(items_per_day):
+            consumption.append((legacy, rng.randint(1, ingredients), rng.uniform(0.5, 2),
+                                MEAL_TYPES[item % len(MEAL_TYPES)], day))
+        recipe_consumption.append((rng.randint(1, recipes), legacy, rng.choice(MEAL_TYPES), 1, day))
+        day += timedelta(days=1)
+
+    for i in range(0, len(consumption), 5000):
+        manager.execute_many('''
+            INSERT INTO Consumption
+            (consumption_date, ingredient_quantity_id, ingredient_quantity_portions, meal_type, entry_date)
+            VALUES (%s, %s, %s, %s, %s)
+        ''', consumption[i:i + 5000])
+    manager.execute_many('''
+        INSERT INTO recipe_consumption (recipe_id, consumption_date, meal_type, servings, entry_date)
+        VALUES (%s, %s, %s, %s, %s)
+    ''', recipe_consumption)
+    return len(consumption)
+
+
+def median_ms(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def measure(food_db, today: date, repeat: int):
+    rows = []
+    for label, days in WINDOWS:
+        start = today - timedelta(days=days - 1)
+
+        def full():
+            consumption = [c for c in food_db.fetch_all_consumption() if start <= c['day'] <= today]
+            recipes = [r for r in food_db.fetch_recipe_consumption() if start <= r['day'] <= today]
+            return consumption, recipes
+
+        def ranged():
+            return (food_db.fetch_consumption_range(start, today),
+                    food_db.fetch_recipe_consumption_range(start, today))
+
+        # Both paths must return the same rows before timing them
+        assert [len(part) for part in full()] == [len(part) for part in ranged()]
+        rows.append((label, median_ms(full, repeat), median_ms(ranged, repeat)))
+    return rows
+
+
+def measure_views(meal_service, today: date, repeat: int):
+    day = today.strftime('%Y-%m-%d')
+    return [
+        ('daily', median_ms(lambda: meal_service.get_daily_meals(day), repeat)),
+        ('weekly', median_ms(lambda: meal_service.get_weekly_meals(day), repeat)),
+        ('monthly', median_ms(lambda: meal_service.get_monthly_meals(today.strftime('%Y-%m')), repeat)),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare full-history and date-bounded consumption reads')
+    parser.add_argument('--years', default='1,3,10', help='Comma-separated history sizes in years')
+    parser.add_argument('--items-per-day', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    manager = get_db_manager()
+    food_db = FoodDatabase()
+    meal_service = MealService()
+    catalog = create_catalog(manager)
+
+    today = date.today()
+    logged_from = today + timedelta(days=1)
+    total = 0
+    views = []
+
+    print(f"{'history':<10}{'rows':>9}  {'window':<9}{'full ms':>10}{'range ms':>10}{'speedup':>10}")
+    for years in sorted(int(value) for value in args.years.split(',')):
+        # Extend the history backwards to the requested size
+        first = today - timedelta(days=365 * years - 1)
+        if first < logged_from:
+            total += log_days(manager, first, logged_from - timedelta(days=1), catalog, args.items_per_day)
+            logged_from = first
+
+        for label, full_ms, range_ms in measure(food_db, today, args.repeat):
+            speedup = full_ms / range_ms if range_ms else float('inf')
+            print(f"{f'{years}y':<10}{total:>9}  {label:<9}{full_ms:>10.2f}{range_ms:>10.2f}{speedup:>9.1f}x")
+        views.append((years, total, measure_views(meal_service, today, args.repeat)))
+
+    print(f"\n{'history':<10}{'rows':>9}" + ''.join(f"{label + ' ms':>12}" for label, _ in views[0][2]))
+    for years, rows, timings in views:
+        print(f"{f'{years}y':<10}{rows:>9}" + ''.join(f"{ms:>12.2f}" for _, ms in timings))
+
+
+if __name__ == '__main__':
+    main()
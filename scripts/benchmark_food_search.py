@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Latency of the in-memory food search index against the LIKE '%term%' query.
+
+Fills a temporary SQLite database with a synthetic catalog of N ingredients
+(multi-word names, a few favorites, some consumption history) and times:
+
+- autocomplete: FoodSearchIndex.autocomplete() for prefixes, reordered words
+  and typos (p50 / p99 / max over every query);
+- search page:  get_foods_paginated() with a search term, indexed vs the
+  previous LIKE + COUNT(*) SQL path.
+
+Usage:
+    python scripts/benchmark_food_search.py [--ingredients 100000] [--repeat N]
+"""
+
+import os
+import sys
+import random
+import argparse
+import tempfile
+import statistics
+import time
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+os.environ['DB_ENGINE'] = 'sqlite'
+os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='bench_food_search_'), 'bench.db')
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from models.database.connection_manager import get_db_manager
+from models.database.food_catalog import create_table
+from models.services.food_service import FoodService
+
+WORDS = ('chicken breast thigh beef steak ground pork loin salmon tuna cod egg white yolk milk whole skim '
+         'yogurt greek cheese cheddar feta rice brown basmati oats rolled bread rye sourdough pasta potato '
+         'sweet apple banana orange strawberry blueberry almond walnut peanut butter olive oil avocado '
+         'spinach broccoli carrot tomato onion garlic pepper red green lentil chickpea bean black kidney '
+         'tofu quinoa honey sugar dark chocolate protein powder whey bar cereal granola raw cooked grilled '
+         'baked fried smoked roasted dried frozen canned organic lean fat free low sodium').split()
+
+QUERIES = ('c', 'ch', 'chi', 'chick', 'chicken b', 'breast chick', 'gre yog', 'salm smok', 'peanut',
+           'chiken', 'yoghurt', 'brocoli', 'avocdo', 'sourdogh bread', 'o', 'ba', 'dark choc', 'whey prot')
+
+
+def create_catalog(manager, ingredients: int):
+    rng = random.Random(7)
+    names = set()
+    while len(names) < ingredients:
+        names.add(' '.join(rng.sample(WORDS, rng.randint(2, 4))) + f' {rng.randint(1, 99)}')
+    manager.execute_query("INSERT INTO Unit (unit_name) VALUES ('g')")
+    manager.execute_many('INSERT INTO Ingredient (ingredient_name) VALUES (%s)', [(name,) for name in names])
+    manager.execute_many('''
+        INSERT INTO Nutrition (ingredient_id, unit_id, kcal, fat, carb, fiber, net_carb, protein)
+        VALUES (%s, 1, %s, %s, %s, 0, %s, %s)
+    ''', [(i, rng.uniform(0.5, 9), rng.uniform(0, 1), rng.uniform(0, 1), rng.uniform(0, 0.8),
+           rng.uniform(0, 0.5)) for i in range(1, ingredients + 1)])
+    manager.execute_many('INSERT INTO Ingredient_Quantity (ingredient_id, unit_id, quantity) VALUES (%s, 1, %s)',
+                         [(i, rng.choice([50, 100, 150])) for i in range(1, ingredients + 1)])
+    manager.execute_many('INSERT INTO Favorites (ingredient_id) VALUES (%s)',
+                         [(i,) for i in rng.sample(range(1, ingredients + 1), min(200, ingredients))])
+    manager.execute_many('''
+        INSERT INTO Consumption
+        (consumption_date, ingredient_quantity_id, ingredient_quantity_portions, meal_type, entry_date)
+        VALUES ('01.01.2024', %s, 1, 'lunch', '2024-01-01')
+    ''', [(rng.randint(1, min(ingredients, 2000)),) for _ in range(20000)])
+
+
+def timings_ms(func, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(share * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the food search index with LIKE queries')
+    parser.add_argument('--ingredients', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    manager = get_db_manager()
+    create_catalog(manager, args.ingredients)
+    create_table(manager)
+    service = FoodService()
+
+    started = time.perf_counter()
+    service.search_index.autocomplete('warm up')
+    print(f"{args.ingredients} ingredients, index built in {(time.perf_counter() - started) * 1000:.0f} ms "
+          f"{service.search_index.stats()}")
+
+    print(f"\n{'autocomplete':<18}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}  top result")
+    everything = []
+    for query in QUERIES:
+        timings = timings_ms(lambda: service.search_index.autocomplete(query, 10), args.repeat)
+        everything += timings
+        top = service.search_index.autocomplete(query, 1)
+        print(f"{query:<18}{percentile(timings, 0.5):>9.3f}{percentile(timings, 0.99):>9.3f}"
+              f"{max(timings):>9.3f}  {top[0]['ingredient'] if top else '-'}")
+    print(f"{'all queries':<18}{percentile(everything, 0.5):>9.3f}{percentile(everything, 0.99):>9.3f}"
+          f"{max(everything):>9.3f}")
+
+    print(f"\n{'search page':<18}{'index ms':>10}{'LIKE ms':>10}")
+    for query in ('chicken', 'gre yog', 'o'):
+        indexed = timings_ms(lambda: service.get_foods_paginated(1, 24, query), 5)
+        like = timings_ms(lambda: service._get_foods_paginated_sql(1, 24, query, {}), 5)
+        print(f"{query:<18}{statistics.median(indexed):>10.2f}{statistics.median(like):>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
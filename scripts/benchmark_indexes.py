@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Before/after benchmark for the composite indexes in migrations/add_user_date_indexes.py.
+
+Builds a synthetic multi-user dataset in scratch tables (prefixed bench_),
+times the hot per-user queries, applies the migration's indexes to the scratch
+tables and times them again. The scratch tables are dropped afterwards.
+
+Usage:
+    python scripts/benchmark_indexes.py [--users N] [--days N] [--repeat N] [--configured-db]
+
+By default the benchmark runs on a temporary SQLite file; --configured-db runs
+it against the database selected by DB_ENGINE (e.g. the MySQL dev schema).
+
+Example:
+    python scripts/benchmark_indexes.py --users 50 --days 1095
+"""
+
+import os
+import sys
+import random
+import argparse
+import tempfile
+import statistics
+import time
+from datetime import date, timedelta
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+if '--configured-db' not in sys.argv:
+    os.environ['DB_ENGINE'] = 'sqlite'
+    os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='bench_indexes_'), 'bench.db')
+    os.environ['QUERY_CACHE_ENABLED'] = 'false'
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from models.database.connection_manager import get_db_manager
+from models.database.index_advisor import apply_indexes, drop_indexes, explain
+from migrations.add_user_date_indexes import INDEXES
+
+PREFIX = 'bench_'
+
+TABLES = {
+    'cycling_workouts': '''
+        id {pk}, user_id VARCHAR(36) NOT NULL, date DATE NOT NULL, start_time VARCHAR(8),
+        duration_sec INTEGER, distance_km REAL, avg_power_w REAL, tss REAL, created_at DATETIME
+    ''',
+    'sleep_summaries': '''
+        id {pk}, user_id VARCHAR(36) NOT NULL, date DATE NOT NULL,
+        total_sleep_minutes INTEGER, sleep_score INTEGER, created_at DATETIME
+    ''',
+    'ai_workout_analyses': '''
+        id {pk}, user_id VARCHAR(36) NOT NULL, workout_id INTEGER, date DATE NOT NULL,
+        summary TEXT, created_at DATETIME
+    ''',
+    'workout_sessions': '''
+        id {pk}, user_id VARCHAR(36) NOT NULL, date DATE NOT NULL, status VARCHAR(16), notes TEXT
+    ''',
+    'workout_sets': '''
+        id {pk}, session_id INTEGER NOT NULL, exercise_id INTEGER NOT NULL,
+        set_number INTEGER NOT NULL, weight REAL, reps INTEGER
+    ''',
+    'workout_timing_sessions': '''
+        id {pk}, session_id INTEGER NOT NULL, set_id INTEGER, event_type VARCHAR(32) NOT NULL,
+        timestamp DATETIME NOT NULL
+    ''',
+}
+
+QUERIES = [
+    ('cycling list', '''
+        SELECT * FROM bench_cycling_workouts WHERE user_id = %s
+        ORDER BY date DESC, start_time DESC LIMIT 30
+    ''', lambda u, d: (u,)),
+    ('cycling 30d range', '''
+        SELECT COUNT(*) AS n, SUM(tss) AS tss FROM bench_cycling_workouts
+        WHERE user_id = %s AND date >= %s
+    ''', lambda u, d: (u, d)),
+    ('sleep by date', '''
+        SELECT * FROM bench_sleep_summaries WHERE user_id = %s AND date = %s
+        ORDER BY created_at DESC LIMIT 1
+    ''', lambda u, d: (u, d)),
+    ('analysis history', '''
+        SELECT * FROM bench_ai_workout_analyses a WHERE a.user_id = %s
+        ORDER BY a.date DESC, a.created_at DESC LIMIT 20
+    ''', lambda u, d: (u,)),
+    ('gym history', '''
+        SELECT * FROM bench_workout_sessions ws WHERE ws.user_id = %s
+        ORDER BY ws.date DESC, ws.id DESC LIMIT 20
+    ''', lambda u, d: (u,)),
+    ('completed sessions', '''
+        SELECT COUNT(*) AS n FROM bench_workout_sessions WHERE user_id = %s AND status = 'completed'
+    ''', lambda u, d: (u,)),
+    ('exercise progression', '''
+        SELECT ws.date, wset.weight, wset.reps FROM bench_workout_sets wset
+        JOIN bench_workout_sessions ws ON wset.session_id = ws.id
+        WHERE ws.user_id = %s AND wset.exercise_id = %s ORDER BY ws.date
+    ''', lambda u, d: (u, 3)),
+    ('rest timer', '''
+        SELECT timestamp FROM bench_workout_timing_sessions
+        WHERE session_id = %s AND event_type = 'rest_start' AND set_id = %s
+        ORDER BY timestamp DESC LIMIT 1
+    ''', lambda u, d: (1, 1)),
+]
+
+
+def create_tables(manager):
+    pk = 'INT AUTO_INCREMENT PRIMARY KEY' if manager.use_mysql else 'INTEGER PRIMARY KEY AUTOINCREMENT'
+    for table, columns in TABLES.items():
+        manager.execute_query(f'DROP TABLE IF EXISTS {PREFIX}{table}')
+        manager.execute_query(f'CREATE TABLE {PREFIX}{table} ({columns.format(pk=pk)})')
+
+
+def drop_tables(manager):
+    for table in TABLES:
+        manager.execute_query(f'DROP TABLE IF EXISTS {PREFIX}{table}')
+
+
+def populate(manager, users: int, days: int):
+    rng = random.Random(42)
+    start = date.today() - timedelta(days=days)
+    cycling, sleep, analyses, sessions, sets, timing = [], [], [], [], [], []
+    session_id = 0
+
+    for user in range(1, users + 1):
+        uid = f'user-{user}'
+        for offset in range(days):
+            day = (start + timedelta(days=offset)).isoformat()
+            created = f'{day} 07:00:00'
+            sleep.append((uid, day, rng.randint(300, 540), rng.randint(50, 100), created))
+            if rng.random() < 0.5:
+                cycling.append((uid, day, f'{rng.randint(6, 19):02d}:00:00', rng.randint(1800, 7200),
+                                rng.uniform(10, 90), rng.uniform(120, 280), rng.uniform(20, 180), created))
+                analyses.append((uid, len(cycling), day, 'synthetic', created))
+            if rng.random() < 0.4:
+                session_id += 1
+                sessions.append((uid, day, rng.choice(['completed', 'completed', 'in_progress'])))
+                for set_number in range(1, 13):
+                    sets.append((session_id, rng.randint(1, 12), set_number, rng.uniform(20, 140), rng.randint(3, 12)))
+                    timing.append((session_id, len(sets), 'rest_start', f'{day} 18:{set_number:02d}:00'))
+
+    batches = [
+        ('cycling_workouts', '(user_id, date, start_time, duration_sec, distance_km, avg_power_w, tss, created_at)', cycling),
+        ('sleep_summaries', '(user_id, date, total_sleep_minutes, sleep_score, created_at)', sleep),
+        ('ai_workout_analyses', '(user_id, workout_id, date, summary, created_at)', analyses),
+        ('workout_sessions', '(user_id, date, status)', sessions),
+        ('workout_sets', '(session_id, exercise_id, set_number, weight, reps)', sets),
+        ('workout_timing_sessions', '(session_id, set_id, event_type, timestamp)', timing),
+    ]
+    for table, columns, rows in batches:
+        placeholders = ', '.join(['%s'] * len(rows[0]))
+        query = f'INSERT INTO {PREFIX}{table} {columns} VALUES ({placeholders})'
+        for i in range(0, len(rows), 5000):
+            manager.execute_many(query, rows[i:i + 5000])
+        print(f"  {PREFIX}{table}: {len(rows)} rows")
+
+
+def run_queries(manager, users: int, repeat: int):
+    rng = random.Random(7)
+    since = (date.today() - timedelta(days=30)).isoformat()
+    results = {}
+    for label, query, params in QUERIES:
+        timings = []
+        for _ in range(repeat):
+            args = params(f'user-{rng.randint(1, users)}', since)
+            started = time.perf_counter()
+            manager.execute_query(query, args, fetch_all=True)
+            timings.append((time.perf_counter() - started) * 1000)
+        sample = query.replace('%s', "'user-1'", 1).replace('%s', f"'{since}'")
+        _, problems = explain(manager, sample)
+        results[label] = (statistics.median(timings), problems)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the composite index migration on synthetic data')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--repeat', type=int, default=25)
+    parser.add_argument('--configured-db', action='store_true', help='Use DB_ENGINE instead of a temporary SQLite file')
+    args = parser.parse_args()
+
+    manager = get_db_manager()
+    bench_indexes = [(PREFIX + table, PREFIX + name, columns) for table, name, columns in INDEXES]
+    print(f"Engine: {manager.get_connection_info().get('type')}  users={args.users} days={args.days}")
+
+    try:
+        create_tables(manager)
+        populate(manager, args.users, args.days)
+
+        before = run_queries(manager, args.users, args.repeat)
+        created = apply_indexes(manager, bench_indexes)
+        print(f"  created {created} index(es)")
+        after = run_queries(manager, args.users, args.repeat)
+
+        print(f"\n{'query':<24}{'before ms':>11}{'after ms':>11}{'speedup':>10}  plan before -> after")
+        for label, (before_ms, before_problems) in before.items():
+            after_ms, after_problems = after[label]
+            speedup = before_ms / after_ms if after_ms else float('inf')
+            plan = f"{','.join(before_problems) or 'ok'} -> {','.join(after_problems) or 'ok'}"
+            print(f"{label:<24}{before_ms:>11.2f}{after_ms:>11.2f}{speedup:>9.1f}x  {plan}")
+    finally:
+        drop_indexes(manager, bench_indexes)
+        drop_tables(manager)
+
+
+if __name__ == '__main__':
+    main()
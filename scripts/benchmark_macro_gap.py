@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Latency of the macro-gap suggester (NutrientMatrix.suggest).
+
+Fills a temporary SQLite database with the synthetic catalog of
+benchmark_food_search.py and times suggest() for a few typical remaining
+gaps (p50 / p99 / max), plus the one-off matrix build. Target: well under
+50 ms per suggestion at 50k foods.
+
+Usage:
+    python scripts/benchmark_macro_gap.py [--ingredients 50000] [--repeat 30]
+"""
+
+import os
+import sys
+import argparse
+import time
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Sets up the temporary SQLite database
+from benchmark_food_search import create_catalog, percentile, timings_ms
+
+from models.database.connection_manager import get_db_manager
+from models.database.food_catalog import create_table, get_catalog
+from models.services.nutrient_matrix import get_nutrient_matrix
+
+GAPS = (
+    ('dinner', {'kcal': 650, 'protein': 45, 'carb': 60, 'fat': 20}),
+    ('protein only', {'kcal': 200, 'protein': 40, 'carb': 0, 'fat': 0}),
+    ('snack', {'kcal': 250, 'protein': 10, 'carb': 30, 'fat': 8}),
+    ('big gap', {'kcal': 1400, 'protein': 90, 'carb': 150, 'fat': 45}),
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the macro-gap suggester')
+    parser.add_argument('--ingredients', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=30)
+    args = parser.parse_args()
+
+    manager = get_db_manager()
+    create_catalog(manager, args.ingredients)
+    create_table(manager)
+    matrix = get_nutrient_matrix(get_catalog(manager))
+
+    started = time.perf_counter()
+    matrix.suggest(GAPS[0][1])
+    print(f"{args.ingredients} ingredients, catalog + matrix built in "
+          f"{(time.perf_counter() - started) * 1000:.0f} ms {matrix.stats()}")
+
+    print(f"\n{'gap':<14}{'items':>6}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}  best combination")
+    for name, gap in GAPS:
+        for max_items in (1, 3):
+            timings = timings_ms(lambda: matrix.suggest(gap, combos=3, max_items=max_items), args.repeat)
+            best = matrix.suggest(gap, combos=1, max_items=max_items)
+            described = ', '.join(f"{item['qty']:g}{item['unit']} {item['ingredient']}"
+                                  for item in best[0]['items']) + f" ({best[0]['match']}%)" if best else '-'
+            print(f"{name:<14}{max_items:>6}{percentile(timings, 0.5):>9.2f}{percentile(timings, 0.99):>9.2f}"
+                  f"{max(timings):>9.2f}  {described}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Worker boot cost of the MySQL pool warm-up, against the configured database.
+
+Times what post_worker_init in gunicorn.conf.py pays per worker (filling a
+pool of pool_size connections) and the first query afterwards, next to a
+single connection handshake and a query on a cold pool for reference. The
+connector opens pool connections one after another, so the warm-up is about
+pool_size handshakes.
+
+Usage:
+    python scripts/benchmark_pool_warmup.py [--repeat 5]
+"""
+
+import os
+import sys
+import argparse
+import statistics
+import time
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import mysql.connector
+
+from models.database.connection_manager import DatabaseConnectionManager
+
+
+def elapsed_ms(func) -> float:
+    started = time.perf_counter()
+    func()
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the MySQL pool warm-up of a gunicorn worker')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    timings = {'one handshake': [], 'pool warm-up': [], 'first query, warm pool': [], 'first query, cold pool': []}
+    for _ in range(args.repeat):
+        manager = DatabaseConnectionManager()
+        timings['one handshake'].append(elapsed_ms(
+            lambda: mysql.connector.connect(**manager._connection_config()).close()))
+        timings['pool warm-up'].append(elapsed_ms(manager.warm_up))
+        timings['first query, warm pool'].append(elapsed_ms(lambda: manager.execute_query('SELECT 1', fetch_one=True)))
+
+        cold = DatabaseConnectionManager()
+        timings['first query, cold pool'].append(elapsed_ms(lambda: cold.execute_query('SELECT 1', fetch_one=True)))
+
+    print(f"pool_size {manager.config.pool_size} at {manager.config.host}:{manager.config.port}")
+    print(f"\n{'':<24}{'median ms':>11}{'max ms':>9}")
+    for name, values in timings.items():
+        print(f"{name:<24}{statistics.median(values):>11.1f}{max(values):>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Find and merge duplicate ingredients ("Banana", " banana", "bananas",
+"banana (large)", "bananna").
+
+Ingredients with the same canonical key, or whose keys are trigram-similar
+with the same number of words, form a cluster around the most logged one.
+A member whose kcal per unit differs from the canonical's is reported as a
+conflict and left alone. Without --apply nothing is written.
+
+Usage:
+    python scripts/dedupe_ingredients.py [--apply] [--threshold 0.75]
+
+--apply merges every cluster in one transaction: quantities, consumption,
+favorites and recipe links move to the canonical ingredient.
+"""
+
+import os
+import sys
+import argparse
+import logging
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from models.database.connection_manager import get_db_manager
+from models.database.ingredient_canon import FUZZY_THRESHOLD, canonical_keys_ready, dedupe
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find and merge duplicate ingredients')
+    parser.add_argument('--apply', action='store_true', help='Merge the clusters found')
+    parser.add_argument('--threshold', type=float, default=FUZZY_THRESHOLD,
+                        help='Trigram similarity for two differently keyed names to match')
+    args = parser.parse_args()
+
+    manager = get_db_manager()
+    if not canonical_keys_ready(manager):
+        logger.warning("Ingredient.canonical_key is missing; run migrations/add_ingredient_canonical_key.py "
+                       "so new ingredients are matched by key")
+
+    found = dedupe(manager, apply=args.apply, threshold=args.threshold)
+    names = found['names']
+    for canonical, members in found['clusters']:
+        print(f"  {names[canonical]!r} <- {', '.join(repr(names[member]) for member in members)}")
+    for canonical, member in found['conflicts']:
+        print(f"  conflict: {names[member]!r} looks like {names[canonical]!r} but its nutrition differs")
+
+    duplicates = sum(len(members) for _, members in found['clusters'])
+    if args.apply:
+        print(f"Merged {found.get('ingredients_removed', 0)} duplicate(s) into {found.get('clusters_merged', 0)} ingredient(s)")
+    else:
+        print(f"{duplicates} duplicate(s) in {len(found['clusters'])} cluster(s); run with --apply to merge")
+
+
+if __name__ == '__main__':
+    main()
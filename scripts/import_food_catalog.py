@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Import a nutrition dataset (CSV) into the food catalog.
+
+The file needs qty, unit, ingr, kcal, fats, carbs and protein columns (the
+shape of data/data.csv; fiber and net_carbs are optional, other columns are
+ignored). Rows are streamed in chunks, each committed with its progress, so
+an interrupted import continues where it stopped when the same file is
+imported again. See models/database/catalog_import.py.
+
+Usage:
+    python scripts/import_food_catalog.py FILE [--chunk-rows N] [--update-nutrition]
+    python scripts/import_food_catalog.py --import-id ID [--chunk-rows N] [--update-nutrition]
+
+--update-nutrition overwrites the nutrition of foods that already exist;
+by default only missing foods, quantities and nutrition are added.
+
+--import-id runs an import begun by POST /foods/api/import, which starts
+this script for it, from its kept upload (CATALOG_IMPORT_DIR/ID.csv) and
+deletes the upload once the import is done. If that process was killed,
+importing the kept upload as FILE (or uploading the file again) resumes it
+once its heartbeat is stale.
+"""
+
+import os
+import sys
+import argparse
+import logging
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from models.database.connection_manager import get_db_manager
+from models.database.catalog_import import CHUNK_ROWS, CatalogImporter, ImportInProgress, get_import, import_path
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import a nutrition CSV into the food catalog')
+    parser.add_argument('file', nargs='?', help='CSV file to import')
+    parser.add_argument('--import-id', type=int, help='Run an import begun by the API from its kept upload')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='Rows committed per transaction')
+    parser.add_argument('--update-nutrition', action='store_true', help='Overwrite nutrition of existing foods')
+    args = parser.parse_args()
+    if (args.file is None) == (args.import_id is None):
+        parser.error('give either FILE or --import-id')
+
+    def progress(state):
+        print(f"  {state['rows_done']:>9} rows  {state['rows_per_second']:>8.0f} rows/s  "
+              f"+{state['ingredients_added']} ingredients  +{state['quantities_added']} quantities  "
+              f"{state['rows_skipped']} skipped", flush=True)
+
+    manager = get_db_manager()
+    if args.import_id is not None:
+        importer = CatalogImporter(manager, chunk_rows=args.chunk_rows, update_nutrition=args.update_nutrition)
+        state = get_import(manager, args.import_id)
+        if not state:
+            logger.error(f"Import {args.import_id} not found")
+            sys.exit(1)
+        path = import_path(args.import_id)
+        try:
+            result = importer.run(path, state) if state['status'] != 'done' else state
+        except Exception as e:
+            logger.error(f"Catalog import {args.import_id} stopped: {e}; resume it from {path}")
+            sys.exit(1)
+        os.remove(path)
+    else:
+        importer = CatalogImporter(manager, chunk_rows=args.chunk_rows,
+                                   update_nutrition=args.update_nutrition, progress=progress)
+        try:
+            result = importer.import_file(args.file, source=os.path.basename(args.file))
+        except ImportInProgress as e:
+            logger.error(str(e))
+            sys.exit(1)
+
+    print(f"Import {result['import_id']} {result['status']}: {result['rows_done']} row(s), "
+          f"{result['rows_skipped']} skipped, {result['ingredients_added']} ingredient(s), "
+          f"{result['quantities_added']} quantit(ies), {result['nutrition_added']} nutrition row(s) added, "
+          f"{result['nutrition_updated']} updated")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Report full scans and filesorts in the statements the database actually runs,
+and generate a migration adding the composite indexes that fix them.
+
+Usage:
+    python scripts/index_advisor.py [--statements FILE] [--limit N] [--min-count N]
+                                    [--write-migration NAME]
+
+Without --statements, statements are read from MySQL's
+performance_schema.events_statements_summary_by_digest for the configured
+schema (needs performance_schema enabled and SELECT on it).
+
+Example:
+    python scripts/index_advisor.py --limit 100 --write-migration add_advisor_indexes
+"""
+
+import os
+import sys
+import argparse
+import logging
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from models.database.connection_manager import get_db_manager
+from models.database.index_advisor import (
+    analyze, collect_fingerprints, existing_indexes, load_statements,
+    missing_indexes, redundant_indexes, render_migration, unique_indexes
+)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def print_report(findings):
+    flagged = [f for f in findings if f.problems or f.error]
+    print(f"\nAnalyzed {len(findings)} statement(s), {len(flagged)} need attention\n")
+
+    for finding in sorted(flagged, key=lambda f: f.statement.count * f.statement.avg_ms, reverse=True):
+        statement = finding.statement
+        print('-' * 80)
+        print(f"calls={statement.count} avg_ms={statement.avg_ms}")
+        print(statement.fingerprint[:300])
+        if finding.error:
+            print(f"  EXPLAIN failed: {finding.error}")
+            continue
+        print(f"  problems: {', '.join(finding.problems)}")
+        if finding.suggestion:
+            columns = ', '.join(finding.suggestion.columns)
+            if finding.covered_by:
+                print(f"  {finding.suggestion.table}({columns}) already served by {finding.covered_by}")
+            else:
+                print(f"  suggest: {finding.suggestion.table}({columns})")
+
+
+def print_redundant(manager, tables):
+    for table in sorted(tables):
+        for redundant, kept in redundant_indexes(existing_indexes(manager, table), unique_indexes(manager, table)):
+            print(f"  {table}.{redundant} is a prefix of {kept} and can be dropped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EXPLAIN hot statements and suggest composite indexes')
+    parser.add_argument('--statements', help="File of ';'-separated statements instead of performance_schema")
+    parser.add_argument('--limit', type=int, default=200, help='Number of digests to analyze')
+    parser.add_argument('--min-count', type=int, default=1, help='Ignore digests executed fewer times')
+    parser.add_argument('--write-migration', metavar='NAME', help='Write migrations/NAME.py for the missing indexes')
+    args = parser.parse_args()
+
+    manager = get_db_manager()
+    if args.statements:
+        statements = load_statements(args.statements)
+        source = os.path.basename(args.statements)
+    else:
+        statements = collect_fingerprints(manager, args.limit, args.min_count)
+        source = 'performance_schema statement digests'
+
+    findings = analyze(manager, statements)
+    print_report(findings)
+
+    indexes = missing_indexes(findings)
+    print(f"\nMissing indexes: {len(indexes)}")
+    for table, name, columns in indexes:
+        print(f"  {name} ON {table}({', '.join(columns)})")
+
+    print("\nRedundant indexes:")
+    print_redundant(manager, {f.suggestion.table for f in findings if f.suggestion})
+
+    if args.write_migration and indexes:
+        path = os.path.join(project_root, 'migrations', f'{args.write_migration}.py')
+        if os.path.exists(path):
+            logger.error(f"{path} already exists; pick another name")
+            sys.exit(1)
+        with open(path, 'w') as handle:
+            handle.write(render_migration(indexes, args.write_migration, source=source))
+        print(f"\nWrote {path}; register it in run_schema_migrations.py")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Rebuild the daily_nutrition rollup from the consumption tables.
+
+The rollup is maintained by every consumption and recipe writer; a full
+rebuild is only needed after bulk edits made outside the application
+(imports, manual SQL) or to verify it. The rebuild runs in one transaction,
+so readers see either the old or the new rollup.
+
+Usage:
+    python scripts/rebuild_daily_nutrition.py [--check]
+
+--check compares the stored rollup with a fresh aggregation and reports the
+differing days without writing anything.
+"""
+
+import os
+import sys
+import argparse
+import logging
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from models.database.connection_manager import get_db_manager
+from models.database.daily_nutrition import (
+    DEFAULT_USER, NUTRIENTS, ROLLUP_TABLE, aggregate_days, rebuild, rollup_ready
+)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def check(manager) -> int:
+    """Number of (day, meal_type) rows where the rollup differs from the source tables"""
+    stored = {
+        (row['day'], row['meal_type']): row
+        for row in manager.execute_query(
+            f'SELECT * FROM {ROLLUP_TABLE} WHERE user_id = %s', (DEFAULT_USER,), fetch_all=True
+        ) or []
+    }
+    fresh = {(row['day'], row['meal_type']): row for row in aggregate_days(manager)}
+
+    differing = 0
+    for key in sorted(set(stored) | set(fresh), key=str):
+        old, new = stored.get(key), fresh.get(key)
+        if old is None or new is None or any(
+            abs(float(old[n] or 0) - float(new[n] or 0)) > 0.01 for n in NUTRIENTS
+        ) or int(old['items']) != int(new['items']):
+            differing += 1
+            print(f"  {key[0]} {key[1]}: stored={old and round(float(old['kcal']), 1)} "
+                  f"fresh={new and round(float(new['kcal']), 1)}")
+    return differing
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the daily_nutrition rollup')
+    parser.add_argument('--check', action='store_true', help='Only report days that differ')
+    args = parser.parse_args()
+
+    manager = get_db_manager()
+    if not rollup_ready(manager):
+        logger.error(f"{ROLLUP_TABLE} is not available; run migrations/add_daily_nutrition_rollup.py")
+        sys.exit(1)
+
+    if args.check:
+        differing = check(manager)
+        print(f"{differing} rollup row(s) differ")
+        sys.exit(1 if differing else 0)
+
+    rows = rebuild(manager)
+    print(f"Rebuilt {ROLLUP_TABLE}: {rows} row(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+"""
+Shared fixtures: every test gets its own SQLite database file.
+
+The services reach the database through get_db_manager(), so the fixture
+installs its manager as the process-wide one for the duration of the test.
+"""
+import pytest
+
+from config.database import SQLiteConfig
+from models.database import connection_manager
+from models.database.sqlite_manager import SQLiteConnectionManager
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    """A fresh SQLite database with the core schema, without a query cache"""
+    monkeypatch.setenv('DB_ENGINE', 'sqlite')
+    monkeypatch.setenv('QUERY_CACHE_ENABLED', 'false')
+    db = SQLiteConnectionManager(SQLiteConfig(path=str(tmp_path / 'test.db'), database='test'))
+    monkeypatch.setattr(connection_manager, '_db_manager', db)
+    yield db
+    db.cleanup_connections()
@@ -0,0 +1,79 @@
+import pytest
+
+from config.database import SQLiteConfig
+from models.database.catalog_import import CatalogImporter, ImportInProgress, TooManyImports
+from models.database.sqlite_manager import SQLiteConnectionManager
+
+ROWS = 95
+
+
+@pytest.fixture
+def upload(tmp_path):
+    path = tmp_path / 'foods.csv'
+    lines = ['qty,unit,ingr,kcal,fats,carbs,protein']
+    lines += [f'100,g,food {i},{100 + i},{i % 9},{i % 40},{i % 25}' for i in range(ROWS)]
+    lines.insert(10, '0,g,no quantity,1,1,1,1')  # Skipped, and still counted as done
+    path.write_text('\n'.join(lines) + '\n')
+    return str(path)
+
+
+def _catalog(manager):
+    return manager.execute_query('''
+        SELECT i.ingredient_name, iq.quantity, n.kcal
+        FROM Ingredient i
+        JOIN Ingredient_Quantity iq ON iq.ingredient_id = i.ingredient_id
+        JOIN Nutrition n ON n.ingredient_id = i.ingredient_id AND n.unit_id = iq.unit_id
+        ORDER BY i.ingredient_name
+    ''', fetch_all=True)
+
+
+def test_resume_after_an_interrupted_chunk(manager, upload, monkeypatch, tmp_path):
+    real_chunk = CatalogImporter._import_chunk
+    calls = []
+
+    def failing_chunk(self, cursor, rows):
+        calls.append(len(rows))
+        if len(calls) == 4:
+            raise RuntimeError('worker killed')
+        return real_chunk(self, cursor, rows)
+
+    monkeypatch.setattr(CatalogImporter, '_import_chunk', failing_chunk)
+    with pytest.raises(RuntimeError):
+        CatalogImporter(manager, chunk_rows=20).import_file(upload)
+
+    state = manager.execute_query('SELECT * FROM catalog_imports', fetch_one=True)
+    assert (state['status'], state['rows_done'], state['rows_skipped']) == ('failed', 60, 1)
+    assert len(_catalog(manager)) == 59
+
+    monkeypatch.setattr(CatalogImporter, '_import_chunk', real_chunk)
+    resumed = CatalogImporter(manager, chunk_rows=20).import_file(upload)
+    assert resumed['import_id'] == state['import_id']
+    assert (resumed['status'], resumed['rows_done'], resumed['rows_skipped']) == ('done', ROWS + 1, 1)
+    assert resumed['ingredients_added'] == ROWS
+
+    # The resumed import ends where one uninterrupted run does
+    interrupted = _catalog(manager)
+    fresh = SQLiteConnectionManager(SQLiteConfig(path=str(tmp_path / 'fresh.db'), database='fresh'))
+    CatalogImporter(fresh, chunk_rows=1000).import_file(upload)
+    assert interrupted == _catalog(fresh)
+    fresh.cleanup_connections()
+
+    # A finished file is not imported again
+    assert CatalogImporter(manager, chunk_rows=20).import_file(upload)['import_id'] == state['import_id']
+    assert len(_catalog(manager)) == ROWS
+
+
+def test_running_imports_are_capped(manager, upload, tmp_path):
+    importer = CatalogImporter(manager)
+    first = importer.begin(upload, max_running=1)
+
+    with pytest.raises(ImportInProgress):
+        importer.begin(upload, max_running=1)
+
+    other = tmp_path / 'other.csv'
+    other.write_text('qty,unit,ingr,kcal,fats,carbs,protein\n1,g,salt,0,0,0,0\n')
+    with pytest.raises(TooManyImports):
+        importer.begin(str(other), max_running=1)
+
+    importer.run(upload, first)
+    assert importer.begin(str(other), max_running=1)['status'] == 'running'
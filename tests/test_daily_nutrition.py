@@ -0,0 +1,108 @@
+import pytest
+
+from models.database import daily_nutrition
+from models.food import FoodDatabase
+
+CSV_HEADER = 'qty,unit,ingr,kcal,fats,carbs,fiber,net_carbs,protein'
+
+
+def _entry(qty, unit, name, kcal, fats, carbs, protein):
+    return {'qty': str(qty), 'unit': unit, 'ingr': name, 'kcal': str(kcal), 'fats': str(fats),
+            'carbs': str(carbs), 'fiber': '1', 'net_carbs': str(carbs - 1), 'protein': str(protein)}
+
+
+@pytest.fixture
+def food_db(manager):
+    daily_nutrition.create_table(manager)
+    db = FoodDatabase()
+    assert daily_nutrition.rollup_ready(manager)
+    return db
+
+
+def _rollup(manager):
+    rows = manager.execute_query(f'''
+        SELECT day, meal_type, kcal, fat, carb, fiber, net_carb, protein, items
+        FROM {daily_nutrition.ROLLUP_TABLE} ORDER BY day, meal_type
+    ''', fetch_all=True)
+    return [{k: round(v, 6) if isinstance(v, float) else str(v) for k, v in row.items()} for row in rows]
+
+
+def assert_matches_rebuild(manager):
+    maintained = _rollup(manager)
+    daily_nutrition.rebuild(manager)
+    assert maintained == _rollup(manager)
+    return maintained
+
+
+def test_rollup_equals_rebuild_after_every_write(manager, food_db):
+    oats, milk, egg = food_db.save_entries([
+        _entry(100, 'g', 'oats', 380, 7, 60, 13),
+        _entry(200, 'ml', 'milk', 130, 7, 10, 7),
+        _entry(2, 'piece', 'egg', 150, 10, 1, 13),
+    ])
+
+    food_db.save_consumption('01.03.2024', oats, 'breakfast')
+    food_db.save_consumption('01.03.2024', oats, 'breakfast')  # Second portion of the same entry
+    food_db.save_consumption('2024-03-01', milk, 'breakfast')
+    food_db.save_consumption('02.03.2024', egg, 'lunch')
+    days = {row['day'] for row in assert_matches_rebuild(manager)}
+    assert days == {'2024-03-01', '2024-03-02'}
+
+    egg_entry = manager.execute_query('SELECT consumption_id FROM Consumption WHERE ingredient_quantity_id = %s',
+                                      (egg,), fetch_one=True)['consumption_id']
+    assert food_db.update_consumption(egg_entry, 3)
+    assert_matches_rebuild(manager)
+
+    recipe_csv = '\n'.join([CSV_HEADER, '100,g,oats,380,7,60,1,59,13', '200,ml,milk,130,7,10,1,9,7'])
+    food_db.save_recipe('2024-03-01', 'porridge', 2, recipe_csv)
+    recipe_id = manager.execute_query("SELECT recipe_id FROM Recipe WHERE recipe_name = 'porridge'",
+                                      fetch_one=True)['recipe_id']
+    assert food_db.save_recipe_consumption(recipe_id, '02.03.2024', 'dinner', servings=2)
+    assert_matches_rebuild(manager)
+
+    assert food_db.update_recipe(recipe_id, 'porridge', 1, '\n'.join([CSV_HEADER, '50,g,oats,190,3.5,30,0.5,29.5,6.5']))
+    assert_matches_rebuild(manager)
+
+    food_db.update_nutrition(oats, {'qty': 100, 'kcal': 400, 'fat': 8, 'carb': 62, 'fiber': 10,
+                                    'net_carb': 52, 'protein': 14})
+    assert_matches_rebuild(manager)
+
+    recipe_entry = manager.execute_query('SELECT recipe_consumption_id FROM recipe_consumption',
+                                         fetch_one=True)['recipe_consumption_id']
+    food_db.delete_recipe_consumption(recipe_entry)
+    food_db.delete_consumption(egg_entry)
+    food_db.delete_recipe(recipe_id)
+    rows = assert_matches_rebuild(manager)
+    assert {row['day'] for row in rows} == {'2024-03-01'}
+
+
+def test_average_matches_with_and_without_rollup(manager, food_db):
+    oats, = food_db.save_entries([_entry(100, 'g', 'oats', 380, 7, 60, 13)])
+    food_db.save_consumption('01.03.2024', oats, 'breakfast')
+    food_db.save_consumption('03.03.2024', oats, 'lunch')
+    food_db.save_recipe('2024-03-01', 'bowl', 1, '\n'.join([CSV_HEADER, '50,g,oats,190,3.5,30,0.5,29.5,6.5']))
+    recipe_id = manager.execute_query('SELECT recipe_id FROM Recipe', fetch_one=True)['recipe_id']
+    food_db.save_recipe_consumption(recipe_id, '03.03.2024', 'dinner')
+
+    with_rollup = food_db.get_avg_nutrition_consumed()
+    manager.execute_query(f'DROP TABLE {daily_nutrition.ROLLUP_TABLE}')
+    daily_nutrition.reset_rollup_state(manager)
+    assert food_db.get_avg_nutrition_consumed() == pytest.approx(with_rollup)
+
+
+def test_failed_update_changes_nothing(manager, food_db, monkeypatch):
+    oats, = food_db.save_entries([_entry(100, 'g', 'oats', 380, 7, 60, 13)])
+    food_db.save_consumption('01.03.2024', oats, 'breakfast')
+    entry = manager.execute_query('SELECT consumption_id FROM Consumption', fetch_one=True)['consumption_id']
+    before = (manager.execute_query('SELECT * FROM Consumption', fetch_all=True), _rollup(manager),
+              manager.execute_query('SELECT COUNT(*) AS n FROM Ingredient_Quantity', fetch_one=True))
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('refresh failed')
+
+    monkeypatch.setattr(FoodDatabase, '_refresh_rollup', fail)
+    with pytest.raises(RuntimeError):
+        food_db.update_consumption(entry, 250)
+
+    assert before == (manager.execute_query('SELECT * FROM Consumption', fetch_all=True), _rollup(manager),
+                      manager.execute_query('SELECT COUNT(*) AS n FROM Ingredient_Quantity', fetch_one=True))
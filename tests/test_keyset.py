@@ -0,0 +1,70 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from models.database.keyset import (InvalidCursor, after_condition, cached_count, cursor_values, encode_cursor,
+                                    keyset_page)
+
+SORT_KEY = [('day', False), ('start_time', True), ('id', False)]
+
+
+@pytest.fixture
+def sessions(manager):
+    rng = random.Random(7)
+    manager.execute_query('CREATE TABLE sessions (id INTEGER PRIMARY KEY, day DATE NOT NULL, start_time TEXT)')
+    manager.execute_many('INSERT INTO sessions (id, day, start_time) VALUES (%s, %s, %s)', [
+        (i, date(2024, 1, 1) + timedelta(days=rng.randint(0, 5)),
+         rng.choice([None, '07:30:00', '12:00:00', '18:15:00']))
+        for i in range(1, 61)
+    ])
+    return manager
+
+
+def _page(manager, limit, token):
+    after = cursor_values(token, 'sessions', 3)
+    condition, params = after_condition(SORT_KEY, after) if after else ('1=1', ())
+    rows = manager.execute_query(f'''
+        SELECT id, day, start_time FROM sessions WHERE {condition}
+        ORDER BY day DESC, start_time DESC, id DESC LIMIT %s
+    ''', (*params, limit + 1), fetch_all=True)
+    return keyset_page(rows, limit, 'sessions', lambda row: (row['day'], row['start_time'], row['id']))
+
+
+@pytest.mark.parametrize('limit', [1, 7, 60, 100])
+def test_pages_cover_the_listing_once_in_order(sessions, limit):
+    expected = sessions.execute_query('SELECT id FROM sessions ORDER BY day DESC, start_time DESC, id DESC',
+                                      fetch_all=True)
+    seen, token = [], None
+    while True:
+        page = _page(sessions, limit, token)
+        seen.extend(page['items'])
+        token = page['next_cursor']
+        assert page['has_more'] == (token is not None)
+        if not token:
+            break
+    assert [row['id'] for row in seen] == [row['id'] for row in expected]
+
+
+def test_cursor_round_trip():
+    values = [date(2024, 1, 2), None, 17]
+    token = encode_cursor('sessions', values)
+    assert cursor_values(token, 'sessions', 3) == ['2024-01-02', None, 17]
+    assert cursor_values(None, 'sessions', 3) is None
+
+
+@pytest.mark.parametrize('token, kind, size', [
+    ('not a cursor', 'sessions', 3),
+    (encode_cursor('foods', [1]), 'sessions', 1),
+    (encode_cursor('sessions', [1, 2]), 'sessions', 3),
+])
+def test_invalid_cursor(token, kind, size):
+    with pytest.raises(InvalidCursor):
+        cursor_values(token, kind, size)
+
+
+def test_cached_count_follows_writes(sessions):
+    query = 'SELECT COUNT(*) AS total FROM sessions'
+    assert cached_count(sessions, ('sessions',), query) == 60
+    sessions.execute_query('DELETE FROM sessions WHERE id <= %s', (10,))
+    assert cached_count(sessions, ('sessions',), query) == 50
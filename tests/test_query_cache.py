@@ -0,0 +1,115 @@
+import pytest
+
+from config.database import get_query_cache_config
+from models.database.query_cache import QueryCache, SharedTableVersions, create_query_cache, written_table
+from models.database.sqlite_manager import SQLiteConnectionManager
+
+
+@pytest.mark.parametrize('query, table', [
+    ('INSERT INTO Consumption (a) VALUES (%s)', 'consumption'),
+    ('  update `Recipe` SET servings = 2', 'recipe'),
+    ('DELETE FROM recipe_consumption WHERE recipe_consumption_id = %s', 'recipe_consumption'),
+    ('SELECT * FROM Consumption', None),
+])
+def test_written_table(query, table):
+    assert written_table(query) == table
+
+
+def test_write_invalidates_only_dependent_entries():
+    cache = QueryCache()
+    cache.put('both', ('Consumption', 'Nutrition'), [{'kcal': 1}])
+    cache.put('other', ('Recipe',), [{'name': 'soup'}])
+
+    cache.touch('nutrition')
+
+    assert cache.get('both', ('Nutrition', 'Consumption')) == (False, None)
+    assert cache.get('other', ('Recipe',)) == (True, [{'name': 'soup'}])
+    stats = cache.stats()
+    assert (stats['entries'], stats['hits'], stats['misses'], stats['invalidations']) == (1, 1, 1, 1)
+
+
+def test_result_read_before_a_write_is_stale():
+    cache = QueryCache()
+    snapshot = cache.snapshot(('Consumption',))
+    cache.touch('Consumption')  # A write lands while the query runs
+    cache.put('rows', ('Consumption',), [], snapshot)
+    assert cache.get('rows', ('Consumption',)) == (False, None)
+
+
+def test_hits_are_copies():
+    cache = QueryCache()
+    cache.put('rows', ('t',), [{'a': 1}])
+    _, rows = cache.get('rows', ('t',))
+    rows[0]['a'] = 2
+    assert cache.get('rows', ('t',)) == (True, [{'a': 1}])
+
+
+def test_lru_eviction_by_entries():
+    cache = QueryCache(max_entries=2)
+    cache.put('a', ('t',), 1)
+    cache.put('b', ('t',), 2)
+    cache.get('a', ('t',))  # b becomes the least recently used
+    cache.put('c', ('t',), 3)
+
+    assert cache.get('b', ('t',))[0] is False
+    assert cache.get('a', ('t',)) == (True, 1)
+    assert cache.get('c', ('t',)) == (True, 3)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_byte_accounting():
+    cache = QueryCache(max_bytes=10_000)
+    row = [{'text': 'x' * 3000}]
+    for key in range(5):
+        cache.put(key, ('t',), row)
+    stats = cache.stats()
+    assert 0 < stats['bytes'] <= 10_000
+    assert stats['entries'] + stats['evictions'] == 5
+
+    # Replacing an entry does not count its old size twice
+    before = cache.stats()['bytes']
+    cache.put(4, ('t',), row)
+    assert cache.stats()['bytes'] == before
+
+    cache.put('huge', ('t',), [{'text': 'x' * 20_000}])
+    assert cache.get('huge', ('t',))[0] is False
+
+    cache.clear()
+    assert (cache.stats()['entries'], cache.stats()['bytes']) == (0, 0)
+
+
+def test_shared_versions_invalidate_across_caches(tmp_path):
+    path = str(tmp_path / 'versions')
+    worker_a = QueryCache(versions=SharedTableVersions(path))
+    worker_b = QueryCache(versions=SharedTableVersions(path))
+    worker_a.put('rows', ('Consumption',), [1])
+
+    worker_b.touch('Consumption')
+
+    assert worker_a.get('rows', ('Consumption',)) == (False, None)
+    assert worker_a.stats()['shared'] is True
+
+
+def test_enabled_by_default_only_with_shared_versions(tmp_path, monkeypatch):
+    monkeypatch.delenv('QUERY_CACHE_ENABLED', raising=False)
+    monkeypatch.delenv('QUERY_CACHE_SHARED_PATH', raising=False)
+    assert create_query_cache(get_query_cache_config()) is None
+
+    monkeypatch.setenv('QUERY_CACHE_SHARED_PATH', str(tmp_path / 'versions'))
+    assert create_query_cache(get_query_cache_config()).stats()['shared'] is True
+
+
+def test_manager_writes_invalidate_cached_reads(manager, monkeypatch):
+    monkeypatch.setenv('QUERY_CACHE_ENABLED', 'true')
+    db = SQLiteConnectionManager(manager.config)
+    db.execute_query('CREATE TABLE kv (k TEXT PRIMARY KEY, v INTEGER)')
+    db.execute_query('INSERT INTO kv (k, v) VALUES (%s, %s)', ('a', 1))
+
+    read = lambda: db.execute_query('SELECT v FROM kv WHERE k = %s', ('a',), fetch_one=True, cache_tables=('kv',))
+    assert read() == {'v': 1}
+    assert read() == {'v': 1}
+    assert db.cache_stats()['hits'] == 1
+
+    db.execute_query('UPDATE kv SET v = %s WHERE k = %s', (2, 'a'))
+    assert read() == {'v': 2}
+    db.cleanup_connections()
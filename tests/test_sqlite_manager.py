@@ -0,0 +1,73 @@
+from datetime import date, timedelta
+
+import pytest
+
+from models.database.sqlite_manager import translate_query
+
+
+@pytest.mark.parametrize('query, has_params, expected', [
+    ('SELECT * FROM t WHERE a = %s AND b = %s', True, 'SELECT * FROM t WHERE a = ? AND b = ?'),
+    ("SELECT * FROM t WHERE a = %s AND b LIKE '%%x%%'", True, "SELECT * FROM t WHERE a = ? AND b LIKE '%x%'"),
+    ("SELECT * FROM t WHERE b LIKE '%%x'", False, "SELECT * FROM t WHERE b LIKE '%%x'"),
+    ("SELECT 'INSERT IGNORE %s' FROM t WHERE a = %s", True, "SELECT 'INSERT IGNORE %s' FROM t WHERE a = ?"),
+    ('INSERT IGNORE INTO t (a) VALUES (%s)', True, 'INSERT OR IGNORE INTO t (a) VALUES (?)'),
+    ('INSERT INTO t (a, b) VALUES (%s, %s) ON DUPLICATE KEY UPDATE b = VALUES(b)', True,
+     'INSERT INTO t (a, b) VALUES (?, ?) ON CONFLICT DO UPDATE SET b = excluded.b'),
+    ('SELECT DATE_SUB(d, INTERVAL 7 DAY) FROM t', False, "SELECT DATE_SUB(d, 7, 'DAY') FROM t"),
+])
+def test_translate_query(query, has_params, expected):
+    assert translate_query(query, has_params) == expected
+
+
+def test_translated_statements_run(manager):
+    manager.execute_query('CREATE TABLE kv (k TEXT PRIMARY KEY, v INTEGER)')
+    manager.execute_query('INSERT INTO kv (k, v) VALUES (%s, %s)', ('a', 1))
+    manager.execute_query('INSERT IGNORE INTO kv (k, v) VALUES (%s, %s)', ('a', 2))
+    assert manager.execute_query('SELECT v FROM kv WHERE k = %s', ('a',), fetch_one=True) == {'v': 1}
+
+    manager.execute_query('INSERT INTO kv (k, v) VALUES (%s, %s) ON DUPLICATE KEY UPDATE v = VALUES(v)', ('a', 3))
+    assert manager.execute_query("SELECT v FROM kv WHERE k LIKE '%%a%%' AND v > %s", (0,), fetch_one=True) == {'v': 3}
+
+    day = date(2024, 3, 1)
+    row = manager.execute_query('SELECT DATE_SUB(%s, INTERVAL 1 MONTH) AS d', (day,), fetch_one=True)
+    assert str(row['d']) == str(day - timedelta(days=29))
+
+
+def _count(manager):
+    return manager.execute_query('SELECT COUNT(*) AS n FROM kv', fetch_one=True)['n']
+
+
+def test_nested_holder_leaves_the_transaction_to_its_caller(manager):
+    manager.execute_query('CREATE TABLE kv (k TEXT PRIMARY KEY, v INTEGER)')
+
+    with manager.get_connection() as conn:
+        conn.cursor().execute('INSERT INTO kv (k, v) VALUES (%s, %s)', ('outer', 1))
+        # Releasing a nested holder, or its commit(), must not end the caller's transaction
+        manager.execute_query('INSERT INTO kv (k, v) VALUES (%s, %s)', ('nested', 2))
+        with manager.get_connection() as inner:
+            inner.commit()
+        conn.rollback()
+
+    assert _count(manager) == 0
+
+
+def test_nested_rollback_does_not_undo_the_callers_writes(manager):
+    manager.execute_query('CREATE TABLE kv (k TEXT PRIMARY KEY, v INTEGER)')
+
+    with manager.get_connection() as conn:
+        conn.cursor().execute('INSERT INTO kv (k, v) VALUES (%s, %s)', ('outer', 1))
+        with manager.get_connection() as inner:
+            inner.rollback()
+        conn.commit()
+
+    assert _count(manager) == 1
+
+
+def test_outermost_connection_commits_on_release(manager):
+    manager.execute_query('CREATE TABLE kv (k TEXT PRIMARY KEY, v INTEGER)')
+    with manager.get_connection() as conn:
+        conn.cursor().execute('INSERT INTO kv (k, v) VALUES (%s, %s)', ('a', 1))
+        manager.execute_query('INSERT INTO kv (k, v) VALUES (%s, %s)', ('b', 2))
+
+    manager.cleanup_connections()  # A new connection only sees committed rows
+    assert _count(manager) == 2
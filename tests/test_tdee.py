@@ -0,0 +1,80 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from models.database.energy_balance import WINDOW_DAYS
+from models.services.tdee import KCAL_PER_KG, MIN_INTAKE_DAYS, SMOOTHING_DAYS, EnergyBalance
+
+
+def _days(count=90, seed=5):
+    rng = random.Random(seed)
+    weight, days = 80.0, []
+    for i in range(count):
+        weight -= rng.uniform(-0.05, 0.1)
+        days.append((date(2024, 1, 1) + timedelta(days=i),
+                     None if rng.random() < 0.2 else rng.uniform(1600, 2600),
+                     None if rng.random() < 0.4 else rng.uniform(0, 900),
+                     None if i < 3 else weight))
+    return days
+
+
+def _mean(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+
+def _recomputed(days):
+    """The estimates of every day, each window summed from scratch"""
+    rows, tdee = [], None
+    alpha = 1 - 0.5 ** (1 / SMOOTHING_DAYS)
+    for i, (day, intake, active, trend) in enumerate(days):
+        window = days[max(0, i - WINDOW_DAYS + 1):i + 1]
+        intakes = [row[1] for row in window if row[1] is not None]
+        first, last = window[0][3], window[-1][3]
+        maintenance = None
+        if len(intakes) >= MIN_INTAKE_DAYS and first is not None and last is not None:
+            maintenance = _mean(intakes) - KCAL_PER_KG * (last - first) / (len(window) - 1)
+            tdee = maintenance if tdee is None else tdee + alpha * (maintenance - tdee)
+        rows.append((maintenance, tdee, _mean(row[2] for row in window)))
+    return rows
+
+
+def _estimates(rows):
+    return [(row['maintenance_kcal'], row['tdee_kcal'], row['active_avg_kcal']) for row in rows]
+
+
+def assert_same_estimates(got, expected):
+    assert len(got) == len(expected)
+    for row, expected_row in zip(got, expected):
+        assert row == pytest.approx(expected_row)
+
+
+def test_running_sums_match_a_full_recompute():
+    days = _days()
+    balance = EnergyBalance()
+    rows = [balance.advance(*day) for day in days]
+
+    assert len(balance.window) == WINDOW_DAYS
+    assert_same_estimates(_estimates(rows), _recomputed(days))
+    assert rows[-1]['tdee_kcal'] is not None
+
+
+def test_resume_continues_like_an_uninterrupted_run():
+    days = _days()
+    balance = EnergyBalance()
+    rows = [balance.advance(*day) for day in days]
+
+    stored = rows[:60]
+    resumed = EnergyBalance.resume(stored)
+    continued = [resumed.advance(*day) for day in days[60:]]
+    assert_same_estimates(_estimates(continued), _estimates(rows[60:]))
+
+
+def test_no_estimate_until_enough_intake_days():
+    balance = EnergyBalance()
+    rows = [balance.advance(date(2024, 1, 1) + timedelta(days=i), 2000.0, None, 80.0)
+            for i in range(MIN_INTAKE_DAYS)]
+    assert all(row['tdee_kcal'] is None for row in rows[:-1])
+    assert rows[-1]['maintenance_kcal'] == pytest.approx(2000.0)
+    assert rows[-1]['active_avg_kcal'] is None
@@ -0,0 +1,84 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from models.database import weight_series
+from models.database.sqlite_manager import SQLiteConnectionManager
+from models.services.weight_trend import WeightTrend, load_trend, record_weight
+
+
+def _points(count=120, seed=3):
+    rng = random.Random(seed)
+    day, weight, points = date(2024, 1, 1), 82.0, []
+    for _ in range(count):
+        day += timedelta(days=rng.choice([1, 1, 1, 2, 3, 7]))
+        weight += rng.uniform(-0.6, 0.5)
+        points.append((day, round(weight, 1)))
+    return points
+
+
+def _columns(trend):
+    return trend.days, list(trend.weights), list(trend.ewma), list(trend.level), list(trend.variance)
+
+
+def test_append_continues_build_exactly():
+    points = _points()
+    trend = WeightTrend.build(points[:50])
+    for day, weight in points[50:]:
+        assert trend.append(day, weight)
+    assert _columns(trend) == _columns(WeightTrend.build(points))
+
+
+def test_append_rejects_days_not_after_the_last():
+    trend = WeightTrend.build(_points(5))
+    last = trend.days[-1]
+    assert not trend.append(last, 80.0)
+    assert not trend.append(last - timedelta(days=1), 80.0)
+    assert len(trend) == 5
+
+
+def test_smoothing_follows_gaps():
+    trend = WeightTrend.build([(date(2024, 1, 1), 80.0), (date(2024, 1, 8), 82.0)])
+    # One half-life between the weigh-ins moves the EWMA halfway
+    assert trend.ewma[-1] == pytest.approx(81.0)
+    assert trend.level_on(date(2024, 1, 5)) == 80.0
+    assert trend.level_on(date(2023, 12, 31)) is None
+
+
+@pytest.fixture
+def cached_manager(manager, monkeypatch):
+    """A manager with the query cache on, which versions the cached trends"""
+    monkeypatch.setenv('QUERY_CACHE_ENABLED', 'true')
+    db = SQLiteConnectionManager(manager.config)
+    weight_series.create_table(db)
+    yield db
+    db.cleanup_connections()
+
+
+def test_recorded_weight_extends_the_cached_trend(cached_manager):
+    points = _points(30)
+    for day, weight in points[:-1]:
+        weight_series.record(cached_manager, day, weight, user_id='ana')
+    cached = load_trend(cached_manager, 'ana')
+
+    record_weight(cached_manager, *points[-1], user_id='ana')
+
+    extended = load_trend(cached_manager, 'ana')
+    assert extended is cached
+    assert _columns(extended) == _columns(WeightTrend.build(points))
+
+
+def test_back_dated_weight_rebuilds_the_trend(cached_manager):
+    points = _points(30)
+    for day, weight in points:
+        weight_series.record(cached_manager, day, weight, user_id='ana')
+    cached = load_trend(cached_manager, 'ana')
+
+    day, weight = points[10]
+    record_weight(cached_manager, day, weight + 2, user_id='ana')
+
+    rebuilt = load_trend(cached_manager, 'ana')
+    assert rebuilt is not cached
+    points[10] = (day, weight + 2)
+    assert _columns(rebuilt) == _columns(WeightTrend.build(points))